@@ -5,6 +5,7 @@ import datetime, time
 import types
 import threading
 import random
+import Queue
 from DIRAC.Core.Base.DB import DB
 from DIRAC import S_OK, S_ERROR, gMonitor, gConfig
 from DIRAC.Core.Utilities import List, ThreadSafe, Time, DEncode
@@ -13,6 +14,9 @@ from DIRAC.Core.Utilities.ThreadPool import ThreadPool
 
 gSynchro = ThreadSafe.Synchronizer()
 
+#Seconds after which the rollups are reloaded, to see the ones created by other instances
+ROLLUPS_REFRESH_TIME = 300
+
 class AccountingDB( DB ):
 
   def __init__( self, name = 'Accounting/AccountingDB', maxQueueSize = 10, readOnly = False ):
@@ -29,20 +33,48 @@ class AccountingDB( DB ):
     self.dbCatalog = {}
     self.dbBucketsLength = {}
     self.__keysCache = {}
+    self.dbRollups = {}
+    self.__rollupsLoadTime = 0
+    #Buckets contributions waiting to be written, by type and bucket cell
+    self.__bucketsBufferLock = threading.Lock()
+    self.__bucketsBuffer = {}
+    self.__rollupsBuffer = {}
+    #Rollups the buffered cells were split for
+    self.__bufferedRollups = {}
+    self.__bufferedRecords = {}
+    self.__bufferedINIds = {}
+    self.__bufferedCells = 0
+    self.__bufferStartEpoch = 0
+    self.__bucketsBufferTime = self.getCSOption( "BucketsBufferTime", 30 )
+    self.__bucketsBufferSize = self.getCSOption( "BucketsBufferSize", 10000 )
+    self.__bufferCounters = { 'RecordsIn' : 0, 'CellsWritten' : 0, 'RollupCellsWritten' : 0, 'Flushes' : 0 }
     maxParallelInsertions = self.getCSOption( "ParallelRecordInsertions", 10 )
     self.__threadPool = ThreadPool( 1, maxParallelInsertions )
     self.__threadPool.daemonize()
+    #Progress of the running or last compaction
+    self.__compactionLock = threading.Lock()
+    self.__compactionStatus = { 'Running' : False, 'StartTime' : 0, 'EndTime' : 0 }
+    self.__compactionNextSlot = 0
     self.catalogTableName = _getTableName( "catalog", "Types" )
+    self.rollupsCatalogTableName = _getTableName( "catalog", "Rollups" )
     self._createTables( { self.catalogTableName : { 'Fields' : { 'name' : "VARCHAR(64) UNIQUE NOT NULL",
                                                           'keyFields' : "VARCHAR(255) NOT NULL",
                                                           'valueFields' : "VARCHAR(255) NOT NULL",
                                                           'bucketsLength' : "VARCHAR(255) NOT NULL",
                                                        },
                                              'PrimaryKey' : 'name'
-                                           }
+                                           },
+                          self.rollupsCatalogTableName : { 'Fields' : { 'name' : "VARCHAR(64) NOT NULL",
+                                                                        'granularity' : "INT UNSIGNED NOT NULL",
+                                                                        'keyFields' : "VARCHAR(255) NOT NULL",
+                                                                        'validSince' : "INT UNSIGNED NOT NULL"
+                                                                      },
+                                                           'PrimaryKey' : [ 'name', 'granularity' ]
+                                                         }
                         }
                       )
     self.__loadCatalogFromDB()
+    self.__loadRollupsFromDB()
     gMonitor.registerActivity( "registeradded",
                                "Register added",
                                "Accounting",
@@ -53,6 +85,21 @@ class AccountingDB( DB ):
                                "Accounting",
                                "seconds",
                                gMonitor.OP_MEAN )
+    gMonitor.registerActivity( "bucketrecordsin",
+                               "Records added to the buckets",
+                               "Accounting",
+                               "records",
+                               gMonitor.OP_ACUM )
+    gMonitor.registerActivity( "bucketcellswritten",
+                               "Bucket cells written",
+                               "Accounting",
+                               "cells",
+                               gMonitor.OP_ACUM )
+    gMonitor.registerActivity( "compactedbuckets",
+                               "Buckets compacted",
+                               "Accounting",
+                               "buckets",
+                               gMonitor.OP_ACUM )
     gMonitor.registerActivity( "querytime",
                                "Records query time",
                                "Accounting",
@@ -152,6 +199,100 @@ class AccountingDB( DB ):
       bucketsLength = DEncode.decode( typesEntry[3] )[0]
       self.__addToCatalog( typeName, keyFields, valueFields, bucketsLength )
 
+  def __loadRollupsFromDB( self ):
+    """
+    Load the rollups defined in the DB, they may have been created by another instance
+    """
+    retVal = self._query( "SELECT `name`, `granularity`, `keyFields`, `validSince` FROM `%s`" % self.rollupsCatalogTableName )
+    if not retVal[ 'OK' ]:
+      return retVal
+    dbRollups = {}
+    for typeName, granularity, keyFields, validSince in retVal[ 'Value' ]:
+      if typeName not in self.dbCatalog:
+        continue
+      keyFields = List.fromChar( keyFields, "," )
+      typeKeys = self.dbCatalog[ typeName ][ 'keys' ]
+      if [ key for key in keyFields if key not in typeKeys ]:
+        self.log.error( "Rollup key fields are not keys of the type", "%s: %s" % ( typeName, keyFields ) )
+        continue
+      dbRollups.setdefault( typeName, {} )[ int( granularity ) ] = { 'granularity' : int( granularity ),
+                                                                     'keys' : keyFields,
+                                                                     'keyPositions' : [ typeKeys.index( key ) for key in keyFields ],
+                                                                     'validSince' : int( validSince ),
+                                                                     'retention' : 0 }
+    for typeName in dbRollups:
+      retentions = _getRollupsRetention( self.__getBucketsLengthRanges( typeName ), dbRollups[ typeName ].keys() )
+      for granularity in retentions:
+        dbRollups[ typeName ][ granularity ][ 'retention' ] = retentions[ granularity ]
+    self.dbRollups = dbRollups
+    self.__rollupsLoadTime = time.time()
+    return S_OK()
+
+  def __refreshRollups( self ):
+    """
+    Reload the rollups if they have not been loaded for ROLLUPS_REFRESH_TIME seconds
+    """
+    if time.time() - self.__rollupsLoadTime > ROLLUPS_REFRESH_TIME:
+      retVal = self.__loadRollupsFromDB()
+      if not retVal[ 'OK' ]:
+        self.log.error( "Cannot load the rollups", retVal[ 'Message' ] )
+
+  def __getBucketsLengthRanges( self, typeName ):
+    """
+    Buckets length by age, 0 as age limit of the last range
+    """
+    return list( self.dbBucketsLength[ typeName ] ) + [ ( 0, self.maxBucketTime ) ]
+
+  def __registerRollups( self, typeName ):
+    """
+    Create the configured rollup tables of a type that do not exist yet
+    """
+    granularities = [ int( granularity ) for granularity in self.getCSOption( "RollupGranularities",
+                                                                              [ 3600, 86400, 604800 ] ) ]
+    typeKeys = self.dbCatalog[ typeName ][ 'keys' ]
+    keyFields = self.getCSOption( "RollupKeyFields/%s" % typeName.split( "_" )[-1], typeKeys )
+    if [ key for key in keyFields if key not in typeKeys ]:
+      return S_ERROR( "Rollup key fields %s are not keys of %s" % ( keyFields, typeName ) )
+    typeRollups = self.dbRollups.get( typeName, {} )
+    allGranularities = list( set( granularities + typeRollups.keys() ) )
+    usedGranularities = [ _getRollupForBucketLength( bucketLength, allGranularities )
+                          for _timeLimit, bucketLength in self.__getBucketsLengthRanges( typeName ) ]
+    for granularity in granularities:
+      if granularity in typeRollups:
+        if typeRollups[ granularity ][ 'keys' ] != keyFields:
+          self.log.warn( "Rollup key fields have changed, keeping the existing ones",
+                         "for %s %s" % ( typeName, granularity ) )
+        continue
+      if granularity not in usedGranularities:
+        continue
+      fieldsDict = { 'startTime' : "INT UNSIGNED NOT NULL",
+                     'bucketLength' : "MEDIUMINT UNSIGNED NOT NULL",
+                     'entriesInBucket' : "DECIMAL(30,10) NOT NULL" }
+      indexes = { 'startTimeIndex' : [ 'startTime' ] }
+      for field in keyFields:
+        fieldsDict[ field ] = "INTEGER NOT NULL"
+        indexes[ "%sIndex" % field ] = [ field ]
+      for field in self.dbCatalog[ typeName ][ 'values' ]:
+        fieldsDict[ field ] = "DECIMAL(30,10) NOT NULL"
+      retVal = self._createTables( { _getRollupTableName( typeName, granularity ) :
+                                     { 'Fields' : fieldsDict,
+                                       'Indexes' : indexes,
+                                       'UniqueIndexes' : { 'UniqueConstraint' : [ 'startTime' ] + keyFields + [ 'bucketLength' ] }
+                                     }
+                                   } )
+      if not retVal[ 'OK' ]:
+        return retVal
+      #Other instances may not write to it until they reload the rollups and flush their buffers
+      validSince = _getRollupValidSince( int( Time.toEpoch() ), granularity,
+                                         ROLLUPS_REFRESH_TIME + self.__bucketsBufferTime )
+      retVal = self.insertFields( self.rollupsCatalogTableName,
+                                  [ 'name', 'granularity', 'keyFields', 'validSince' ],
+                                  [ typeName, granularity, ",".join( keyFields ), validSince ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      self.log.info( "Created %s seconds rollup for %s" % ( granularity, typeName ) )
+    return self.__loadRollupsFromDB()
+
   def getWaitingRecordsLifeTime( self ):
     """
     Get the time records can live in the IN tables without no retry
@@ -184,6 +325,10 @@ class AccountingDB( DB ):
     finally:
       gSynchro.unlock()
     self.log.info( "[PENDING] Loading pending records for insertion" )
+    #Pick up the rollups created by other instances
+    result = self.__loadRollupsFromDB()
+    if not result[ 'OK' ]:
+      self.log.error( "[PENDING] Cannot load the rollups", result[ 'Message' ] )
     pending = 0
     now = Time.toEpoch()
     recordsPerSlot = self.getCSOption( "RecordsPerSlot", 100 )
@@ -397,6 +542,9 @@ class AccountingDB( DB ):
                          [ 'name', 'keyFields', 'valueFields', 'bucketsLength' ],
                          [ name, ",".join( keyFieldsList ), ",".join( valueFieldsList ), bucketsEncoding ] )
       self.__addToCatalog( name, keyFieldsList, valueFieldsList, bucketsLength )
+    retVal = self.__registerRollups( name )
+    if not retVal[ 'OK' ]:
+      self.log.error( "Can't create rollups", "for %s: %s" % ( name, retVal[ 'Message' ] ) )
     self.log.info( "Registered type %s" % name )
     return S_OK( True )
 
@@ -470,11 +618,15 @@ class AccountingDB( DB ):
     tablesToDelete.insert( 0, "`%s`" % _getTableName( "type", typeName ) )
     tablesToDelete.insert( 0, "`%s`" % _getTableName( "bucket", typeName ) )
     tablesToDelete.insert( 0, "`%s`" % _getTableName( "in", typeName ) )
+    for granularity in self.dbRollups.get( typeName, {} ):
+      tablesToDelete.append( "`%s`" % _getRollupTableName( typeName, granularity ) )
     retVal = self._query( "DROP TABLE %s" % ", ".join( tablesToDelete ) )
     if not retVal[ 'OK' ]:
       return retVal
     retVal = self._update( "DELETE FROM `%s` WHERE name='%s'" % ( _getTableName( "catalog", "Types" ), typeName ) )
+    retVal = self._update( "DELETE FROM `%s` WHERE name='%s'" % ( self.rollupsCatalogTableName, typeName ) )
     del( self.dbCatalog[ typeName ] )
+    self.dbRollups.pop( typeName, None )
     return S_OK()
 
   def __getIdForKeyValue( self, typeName, keyName, keyValue, conn = False ):
@@ -619,21 +771,210 @@ class AccountingDB( DB ):
 
   def __insertFromINTable( self, recordTuples ):
     """
-    Do the real insert and delete from the in buffer table
+    Add the records to the buckets buffer, they are deleted from the in buffer table
+    once the buffer is written
     """
     self.log.verbose( "Received bundle to process", "of %s elements" % len( recordTuples ) )
     for record in recordTuples:
       iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
-      result = self.insertRecordDirectly( typeName, startTime, endTime, valuesList )
+      result = self.__bufferRecord( typeName, startTime, endTime, valuesList, iD )
       if not result[ 'OK' ]:
         self._update( "UPDATE `%s` SET taken=0 WHERE id=%s" % ( _getTableName( "in", typeName ), iD ) )
         self.log.error( "Can't insert row", result[ 'Message' ] )
         continue
-      result = self._update( "DELETE FROM `%s` WHERE id=%s" % ( _getTableName( "in", typeName ), iD ) )
-      if not result[ 'OK' ]:
-        self.log.error( "Can't delete row from the IN table", result[ 'Message' ] )
       gMonitor.addMark( "insertiontime", Time.toEpoch() - insertionEpoch )
+    self.flushBuckets( onlyIfDue = True )
+
+  def insertRecordsDirectly( self, recordsList ):
+    """
+    Add a list of ( typeName, startTime, endTime, valuesList ) records, merging their
+    contributions to the same bucket cells before writing them
+    """
+    if self.__readOnly:
+      return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
+    for typeName, startTime, endTime, valuesList in recordsList:
+      result = self.__bufferRecord( typeName, startTime, endTime, valuesList )
+      if not result[ 'OK' ]:
+        self.flushBuckets()
+        return result
+    return self.flushBuckets()
+
+  def __bufferRecord( self, typeName, startTime, endTime, valuesList, iD = None ):
+    """
+    Add the contributions of a record to the buckets buffer
+    """
+    if not typeName in self.dbCatalog:
+      return S_ERROR( "Type %s has not been defined in the db" % typeName )
+    keyFields = self.dbCatalog[ typeName ][ 'keys' ]
+    valueFields = self.dbCatalog[ typeName ][ 'values' ]
+    if len( valuesList ) != len( keyFields ) + len( valueFields ):
+      return S_ERROR( "Fields mismatch for record %s. %s fields and %s expected" % ( typeName,
+                                                                                     len( valuesList ),
+                                                                                     len( keyFields ) + len( valueFields ) ) )
+    keyIds = []
+    for keyPos in range( len( keyFields ) ):
+      retVal = self.__addKeyValue( typeName, keyFields[ keyPos ], valuesList[ keyPos ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      keyIds.append( retVal[ 'Value' ] )
+    values = valuesList[ len( keyFields ): ]
+    try:
+      numValues = [ float( value ) for value in values ]
+    except ( TypeError, ValueError ):
+      return S_ERROR( "Non numeric values for record %s: %s" % ( typeName, values ) )
+    buckets = self.calculateBuckets( typeName, startTime, endTime )
+    gMonitor.addMark( "registeradded", 1 )
+    gMonitor.addMark( "registeradded:%s" % typeName, 1 )
+    self.__refreshRollups()
+    typeRollups = self.dbRollups.get( typeName, {} )
+    self.__bucketsBufferLock.acquire()
+    try:
+      typeBuffer = self.__bucketsBuffer.setdefault( typeName, {} )
+      for bStartTime, bProportion, bLength in buckets:
+        if _addToCell( typeBuffer, tuple( [ bStartTime, bLength ] + keyIds ), numValues, bProportion ):
+          self.__bufferedCells += 1
+      for granularity in typeRollups:
+        self.__bufferedRollups.setdefault( typeName, {} )[ granularity ] = typeRollups[ granularity ]
+        rollupBuffer = self.__rollupsBuffer.setdefault( typeName, {} ).setdefault( granularity, {} )
+        rollupKeyIds = [ keyIds[ keyPos ] for keyPos in typeRollups[ granularity ][ 'keyPositions' ] ]
+        for bStartTime, bProportion in _splitInGranularity( startTime, endTime, granularity ):
+          if _addToCell( rollupBuffer, tuple( [ bStartTime, granularity ] + rollupKeyIds ), numValues, bProportion ):
+            self.__bufferedCells += 1
+      self.__bufferedRecords.setdefault( typeName, [] ).append( keyIds + list( values ) + [ startTime, endTime ] )
+      if iD is not None:
+        self.__bufferedINIds.setdefault( typeName, [] ).append( iD )
+      if not self.__bufferStartEpoch:
+        self.__bufferStartEpoch = time.time()
+      self.__bufferCounters[ 'RecordsIn' ] += 1
+    finally:
+      self.__bucketsBufferLock.release()
+    gMonitor.addMark( "bucketrecordsin", 1 )
+    return S_OK()
+
+  def flushBuckets( self, onlyIfDue = False ):
+    """
+    Write the buffered records and their buckets, with one multi-row statement per
+    type and table, and delete the written records from the in buffer table.
+    With onlyIfDue the buffer is only written if it is full or old enough
+    """
+    self.__bucketsBufferLock.acquire()
+    try:
+      if onlyIfDue and self.__bufferedCells < self.__bucketsBufferSize and \
+         time.time() - self.__bufferStartEpoch < self.__bucketsBufferTime:
+        return S_OK()
+      bucketsBuffer = self.__bucketsBuffer
+      rollupsBuffer = self.__rollupsBuffer
+      bufferedRollups = self.__bufferedRollups
+      bufferedRecords = self.__bufferedRecords
+      bufferedINIds = self.__bufferedINIds
+      self.__bucketsBuffer = {}
+      self.__rollupsBuffer = {}
+      self.__bufferedRollups = {}
+      self.__bufferedRecords = {}
+      self.__bufferedINIds = {}
+      self.__bufferedCells = 0
+      self.__bufferStartEpoch = 0
+    finally:
+      self.__bucketsBufferLock.release()
+    end = S_OK()
+    for typeName in bufferedRecords:
+      typeBuffer = bucketsBuffer.get( typeName, {} )
+      typeRollupsBuffer = rollupsBuffer.get( typeName, {} )
+      inTable = _getTableName( "in", typeName )
+      for i in range( max( 1, self.__deadLockRetries ) ):
+        result = self.__writeBufferedType( typeName, bufferedRecords[ typeName ], typeBuffer, typeRollupsBuffer,
+                                           bufferedRollups.get( typeName, {} ) )
+        if result[ 'OK' ] or result[ 'Message' ].find( "try restarting transaction" ) == -1:
+          break
+      if not result[ 'OK' ]:
+        self.log.error( "Can't write buffered records", "for %s: %s" % ( typeName, result[ 'Message' ] ) )
+        #Let them be taken again
+        for idChunk in List.breakListIntoChunks( bufferedINIds.get( typeName, [] ), 1000 ):
+          self._update( "UPDATE `%s` SET taken=0 WHERE id in (%s)" % ( inTable, ", ".join( [ str( iD ) for iD in idChunk ] ) ) )
+        end = result
+        continue
+      self.__bufferCounters[ 'CellsWritten' ] += len( typeBuffer )
+      self.__bufferCounters[ 'RollupCellsWritten' ] += sum( [ len( cells ) for cells in typeRollupsBuffer.values() ] )
+      self.__bufferCounters[ 'Flushes' ] += 1
+      gMonitor.addMark( "bucketcellswritten", len( typeBuffer ) )
+      for idChunk in List.breakListIntoChunks( bufferedINIds.get( typeName, [] ), 1000 ):
+        result = self._update( "DELETE FROM `%s` WHERE id in (%s)" % ( inTable, ", ".join( [ str( iD ) for iD in idChunk ] ) ) )
+        if not result[ 'OK' ]:
+          self.log.error( "Can't delete rows from the IN table", result[ 'Message' ] )
+    return end
 
+  def __writeBufferedType( self, typeName, records, typeBuffer, typeRollupsBuffer, typeRollups ):
+    """
+    Insert the records of a type and add the buffered cells to its buckets and rollups in one transaction.
+    typeRollups are the rollups the cells were split for
+    """
+    retVal = self._getConnection()
+    if not retVal[ 'OK' ]:
+      return retVal
+    connObj = retVal[ 'Value' ]
+    try:
+      retVal = self.__startTransaction( connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      retVal = self.insertMany( _getTableName( "type", typeName ), self.dbCatalog[ typeName ][ 'typeFields' ],
+                                records, conn = connObj )
+      if retVal[ 'OK' ]:
+        retVal = self.__upsertCells( _getTableName( "bucket", typeName ), self.dbCatalog[ typeName ][ 'keys' ],
+                                     self.dbCatalog[ typeName ][ 'values' ], typeBuffer, connObj )
+      for granularity in typeRollupsBuffer:
+        if not retVal[ 'OK' ]:
+          break
+        retVal = self.__upsertRollupCells( typeName, typeRollups[ granularity ], typeRollupsBuffer[ granularity ],
+                                           connObj )
+      if not retVal[ 'OK' ]:
+        self.__rollbackTransaction( connObj )
+        return retVal
+      return self.__commitTransaction( connObj )
+    finally:
+      connObj.close()
+
+  def __upsertCells( self, tableName, keyFields, valueFields, cells, connObj ):
+    """
+    Add the values of the cells to the rows of a bucket or rollup table
+    """
+    fields = [ 'startTime', 'bucketLength' ] + keyFields + [ 'entriesInBucket' ] + valueFields
+    #Sorted to lock the rows always in the same order
+    rows = [ list( cellKey ) + cells[ cellKey ] for cellKey in sorted( cells ) ]
+    return self.upsertMany( tableName, fields, rows, updateFields = fields[ len( keyFields ) + 2: ],
+                            conn = connObj, accumulate = True )
+
+  def __upsertRollupCells( self, typeName, rollup, cells, connObj ):
+    return self.__upsertCells( _getRollupTableName( typeName, rollup[ 'granularity' ] ), rollup[ 'keys' ],
+                               self.dbCatalog[ typeName ][ 'values' ], cells, connObj )
+
+  def __writeRecordRollups( self, typeName, startTime, endTime, keyIds, values, factor, connObj ):
+    """
+    Add factor times a record to the rollups of its type
+    """
+    numValues = [ float( value ) for value in values ]
+    self.__refreshRollups()
+    for granularity, rollup in self.dbRollups.get( typeName, {} ).items():
+      cells = {}
+      rollupKeyIds = [ keyIds[ keyPos ] for keyPos in rollup[ 'keyPositions' ] ]
+      for bStartTime, bProportion in _splitInGranularity( startTime, endTime, granularity ):
+        _addToCell( cells, tuple( [ bStartTime, granularity ] + rollupKeyIds ), numValues, bProportion * factor )
+      retVal = self.__upsertRollupCells( typeName, rollup, cells, connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+    return S_OK()
+
+  def getBucketsBufferCounters( self ):
+    """
+    Get the counters of records added to the buckets and bucket cells written
+    """
+    self.__bucketsBufferLock.acquire()
+    try:
+      counters = dict( self.__bufferCounters )
+      counters[ 'BufferedRecords' ] = sum( [ len( records ) for records in self.__bufferedRecords.values() ] )
+      counters[ 'BufferedCells' ] = self.__bufferedCells
+    finally:
+      self.__bucketsBufferLock.release()
+    return S_OK( counters )
 
   def insertRecordDirectly( self, typeName, startTime, endTime, valuesList ):
     """
@@ -663,18 +1004,24 @@ class AccountingDB( DB ):
       return retVal
     connObj = retVal[ 'Value' ]
     try:
+      #The record and its rollups are written together, regenerateRollups relies on it
+      retVal = self.__startTransaction( connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
       retVal = self.insertFields( _getTableName( "type", typeName ),
                              self.dbCatalog[ typeName ][ 'typeFields' ],
                              insertList,
                              conn = connObj )
       if not retVal[ 'OK' ]:
+        self.__rollbackTransaction( connObj )
         return retVal
       #HACK: One more record to split in the buckets to be able to count total entries
       valuesList.append( 1 )
-      retVal = self.__startTransaction( connObj )
-      if not retVal[ 'OK' ]:
-        return retVal
       retVal = self.__splitInBuckets( typeName, startTime, endTime, valuesList, connObj = connObj )
+      if retVal[ 'OK' ]:
+        numKeys = len( self.dbCatalog[ typeName ][ 'keys' ] )
+        retVal = self.__writeRecordRollups( typeName, startTime, endTime, valuesList[ :numKeys ],
+                                            valuesList[ numKeys:-1 ], 1, connObj )
       if not retVal[ 'OK' ]:
         self.__rollbackTransaction( connObj )
         return retVal
@@ -740,6 +1087,10 @@ class AccountingDB( DB ):
       return S_OK( 0 )
     sqlValues.append( 1 )
     retVal = self.__deleteFromBuckets( typeName, startTime, endTime, sqlValues, numInsertions, connObj = connObj )
+    if retVal[ 'OK' ]:
+      retVal = self.__writeRecordRollups( typeName, startTime, endTime, sqlValues[ :numKeyFields ],
+                                          sqlValues[ numKeyFields:numKeyFields + numValueFields ],
+                                          -numInsertions, connObj )
     if not retVal[ 'OK' ]:
       self.__rollbackTransaction( connObj )
       return retVal
@@ -967,6 +1318,7 @@ class AccountingDB( DB ):
       return retVal
     nowEpoch = Time.toEpoch( Time.dateTime () )
     bucketTimeLength = self.calculateBucketLengthForTime( typeName, nowEpoch , startTime )
+    rollupGranularity = self.__getRollupForQuery( typeName, startTime, selectFields, condDict, groupFields, orderFields )
     startTime = startTime - startTime % bucketTimeLength
     result = self.__queryType( typeName,
                              startTime,
@@ -976,15 +1328,38 @@ class AccountingDB( DB ):
                              groupFields,
                              orderFields,
                              "bucket",
-                             connObj = connObj )
+                             connObj = connObj,
+                             rollupGranularity = rollupGranularity )
     gMonitor.addMark( "querytime", Time.toEpoch() - startQueryEpoch )
     return result
 
-  def __queryType( self, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, tableType, connObj = False ):
+  def __getRollupForQuery( self, typeName, startTime, selectFields, condDict, groupFields, orderFields ):
+    """
+    Get the granularity of the coarsest rollup having the fields and the time span of a
+    query, and dividing the buckets length used for its results. 0 if there is none
+    """
+    self.__refreshRollups()
+    typeRollups = self.dbRollups.get( typeName, {} )
+    if not typeRollups:
+      return 0
+    usedFields = list( selectFields[1] ) + condDict.keys()
+    for preGenFields in ( groupFields, orderFields ):
+      if preGenFields:
+        usedFields.extend( preGenFields[1] )
+    usedKeys = [ field for field in usedFields if field in self.dbCatalog[ typeName ][ 'keys' ] ]
+    nowEpoch = int( Time.toEpoch() )
+    bucketLength = self.calculateBucketLengthForTime( typeName, nowEpoch, startTime )
+    return _chooseRollup( typeRollups, bucketLength, startTime, usedKeys, nowEpoch )
+
+  def __queryType( self, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, tableType,
+                   connObj = False, rollupGranularity = 0 ):
     """
-    Execute a query over a main table
+    Execute a query over a main table, or over a bucket rollup table if rollupGranularity is given
     """
-    tableName = _getTableName( tableType, typeName )
+    if rollupGranularity:
+      tableName = _getRollupTableName( typeName, rollupGranularity )
+    else:
+      tableName = _getTableName( tableType, typeName )
     cmd = "SELECT"
     sqlLinkList = []
     #Check if groupFields and orderFields are in ( "%s", ( field1, ) ) form
@@ -1024,13 +1399,18 @@ class AccountingDB( DB ):
     #Calculate time conditions
     sqlTimeCond = []
     if startTime:
-      if tableType == 'bucket':
+      if rollupGranularity:
+        startTime = startTime - startTime % rollupGranularity
+      elif tableType == 'bucket':
         #HACK because MySQL and UNIX do not start epoch at the same time
         startTime = startTime + 3600
         startTime = self.calculateBuckets( typeName, startTime, startTime )[0][0]
       sqlTimeCond.append( "`%s`.`startTime` >= %s" % ( tableName, startTime ) )
     if endTime:
-      if tableType == "bucket":
+      if rollupGranularity:
+        endTimeSQLVar = "startTime"
+        endTime = endTime - endTime % rollupGranularity
+      elif tableType == "bucket":
         endTimeSQLVar = "startTime"
         endTime = endTime + 3600
         endTime = self.calculateBuckets( typeName, endTime, endTime )[0][0]
@@ -1099,7 +1479,7 @@ class AccountingDB( DB ):
       self.__doingCompaction = True
     finally:
       gSynchro.unlock()
-    slow = True
+    typesToCompact = []
     for typeName in self.dbCatalog:
       if typeFilter and typeName.find( typeFilter ) == -1:
         self.log.info( "[COMPACT] Skipping %s" % typeName )
@@ -1107,11 +1487,10 @@ class AccountingDB( DB ):
       if self.dbCatalog[ typeName ][ 'dataTimespan' ] > 0:
         self.log.info( "[COMPACT] Deleting records older that timespan for type %s" % typeName )
         self.__deleteRecordsOlderThanDataTimespan( typeName )
-      self.log.info( "[COMPACT] Compacting %s" % typeName )
-      if slow:
-        self.__slowCompactBucketsForType( typeName )
-      else:
-        self.__compactBucketsForType( typeName )
+      typesToCompact.append( typeName )
+    self.__scheduleCompaction( typesToCompact )
+    for typeName in typesToCompact:
+      self.__compactRollupsForType( typeName )
     self.log.info( "[COMPACT] Compaction finished" )
     self.__lastCompactionEpoch = int( Time.toEpoch() )
     gSynchro.lock()
@@ -1122,188 +1501,258 @@ class AccountingDB( DB ):
       gSynchro.unlock()
     return S_OK()
 
-  def __selectForCompactBuckets( self, typeName, timeLimit, bucketLength, nextBucketLength, connObj = False ):
-    """
-    Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
-    """
-    tableName = _getTableName( "bucket", typeName )
-    selectSQL = "SELECT "
-    sqlSelectList = []
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlSelectList.append( "`%s`.`%s`" % ( tableName, field ) )
-    for field in self.dbCatalog[ typeName ][ 'values' ]:
-      sqlSelectList.append( "SUM( `%s`.`%s` )" % ( tableName, field ) )
-    sqlSelectList.append( "SUM( `%s`.`entriesInBucket` )" % ( tableName ) )
-    sqlSelectList.append( "MIN( `%s`.`startTime` )" % tableName )
-    sqlSelectList.append( "MAX( `%s`.`startTime` )" % tableName )
-    selectSQL += ", ".join( sqlSelectList )
-    selectSQL += " FROM `%s`" % tableName
-    selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % ( tableName, timeLimit )
-    selectSQL += " `%s`.`bucketLength` = %s" % ( tableName, bucketLength )
-    #MAGIC bucketing
-    sqlGroupList = [ _bucketizeDataField( "`%s`.`startTime`" % tableName, nextBucketLength ) ]
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlGroupList.append( "`%s`.`%s`" % ( tableName, field ) )
-    selectSQL += " GROUP BY %s" % ", ".join( sqlGroupList )
-    return self._query( selectSQL, conn = connObj )
+  def __scheduleCompaction( self, typeNames ):
+    """
+    Compact the buckets of the types one bucket length at a time. Each length is split
+    in ( type, time slice ) work units that are compacted by CompactionThreads threads
+    """
+    numThreads = max( 1, self.getCSOption( "CompactionThreads", 4 ) )
+    sliceTime = max( self.maxBucketTime, self.getCSOption( "CompactionSliceTime", 4 * self.maxBucketTime ) )
+    sliceTime -= sliceTime % self.maxBucketTime
+    self.__compactionQuerySize = max( 1, self.getCSOption( "CompactionQuerySize", 1000 ) )
+    self.__compactionMaxRate = self.getCSOption( "CompactionMaxBucketsPerSecond", 0 )
+    self.__compactionYieldJobs = self.getCSOption( "CompactionYieldPendingJobs", 10 )
+    self.__compactionNextSlot = 0
+    nowEpoch = int( Time.toEpoch() )
+    numSteps = max( [ len( self.dbBucketsLength[ typeName ] ) for typeName in typeNames ] + [ 1 ] ) - 1
+    self.__compactionLock.acquire()
+    try:
+      self.__compactionStatus = { 'Running' : True, 'StartTime' : time.time(), 'EndTime' : 0,
+                                  'Step' : 0, 'Steps' : numSteps, 'UnitsTotal' : 0, 'UnitsDone' : 0,
+                                  'UnitsFailed' : 0, 'BucketsCompacted' : 0, 'CellsWritten' : 0,
+                                  'ThrottledTime' : 0.0 }
+    finally:
+      self.__compactionLock.release()
+    for bPos in range( numSteps ):
+      workUnits = Queue.Queue()
+      for typeName in typeNames:
+        for workUnit in self.__getCompactionWorkUnits( typeName, bPos, sliceTime, nowEpoch ):
+          workUnits.put( workUnit )
+      self.__compactionLock.acquire()
+      try:
+        self.__compactionStatus[ 'Step' ] = bPos + 1
+        self.__compactionStatus[ 'UnitsTotal' ] += workUnits.qsize()
+      finally:
+        self.__compactionLock.release()
+      self.log.info( "[COMPACT] Step %d of %d: %d work units in %d threads" % ( bPos + 1, numSteps,
+                                                                               workUnits.qsize(), numThreads ) )
+      workers = []
+      for i in range( min( numThreads, workUnits.qsize() ) ):
+        worker = threading.Thread( target = self.__compactionWorker, args = ( workUnits, ) )
+        worker.setDaemon( 1 )
+        worker.start()
+        workers.append( worker )
+      for worker in workers:
+        worker.join()
+    self.__compactionLock.acquire()
+    try:
+      self.__compactionStatus[ 'Running' ] = False
+      self.__compactionStatus[ 'EndTime' ] = time.time()
+    finally:
+      self.__compactionLock.release()
+    status = self.getCompactionStatus()[ 'Value' ]
+    self.log.info( "[COMPACT] Compacted %d buckets in %.2f secs (%.2f buckets/sec, %.2f secs throttled)" % (
+                                                                    status[ 'BucketsCompacted' ], status[ 'Elapsed' ],
+                                                                    status[ 'BucketsPerSecond' ], status[ 'ThrottledTime' ] ) )
+
+  def __getCompactionWorkUnits( self, typeName, bPos, sliceTime, nowEpoch ):
+    """
+    Get the ( typeName, bucketLength, sliceStart, sliceEnd, nowEpoch ) work units to compact
+    the buckets of a type with the length in position bPos
+    """
+    if bPos >= len( self.dbBucketsLength[ typeName ] ) - 1:
+      return []
+    secondsLimit = self.dbBucketsLength[ typeName ][ bPos ][0]
+    bucketLength = self.dbBucketsLength[ typeName ][ bPos ][1]
+    timeLimit = ( nowEpoch - nowEpoch % bucketLength ) - secondsLimit
+    result = self._query( "SELECT MIN(`startTime`) FROM `%s` WHERE `bucketLength` = %d AND `startTime` < %d" % (
+                                                      _getTableName( "bucket", typeName ), bucketLength, timeLimit ) )
+    if not result[ 'OK' ]:
+      self.log.error( "[COMPACT] Cannot get the buckets to compact", "for %s: %s" % ( typeName, result[ 'Message' ] ) )
+      return []
+    firstTime = result[ 'Value' ][0][0]
+    if firstTime is None:
+      return []
+    workUnits = []
+    sliceStart = int( firstTime ) - int( firstTime ) % sliceTime
+    while sliceStart < timeLimit:
+      workUnits.append( ( typeName, bucketLength, sliceStart, min( sliceStart + sliceTime, timeLimit ), nowEpoch ) )
+      sliceStart += sliceTime
+    return workUnits
+
+  def __compactionWorker( self, workUnits ):
+    """
+    Compact work units until there are no more
+    """
+    while True:
+      try:
+        typeName, bucketLength, sliceStart, sliceEnd, nowEpoch = workUnits.get_nowait()
+      except Queue.Empty:
+        return
+      unitStartTime = time.time()
+      result = self.__compactSlice( typeName, bucketLength, sliceStart, sliceEnd, nowEpoch )
+      self.__compactionLock.acquire()
+      try:
+        if result[ 'OK' ]:
+          self.__compactionStatus[ 'UnitsDone' ] += 1
+        else:
+          self.__compactionStatus[ 'UnitsFailed' ] += 1
+      finally:
+        self.__compactionLock.release()
+      if not result[ 'OK' ]:
+        self.log.error( "[COMPACT] Cannot compact buckets", "of %s secs for %s between %s and %s: %s" % (
+                                                                    bucketLength, typeName, Time.fromEpoch( sliceStart ),
+                                                                    Time.fromEpoch( sliceEnd ), result[ 'Message' ] ) )
+        continue
+      self.log.info( "[COMPACT] Compacted %d buckets of %s secs for %s between %s and %s (took %.2f secs)" % (
+                                                                    result[ 'Value' ], bucketLength, typeName,
+                                                                    Time.fromEpoch( sliceStart ), Time.fromEpoch( sliceEnd ),
+                                                                    time.time() - unitStartTime ) )
+
+  def __compactSlice( self, typeName, bucketLength, sliceStart, sliceEnd, nowEpoch ):
+    """
+    Compact the buckets of a type with a length in a time slice, in pages of
+    CompactionQuerySize buckets that are each moved in their own transaction.
+    Pages follow the unique index instead of using offsets
+    """
+    pageFields = [ "`startTime`" ] + [ "`%s`" % field for field in self.dbCatalog[ typeName ][ 'keys' ] ]
+    sliceCond = "`bucketLength` = %d AND `startTime` >= %d AND `startTime` < %d" % ( bucketLength, sliceStart, sliceEnd )
+    lastKey = False
+    compacted = 0
+    while True:
+      self.__throttleCompaction( self.__compactionQuerySize )
+      pageCond = sliceCond
+      if lastKey:
+        pageCond += " AND ( %s ) > ( %s )" % ( ", ".join( pageFields ), ", ".join( [ str( v ) for v in lastKey ] ) )
+      for i in range( max( 1, self.__deadLockRetries ) ):
+        result = self.__compactPage( typeName, bucketLength, pageFields, pageCond, nowEpoch )
+        if result[ 'OK' ] or result[ 'Message' ].find( "try restarting transaction" ) == -1:
+          break
+      if not result[ 'OK' ]:
+        return result
+      pageKeys, numCells = result[ 'Value' ]
+      compacted += len( pageKeys )
+      self.__compactionLock.acquire()
+      try:
+        self.__compactionStatus[ 'BucketsCompacted' ] += len( pageKeys )
+        self.__compactionStatus[ 'CellsWritten' ] += numCells
+      finally:
+        self.__compactionLock.release()
+      gMonitor.addMark( "compactedbuckets", len( pageKeys ) )
+      if len( pageKeys ) < self.__compactionQuerySize:
+        return S_OK( compacted )
+      lastKey = pageKeys[-1]
 
-  def __deleteForCompactBuckets( self, typeName, timeLimit, bucketLength, connObj = False ):
+  def __compactPage( self, typeName, bucketLength, pageFields, pageCond, nowEpoch ):
     """
-    Delete compacted buckets
+    Move a page of buckets to the buckets they compact into in one transaction.
+    Returns the keys of the page buckets and the number of cells written
     """
     tableName = _getTableName( "bucket", typeName )
-    deleteSQL = "DELETE FROM `%s` WHERE " % tableName
-    deleteSQL += "`%s`.`startTime` < '%s' AND " % ( tableName, timeLimit )
-    deleteSQL += "`%s`.`bucketLength` = %s" % ( tableName, bucketLength )
-    return self._update( deleteSQL, conn = connObj )
-
-  def __compactBucketsForType( self, typeName ):
-    """
-    Compact all buckets for a given type
-    """
-    nowEpoch = Time.toEpoch()
-    #retVal = self.__startTransaction( connObj )
-    #if not retVal[ 'OK' ]:
-    #  return retVal
-    for bPos in range( len( self.dbBucketsLength[ typeName ] ) - 1 ):
-      self.log.info( "[COMPACT] Query %d of %d" % ( bPos + 1, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
-      secondsLimit = self.dbBucketsLength[ typeName ][ bPos ][0]
-      bucketLength = self.dbBucketsLength[ typeName ][ bPos ][1]
-      timeLimit = ( nowEpoch - nowEpoch % bucketLength ) - secondsLimit
-      nextBucketLength = self.dbBucketsLength[ typeName ][ bPos + 1 ][1]
-      self.log.info( "[COMPACT] Compacting data newer that %s with bucket size %s" % ( Time.fromEpoch( timeLimit ), bucketLength ) )
-      #Retrieve the data
-      retVal = self.__selectForCompactBuckets( typeName, timeLimit, bucketLength, nextBucketLength )
+    numKeys = len( pageFields )
+    sqlFields = pageFields + [ "`entriesInBucket`" ] + [ "`%s`" % field for field in self.dbCatalog[ typeName ][ 'values' ] ]
+    retVal = self._getConnection()
+    if not retVal[ 'OK' ]:
+      return retVal
+    connObj = retVal[ 'Value' ]
+    try:
+      retVal = self.__startTransaction( connObj )
       if not retVal[ 'OK' ]:
-        #self.__rollbackTransaction( connObj )
         return retVal
+      retVal = self._query( "SELECT %s FROM `%s` WHERE %s ORDER BY %s LIMIT %d FOR UPDATE" % ( ", ".join( sqlFields ),
+                                                                                               tableName, pageCond,
+                                                                                               ", ".join( pageFields ),
+                                                                                               self.__compactionQuerySize ),
+                            conn = connObj )
+      if not retVal[ 'OK' ] or not retVal[ 'Value' ]:
+        self.__rollbackTransaction( connObj )
+        if not retVal[ 'OK' ]:
+          return retVal
+        return S_OK( ( [], 0 ) )
       bucketsData = retVal[ 'Value' ]
-      self.log.info( "[COMPACT] Got %d records to compact" % len( bucketsData ) )
-      if len( bucketsData ) == 0:
-        continue
-      retVal = self.__deleteForCompactBuckets( typeName, timeLimit, bucketLength )
+      pageKeys = []
+      cells = {}
+      for record in bucketsData:
+        bucketKey = [ int( value ) for value in record[ :numKeys ] ]
+        pageKeys.append( bucketKey )
+        values = [ float( value ) for value in record[ numKeys: ] ]
+        for bStartTime, bProportion, bLength in self.calculateBuckets( typeName, bucketKey[0],
+                                                                       bucketKey[0] + bucketLength, nowEpoch ):
+          _addBucketToCell( cells, tuple( [ bStartTime, bLength ] + bucketKey[1:] ), values, bProportion )
+      retVal = self._update( "DELETE FROM `%s` WHERE %s AND ( %s ) <= ( %s )" % ( tableName, pageCond,
+                                                                                ", ".join( pageFields ),
+                                                                                ", ".join( [ str( v ) for v in pageKeys[-1] ] ) ),
+                             conn = connObj )
+      if retVal[ 'OK' ] and retVal[ 'Value' ] != len( pageKeys ):
+        retVal = S_ERROR( "Deleted %s buckets instead of %s" % ( retVal[ 'Value' ], len( pageKeys ) ) )
+      if retVal[ 'OK' ]:
+        retVal = self.__upsertCells( tableName, self.dbCatalog[ typeName ][ 'keys' ],
+                                     self.dbCatalog[ typeName ][ 'values' ], cells, connObj )
       if not retVal[ 'OK' ]:
-        #self.__rollbackTransaction( connObj )
+        self.__rollbackTransaction( connObj )
         return retVal
-      self.log.info( "[COMPACT] Compacting %s records %s seconds size for %s" % ( len( bucketsData ), bucketLength, typeName ) )
-      #Add data
-      for record in bucketsData:
-        startTime = record[-2]
-        endTime = record[-1]
-        valuesList = record[:-2]
-        retVal = self.__splitInBuckets( typeName, startTime, endTime, valuesList )
-        if not retVal[ 'OK' ]:
-          #self.__rollbackTransaction( connObj )
-          self.log.error( "[COMPACT] Error while compacting data for record in %s: %s" % ( typeName, retVal[ 'Value' ] ) )
-      self.log.info( "[COMPACT] Finished compaction %d of %d" % ( bPos, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
-    #return self.__commitTransaction( connObj )
-    return S_OK()
-
-  def __slowCompactBucketsForType( self, typeName ):
-    """
-    Compact all buckets for a given type
-    """
-    nowEpoch = Time.toEpoch()
-    for bPos in range( len( self.dbBucketsLength[ typeName ] ) - 1 ):
-      self.log.info( "[COMPACT] Query %d of %d" % ( bPos, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
-      secondsLimit = self.dbBucketsLength[ typeName ][ bPos ][0]
-      bucketLength = self.dbBucketsLength[ typeName ][ bPos ][1]
-      timeLimit = ( nowEpoch - nowEpoch % bucketLength ) - secondsLimit
-      nextBucketLength = self.dbBucketsLength[ typeName ][ bPos + 1 ][1]
-      self.log.info( "[COMPACT] Compacting data newer that %s with bucket size %s for %s" % ( Time.fromEpoch( timeLimit ), bucketLength, typeName ) )
-      querySize = 10000
-      previousRecordsSelected = querySize
-      totalCompacted = 0
-      while previousRecordsSelected == querySize:
-        #Retrieve the data
-        self.log.info( "[COMPACT] Retrieving buckets to compact newer that %s with size %s" % ( Time.fromEpoch( timeLimit ),
-                                                                                                       bucketLength ) )
-        roundStartTime = time.time()
-        result = self.__selectIndividualForCompactBuckets( typeName, timeLimit, bucketLength,
-                                                           nextBucketLength, querySize )
-        if not result[ 'OK' ]:
-          #self.__rollbackTransaction( connObj )
-          return result
-        bucketsData = result[ 'Value' ]
-        previousRecordsSelected = len( bucketsData )
-        selectEndTime = time.time()
-        self.log.info( "[COMPACT] Got %d buckets (%d done) (took %.2f secs)" % ( previousRecordsSelected,
-                                                                                 totalCompacted,
-                                                                                 selectEndTime - roundStartTime ) )
-        if len( bucketsData ) == 0:
-          break
+      retVal = self.__commitTransaction( connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      return S_OK( ( pageKeys, len( cells ) ) )
+    finally:
+      connObj.close()
 
-        result = self.__deleteIndividualForCompactBuckets( typeName, bucketsData )
-        if not result[ 'OK' ]:
-          #self.__rollbackTransaction( connObj )
-          return result
-        bucketsData = result[ 'Value' ]
-        deleteEndTime = time.time()
-        self.log.info( "[COMPACT] Deleted %s out-of-bounds buckets (took %.2f secs)" % ( len( bucketsData ),
-                                                                                         deleteEndTime - selectEndTime ) )
-        #Add data
-        for record in bucketsData:
-          startTime = record[-2]
-          endTime = record[-2] + record[-1]
-          valuesList = record[:-2]
-          retVal = self.__splitInBuckets( typeName, startTime, endTime, valuesList )
-          if not retVal[ 'OK' ]:
-            self.log.error( "[COMPACT] Error while compacting data for buckets in %s: %s" % ( typeName, retVal[ 'Value' ] ) )
-        totalCompacted += len( bucketsData )
-        insertElapsedTime = time.time() - deleteEndTime
-        self.log.info( "[COMPACT] Records compacted (took %.2f secs, %.2f secs/bucket)" % ( insertElapsedTime,
-                                                                                            insertElapsedTime / len( bucketsData ) ) )
-      self.log.info( "[COMPACT] Finised compaction %d of %d" % ( bPos, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
-    #return self.__commitTransaction( connObj )
-    return S_OK()
+  def __throttleCompaction( self, numBuckets ):
+    """
+    Let the pending records be inserted first, for at most a minute, and keep all the
+    compaction threads together under CompactionMaxBucketsPerSecond
+    """
+    waitStart = time.time()
+    while self.__threadPool.pendingJobs() > self.__compactionYieldJobs and time.time() - waitStart < 60:
+      time.sleep( 1 )
+    self.__compactionLock.acquire()
+    try:
+      now = time.time()
+      slotTime = now
+      if self.__compactionMaxRate > 0:
+        slotTime = max( now, self.__compactionNextSlot )
+        self.__compactionNextSlot = slotTime + float( numBuckets ) / self.__compactionMaxRate
+      self.__compactionStatus[ 'ThrottledTime' ] += slotTime - waitStart
+    finally:
+      self.__compactionLock.release()
+    if slotTime > now:
+      time.sleep( slotTime - now )
 
-  def __selectIndividualForCompactBuckets( self, typeName, timeLimit, bucketLength, nextBucketLength, querySize, connObj = False ):
+  def getCompactionStatus( self ):
     """
-    Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
+    Get the progress and throughput of the running or last compaction
     """
-    tableName = _getTableName( "bucket", typeName )
-    selectSQL = "SELECT "
-    sqlSelectList = []
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlSelectList.append( "`%s`.`%s`" % ( tableName, field ) )
-    for field in self.dbCatalog[ typeName ][ 'values' ]:
-      sqlSelectList.append( "`%s`.`%s`" % ( tableName, field ) )
-    sqlSelectList.append( "`%s`.`entriesInBucket`" % ( tableName ) )
-    sqlSelectList.append( "`%s`.`startTime`" % tableName )
-    sqlSelectList.append( "`%s`.bucketLength" % ( tableName ) )
-    selectSQL += ", ".join( sqlSelectList )
-    selectSQL += " FROM `%s`" % tableName
-    selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % ( tableName, timeLimit )
-    selectSQL += " `%s`.`bucketLength` = %s" % ( tableName, bucketLength )
-    #MAGIC bucketing
-    selectSQL += " LIMIT %d" % querySize
-    return self._query( selectSQL, conn = connObj )
-
-  def __deleteIndividualForCompactBuckets( self, typeName, bucketsData, connObj = False ):
-    """
-    Delete compacted buckets
+    self.__compactionLock.acquire()
+    try:
+      status = dict( self.__compactionStatus )
+    finally:
+      self.__compactionLock.release()
+    status[ 'LastCompaction' ] = self.__lastCompactionEpoch
+    if status[ 'StartTime' ]:
+      status[ 'Elapsed' ] = ( status[ 'EndTime' ] or time.time() ) - status[ 'StartTime' ]
+      status[ 'BucketsPerSecond' ] = status[ 'BucketsCompacted' ] / max( status[ 'Elapsed' ], 0.001 )
+    return S_OK( status )
+
+  def __compactRollupsForType( self, typeName ):
     """
-    tableName = _getTableName( "bucket", typeName )
-    keyFields = self.dbCatalog[ typeName ][ 'keys' ]
-    deleteQueryLimit = 50
-    deletedBuckets = []
-    for bLimit in range( 0, len( bucketsData ) , deleteQueryLimit ):
-      delCondsSQL = []
-      for record in bucketsData[ bLimit : bLimit + deleteQueryLimit ]:
-        condSQL = []
-        for iPos in range( len( keyFields ) ):
-          field = keyFields[ iPos ]
-          condSQL.append( "`%s`.`%s` = %s" % ( tableName, field, record[ iPos ] ) )
-        condSQL.append( "`%s`.`startTime` = %d" % ( tableName, record[-2] ) )
-        condSQL.append( "`%s`.`bucketLength` = %d" % ( tableName, record[-1] ) )
-        delCondsSQL.append( "(%s)" % " AND ".join( condSQL ) )
-      delSQL = "DELETE FROM `%s` WHERE %s" % ( tableName, " OR ".join( delCondsSQL ) )
-      result = self._update( delSQL, conn = connObj )
-      if not result[ 'OK' ]:
-        self.log.error( "Cannot delete individual records for compaction", result[ 'Message' ] )
-      else:
-        deletedBuckets.extend( bucketsData[ bLimit : bLimit + deleteQueryLimit ] )
-    return S_OK( deletedBuckets )
+    Delete the rollup rows older than the queries the rollups are used for
+    """
+    nowEpoch = int( Time.toEpoch() )
+    for granularity, rollup in self.dbRollups.get( typeName, {} ).items():
+      if not rollup[ 'retention' ]:
+        continue
+      tableName = _getRollupTableName( typeName, granularity )
+      timeLimit = nowEpoch - rollup[ 'retention' ] - granularity
+      self.log.info( "[COMPACT] Deleting rows older than %s from %s" % ( Time.fromEpoch( timeLimit ), tableName ) )
+      deleteLimit = 10000
+      deleted = deleteLimit
+      while deleted >= deleteLimit:
+        result = self._update( "DELETE FROM `%s` WHERE startTime < %d LIMIT %d" % ( tableName, timeLimit, deleteLimit ) )
+        if not result[ 'OK' ]:
+          self.log.error( "[COMPACT] Cannot delete old rollup rows", "%s: %s" % ( tableName, result[ 'Message' ] ) )
+          break
+        deleted = result[ 'Value' ]
 
   def __deleteRecordsOlderThanDataTimespan( self, typeName ):
     """
@@ -1313,8 +1762,11 @@ class AccountingDB( DB ):
     dataTimespan = self.dbCatalog[ typeName ][ 'dataTimespan' ]
     if dataTimespan < 86400 * 30:
       return
-    for table, field in ( ( _getTableName( "type", typeName ), 'endTime' ),
-                          ( _getTableName( "bucket", typeName ), 'startTime + bucketLength' ) ):
+    tablesAndFields = [ ( _getTableName( "type", typeName ), 'endTime' ),
+                        ( _getTableName( "bucket", typeName ), 'startTime + bucketLength' ) ]
+    for granularity in self.dbRollups.get( typeName, {} ):
+      tablesAndFields.append( ( _getRollupTableName( typeName, granularity ), 'startTime + bucketLength' ) )
+    for table, field in tablesAndFields:
       self.log.info( "[COMPACT] Deleting old records for table %s" % table )
       deleteLimit = 10000
       deleted = deleteLimit
@@ -1455,8 +1907,124 @@ class AccountingDB( DB ):
                                                                                                             blockAvg, queryAvg,
                                                                                                             expectedEnd ) )
     #return self.__commitTransaction( connObj )
-    return S_OK()
+    return self.regenerateRollups( typeName )
 
+  def regenerateRollups( self, typeName ):
+    """
+    Rebuild the rollups of a type from its records, they can then be used for any time span.
+    The records and the rollups are read in one consistent snapshot and only the differences
+    are written, so that the records inserted meanwhile are counted once
+    """
+    if self.__readOnly:
+      return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
+    if typeName not in self.dbCatalog:
+      return S_ERROR( "Type %s is not defined" % typeName )
+    retVal = self.__loadRollupsFromDB()
+    if not retVal[ 'OK' ]:
+      return retVal
+    typeRollups = self.dbRollups.get( typeName, {} )
+    if not typeRollups:
+      return S_OK()
+    #Rows older than the queries the rollups are used for are not rebuilt
+    nowEpoch = int( Time.toEpoch() )
+    timeLimits = {}
+    for granularity, rollup in typeRollups.items():
+      timeLimits[ granularity ] = 0
+      if rollup[ 'retention' ]:
+        timeLimits[ granularity ] = nowEpoch - rollup[ 'retention' ] - granularity
+    retVal = self._getConnection()
+    if not retVal[ 'OK' ]:
+      return retVal
+    connObj = retVal[ 'Value' ]
+    try:
+      retVal = self._query( "START TRANSACTION WITH CONSISTENT SNAPSHOT", conn = connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      try:
+        retVal = self.__getRollupsCorrections( typeName, typeRollups, timeLimits, connObj )
+      finally:
+        self.__rollbackTransaction( connObj )
+    finally:
+      connObj.close()
+    if not retVal[ 'OK' ]:
+      return retVal
+    rollupsCells = retVal[ 'Value' ]
+    for granularity, rollup in typeRollups.items():
+      tableName = _getRollupTableName( typeName, granularity )
+      if timeLimits[ granularity ]:
+        retVal = self._update( "DELETE FROM `%s` WHERE `startTime` < %d" % ( tableName, timeLimits[ granularity ] ) )
+        if not retVal[ 'OK' ]:
+          return retVal
+      self.log.info( "[REROLLUP] Correcting %s cells of the %s seconds rollup for %s" % ( len( rollupsCells[ granularity ] ),
+                                                                                           granularity, typeName ) )
+      retVal = self.__upsertRollupCells( typeName, rollup, rollupsCells[ granularity ], False )
+      if not retVal[ 'OK' ]:
+        return retVal
+    #Rollups are complete now
+    retVal = self._update( "UPDATE `%s` SET validSince = 0 WHERE name = '%s'" % ( self.rollupsCatalogTableName, typeName ) )
+    if not retVal[ 'OK' ]:
+      return retVal
+    return self.__loadRollupsFromDB()
+
+  def __getRollupsCorrections( self, typeName, typeRollups, timeLimits, connObj ):
+    """
+    Get the cells to add to the rollups of a type for them to hold the split of its records,
+    reading both in the snapshot of the transaction of connObj
+    """
+    rawTableName = _getTableName( "type", typeName )
+    numKeys = len( self.dbCatalog[ typeName ][ 'keys' ] )
+    numValues = len( self.dbCatalog[ typeName ][ 'values' ] )
+    retVal = self._query( "SELECT MIN(`startTime`), MAX(`startTime`) FROM `%s`" % rawTableName, conn = connObj )
+    if not retVal[ 'OK' ]:
+      return retVal
+    minStartTime, maxStartTime = retVal[ 'Value' ][0]
+    sqlFields = ", ".join( [ "`%s`" % field for field in self.dbCatalog[ typeName ][ 'typeFields' ] ] )
+    rollupsCells = dict( [ ( granularity, {} ) for granularity in typeRollups ] )
+    #Go through the records one day at a time
+    windowLength = 86400
+    windowStart = 0
+    if minStartTime is not None:
+      windowStart = minStartTime - minStartTime % windowLength
+    while minStartTime is not None and windowStart <= maxStartTime:
+      retVal = self._query( "SELECT %s FROM `%s` WHERE `startTime` >= %d AND `startTime` < %d" % ( sqlFields, rawTableName,
+                                                                                              windowStart,
+                                                                                              windowStart + windowLength ),
+                            conn = connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      self.log.info( "[REROLLUP] Got %s records of %s from %s" % ( len( retVal[ 'Value' ] ), typeName,
+                                                                   Time.fromEpoch( windowStart ) ) )
+      for record in retVal[ 'Value' ]:
+        keyIds = list( record[ :numKeys ] )
+        values = [ float( value ) for value in record[ numKeys:numKeys + numValues ] ]
+        startTime, endTime = record[ -2: ]
+        for granularity, rollup in typeRollups.items():
+          if endTime < timeLimits[ granularity ]:
+            continue
+          rollupKeyIds = [ keyIds[ keyPos ] for keyPos in rollup[ 'keyPositions' ] ]
+          for bStartTime, bProportion in _splitInGranularity( startTime, endTime, granularity ):
+            if bStartTime >= timeLimits[ granularity ]:
+              _addToCell( rollupsCells[ granularity ], tuple( [ bStartTime, granularity ] + rollupKeyIds ), values,
+                          bProportion )
+      windowStart += windowLength
+    #Take away what the rollups already have
+    valueFields = [ 'entriesInBucket' ] + self.dbCatalog[ typeName ][ 'values' ]
+    for granularity, rollup in typeRollups.items():
+      sqlFields = ", ".join( [ "`%s`" % field for field in [ 'startTime', 'bucketLength' ] + rollup[ 'keys' ] + valueFields ] )
+      retVal = self._query( "SELECT %s FROM `%s` WHERE `startTime` >= %d" % ( sqlFields,
+                                                                          _getRollupTableName( typeName, granularity ),
+                                                                          timeLimits[ granularity ] ),
+                            conn = connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      cells = rollupsCells[ granularity ]
+      numCellKeys = len( rollup[ 'keys' ] ) + 2
+      for row in retVal[ 'Value' ]:
+        _addBucketToCell( cells, tuple( row[ :numCellKeys ] ), [ float( value ) for value in row[ numCellKeys: ] ], -1 )
+      for cellKey in cells.keys():
+        if max( [ abs( value ) for value in cells[ cellKey ] ] ) < 1e-9:
+          del cells[ cellKey ]
+    return S_OK( rollupsCells )
 
   def __startTransaction( self, connObj ):
     return self._query( "START TRANSACTION", conn = connObj )
@@ -1470,6 +2038,98 @@ class AccountingDB( DB ):
 def _bucketizeDataField( dataField, bucketLength ):
   return "%s - ( %s %% %s )" % ( dataField, dataField, bucketLength )
 
+def _getRollupTableName( typeName, granularity ):
+  return "ac_rollup_%s_%s" % ( typeName, granularity )
+
+def _getRollupForBucketLength( bucketLength, granularities ):
+  """
+  Get the coarsest granularity of which bucketLength is a multiple, 0 if none
+  """
+  chosen = 0
+  for granularity in granularities:
+    if bucketLength % granularity == 0 and granularity > chosen:
+      chosen = granularity
+  return chosen
+
+def _getRollupsRetention( bucketsLengthRanges, granularities ):
+  """
+  Get the age of the oldest query start each rollup is used for: a rollup is only used
+  at the ages when the buckets length is a multiple of its granularity and not of a
+  coarser one. None if it is never used, 0 if it is used for any age
+  """
+  retentions = {}
+  for granularity in granularities:
+    retention = None
+    for timeLimit, bucketLength in bucketsLengthRanges:
+      if _getRollupForBucketLength( bucketLength, granularities ) == granularity:
+        retention = timeLimit
+    retentions[ granularity ] = retention
+  return retentions
+
+def _getRollupValidSince( nowEpoch, granularity, writeDelay ):
+  """
+  Get the start of the first bucket of a new rollup that all the writers fill, the ones
+  writing to it within writeDelay seconds
+  """
+  firstEpoch = nowEpoch + writeDelay
+  return firstEpoch - firstEpoch % granularity + granularity
+
+def _chooseRollup( typeRollups, bucketLength, startTime, usedKeys, nowEpoch ):
+  """
+  Get the granularity of the coarsest rollup dividing bucketLength, complete and kept
+  from startTime and having the usedKeys. 0 if there is none
+  """
+  for granularity in sorted( typeRollups, reverse = True ):
+    rollup = typeRollups[ granularity ]
+    if bucketLength % granularity or startTime < rollup[ 'validSince' ]:
+      continue
+    if rollup[ 'retention' ] is None or ( rollup[ 'retention' ] and startTime < nowEpoch - rollup[ 'retention' ] ):
+      continue
+    if [ key for key in usedKeys if key not in rollup[ 'keys' ] ]:
+      continue
+    return granularity
+  return 0
+
+def _splitInGranularity( startTime, endTime, granularity ):
+  """
+  Get the ( bucketStartTime, proportion ) of a record in buckets of fixed length
+  """
+  bucketStart = startTime - startTime % granularity
+  if startTime == endTime:
+    return [ ( bucketStart, 1 ) ]
+  buckets = []
+  totalLength = float( endTime - startTime )
+  while bucketStart < endTime:
+    proportion = ( min( bucketStart + granularity, endTime ) - max( bucketStart, startTime ) ) / totalLength
+    buckets.append( ( bucketStart, proportion ) )
+    bucketStart += granularity
+  return buckets
+
+def _addToCell( cells, cellKey, values, proportion ):
+  """
+  Add the proportional part of the values to a bucket cell, returns True if the cell is new
+  """
+  cell = cells.get( cellKey )
+  isNew = cell is None
+  if isNew:
+    cell = [ 0.0 ] * ( len( values ) + 1 )
+    cells[ cellKey ] = cell
+  cell[0] += proportion
+  for valPos in range( len( values ) ):
+    cell[ valPos + 1 ] += values[ valPos ] * proportion
+  return isNew
+
+def _addBucketToCell( cells, cellKey, values, proportion ):
+  """
+  Add the proportional part of a bucket entriesInBucket and values to a bucket cell
+  """
+  cell = cells.get( cellKey )
+  if cell is None:
+    cell = [ 0.0 ] * len( values )
+    cells[ cellKey ] = cell
+  for valPos in range( len( values ) ):
+    cell[ valPos ] += values[ valPos ] * proportion
+
 def _getTableName( tableType, typeName, keyName = None ):
   """
   Generate table name
@@ -43,26 +43,63 @@ class MultiAccountingDB( object ):
       self.__dbByType[ acType ] = self.__allDBs[ dbName ]
 
   def __registerMethods( self ):
-    for methodName in ( 'registerType', 'changeBucketsLength', 'regenerateBuckets',
+    for methodName in ( 'registerType', 'changeBucketsLength', 'regenerateBuckets', 'regenerateRollups',
                         'deleteType', 'insertRecordThroughQueue', 'deleteRecord',
                         'getKeyValues', 'retrieveBucketedData', 'calculateBuckets',
                         'calculateBucketLengthForTime' ):
-      setattr( self, methodName, lambda *x: self.__mimeTypeMethod( methodName, *x ) )
+      setattr( self, methodName, self.__getTypeMethod( methodName ) )
     for methodName in ( 'autoCompactDB', 'compactBuckets', 'markAllPendingRecordsAsNotTaken',
-                        'loadPendingRecords', 'getRegisteredTypes' ):
-      setattr( self, methodName, lambda *x: self.__mimeMethod( methodName, *x ) )
+                        'loadPendingRecords', 'getRegisteredTypes', 'flushBuckets' ):
+      setattr( self, methodName, self.__getMethod( methodName ) )
+
+  def __getTypeMethod( self, methodName ):
+    return lambda *x: self.__mimeTypeMethod( methodName, *x )
+
+  def __getMethod( self, methodName ):
+    return lambda *x, **kwargs: self.__mimeMethod( methodName, *x, **kwargs )
 
   def __mimeTypeMethod( self, methodName, setup, acType, *args ):
     return getattr( self.__db( acType ), methodName )( "%s_%s" % ( setup, acType ), *args )
 
-  def __mimeMethod( self, methodName, *args ):
+  def __mimeMethod( self, methodName, *args, **kwargs ):
     end = S_OK()
     for dbName in self.__allDBs:
-      res = getattr( self.__allDBs[ dbName ], methodName )( *args )
+      res = getattr( self.__allDBs[ dbName ], methodName )( *args, **kwargs )
       if res and not res[ 'OK' ]:
         end = res
     return end
 
-  def __db( acType ):
+  def __db( self, acType ):
     return self.__allDBs[ self.__dbByType.get( acType, self.__defaultDB ) ]
 
+  def insertRecordBundleThroughQueue( self, records ):
+    """ records is a list of ( setup, acType, startTime, endTime, valuesList )
+    """
+    recordsByDB = {}
+    for setup, acType, startTime, endTime, valuesList in records:
+      recordsByDB.setdefault( self.__db( acType ), [] ).append( ( "%s_%s" % ( setup, acType ),
+                                                                  startTime, endTime, valuesList ) )
+    for acDB in recordsByDB:
+      result = acDB.insertRecordBundleThroughQueue( recordsByDB[ acDB ] )
+      if not result[ 'OK' ]:
+        return result
+    return S_OK()
+
+  def getBucketsBufferCounters( self ):
+    counters = {}
+    for dbName in self.__allDBs:
+      result = self.__allDBs[ dbName ].getBucketsBufferCounters()
+      if not result[ 'OK' ]:
+        return result
+      for counter, value in result[ 'Value' ].items():
+        counters[ counter ] = counters.get( counter, 0 ) + value
+    return S_OK( counters )
+
+  def getCompactionStatus( self ):
+    status = {}
+    for dbName in self.__allDBs:
+      result = self.__allDBs[ dbName ].getCompactionStatus()
+      if not result[ 'OK' ]:
+        return result
+      status[ dbName ] = result[ 'Value' ]
+    return S_OK( status )
@@ -0,0 +1,107 @@
+""" Benchmark of the accounting records insertion with and without merging the buckets
+
+    Replays a synthetic day of Job and DataOperation registers in the configured
+    AccountingDB (use a test database) under a Benchmark setup, first writing the
+    buckets of every record on its own and then merging them by bucket cell, and
+    deletes the benchmark types at the end. Run it with:
+
+      python AccountingBucketsBenchmark.py [ nJobs ] [ nTransfers ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import random
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine( ignoreErrors = True )
+
+from DIRAC.AccountingSystem.DB.AccountingDB import AccountingDB
+from DIRAC.AccountingSystem.Client.Types.Job import Job
+from DIRAC.AccountingSystem.Client.Types.DataOperation import DataOperation
+
+RECORDS_PER_SLOT = 100
+USERS = [ 'user%d' % i for i in range( 30 ) ]
+SITES = [ 'Site%d.org' % i for i in range( 40 ) ]
+SES = [ 'SE%d-disk' % i for i in range( 20 ) ]
+
+def randomInterval( dayStart, maxLength ):
+  startTime = dayStart + random.randint( 0, 86400 )
+  return startTime, startTime + random.randint( 60, maxLength )
+
+def jobRecord( dayStart ):
+  startTime, endTime = randomInterval( dayStart, 36000 )
+  execTime = endTime - startTime
+  return ( startTime, endTime,
+           [ random.choice( USERS ), 'user', '00001234', random.choice( [ 'User', 'MCSimulation' ] ), 'unknown',
+             'unknown', random.choice( SITES ), 'Done', random.choice( [ 'Execution Complete', 'Application Finished' ] ),
+             int( execTime * 0.9 ), int( execTime * 10 ), execTime, random.randint( 0, 10 ** 10 ),
+             random.randint( 0, 10 ** 9 ), random.randint( 0, 10 ), random.randint( 0, 5 ), 0,
+             random.randint( 0, 10 ** 6 ), random.randint( 0, 10 ** 7 ), random.randint( 0, 10 ** 5 ) ] )
+
+def transferRecord( dayStart ):
+  startTime, endTime = randomInterval( dayStart, 3600 )
+  ok = random.randint( 0, 1 )
+  return ( startTime, endTime,
+           [ 'putAndRegister', random.choice( USERS ), random.choice( SITES ), random.choice( SES ),
+             random.choice( SES ), 'srm', random.choice( [ 'Successful', 'Failed' ] ),
+             random.randint( 0, 10 ** 10 ), random.random() * 100, random.random(), ok, 1, ok, 1 ] )
+
+def registerType( acDB, typeClass ):
+  typeName = "Benchmark_%s" % typeClass.__name__
+  definition = typeClass().getDefinition()
+  result = acDB.registerType( typeName, *definition[1:] )
+  if not result[ 'OK' ]:
+    print "Cannot register %s: %s" % ( typeName, result[ 'Message' ] )
+    sys.exit( 1 )
+  return typeName
+
+def report( name, nRecords, elapsed ):
+  print "%s: %s records in %.2f s (%.0f records/s)" % ( name, nRecords, elapsed, nRecords / max( elapsed, 0.000001 ) )
+
+if __name__ == "__main__":
+  nJobs = 20000
+  nTransfers = 50000
+  if len( sys.argv ) > 1:
+    nJobs = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nTransfers = int( sys.argv[2] )
+
+  acDB = AccountingDB()
+  jobType = registerType( acDB, Job )
+  transferType = registerType( acDB, DataOperation )
+
+  dayStart = int( time.time() ) - 2 * 86400
+  records = [ ( jobType, ) + jobRecord( dayStart ) for _i in range( nJobs ) ]
+  records += [ ( transferType, ) + transferRecord( dayStart ) for _i in range( nTransfers ) ]
+  records.sort( key = lambda record: record[2] )
+
+  start = time.time()
+  for typeName, startTime, endTime, valuesList in records:
+    result = acDB.insertRecordDirectly( typeName, startTime, endTime, list( valuesList ) )
+    if not result[ 'OK' ]:
+      print "Record insertion failed: %s" % result[ 'Message' ]
+      sys.exit( 1 )
+  report( "Bucket write per record", len( records ), time.time() - start )
+
+  start = time.time()
+  for i in range( 0, len( records ), RECORDS_PER_SLOT ):
+    result = acDB.insertRecordsDirectly( [ ( typeName, startTime, endTime, list( valuesList ) )
+                                           for typeName, startTime, endTime, valuesList in records[ i:i + RECORDS_PER_SLOT ] ] )
+    if not result[ 'OK' ]:
+      print "Records insertion failed: %s" % result[ 'Message' ]
+      sys.exit( 1 )
+  report( "Merged buckets by %s records" % RECORDS_PER_SLOT, len( records ), time.time() - start )
+
+  start = time.time()
+  result = acDB.insertRecordsDirectly( [ ( typeName, startTime, endTime, list( valuesList ) )
+                                         for typeName, startTime, endTime, valuesList in records ] )
+  if not result[ 'OK' ]:
+    print "Records insertion failed: %s" % result[ 'Message' ]
+    sys.exit( 1 )
+  report( "Merged buckets for the whole day", len( records ), time.time() - start )
+  counters = acDB.getBucketsBufferCounters()[ 'Value' ]
+  print "Merged: %s records in, %s bucket cells written" % ( counters[ 'RecordsIn' ], counters[ 'CellsWritten' ] )
+
+  for typeName in ( jobType, transferType ):
+    acDB.deleteType( typeName )
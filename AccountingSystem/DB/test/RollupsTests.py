@@ -0,0 +1,78 @@
+""" Test cases for the splitting of the records in the rollups and the choice of the rollup of a query
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC.AccountingSystem.DB.AccountingDB import _splitInGranularity, _getRollupForBucketLength, \
+                                                   _getRollupsRetention, _getRollupValidSince, _chooseRollup
+
+HOUR = 3600
+DAY = 86400
+WEEK = 604800
+NOW = 1400000000 - 1400000000 % WEEK
+#Buckets length by age as kept in the AccountingDB catalog, 0 as age limit of the last range
+BUCKETS_LENGTH_RANGES = [ ( 86400, 900 ), ( 604800, 3600 ), ( 2592000, 86400 ), ( 0, 604800 ) ]
+
+class RollupsTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    granularities = [ HOUR, DAY, WEEK ]
+    retentions = _getRollupsRetention( BUCKETS_LENGTH_RANGES, granularities )
+    self.rollups = dict( [ ( granularity, { 'granularity' : granularity, 'keys' : [ 'Site', 'User' ],
+                                            'validSince' : 0, 'retention' : retentions[ granularity ] } )
+                           for granularity in granularities ] )
+    self.rollups[ WEEK ][ 'keys' ] = [ 'Site' ]
+
+  def test01split( self ):
+    """ a record is split in proportion to its time in each bucket """
+    self.assertEqual( _splitInGranularity( NOW + 10, NOW + 10, HOUR ), [ ( NOW, 1 ) ] )
+    self.assertEqual( _splitInGranularity( NOW + 1800, NOW + 3 * HOUR, HOUR ),
+                      [ ( NOW, 0.2 ), ( NOW + HOUR, 0.4 ), ( NOW + 2 * HOUR, 0.4 ) ] )
+    self.assertEqual( _splitInGranularity( NOW, NOW + HOUR, HOUR ), [ ( NOW, 1 ) ] )
+    split = _splitInGranularity( NOW - 12345, NOW + 54321, DAY )
+    self.assertAlmostEqual( sum( [ proportion for _bStart, proportion in split ] ), 1 )
+
+  def test02rollupForBucketLength( self ):
+    """ the coarsest granularity the bucket length is a multiple of """
+    self.assertEqual( _getRollupForBucketLength( 900, [ HOUR, DAY, WEEK ] ), 0 )
+    self.assertEqual( _getRollupForBucketLength( 7200, [ HOUR, DAY, WEEK ] ), HOUR )
+    self.assertEqual( _getRollupForBucketLength( DAY, [ HOUR, DAY, WEEK ] ), DAY )
+    self.assertEqual( _getRollupForBucketLength( WEEK, [ HOUR, DAY ] ), DAY )
+    self.assertEqual( _getRollupForBucketLength( WEEK, [] ), 0 )
+
+  def test03retention( self ):
+    """ a rollup is kept for the ages it is used for """
+    self.assertEqual( _getRollupsRetention( BUCKETS_LENGTH_RANGES, [ HOUR, DAY, WEEK ] ),
+                      { HOUR : 604800, DAY : 2592000, WEEK : 0 } )
+    self.assertEqual( _getRollupsRetention( BUCKETS_LENGTH_RANGES, [ HOUR, 7200 ] ),
+                      { HOUR : 604800, 7200 : 0 } )
+    #Never used, the hour one serves all the ages above a day
+    self.assertEqual( _getRollupsRetention( [ ( 86400, 900 ), ( 0, 3600 ) ], [ HOUR, DAY ] ),
+                      { HOUR : 0, DAY : None } )
+
+  def test04validSince( self ):
+    """ a new rollup is only complete after the other writers have seen it """
+    self.assertEqual( _getRollupValidSince( NOW + 10, HOUR, 0 ), NOW + HOUR )
+    self.assertEqual( _getRollupValidSince( NOW + 10, HOUR, 330 ), NOW + HOUR )
+    self.assertEqual( _getRollupValidSince( NOW + HOUR - 100, HOUR, 330 ), NOW + 2 * HOUR )
+    self.assertEqual( _getRollupValidSince( NOW + 10, DAY, 330 ), NOW + DAY )
+
+  def test05chooseRollup( self ):
+    """ the coarsest rollup with the keys, the time span and a granularity dividing the buckets length """
+    self.assertEqual( _chooseRollup( self.rollups, 3600, NOW - 2 * DAY, [ 'Site', 'User' ], NOW ), HOUR )
+    self.assertEqual( _chooseRollup( self.rollups, 900, NOW - HOUR, [ 'Site' ], NOW ), 0 )
+    self.assertEqual( _chooseRollup( self.rollups, DAY, NOW - 10 * DAY, [ 'Site' ], NOW ), DAY )
+    self.assertEqual( _chooseRollup( self.rollups, WEEK, NOW - 100 * DAY, [ 'Site' ], NOW ), WEEK )
+    #The week rollup does not have the User key
+    self.assertEqual( _chooseRollup( self.rollups, WEEK, NOW - 20 * DAY, [ 'User' ], NOW ), DAY )
+    #Older than the retention of the day rollup
+    self.assertEqual( _chooseRollup( self.rollups, WEEK, NOW - 100 * DAY, [ 'User' ], NOW ), 0 )
+    #Not complete yet at the start of the query
+    self.rollups[ HOUR ][ 'validSince' ] = NOW - DAY
+    self.assertEqual( _chooseRollup( self.rollups, 3600, NOW - 2 * DAY, [ 'Site' ], NOW ), 0 )
+    self.assertEqual( _chooseRollup( self.rollups, 3600, NOW - DAY, [ 'Site' ], NOW ), HOUR )
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( RollupsTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( suite )
@@ -19,6 +19,8 @@ class DataStoreHandler( RequestHandler ):
     if not result[ 'OK' ]:
       return result
     gThreadScheduler.addPeriodicTask( 60, cls.__acDB.loadPendingRecords )
+    #Write the buffered buckets when they are older than BucketsBufferTime
+    gThreadScheduler.addPeriodicTask( 10, lambda: cls.__acDB.flushBuckets( onlyIfDue = True ) )
     return S_OK()
 
   types_registerType = [ types.StringType, types.ListType, types.ListType, types.ListType ]
@@ -75,6 +77,23 @@ class DataStoreHandler( RequestHandler ):
       return S_ERROR( "Error while recalculating buckets for type:\n %s" % "\n ".join( errorsList ) )
     return S_OK()
 
+  types_regenerateRollups = [ types.StringType ]
+  def export_regenerateRollups( self, typeName ):
+    """
+      Rebuild the rollups of a type from its records. (Only for all powerful admins)
+    """
+    retVal = gConfig.getSections( "/DIRAC/Setups" )
+    if not retVal[ 'OK' ]:
+      return retVal
+    errorsList = []
+    for setup in retVal[ 'Value' ]:
+      retVal = self.__acDB.regenerateRollups( setup, typeName )
+      if not retVal[ 'OK' ]:
+        errorsList.append( retVal[ 'Message' ] )
+    if errorsList:
+      return S_ERROR( "Error while rebuilding rollups for type:\n %s" % "\n ".join( errorsList ) )
+    return S_OK()
+
   types_getRegisteredTypes = []
   def export_getRegisteredTypes( self ):
     """
@@ -139,6 +158,13 @@ class DataStoreHandler( RequestHandler ):
     """
     return self.__acDB.compactBuckets()
 
+  types_getCompactionStatus = []
+  def export_getCompactionStatus( self ):
+    """
+    Get the progress and throughput of the running or last compaction of each db
+    """
+    return self.__acDB.getCompactionStatus()
+
   types_remove = [ types.StringType, Time._dateTimeType, Time._dateTimeType, types.ListType ]
   def export_remove( self, typeName, startTime, endTime, valuesList ):
     """
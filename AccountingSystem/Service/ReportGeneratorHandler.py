@@ -52,6 +52,9 @@ class ReportGeneratorHandler( RequestHandler ):
       gLogger.fatal( "Can't write to %s" % dataPath )
       return S_ERROR( "Data location is not writable" )
     gDataCache.setGraphsLocation( dataPath )
+    #Size in MB
+    dataCacheSize = gConfig.getValue( "%s/DataCacheSize" % reportSection, 256 )
+    gDataCache.setDataCacheSize( dataCacheSize * 1024 * 1024 )
     gMonitor.registerActivity( "plotsDrawn", "Drawn plot images", "Accounting reports", "plots", gMonitor.OP_SUM )
     gMonitor.registerActivity( "reportsRequested", "Generated reports", "Accounting reports", "reports", gMonitor.OP_SUM )
     return S_OK()
@@ -0,0 +1,280 @@
+""" Array backed report data
+
+    BinnedData holds the { group : { epoch : value } } dicts used by the
+    reporters as a 2-D numpy array indexed by group and time bin ( 3-D when
+    each bin holds a list of fields ) plus a mask of the bins that have a value,
+    so the re-binning, accumulation and normalization of the reports are done
+    with vectorized operations instead of nested loops over dicts.
+"""
+__RCSID__ = "$Id$"
+
+import numpy
+
+class BinnedData:
+
+  def __init__( self, groups, bins, values, present = None ):
+    """ groups is the list of group keys, bins the sorted array of bin epochs and
+        values an array of shape ( len( groups ), len( bins )[, nFields ] )
+    """
+    self.groups = list( groups )
+    self.bins = numpy.asarray( bins, dtype = numpy.int64 )
+    self.values = numpy.asarray( values, dtype = numpy.float64 )
+    if present is None:
+      present = numpy.ones( ( len( self.groups ), len( self.bins ) ), dtype = bool )
+    self.present = present
+
+  @classmethod
+  def fromDict( cls, dataDict ):
+    """ Build it from { group : { epoch : value or [ fields ] } }
+    """
+    keys = list( dataDict )
+    epochs = set()
+    nFields = 0
+    for key in keys:
+      epochs.update( dataDict[ key ] )
+      if not nFields:
+        for value in dataDict[ key ].itervalues():
+          if type( value ) in ( list, tuple ):
+            nFields = len( value )
+          else:
+            nFields = -1
+          break
+    bins = numpy.array( sorted( epochs ), dtype = numpy.int64 )
+    binIndex = dict( ( epoch, iBin ) for iBin, epoch in enumerate( bins.tolist() ) )
+    shape = ( len( keys ), len( bins ) )
+    if nFields > 0:
+      shape += ( nFields, )
+    values = numpy.zeros( shape, dtype = numpy.float64 )
+    present = numpy.zeros( shape[:2], dtype = bool )
+    for iKey in range( len( keys ) ):
+      currentDict = dataDict[ keys[ iKey ] ]
+      if not currentDict:
+        continue
+      cols = [ binIndex[ epoch ] for epoch in currentDict ]
+      values[ iKey, cols ] = currentDict.values()
+      present[ iKey, cols ] = True
+    return cls( keys, bins, values, present )
+
+  def toDict( self ):
+    """ Get back the { group : { epoch : value or [ fields ] } } dict, only
+        with the bins that have a value
+    """
+    dataDict = {}
+    for iKey in range( len( self.groups ) ):
+      cols = numpy.nonzero( self.present[ iKey ] )[0]
+      dataDict[ self.groups[ iKey ] ] = dict( zip( self.bins[ cols ].tolist(), self.values[ iKey, cols ].tolist() ) )
+    return dataDict
+
+  @classmethod
+  def fromBucketsData( cls, granularity, groupedData, average = False, consolidationFunction = None ):
+    """ Build it from { group : [ [ epoch, bucketLength, field1, ... ], ... ] }
+        re-binning each group to granularity. The fields are summed, or averaged
+        if average is True, and optionally consolidated to one field with
+        consolidationFunction( *fields )
+    """
+    keys = list( groupedData )
+    groupsBins = []
+    groupsValues = []
+    for key in keys:
+      bins, normData = cls.spanToGranularity( granularity, groupedData[ key ] )
+      if average:
+        normData = normData[ :, :-1 ] / normData[ :, -1: ]
+      else:
+        normData = normData[ :, :-1 ]
+      if consolidationFunction:
+        normData = numpy.array( [ [ consolidationFunction( *fields ) ] for fields in normData.tolist() ],
+                                dtype = numpy.float64 ).reshape( len( bins ), 1 )
+      groupsBins.append( bins )
+      groupsValues.append( normData )
+    allBins = numpy.zeros( 0, dtype = numpy.int64 )
+    if groupsBins:
+      allBins = numpy.unique( numpy.concatenate( groupsBins ) )
+    nFields = 0
+    if groupsValues:
+      nFields = max( [ values.shape[1] for values in groupsValues ] )
+    values = numpy.zeros( ( len( keys ), len( allBins ), nFields ), dtype = numpy.float64 )
+    present = numpy.zeros( ( len( keys ), len( allBins ) ), dtype = bool )
+    for iKey in range( len( keys ) ):
+      cols = numpy.searchsorted( allBins, groupsBins[ iKey ] )
+      values[ iKey, cols ] = groupsValues[ iKey ]
+      present[ iKey, cols ] = True
+    return cls( keys, allBins, values, present )
+
+  # Enough of the dict interface for the reporters
+
+  def __len__( self ):
+    return len( self.groups )
+
+  def __iter__( self ):
+    return iter( self.groups )
+
+  def __contains__( self, key ):
+    return key in self.groups
+
+  def __getitem__( self, key ):
+    """ Get a copy of the { epoch : value } dict of a group
+    """
+    iKey = self.groups.index( key )
+    cols = numpy.nonzero( self.present[ iKey ] )[0]
+    return dict( zip( self.bins[ cols ].tolist(), self.values[ iKey, cols ].tolist() ) )
+
+  def __setitem__( self, key, currentDict ):
+    """ Add or replace a group from its { epoch : value } dict
+    """
+    epochs = currentDict.keys()
+    cols = self.__addBins( epochs )
+    if key in self.groups:
+      iKey = self.groups.index( key )
+      self.values[ iKey ] = 0
+      self.present[ iKey ] = False
+    else:
+      iKey = len( self.groups )
+      self.groups.append( key )
+      self.values = numpy.concatenate( ( self.values, numpy.zeros( ( 1, ) + self.values.shape[1:] ) ) )
+      self.present = numpy.concatenate( ( self.present, numpy.zeros( ( 1, len( self.bins ) ), dtype = bool ) ) )
+    if epochs:
+      self.values[ iKey, cols ] = [ currentDict[ epoch ] for epoch in epochs ]
+      self.present[ iKey, cols ] = True
+
+  def keys( self ):
+    return list( self.groups )
+
+  def __addBins( self, newBins ):
+    """ Add ( empty ) bins and return the positions of newBins in the bins
+    """
+    newBins = numpy.asarray( newBins, dtype = numpy.int64 )
+    allBins = numpy.union1d( self.bins, newBins )
+    if len( allBins ) != len( self.bins ):
+      cols = numpy.searchsorted( allBins, self.bins )
+      values = numpy.zeros( ( len( self.groups ), len( allBins ) ) + self.values.shape[2:], dtype = numpy.float64 )
+      present = numpy.zeros( ( len( self.groups ), len( allBins ) ), dtype = bool )
+      values[ :, cols ] = self.values
+      present[ :, cols ] = self.present
+      self.bins, self.values, self.present = allBins, values, present
+    return numpy.searchsorted( self.bins, newBins )
+
+  def stripField( self, fieldId ):
+    """ Keep only the field fieldId in the bins and return the sums over
+        the groups of the other fields, as DBUtils.stripDataField
+    """
+    remainingData = [ {} ]
+    if self.values.ndim != 3:
+      return remainingData
+    if not self.groups:
+      self.values = numpy.zeros( self.present.shape, dtype = numpy.float64 )
+      return remainingData
+    nFields = self.values.shape[2]
+    remainingData.extend( [ {} for _iField in range( nFields ) ] )
+    cols = numpy.nonzero( self.present.any( axis = 0 ) )[0]
+    epochs = self.bins[ cols ].tolist()
+    otherFields = [ iField for iField in range( nFields ) if iField != fieldId ]
+    for iPos in range( len( otherFields ) ):
+      sums = numpy.where( self.present, self.values[ :, :, otherFields[ iPos ] ], 0 ).sum( axis = 0 )
+      remainingData[ iPos ] = dict( zip( epochs, sums[ cols ].tolist() ) )
+    self.values = self.values[ :, :, fieldId ].copy()
+    return remainingData
+
+  def fillWithZero( self, granularity, startEpoch, endEpoch ):
+    """ Give a zero value to the missing bins between startEpoch and endEpoch
+    """
+    startBucketEpoch = startEpoch - startEpoch % granularity
+    cols = self.__addBins( numpy.arange( startBucketEpoch, endEpoch, granularity, dtype = numpy.int64 ) )
+    self.present[ :, cols ] = True
+    return self
+
+  def accumulate( self, granularity, startEpoch, endEpoch ):
+    """ Replace the values between startEpoch and endEpoch by their running sum
+    """
+    startBucketEpoch = startEpoch - startEpoch % granularity
+    cols = self.__addBins( numpy.arange( startBucketEpoch, endEpoch, granularity, dtype = numpy.int64 ) )
+    if len( cols ):
+      inRange = numpy.where( self.present[ :, cols ], self.values[ :, cols ], 0 )
+      self.values[ :, cols ] = numpy.cumsum( inRange, axis = 1 )
+      self.present[ :, cols ] = True
+    return self
+
+  def divideByFactor( self, factor ):
+    """ Divide the values by factor and get the maximum value
+    """
+    self.values /= float( factor )
+    maxValue = 0.0
+    if self.present.any():
+      maxValue = max( maxValue, float( self.values[ self.present ].max() ) )
+    return maxValue
+
+  def getAccumulationMaxValue( self ):
+    """ Sum of the values in the last bin that has any value
+    """
+    filledBins = numpy.nonzero( self.present.any( axis = 0 ) )[0]
+    if not len( filledBins ):
+      return 0
+    lastBin = filledBins[-1]
+    # Sum in the groups order to get the same rounding as the dict version
+    return sum( self.values[ self.present[ :, lastBin ], lastBin ].tolist() )
+
+  def getBucketTotals( self ):
+    """ Sum of the values of all the groups per bin
+    """
+    cols = numpy.nonzero( self.present.any( axis = 0 ) )[0]
+    totals = numpy.where( self.present, self.values, 0 ).sum( axis = 0 )
+    return dict( zip( self.bins[ cols ].tolist(), totals[ cols ].tolist() ) )
+
+  def calculateProportionalGauges( self ):
+    """ Replace [ value, weight, ... ] in each bin by the proportional gauge
+        of the value of the group over all the groups in that bin
+    """
+    if self.values.ndim != 3 or self.values.shape[2] < 2:
+      raise Exception( "DataDict must be of the type { <key>:{ <timeKey> : [ field1, field2, ..] } }. With at least two fields" )
+    data = self.values[ :, :, 0 ]
+    weights = self.values[ :, :, 1 ]
+    if ( weights[ self.present ] == 0 ).any():
+      raise ZeroDivisionError( "float division by zero" )
+    ratios = numpy.zeros( data.shape, dtype = numpy.float64 )
+    ratios[ self.present ] = data[ self.present ] / weights[ self.present ]
+    dataSums = numpy.where( self.present, data, 0 ).sum( axis = 0 )
+    weightSums = numpy.where( self.present, weights, 0 ).sum( axis = 0 )
+    ratioSums = ratios.sum( axis = 0 )
+    factors = numpy.zeros( len( self.bins ), dtype = numpy.float64 )
+    nonZero = dataSums != 0
+    factors[ nonZero ] = ( dataSums[ nonZero ] / weightSums[ nonZero ] ) / ratioSums[ nonZero ]
+    self.values = ( ratios * factors )[ :, :, numpy.newaxis ]
+    return self
+
+  @classmethod
+  def spanToGranularity( cls, granularity, bucketsData ):
+    """ Re-bin bucketsData rows [ epoch, bucketLength, field1, ... ] to buckets
+        of granularity seconds, splitting the rows that span several buckets
+        proportionally to their overlap. Returns the array of bucket epochs and
+        the array of summed fields with the summed proportions as last column
+    """
+    if not bucketsData:
+      return numpy.zeros( 0, dtype = numpy.int64 ), numpy.zeros( ( 0, 1 ), dtype = numpy.float64 )
+    rows = numpy.array( bucketsData, dtype = object )
+    fields = rows[ :, 2: ]
+    fields[ numpy.equal( fields, None ) ] = 0
+    fields = fields.astype( numpy.float64 )
+    startEpochs = rows[ :, 0 ].astype( numpy.int64 )
+    bucketLengths = rows[ :, 1 ].astype( numpy.int64 )
+    endEpochs = startEpochs + bucketLengths
+    firstBuckets = startEpochs - startEpochs % granularity
+    # Rows already in the granularity keep their epoch, empty rows go to their bucket
+    asIs = bucketLengths == granularity
+    single = asIs | ( bucketLengths == 0 )
+    nPieces = numpy.where( single, 1, ( endEpochs - firstBuckets + granularity - 1 ) // granularity )
+    rowIndex = numpy.repeat( numpy.arange( len( rows ) ), nPieces )
+    pieceIndex = numpy.arange( len( rowIndex ) ) - numpy.repeat( numpy.cumsum( nPieces ) - nPieces, nPieces )
+    pieceBuckets = firstBuckets[ rowIndex ] + pieceIndex * granularity
+    pieceStarts = numpy.maximum( pieceBuckets, startEpochs[ rowIndex ] )
+    pieceEnds = numpy.minimum( pieceBuckets + granularity, endEpochs[ rowIndex ] )
+    proportions = numpy.ones( len( rowIndex ), dtype = numpy.float64 )
+    split = ~single[ rowIndex ]
+    proportions[ split ] = ( pieceEnds[ split ] - pieceStarts[ split ] ).astype( numpy.float64 ) / bucketLengths[ rowIndex ][ split ]
+    pieceBuckets = numpy.where( asIs[ rowIndex ], startEpochs[ rowIndex ], pieceBuckets )
+    bins, binIndex = numpy.unique( pieceBuckets, return_inverse = True )
+    nFields = fields.shape[1]
+    normData = numpy.zeros( ( len( bins ), nFields + 1 ), dtype = numpy.float64 )
+    pieceFields = fields[ rowIndex ] * proportions[ :, numpy.newaxis ]
+    for iField in range( nFields ):
+      normData[ :, iField ] = numpy.bincount( binIndex, weights = pieceFields[ :, iField ], minlength = len( bins ) )
+    normData[ :, nFields ] = numpy.bincount( binIndex, weights = proportions, minlength = len( bins ) )
+    return bins, normData
@@ -1,8 +1,16 @@
 import types
 from DIRAC.Core.Utilities import Time
+try:
+  from DIRAC.AccountingSystem.private.BinnedData import BinnedData
+except ImportError:
+  # Without numpy the reports are processed with the dicts
+  BinnedData = None
 
 class DBUtils:
 
+  # Minimum number of rows to re-bin them with arrays, below it the conversion costs more than it saves
+  _arraysThreshold = 100
+
   def __init__( self, db, setup ):
     self._acDB = db
     self._setup = setup
@@ -72,6 +80,18 @@ class DBUtils:
     typeName = "%s_%s" % ( self._setup, typeName )
     return self._acDB.calculateBucketLengthForTime( typeName, nowEpoch, momentEpoch )
 
+  def _rebinWithArrays( self, bucketsData ):
+    """
+    Check if bucketsData rows have to be re-binned with arrays
+    """
+    return BinnedData is not None and self._arraysThreshold and len( bucketsData ) >= self._arraysThreshold
+
+  def _isBinned( self, dataDict ):
+    """
+    Check if dataDict is a BinnedData instead of a dict
+    """
+    return BinnedData is not None and isinstance( dataDict, BinnedData )
+
   def _spanToGranularity( self, granularity, bucketsData ):
     """
     bucketsData must be a list of lists where each list contains
@@ -79,6 +99,9 @@ class DBUtils:
       - field 1: bucketLength
       - fields 2-n: numericalFields
     """
+    if self._rebinWithArrays( bucketsData ):
+      bins, normData = BinnedData.spanToGranularity( granularity, bucketsData )
+      return dict( zip( bins.tolist(), normData.tolist() ) )
     normData = {}
 
     def addToNormData( bucketDate, data, proportion = 1.0 ):
@@ -125,6 +148,9 @@ class DBUtils:
       - field 1: bucketLength
       - fields 2-n: numericalFields
     """
+    if self._rebinWithArrays( bucketsData ):
+      bins, normData = BinnedData.spanToGranularity( granularity, bucketsData )
+      return dict( zip( bins.tolist(), normData[ :, :-1 ].tolist() ) )
     normData = self._spanToGranularity( granularity, bucketsData )
     for bDate in normData:
       del( normData[ bDate ][-1] )
@@ -137,6 +163,10 @@ class DBUtils:
       - field 1: bucketLength
       - fields 2-n: numericalFields
     """
+    if self._rebinWithArrays( bucketsData ):
+      bins, normData = BinnedData.spanToGranularity( granularity, bucketsData )
+      normData = normData[ :, :-1 ] / normData[ :, -1: ]
+      return dict( zip( bins.tolist(), normData.tolist() ) )
     normData = self._spanToGranularity( granularity, bucketsData )
     for bDate in normData:
       for iP in range( len( normData[ bDate ] ) ):
@@ -164,6 +194,8 @@ class DBUtils:
     Fill with zeros missing buckets
       - dataDict = { 'key' : { time1 : value,  time2 : value... }, 'key2'.. }
     """
+    if self._isBinned( dataDict ):
+      return dataDict.fillWithZero( granularity, startEpoch, endEpoch )
     startBucketEpoch = startEpoch - startEpoch % granularity
     for key in dataDict:
       currentDict = dataDict[ key ]
@@ -177,6 +209,8 @@ class DBUtils:
     Divide by factor the values and get the maximum value
       - dataDict = { 'key' : { time1 : value,  time2 : value... }, 'key2'.. }
     """
+    if self._isBinned( dataDict ):
+      return dataDict.getAccumulationMaxValue()
     maxValue = 0
     maxEpoch = 0
     for key in dataDict:
@@ -211,6 +245,8 @@ class DBUtils:
     Divide by factor the values and get the maximum value
       - dataDict = { 'key' : { time1 : value,  time2 : value... }, 'key2'.. }
     """
+    if self._isBinned( dataDict ):
+      return dataDict, dataDict.divideByFactor( factor )
     maxValue = 0.0
     for key in dataDict:
       currentDict = dataDict[ key ]
@@ -224,6 +260,8 @@ class DBUtils:
     Accumulate all the values.
       - dataDict = { 'key' : { time1 : value,  time2 : value... }, 'key2'.. }
     """
+    if self._isBinned( dataDict ):
+      return dataDict.accumulate( granularity, startEpoch, endEpoch )
     startBucketEpoch = startEpoch - startEpoch % granularity
     for key in dataDict:
       currentDict = dataDict[ key ]
@@ -247,6 +285,8 @@ class DBUtils:
       - return : [ { <timeEpoch1>: 2, <timeEpoch2>: 4... }
                    { <timeEpoch1>: 3, <timeEpoch2>): 5... } ]
     """
+    if self._isBinned( dataDict ):
+      return dataDict.stripField( fieldId )
     remainingData = [{}] #Hack for empty data
     for key in dataDict:
       for timestamp in dataDict[ key ]:
@@ -277,6 +317,8 @@ class DBUtils:
     """
     Get a dict with more than one entry per bucket and list
     """
+    if self._isBinned( dataDict ):
+      return dataDict.calculateProportionalGauges()
     bucketSums = {}
     #Calculate total sums in buckets
     for key in dataDict:
@@ -308,6 +350,8 @@ class DBUtils:
     """
     Sum key data and get totals for each bucket
     """
+    if self._isBinned( dataDict ):
+      return dataDict.getBucketTotals()
     newData = {}
     for k in dataDict:
       for bt in dataDict[ k ]:
@@ -4,10 +4,12 @@ __RCSID__ = "$Id$"
 import os
 import os.path
 import time
+import cPickle
 import threading
 
 from DIRAC import S_OK, S_ERROR, gLogger, rootPath, gConfig
 from DIRAC.Core.Utilities.DictCache import DictCache
+from DIRAC.Core.Utilities.LRUCache import LRUCache
 
 
 class DataCache:
@@ -19,10 +21,24 @@ class DataCache:
     self.purgeThread = threading.Thread( target = self.purgeExpired )
     self.purgeThread.setDaemon( 1 )
     self.purgeThread.start()
-    self.__dataCache = DictCache()
-    self.__graphCache = DictCache( deleteFunction = self._deleteGraph )
     self.__dataLifeTime = 600
     self.__graphLifeTime = 3600
+    # Report data and query rows, bounded by their size in bytes
+    self.__dataCache = LRUCache( maxSize = 10000, lifeTime = self.__dataLifeTime, maxWeight = 256 * 1024 * 1024 )
+    self.__graphCache = DictCache( deleteFunction = self._deleteGraph )
+    # Margin to be sure that the DB time conditions of a partial query cover the bins to merge
+    self.__rowsMargin = 3600
+    self.__inFlight = {}
+    self.__inFlightLock = threading.Lock()
+
+  def setDataCacheSize( self, maxBytes ):
+    """
+    Set the maximum size in bytes of the cached report data and query rows
+    """
+    self.__dataCache = LRUCache( maxSize = 10000, lifeTime = self.__dataLifeTime, maxWeight = maxBytes )
+
+  def getDataCacheStats( self ):
+    return self.__dataCache.getStats()
 
   def setGraphsLocation( self, graphsDir ):
     self.graphsLocation = graphsDir
@@ -38,23 +54,123 @@ class DataCache:
       self.__graphCache.purgeExpired()
       self.__dataCache.purgeExpired()
 
+  def __singleFlight( self, flightKey, function ):
+    """
+    Execute function only once for all the threads asking for flightKey at the same
+    time, the ones arriving while it runs wait for it and get its result
+    """
+    self.__inFlightLock.acquire()
+    try:
+      flight = self.__inFlight.get( flightKey )
+      isLeader = flight is None
+      if isLeader:
+        flight = { 'event' : threading.Event(), 'result' : S_ERROR( "Generation of %s failed" % flightKey[0] ) }
+        self.__inFlight[ flightKey ] = flight
+    finally:
+      self.__inFlightLock.release()
+    if not isLeader:
+      flight[ 'event' ].wait()
+      return flight[ 'result' ]
+    try:
+      flight[ 'result' ] = function()
+    finally:
+      self.__inFlightLock.acquire()
+      try:
+        del( self.__inFlight[ flightKey ] )
+      finally:
+        self.__inFlightLock.release()
+      flight[ 'event' ].set()
+    return flight[ 'result' ]
+
+  def __getDataSize( self, data ):
+    try:
+      return len( cPickle.dumps( data, cPickle.HIGHEST_PROTOCOL ) )
+    except Exception:
+      return 1
+
   def getReportData( self, reportRequest, reportHash, dataFunc ):
     """
     Get report data from cache if exists, else generate it
     """
-    reportData = self.__dataCache.get( reportHash )
-    if reportData == False:
-      retVal = dataFunc( reportRequest )
-      if not retVal[ 'OK' ]:
-        return retVal
-      reportData = retVal[ 'Value' ]
-      self.__dataCache.add( reportHash, self.__dataLifeTime, reportData )
+    reportData = self.__dataCache.get( ( 'report', reportHash ) )
+    if reportData is not None:
+      return S_OK( reportData )
+    return self.__singleFlight( ( 'report', reportHash ),
+                                lambda: self.__generateReportData( reportRequest, reportHash, dataFunc ) )
+
+  def __generateReportData( self, reportRequest, reportHash, dataFunc ):
+    #It may have been generated by another thread while getting here
+    reportData = self.__dataCache.get( ( 'report', reportHash ) )
+    if reportData is not None:
+      return S_OK( reportData )
+    retVal = dataFunc( reportRequest )
+    if not retVal[ 'OK' ]:
+      return retVal
+    reportData = retVal[ 'Value' ]
+    self.__dataCache.put( ( 'report', reportHash ), reportData, self.__getDataSize( reportData ) )
     return S_OK( reportData )
 
+  def getTimedRows( self, rowsKey, startTime, endTime, granularity, retrieveFunc ):
+    """
+    Get the rows of a timed query between startTime and endTime. If the rows of the
+    same query for an earlier overlapping period are cached, only the head of the period
+    and the bins after the cached ones are queried, and merged with the cached rows
+      - rowsKey identifies the query without its time span
+      - granularity is the length of the bins the rows will be grouped in
+      - retrieveFunc( startTime, endTime ) has to return the rows ordered by startTime,
+        with the startTime in position 1
+    """
+    cached = self.__dataCache.get( ( 'rows', rowsKey ) )
+    if cached and time.time() - cached[ 'fetchTime' ] < self.__dataLifeTime and \
+       cached[ 'startTime' ] <= startTime and cached[ 'endTime' ] <= endTime:
+      # Rows before headEnd are queried again because the DB moves the query start to the
+      # bucket boundaries, the bins from the one of the cached end on may have new records
+      headEnd = startTime + self.__rowsMargin + granularity
+      headEnd += ( granularity - headEnd % granularity ) % granularity
+      tailStart = cached[ 'endTime' ] - cached[ 'endTime' ] % granularity
+      if headEnd < tailStart:
+        retVal = retrieveFunc( startTime, headEnd )
+        if not retVal[ 'OK' ]:
+          return retVal
+        rows = [ tuple( row ) for row in retVal[ 'Value' ] if row[1] < headEnd ]
+        rows.extend( [ row for row in cached[ 'rows' ] if headEnd <= row[1] < tailStart ] )
+        retVal = retrieveFunc( tailStart - granularity - self.__rowsMargin, endTime )
+        if not retVal[ 'OK' ]:
+          return retVal
+        rows.extend( [ tuple( row ) for row in retVal[ 'Value' ] if row[1] >= tailStart ] )
+        gLogger.verbose( "Reused %s cached rows for a timed query" % ( len( rows ) ) )
+        # The merged rows are as old as the reused ones
+        self.__cacheTimedRows( rowsKey, startTime, endTime, cached[ 'fetchTime' ], rows )
+        return S_OK( rows )
+    fetchTime = time.time()
+    retVal = retrieveFunc( startTime, endTime )
+    if not retVal[ 'OK' ]:
+      return retVal
+    rows = [ tuple( row ) for row in retVal[ 'Value' ] ]
+    self.__cacheTimedRows( rowsKey, startTime, endTime, fetchTime, rows )
+    return S_OK( rows )
+
+  def __cacheTimedRows( self, rowsKey, startTime, endTime, fetchTime, rows ):
+    rowsSize = 64
+    if rows:
+      #Good enough estimation, pickling them all would cost too much
+      rowsSize += len( rows ) * self.__getDataSize( rows[0] )
+    self.__dataCache.put( ( 'rows', rowsKey ), { 'startTime' : startTime,
+                                                 'endTime' : endTime,
+                                                 'fetchTime' : fetchTime,
+                                                 'rows' : rows }, rowsSize )
+
   def getReportPlot( self, reportRequest, reportHash, reportData, plotFunc ):
     """
     Get report data from cache if exists, else generate it
     """
+    plotDict = self.__graphCache.get( reportHash )
+    if plotDict == False:
+      return self.__singleFlight( ( 'plot', reportHash ),
+                                  lambda: self.__generateReportPlot( reportRequest, reportHash, reportData, plotFunc ) )
+    return S_OK( plotDict )
+
+  def __generateReportPlot( self, reportRequest, reportHash, reportData, plotFunc ):
     plotDict = self.__graphCache.get( reportHash )
     if plotDict == False:
       basePlotFileName = "%s/%s" % ( self.graphsLocation, reportHash )
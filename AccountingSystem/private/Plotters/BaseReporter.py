@@ -1,6 +1,6 @@
 import time, copy, types
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.AccountingSystem.private.DBUtils import DBUtils
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils, BinnedData
 from DIRAC.AccountingSystem.private.DataCache import gDataCache
 from DIRAC.Core.Utilities import Time
 from DIRAC.AccountingSystem.private.Plots import generateNoDataPlot, generateTimedStackedBarPlot, generateQualityPlot, generateCumulativePlot, generatePiePlot, generateStackedLinePlot
@@ -38,6 +38,9 @@ class BaseReporter( DBUtils ):
   # To be defined in the derived classes
   _typeKeyFields = []
   _typeName = ''
+  # Reporters that only handle the timed data through the DBUtils methods, len, iteration
+  # and setting whole keys can process it as a BinnedData, it is turned into dicts at the end
+  _useBinnedData = False
 
   def __init__( self, db, setup, extraArgs = None ):
     DBUtils.__init__( self, db, setup )
@@ -115,8 +118,24 @@ class BaseReporter( DBUtils ):
       funcObj = getattr( self, funcName )
     except:
       return S_ERROR( "Report %s is not defined" % reportRequest[ 'reportName' ] )
+    if self._useBinnedData:
+      funcObj = self.__binnedReportToDicts( funcObj )
     return gDataCache.getReportData( reportRequest, reportHash, funcObj )
 
+  def __binnedReportToDicts( self, funcObj ):
+    """
+    Wrap a report function to turn the BinnedData in its result into dicts
+    """
+    def reportToDicts( reportRequest ):
+      retVal = funcObj( reportRequest )
+      if retVal[ 'OK' ]:
+        reportData = retVal[ 'Value' ]
+        for key in reportData:
+          if self._isBinned( reportData[ key ] ):
+            reportData[ key ] = reportData[ key ].toDict()
+      return retVal
+    return reportToDicts
+
   def __generatePlotForReport( self, reportRequest, reportHash, reportData ):
     funcName = "_plot%s" % reportRequest[ 'reportName' ]
     try:
@@ -146,18 +165,19 @@ class BaseReporter( DBUtils ):
         condDict[ keyword ] = preCondDict[ keyword ]
     #Query!
     timeGrouping = ( "%%s, %s" % groupingFields[0], [ 'startTime' ] + groupingFields[1] )
-    retVal = self._retrieveBucketedData( self._typeName,
-                                          startTime,
-                                          endTime,
-                                          selectFields,
-                                          condDict,
-                                          timeGrouping,
-                                          ( '%s', [ 'startTime' ] )
-                                          )
+    coarsestGranularity = self._getBucketLengthForTime( self._typeName, startTime )
+    retVal = self.__retrieveTimedRows( startTime, endTime, selectFields, condDict, timeGrouping, coarsestGranularity )
     if not retVal[ 'OK' ]:
       return retVal
     dataDict = self._groupByField( 0, retVal[ 'Value' ] )
-    coarsestGranularity = self._getBucketLengthForTime( self._typeName, startTime )
+    if self._useBinnedData and BinnedData is not None:
+      #Transform all the keys at once! None values are taken as 0 when re-binning
+      dataDict = BinnedData.fromBucketsData( coarsestGranularity, dataDict,
+                                             metadataDict[ self._PARAM_CONVERT_TO_GRANULARITY ] == "average",
+                                             metadataDict.get( self._PARAM_CONSOLIDATION_FUNCTION ) )
+      if metadataDict[ self._PARAM_CALCULATE_PROPORTIONAL_GAUGES ]:
+        dataDict = self._calculateProportionalGauges( dataDict )
+      return S_OK( ( dataDict, coarsestGranularity ) )
     #Transform!
     for keyField in dataDict:
       if metadataDict[ self._PARAM_CHECK_FOR_NONE ]:
@@ -172,6 +192,23 @@ class BaseReporter( DBUtils ):
       dataDict = self._calculateProportionalGauges( dataDict )
     return S_OK( ( dataDict, coarsestGranularity ) )
 
+  def __retrieveTimedRows( self, startTime, endTime, selectFields, condDict, timeGrouping, granularity ):
+    """
+    Get the rows of a timed query, the cached rows of the same query for an earlier
+    period are reused so that sliding reports only query the new bins
+    """
+    def retrieveRows( queryStart, queryEnd ):
+      return self._retrieveBucketedData( self._typeName,
+                                         queryStart,
+                                         queryEnd,
+                                         selectFields,
+                                         condDict,
+                                         timeGrouping,
+                                         ( '%s', [ 'startTime' ] )
+                                         )
+    rowsKey = repr( ( self._setup, self._typeName, selectFields, sorted( condDict.items() ), timeGrouping ) )
+    return gDataCache.getTimedRows( rowsKey, startTime, endTime, granularity, retrieveRows )
+
   def _executeConsolidation( self, functor, dataDict ):
     for timeKey in dataDict:
       dataDict[ timeKey ] = [ functor( *dataDict[ timeKey ] ) ]
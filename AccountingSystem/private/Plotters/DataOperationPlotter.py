@@ -7,6 +7,7 @@ class DataOperationPlotter( BaseReporter ):
 
   _typeName = "DataOperation"
   _typeKeyFields = [ dF[0] for dF in DataOperation().definitionKeyFields ]
+  _useBinnedData = True
 
   def _translateGrouping( self, grouping ):
     if grouping == "Channel":
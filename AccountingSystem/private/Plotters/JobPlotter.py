@@ -7,6 +7,7 @@ class JobPlotter( BaseReporter ):
 
   _typeName = "Job"
   _typeKeyFields = [ dF[0] for dF in Job().definitionKeyFields ]
+  _useBinnedData = True
 
   def _translateGrouping( self, grouping ):
     if grouping == "Country":
@@ -7,6 +7,7 @@ class PilotPlotter( BaseReporter ):
 
   _typeName = "Pilot"
   _typeKeyFields = [ dF[0] for dF in Pilot().definitionKeyFields ]
+  _useBinnedData = True
 
   def _reportCumulativeNumberOfJobs( self, reportRequest ):
     selectFields = ( self._getSelectStringForGrouping( reportRequest[ 'groupingFields' ] ) + ", %s, %s, SUM(%s)",
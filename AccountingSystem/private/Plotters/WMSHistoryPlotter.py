@@ -7,6 +7,7 @@ class WMSHistoryPlotter( BaseReporter ):
 
   _typeName = "WMSHistory"
   _typeKeyFields = [ dF[0] for dF in WMSHistory().definitionKeyFields ]
+  _useBinnedData = True
 
   def _translateGrouping( self, grouping ):
     if grouping == "Country":
@@ -0,0 +1,79 @@
+""" Test cases for BinnedData, the array version of the DBUtils report operations
+"""
+
+__RCSID__ = "$Id$"
+
+import copy
+import random
+import unittest
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils, BinnedData
+
+GRANULARITY = 3600
+START_EPOCH = 1300000000
+
+def bucketRows( nRows ):
+  rows = []
+  for _i in range( nRows ):
+    rows.append( [ START_EPOCH + random.randint( 0, 100 ) * 900, random.choice( ( 0, 900, GRANULARITY, 7200, 86400 ) ),
+                   random.random() * 100, random.randint( 1, 10 ), random.choice( ( None, 1, 2.5 ) ) ] )
+  return rows
+
+class BinnedDataTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    random.seed( 5 )
+    self.dbUtils = DBUtils( None, 'Test' )
+    self.dbUtils._arraysThreshold = 0
+    self.groupedRows = dict( [ ( 'Group%d' % i, bucketRows( 50 ) ) for i in range( 5 ) ] )
+    self.fieldsDict = {}
+    for group in self.groupedRows:
+      self.fieldsDict[ group ] = self.dbUtils._sumToGranularity( GRANULARITY, copy.deepcopy( self.groupedRows[ group ] ) )
+
+  def test01rebinning( self ):
+    """ re-binning rows gives the same as the dict version """
+    rows = self.groupedRows[ 'Group0' ]
+    for average in ( False, True ):
+      if average:
+        expected = self.dbUtils._averageToGranularity( GRANULARITY, copy.deepcopy( rows ) )
+      else:
+        expected = self.dbUtils._sumToGranularity( GRANULARITY, copy.deepcopy( rows ) )
+      binnedData = BinnedData.fromBucketsData( GRANULARITY, { 'Group0' : rows }, average )
+      self.assertEqual( binnedData.toDict(), { 'Group0' : expected } )
+    self.assertEqual( BinnedData.fromBucketsData( GRANULARITY, self.groupedRows ).toDict(), self.fieldsDict )
+
+  def test02operations( self ):
+    """ fill, accumulate and max value give the same as the dict version """
+    dataDict = copy.deepcopy( self.fieldsDict )
+    remaining = self.dbUtils.stripDataField( dataDict, 0 )
+    binnedData = BinnedData.fromDict( self.fieldsDict )
+    self.assertEqual( binnedData.stripField( 0 ), remaining )
+    self.assertEqual( binnedData.toDict(), dataDict )
+    endEpoch = START_EPOCH + 30 * GRANULARITY
+    self.dbUtils._fillWithZero( GRANULARITY, START_EPOCH + 10, endEpoch, dataDict )
+    binnedData.fillWithZero( GRANULARITY, START_EPOCH + 10, endEpoch )
+    self.assertEqual( binnedData.toDict(), dataDict )
+    self.dbUtils._accumulate( GRANULARITY, START_EPOCH, endEpoch, dataDict )
+    binnedData.accumulate( GRANULARITY, START_EPOCH, endEpoch )
+    self.assertEqual( binnedData.toDict(), dataDict )
+    self.assertEqual( binnedData.getAccumulationMaxValue(), self.dbUtils._getAccumulationMaxValue( dataDict ) )
+    self.assertEqual( binnedData.getBucketTotals(), self.dbUtils._getBucketTotals( dataDict ) )
+
+  def test03gauges( self ):
+    """ proportional gauges give the same as the dict version """
+    expected = self.dbUtils._calculateProportionalGauges( copy.deepcopy( self.fieldsDict ) )
+    binnedData = BinnedData.fromDict( self.fieldsDict ).calculateProportionalGauges()
+    self.assertEqual( binnedData.toDict(), expected )
+
+  def test04dictInterface( self ):
+    """ groups can be read and set as in a dict """
+    binnedData = BinnedData.fromDict( { 'a' : { 10 : 1.0, 20 : 2.0 }, 'b' : { 20 : 3.0 } } )
+    self.assertEqual( len( binnedData ), 2 )
+    self.assertEqual( sorted( binnedData ), [ 'a', 'b' ] )
+    self.assertEqual( binnedData[ 'b' ], { 20 : 3.0 } )
+    binnedData[ 'Total' ] = { 30 : 4.0 }
+    binnedData[ 'a' ] = { 10 : 5.0 }
+    self.assertEqual( binnedData.toDict(), { 'a' : { 10 : 5.0 }, 'b' : { 20 : 3.0 }, 'Total' : { 30 : 4.0 } } )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( BinnedDataTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
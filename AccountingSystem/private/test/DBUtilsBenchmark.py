@@ -0,0 +1,143 @@
+""" Micro-benchmark of the report post-processing with dicts and with arrays
+
+    Times each DBUtils operation on a synthetic report of nGroups groups over
+    nBins hourly bins, once with the nested dicts and once with the numpy
+    arrays of BinnedData, and checks that both give the same result. The time
+    to build the BinnedData and to turn it back into dicts is shown apart, as
+    the reporters pay it once per report. Run it with:
+
+      python DBUtilsBenchmark.py [ nGroups ] [ nBins ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import types
+import copy
+import random
+
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils, BinnedData
+
+GRANULARITY = 3600
+START_EPOCH = 1300000000
+REPEAT = 3
+#Relative difference allowed between the dict and array results, the sums are not rounded the same way
+TOLERANCE = 1e-9
+
+def bucketRows( nBins ):
+  rows = []
+  for iBin in range( nBins ):
+    bucketLength = random.choice( ( 900, GRANULARITY, GRANULARITY, 86400 ) )
+    rows.append( [ START_EPOCH + iBin * GRANULARITY, bucketLength,
+                   random.random() * 1000, random.randint( 1, 100 ), random.choice( ( None, 1, 2 ) ) ] )
+  return rows
+
+def timeIt( function, data ):
+  best = 0
+  for _i in range( REPEAT ):
+    dataCopy = copy.deepcopy( data )
+    start = time.time()
+    result = function( dataCopy )
+    elapsed = time.time() - start
+    if not best or elapsed < best:
+      best = elapsed
+  return result, best
+
+def asDicts( result ):
+  if isinstance( result, BinnedData ):
+    return result.toDict()
+  if type( result ) == types.TupleType:
+    return tuple( [ asDicts( value ) for value in result ] )
+  return result
+
+def sameResults( first, second ):
+  """ Compare nested dicts, lists and tuples, the numbers within TOLERANCE
+  """
+  if type( first ) == types.DictType and type( second ) == types.DictType:
+    if sorted( first ) != sorted( second ):
+      return False
+    for key in first:
+      if not sameResults( first[ key ], second[ key ] ):
+        return False
+    return True
+  if type( first ) in ( types.ListType, types.TupleType ) and type( second ) in ( types.ListType, types.TupleType ):
+    if len( first ) != len( second ):
+      return False
+    for iPos in range( len( first ) ):
+      if not sameResults( first[ iPos ], second[ iPos ] ):
+        return False
+    return True
+  try:
+    first = float( first )
+    second = float( second )
+  except ( TypeError, ValueError ):
+    return first == second
+  return abs( first - second ) <= TOLERANCE * max( abs( first ), abs( second ) )
+
+def compare( name, function, dictData, arrayData = None ):
+  """ Time function with the dicts and with the arrays, arrayData is the
+      BinnedData version of dictData or None for the list of rows
+  """
+  dictUtils = DBUtils( None, 'Benchmark' )
+  dictUtils._arraysThreshold = 0
+  arrayUtils = DBUtils( None, 'Benchmark' )
+  arrayUtils._arraysThreshold = 1
+  if arrayData is None:
+    arrayData = dictData
+  dictResult, dictTime = timeIt( lambda data: function( dictUtils, data ), dictData )
+  arrayResult, arrayTime = timeIt( lambda data: function( arrayUtils, data ), arrayData )
+  if not sameResults( dictResult, asDicts( arrayResult ) ):
+    print "%s: dict and array results differ!" % name
+  print "%-30s dicts %8.4f s  arrays %8.4f s  speedup %6.1f" % ( name, dictTime, arrayTime,
+                                                                   dictTime / max( arrayTime, 0.000001 ) )
+
+if __name__ == "__main__":
+  if BinnedData is None:
+    print "numpy is not available, reports are processed with the dicts only"
+    sys.exit( 1 )
+  nGroups = 200
+  nBins = 2000
+  if len( sys.argv ) > 1:
+    nGroups = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nBins = int( sys.argv[2] )
+  random.seed( 1 )
+  endEpoch = START_EPOCH + nBins * GRANULARITY
+
+  rows = bucketRows( nBins )
+  compare( "_spanToGranularity", lambda utils, data: utils._spanToGranularity( GRANULARITY, data ), rows )
+  compare( "_sumToGranularity", lambda utils, data: utils._sumToGranularity( GRANULARITY, data ), rows )
+  compare( "_averageToGranularity", lambda utils, data: utils._averageToGranularity( GRANULARITY, data ), rows )
+
+  groupedRows = {}
+  for iGroup in range( nGroups ):
+    groupedRows[ 'Group%d' % iGroup ] = [ row for row in bucketRows( nBins ) if random.random() < 0.7 ]
+  utils = DBUtils( None, 'Benchmark' )
+  utils._arraysThreshold = 0
+  fieldsDict = {}
+  for group in groupedRows:
+    fieldsDict[ group ] = utils._sumToGranularity( GRANULARITY, groupedRows[ group ] )
+  start = time.time()
+  BinnedData.fromBucketsData( GRANULARITY, groupedRows )
+  print "%-30s %8.4f s" % ( "BinnedData.fromBucketsData", time.time() - start )
+  # Same groups order as the dicts, for the sums over the groups to be rounded the same way
+  fieldsArray = BinnedData.fromDict( fieldsDict )
+  compare( "_calculateProportionalGauges", lambda utils, data: utils._calculateProportionalGauges( data ),
+           fieldsDict, fieldsArray )
+  compare( "stripDataField", lambda utils, data: ( utils.stripDataField( data, 0 ), data ), fieldsDict, fieldsArray )
+
+  dataDict = copy.deepcopy( fieldsDict )
+  utils.stripDataField( dataDict, 0 )
+  dataArray = copy.deepcopy( fieldsArray )
+  dataArray.stripField( 0 )
+  compare( "_fillWithZero", lambda utils, data: utils._fillWithZero( GRANULARITY, START_EPOCH, endEpoch, data ),
+           dataDict, dataArray )
+  compare( "_accumulate", lambda utils, data: utils._accumulate( GRANULARITY, START_EPOCH, endEpoch, data ),
+           dataDict, dataArray )
+  compare( "_divideByFactor", lambda utils, data: utils._divideByFactor( data, GRANULARITY ), dataDict, dataArray )
+  compare( "_getAccumulationMaxValue", lambda utils, data: utils._getAccumulationMaxValue( data ), dataDict, dataArray )
+  compare( "_getBucketTotals", lambda utils, data: utils._getBucketTotals( data ), dataDict, dataArray )
+
+  # The reporters turn the BinnedData into dicts once, when the report is done
+  _result, elapsed = timeIt( lambda data: data.toDict(), dataArray )
+  print "%-30s %8.4f s" % ( "BinnedData.toDict", elapsed )
@@ -0,0 +1,63 @@
+""" Test cases for the report data cache
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import threading
+import unittest
+from DIRAC import S_OK
+from DIRAC.AccountingSystem.private.DataCache import DataCache
+
+GRANULARITY = 3600
+END_EPOCH = 1400000000 - 1400000000 % GRANULARITY
+
+class DataCacheTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.cache = DataCache()
+    self.queries = []
+    # One bucket per hour and group, the query start is moved to the next hour as the AccountingDB does
+    self.rows = [ ( group, epoch, GRANULARITY, 1 ) for epoch in range( END_EPOCH - 100 * GRANULARITY, END_EPOCH, GRANULARITY )
+                                                   for group in ( 'A', 'B' ) ]
+
+  def retrieveRows( self, startTime, endTime ):
+    self.queries.append( ( startTime, endTime ) )
+    startTime = startTime - startTime % GRANULARITY + GRANULARITY
+    endTime = endTime - endTime % GRANULARITY + GRANULARITY
+    return S_OK( [ row for row in self.rows if startTime <= row[1] <= endTime ] )
+
+  def test01singleFlight( self ):
+    """ concurrent requests for the same report generate it once """
+    calls = []
+    def generate( reportRequest ):
+      calls.append( reportRequest )
+      time.sleep( 0.2 )
+      return S_OK( { 'data' : { 'A' : { END_EPOCH : 1.0 } } } )
+    results = []
+    threads = [ threading.Thread( target = lambda: results.append( self.cache.getReportData( {}, 'hash', generate ) ) )
+                for _i in range( 5 ) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual( len( calls ), 1 )
+    self.assertEqual( [ result[ 'Value' ] for result in results ], [ results[0][ 'Value' ] ] * 5 )
+
+  def test02partialReuse( self ):
+    """ a sliding window only queries its head and its new bins """
+    startTime = END_EPOCH - 50 * GRANULARITY + 60
+    self.cache.getTimedRows( 'query', startTime, END_EPOCH - 10 * GRANULARITY, GRANULARITY, self.retrieveRows )
+    self.queries = []
+    result = self.cache.getTimedRows( 'query', startTime + 1800, END_EPOCH - 9 * GRANULARITY, GRANULARITY,
+                                      self.retrieveRows )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( len( self.queries ), 2 )
+    self.assert_( self.queries[0][1] - self.queries[0][0] < 3 * GRANULARITY )
+    self.assert_( self.queries[1][1] - self.queries[1][0] < 4 * GRANULARITY )
+    expected = self.retrieveRows( startTime + 1800, END_EPOCH - 9 * GRANULARITY )[ 'Value' ]
+    self.assertEqual( result[ 'Value' ], expected )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( DataCacheTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
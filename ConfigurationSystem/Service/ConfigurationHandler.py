@@ -31,6 +31,10 @@ class ConfigurationHandler( RequestHandler ):
       retDict[ 'data' ] = gServiceInterface.getCompressedConfigurationData()
     return S_OK( retDict )
 
+  types_getConfigurationDelta = [ types.StringType ]
+  def export_getConfigurationDelta( self, sClientVersion ):
+    return S_OK( gServiceInterface.getConfigurationDelta( sClientVersion ) )
+
   types_publishSlaveServer = [ types.StringType ]
   def export_publishSlaveServer( self, sURL ):
     gServiceInterface.publishSlaveServer( sURL )
@@ -29,6 +29,10 @@ class ConfigurationData:
     self.remoteCFG = CFG()
     self.mergedCFG = CFG()
     self.remoteServerList = []
+    #Bounded history of ( fromVersion, toVersion, modifications ) kept by CS servers
+    self.__modificationsHistory = []
+    self.__lastSyncedCFG = None
+    self.__lastSyncedVersion = "0"
     if loadDefaultCFG:
       defaultCFGFile = os.path.join( DIRAC.rootPath, "etc", "dirac.cfg" )
       gLogger.debug( "dirac.cfg should be at", "%s" % defaultCFGFile )
@@ -55,7 +59,76 @@ class ConfigurationData:
     if remoteServers:
       self.remoteServerList.extend( List.fromChar( remoteServers, "," ) )
     self.remoteServerList = List.uniqueElements( self.remoteServerList )
-    self.compressedConfigurationData = zlib.compress( str( self.remoteCFG ), 9 )
+    #Compressed data is only generated when somebody asks for it
+    self.compressedConfigurationData = ""
+    if self._isService:
+      self.__recordModifications()
+
+  def __recordModifications( self ):
+    """
+    Keep the modifications between consecutive versions of the remote CFG
+    so clients can be updated with deltas instead of full dumps
+    PRIVATE USE
+    """
+    #sync may be called while the data is locked, so go directly to the CFG
+    newVersion = self.remoteCFG.getOption( "%s/Version" % self.configurationPath, "0" )
+    if self.__lastSyncedCFG is not None:
+      #The content may change before its new version is generated (updateConfiguration does it),
+      #the baseline only moves when the modifications of a new version are recorded
+      if newVersion == self.__lastSyncedVersion:
+        return
+      modList = self.__lastSyncedCFG.getModifications( self.remoteCFG )
+      self.__modificationsHistory.append( ( self.__lastSyncedVersion, newVersion, modList ) )
+      historySize = max( 1, self.mergedCFG.getOption( "%s/ModificationsHistorySize" % self.configurationPath, 20 ) )
+      if len( self.__modificationsHistory ) > historySize:
+        self.__modificationsHistory = self.__modificationsHistory[ -historySize: ]
+    self.__lastSyncedCFG = self.remoteCFG.clone()
+    self.__lastSyncedVersion = newVersion
+
+  def getModificationsSince( self, version ):
+    """
+    Get the modifications needed to go from a version of the remote CFG to the newest one
+
+    :return: S_OK( ( newestVersion, [ modList, ... ] ) ) / S_ERROR if the version is not in the history
+    """
+    history = list( self.__modificationsHistory )
+    for iPos in range( len( history ) ):
+      if history[ iPos ][0] != version:
+        continue
+      modifications = []
+      lastVersion = version
+      for fromVersion, toVersion, modList in history[ iPos: ]:
+        if fromVersion != lastVersion:
+          return S_ERROR( "Modifications history is not contiguous after version %s" % lastVersion )
+        modifications.append( modList )
+        lastVersion = toVersion
+      return S_OK( ( lastVersion, modifications ) )
+    return S_ERROR( "Version %s is not in the modifications history" % version )
+
+  def applyRemoteModifications( self, modificationsList, newVersion ):
+    """
+    Apply in place a list of modification lists to the remote CFG
+
+    :return: S_OK / S_ERROR. In case of error the version is reset so the next
+             refresh will download the full configuration
+    """
+    result = S_OK()
+    self.lock()
+    try:
+      for modList in modificationsList:
+        result = self.remoteCFG.applyModifications( modList )
+        if not result[ 'OK' ]:
+          break
+    except Exception, e:
+      result = S_ERROR( "Cannot apply modifications: %s" % str( e ) )
+    self.unlock()
+    if result[ 'OK' ] and self.getVersion() != newVersion:
+      result = S_ERROR( "Version after applying modifications is %s instead of %s" % ( self.getVersion(),
+                                                                                       newVersion ) )
+    if not result[ 'OK' ]:
+      self.setVersion( "0" )
+    self.sync()
+    return result
 
   def loadFile( self, fileName ):
     try:
@@ -284,6 +357,8 @@ class ConfigurationData:
     self.sync()
 
   def getCompressedData( self ):
+    if not self.compressedConfigurationData:
+      self.compressedConfigurationData = zlib.compress( str( self.remoteCFG ), 9 )
     return self.compressedConfigurationData
 
   def isMaster( self ):
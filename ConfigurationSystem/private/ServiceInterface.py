@@ -159,6 +159,23 @@ class ServiceInterface( threading.Thread ):
   def getCompressedConfigurationData( self ):
     return gConfigurationData.getCompressedData()
 
+  def getConfigurationDelta( self, sClientVersion ):
+    """
+    Get what a client at a given version needs to update to the newest version.
+    The modifications since the client version are sent if they are still in the
+    history, the full compressed configuration otherwise
+    """
+    sVersion = gConfigurationData.getVersion()
+    retDict = { 'newestVersion' : sVersion }
+    if sClientVersion < sVersion:
+      result = gConfigurationData.getModificationsSince( sClientVersion )
+      if result[ 'OK' ]:
+        retDict[ 'newestVersion' ], retDict[ 'modifications' ] = result[ 'Value' ]
+      else:
+        gLogger.verbose( "Sending full configuration", result[ 'Message' ] )
+        retDict[ 'data' ] = gConfigurationData.getCompressedData()
+    return retDict
+
   def getVersion( self ):
     return gConfigurationData.getVersion()
 
@@ -0,0 +1,76 @@
+""" Test of the configuration updates sent to the clients as deltas
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+
+MASTER_CFG = """
+DIRAC
+{
+  Configuration
+  {
+    Name = Test
+    Version = 2014-01-01 00:00:00.000000
+  }
+}
+Systems
+{
+  WorkloadManagement
+  {
+    MaxJobs = 10
+    Sites = A, B
+  }
+}
+"""
+
+class ConfigurationDeltaTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.master = ConfigurationData( loadDefaultCFG = False )
+    self.master.setAsService()
+    self.master.loadRemoteCFGFromMem( MASTER_CFG )
+    self.client = ConfigurationData( loadDefaultCFG = False )
+    self.client.loadRemoteCFGFromMem( MASTER_CFG )
+
+  def commit( self, changeCFG ):
+    """ What the master does in ServiceInterface.updateConfiguration: the new content
+        is set with the version of the client, then a new version is generated """
+    newCFG = self.master.getRemoteCFG().clone()
+    changeCFG( newCFG )
+    self.master.setRemoteCFG( newCFG )
+    self.master.generateNewVersion()
+
+  def updateClient( self ):
+    result = self.master.getModificationsSince( self.client.getVersion() )
+    self.assert_( result[ 'OK' ] )
+    newVersion, modifications = result[ 'Value' ]
+    result = self.client.applyRemoteModifications( modifications, newVersion )
+    self.assert_( result[ 'OK' ] )
+
+  def test_commitDelta( self ):
+    """ the client updated by delta after a commit has the configuration of the master """
+    def changeCFG( cfg ):
+      cfg[ 'Systems' ][ 'WorkloadManagement' ].setOption( 'MaxJobs', '20' )
+      cfg[ 'Systems' ][ 'WorkloadManagement' ].deleteKey( 'Sites' )
+      cfg[ 'Systems' ].createNewSection( 'DataManagement' )
+      cfg[ 'Systems' ][ 'DataManagement' ].setOption( 'Catalogs', 'FileCatalog' )
+    self.commit( changeCFG )
+    self.updateClient()
+    self.assertEqual( self.client.getRemoteCFG().serialize(), self.master.getRemoteCFG().serialize() )
+
+    def changeAgain( cfg ):
+      cfg[ 'Systems' ][ 'DataManagement' ].setOption( 'Catalogs', 'LcgFileCatalog' )
+    self.commit( changeAgain )
+    self.updateClient()
+    self.assertEqual( self.client.getRemoteCFG().serialize(), self.master.getRemoteCFG().serialize() )
+    self.assertEqual( self.client.getRemoteCFG().getOption( 'Systems/DataManagement/Catalogs' ), 'LcgFileCatalog' )
+
+  def test_unknownVersion( self ):
+    """ a version out of the history cannot be updated by delta """
+    self.assertFalse( self.master.getModificationsSince( 'unknown' )[ 'OK' ] )
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( ConfigurationDeltaTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( suite )
@@ -72,9 +72,18 @@ class DB( MySQL ):
     result = gConfig.getOption( self.cs_path + '/MaxQueueSize' )
     if result['OK']:
       self.maxQueueSize = int( result['Value'] )
+    # Hard limit of connections to the DB server, 0 means no limit
+    self.maxConnections = 0
+    result = gConfig.getOption( self.cs_path + '/MaxConnections' )
+    if not result['OK']:
+      # No individual limit found, try at the common place
+      result = gConfig.getOption( '/Systems/Databases/MaxConnections' )
+    if result['OK']:
+      self.maxConnections = int( result['Value'] )
 
     MySQL.__init__( self, self.dbHost, self.dbUser, self.dbPass,
-                   self.dbName, self.dbPort, maxQueueSize = maxQueueSize, debug = debug )
+                   self.dbName, self.dbPort, maxQueueSize = maxQueueSize, debug = debug,
+                   maxConnections = self.maxConnections )
 
     if not self._connected:
       raise RuntimeError( 'Can not connect to DB %s, exiting...' % self.dbName )
@@ -88,6 +97,7 @@ class DB( MySQL ):
     #self.log.info("Password:       "+self.dbPass)
     self.log.info( "DBName:         " + self.dbName )
     self.log.info( "MaxQueue:       " + str( self.maxQueueSize ) )
+    self.log.info( "MaxConnections: " + str( self.maxConnections ) )
     self.log.info( "==================================================" )
 
 #############################################################################
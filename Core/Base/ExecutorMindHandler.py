@@ -12,6 +12,10 @@ class ExecutorMindHandler( RequestHandler ):
   MSG_DEFINITIONS = { 'ProcessTask' : { 'taskId' : ( types.IntType, types.LongType ),
                                         'taskStub' : types.StringType,
                                         'eType' : types.StringType },
+                      'ProcessTasks' : { 'taskIds' : ( types.ListType, types.TupleType ),
+                                         'taskStubs' : ( types.ListType, types.TupleType ),
+                                         'eType' : types.StringType },
+                      'TasksDone' : { 'results' : ( types.ListType, types.TupleType ) },
                       'TaskDone' : { 'taskId' : ( types.IntType, types.LongType ),
                                      'taskStub' : types.StringType },
                       'TaskFreeze' : { 'taskId' : ( types.IntType, types.LongType ),
@@ -27,8 +31,10 @@ class ExecutorMindHandler( RequestHandler ):
 
   class MindCallbacks( ExecutorDispatcherCallbacks ):
 
-    def __init__( self, sendTaskCB, dispatchCB, disconnectCB, taskProcCB, taskFreezeCB, taskErrCB ):
+    def __init__( self, sendTaskCB, dispatchCB, disconnectCB, taskProcCB, taskFreezeCB, taskErrCB,
+                  sendTasksCB = None ):
       self.__sendTaskCB = sendTaskCB
+      self.__sendTasksCB = sendTasksCB
       self.__dispatchCB = dispatchCB
       self.__disconnectCB = disconnectCB
       self.__taskProcDB = taskProcCB
@@ -39,6 +45,11 @@ class ExecutorMindHandler( RequestHandler ):
     def cbSendTask( self, taskId, taskObj, eId, eType ):
       return self.__sendTaskCB( taskId, taskObj, eId, eType )
 
+    def cbSendTasks( self, tasks, eId, eType ):
+      if not self.__sendTasksCB:
+        return ExecutorDispatcherCallbacks.cbSendTasks( self, tasks, eId, eType )
+      return self.__sendTasksCB( tasks, eId, eType )
+
     def cbDispatch( self, taskId, taskObj, pathExecuted ):
       return self.__dispatchCB( taskId, taskObj, pathExecuted )
 
@@ -67,7 +78,8 @@ class ExecutorMindHandler( RequestHandler ):
                                                          cls.__execDisconnected,
                                                          cls.exec_taskProcessed,
                                                          cls.exec_taskFreeze,
-                                                         cls.exec_taskError )
+                                                         cls.exec_taskError,
+                                                         cls.__sendTasks )
     cls.__eDispatch.setCallbacks( cls.__callbacks )
     cls.__allowedClients = []
     if cls.log.shown( "VERBOSE" ):
@@ -82,7 +94,7 @@ class ExecutorMindHandler( RequestHandler ):
     cls.__allowedClients = aClients
 
   @classmethod
-  def __sendTask( self, taskId, taskObj, eId, eType ):
+  def __prepareTaskStub( self, taskId, taskObj, eId ):
     try:
       result = self.exec_prepareToSend( taskId, taskObj, eId )
       if not result[ 'OK' ]:
@@ -90,6 +102,10 @@ class ExecutorMindHandler( RequestHandler ):
     except Exception, excp:
       gLogger.exception( "Exception while executing prepareToSend: %s" % str( excp ) )
       return S_ERROR( "Cannot presend task" )
+    return self.__serializeTask( taskId, taskObj )
+
+  @classmethod
+  def __serializeTask( self, taskId, taskObj ):
     try:
       result = self.exec_serializeTask( taskObj )
     except Exception, excp:
@@ -97,6 +113,11 @@ class ExecutorMindHandler( RequestHandler ):
       return S_ERROR( "Cannot serialize task %s: %s" % ( taskId, str( excp ) ) )
     if not isReturnStructure( result ):
       raise Exception( "exec_serializeTask does not return a return structure" )
+    return result
+
+  @classmethod
+  def __sendTask( self, taskId, taskObj, eId, eType ):
+    result = self.__prepareTaskStub( taskId, taskObj, eId )
     if not result[ 'OK' ]:
       return result
     taskStub = result[ 'Value' ]
@@ -109,6 +130,32 @@ class ExecutorMindHandler( RequestHandler ):
     msgObj.eType = eType
     return self.srv_msgSend( eId, msgObj )
 
+  @classmethod
+  def __sendTasks( self, tasks, eId, eType ):
+    try:
+      result = self.exec_prepareToSendTasks( tasks, eId )
+      if not result[ 'OK' ]:
+        return result
+    except Exception, excp:
+      gLogger.exception( "Exception while executing prepareToSendTasks: %s" % str( excp ) )
+      return S_ERROR( "Cannot presend tasks" )
+    taskIds = []
+    taskStubs = []
+    for taskId, taskObj in tasks:
+      result = self.__serializeTask( taskId, taskObj )
+      if not result[ 'OK' ]:
+        return result
+      taskIds.append( taskId )
+      taskStubs.append( result[ 'Value' ] )
+    result = self.srv_msgCreate( "ProcessTasks" )
+    if not result[ 'OK' ]:
+      return result
+    msgObj = result[ 'Value' ]
+    msgObj.taskIds = taskIds
+    msgObj.taskStubs = taskStubs
+    msgObj.eType = eType
+    return self.srv_msgSend( eId, msgObj )
+
   @classmethod
   def __execDisconnected( cls, trid ):
     result = cls.srv_disconnectClient( trid )
@@ -134,7 +181,11 @@ class ExecutorMindHandler( RequestHandler ):
       numTasks = max( 1, int( kwargs[ 'maxTasks' ] ) )
     except:
       numTasks = 1
-    self.__eDispatch.addExecutor( trid, kwargs[ 'executorTypes' ] )
+    try:
+      batchSize = max( 1, int( kwargs[ 'batchSize' ] ) )
+    except:
+      batchSize = 1
+    self.__eDispatch.addExecutor( trid, kwargs[ 'executorTypes' ], numTasks, batchSize )
     return self.exec_executorConnected( trid, kwargs[ 'executorTypes' ] )
 
   auth_conn_drop = [ 'all' ]
@@ -142,16 +193,20 @@ class ExecutorMindHandler( RequestHandler ):
     self.__eDispatch.removeExecutor( trid )
     return S_OK()
 
-  auth_msg_TaskDone = [ 'all' ]
-  def msg_TaskDone( self, msgObj ):
-    taskId = msgObj.taskId
+  def __deserializeTaskStub( self, taskId, taskStub ):
     try:
-      result = self.exec_deserializeTask( msgObj.taskStub )
+      result = self.exec_deserializeTask( taskStub )
     except Exception, excp:
       gLogger.exception( "Exception while deserializing task %s" % taskId )
       return S_ERROR( "Cannot deserialize task %s: %s" % ( taskId, str( excp ) ) )
     if not isReturnStructure( result ):
       raise Exception( "exec_deserializeTask does not return a return structure" )
+    return result
+
+  auth_msg_TaskDone = [ 'all' ]
+  def msg_TaskDone( self, msgObj ):
+    taskId = msgObj.taskId
+    result = self.__deserializeTaskStub( taskId, msgObj.taskStub )
     if not result[ 'OK' ]:
       return result
     taskObj = result[ 'Value' ]
@@ -163,13 +218,7 @@ class ExecutorMindHandler( RequestHandler ):
   auth_msg_TaskFreeze = [ 'all' ]
   def msg_TaskFreeze( self, msgObj ):
     taskId = msgObj.taskId
-    try:
-      result = self.exec_deserializeTask( msgObj.taskStub )
-    except Exception, excp:
-      gLogger.exception( "Exception while deserializing task %s" % taskId )
-      return S_ERROR( "Cannot deserialize task %s: %s" % ( taskId, str( excp ) ) )
-    if not isReturnStructure( result ):
-      raise Exception( "exec_deserializeTask does not return a return structure" )
+    result = self.__deserializeTaskStub( taskId, msgObj.taskStub )
     if not result[ 'OK' ]:
       return result
     taskObj = result[ 'Value' ]
@@ -182,22 +231,55 @@ class ExecutorMindHandler( RequestHandler ):
   auth_msg_TaskError = [ 'all' ]
   def msg_TaskError( self, msgObj ):
     taskId = msgObj.taskId
-    try:
-      result = self.exec_deserializeTask( msgObj.taskStub )
-    except Exception, excp:
-      gLogger.exception( "Exception while deserializing task %s" % taskId )
-      return S_ERROR( "Cannot deserialize task %s: %s" % ( taskId, str( excp ) ) )
-    if not isReturnStructure( result ):
-      raise Exception( "exec_deserializeTask does not return a return structure" )
+    result = self.__deserializeTaskStub( taskId, msgObj.taskStub )
     if not result[ 'OK' ]:
       return result
     taskObj = result[ 'Value' ]
+    return self.__taskError( msgObj.taskId, taskObj, msgObj.errorMsg )
+
+  def __taskError( self, taskId, taskObj, errorMsg ):
     #TODO: Check the executor has privileges over the task
-    self.__eDispatch.removeTask( msgObj.taskId )
+    self.__eDispatch.removeTask( taskId )
     try:
-      self.exec_taskError( msgObj.taskId, taskObj, msgObj.errorMsg )
+      self.exec_taskError( taskId, taskObj, errorMsg )
     except:
-      gLogger.exception( "Exception when processing task %s" % msgObj.taskId )
+      gLogger.exception( "Exception when processing task %s" % taskId )
+    return S_OK()
+
+  auth_msg_TasksDone = [ 'all' ]
+  def msg_TasksDone( self, msgObj ):
+    """ Results of a batch of tasks, a list of ( taskId, msgName, taskStub, extra )
+        where msgName is the message the task would have been sent back with alone
+        and extra the freeze time or error message. The executor gets the next batch
+        once all the results are processed
+    """
+    eId = self.srv_getTransportID()
+    self.__eDispatch.holdExecutor( eId )
+    try:
+      results = []
+      for taskId, msgName, taskStub, extra in msgObj.results:
+        result = self.__deserializeTaskStub( taskId, taskStub )
+        if not result[ 'OK' ]:
+          gLogger.error( "Cannot process task %s: %s" % ( taskId, result[ 'Message' ] ) )
+          self.__eDispatch.retryTask( eId, taskId )
+          continue
+        results.append( ( taskId, msgName, result[ 'Value' ], extra ) )
+      try:
+        self.exec_tasksDone( dict( [ ( taskId, taskObj ) for taskId, msgName, taskObj, _extra in results
+                                     if msgName in ( "TaskDone", "TaskFreeze" ) ] ) )
+      except Exception:
+        gLogger.exception( "Exception while executing tasksDone" )
+      for taskId, msgName, taskObj, extra in results:
+        if msgName == "TaskDone":
+          result = self.__eDispatch.taskProcessed( eId, taskId, taskObj )
+        elif msgName == "TaskFreeze":
+          result = self.__eDispatch.freezeTask( eId, taskId, extra, taskObj )
+        else:
+          result = self.__taskError( taskId, taskObj, extra )
+        if not result[ 'OK' ]:
+          gLogger.error( "There was a problem with task %s: %s" % ( taskId, result[ 'Message' ] ) )
+    finally:
+      self.__eDispatch.releaseExecutor( eId )
     return S_OK()
 
   auth_msg_ExecutorError = [ 'all' ]
@@ -249,6 +331,23 @@ class ExecutorMindHandler( RequestHandler ):
   def exec_prepareToSend( cls, taskId, taskObj, eId ):
     return S_OK()
 
+  @classmethod
+  def exec_prepareToSendTasks( cls, tasks, eId ):
+    """ Same as exec_prepareToSend for a batch of ( taskId, taskObj ) tasks
+    """
+    for taskId, taskObj in tasks:
+      result = cls.exec_prepareToSend( taskId, taskObj, eId )
+      if not result[ 'OK' ]:
+        return result
+    return S_OK()
+
+  @classmethod
+  def exec_tasksDone( cls, taskObjs ):
+    """ Called with { taskId : taskObj } for the tasks of a batch that are done or
+        frozen before they are processed one by one, ie to save them in bulk
+    """
+    return S_OK()
+
   ########
   #  Methods to be used by the real services
   ########
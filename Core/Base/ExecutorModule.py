@@ -30,6 +30,9 @@ class ExecutorModule( object ):
                                                        *exeName.split( "/" ) )
     cls.__defaults[ 'ReconnectRetries' ] = 10
     cls.__defaults[ 'ReconnectSleep' ] = 5
+    cls.__defaults[ 'MaxTasks' ] = 1
+    #Tasks received from the mind in one message, and processed with processTasks
+    cls.__defaults[ 'BatchSize' ] = 1
     cls.__properties[ 'shifterProxy' ] = ''
     cls.__properties[ 'shifterProxyLocation' ] = os.path.join( cls.__defaults[ 'WorkDirectory' ],
                                                                '.shifterCred' )
@@ -136,6 +139,9 @@ class ExecutorModule( object ):
       return result
     #Execute!
     result = self.processTask( taskId, taskObj )
+    return self.__taskResult( taskId, taskObj, result )
+
+  def __taskResult( self, taskId, taskObj, result ):
     if not isReturnStructure( result ):
       raise Exception( "processTask does not return a return structure" )
     if not result[ 'OK' ]:
@@ -161,18 +167,60 @@ class ExecutorModule( object ):
     #EOP
     return S_OK( ( taskStub, self.__freezeTime, fastTrackType ) )
 
+  def _ex_processTasks( self, taskIds, taskStubs ):
+    """ Process a batch of tasks, returns S_OK( [ ( taskId, result ), ... ] ) with
+        the result of each task as given by _ex_processTask
+    """
+    results = {}
+    tasks = []
+    self.__taskStates = {}
+    for taskId, taskStub in zip( taskIds, taskStubs ):
+      self.log.verbose( "Task %s: Received" % str( taskId ) )
+      result = self.__deserialize( taskId, taskStub )
+      if not result[ 'OK' ]:
+        self.log.error( "Task %s: Cannot deserialize: %s" % ( str( taskId ), result[ 'Message' ] ) )
+        results[ taskId ] = result
+        continue
+      tasks.append( ( taskId, result[ 'Value' ] ) )
+      self.__taskStates[ taskId ] = [ 0, True ]
+    if tasks:
+      #Shifter proxy?
+      result = self.__installShifterProxy()
+      if not result[ 'OK' ]:
+        return result
+      #Execute!
+      result = self.processTasks( tasks )
+      if not isReturnStructure( result ):
+        raise Exception( "processTasks does not return a return structure" )
+      for taskId, taskObj in tasks:
+        if not result[ 'OK' ]:
+          results[ taskId ] = result
+          continue
+        self.__freezeTime, self.__fastTrackEnabled = self.__taskStates[ taskId ]
+        taskResult = result[ 'Value' ].get( taskId, S_ERROR( "Task %s was not processed" % taskId ) )
+        results[ taskId ] = self.__taskResult( taskId, taskObj, taskResult )
+    return S_OK( [ ( taskId, results[ taskId ] ) for taskId in taskIds ] )
+
   ####
   # Callable functions
   ####
 
-  def freezeTask( self, freezeTime ):
-    self.__freezeTime = freezeTime
+  def freezeTask( self, freezeTime, taskId = None ):
+    """ Freeze the task being processed, or taskId of the batch given to processTasks
+    """
+    if taskId is None:
+      self.__freezeTime = freezeTime
+    else:
+      self.__taskStates[ taskId ][0] = freezeTime
 
   def isTaskFrozen( self ):
     return self.__freezeTime
 
-  def disableFastTrackForTask( self ):
-    self.__fastTrackEnabled = True
+  def disableFastTrackForTask( self, taskId = None ):
+    if taskId is None:
+      self.__fastTrackEnabled = True
+    else:
+      self.__taskStates[ taskId ][1] = False
 
   ###
   #  Fast-track tasks
@@ -194,3 +242,20 @@ class ExecutorModule( object ):
   def processTask( self, taskId, taskObj ):
     raise Exception( "Method processTask has to be coded!" )
 
+  ####
+  # Can be overwritten to process the tasks of a batch together
+  ####
+
+  def processTasks( self, tasks ):
+    """ Process a batch of [ ( taskId, taskObj ), ... ], returns S_OK( { taskId : result } )
+        with the result that processTask would give for each task. By default the tasks
+        are processed one by one with processTask
+    """
+    taskResults = {}
+    for taskId, taskObj in tasks:
+      self.__freezeTime = 0
+      self.__fastTrackEnabled = True
+      taskResults[ taskId ] = self.processTask( taskId, taskObj )
+      self.__taskStates[ taskId ] = [ self.__freezeTime, self.__fastTrackEnabled ]
+    return S_OK( taskResults )
+
@@ -46,6 +46,7 @@ class ExecutorReactor( object ):
       self.__mindName = mindName
       self.__modules = {}
       self.__maxTasks = 1
+      self.__batchSize = 1
       self.__reconnectSleep = 1
       self.__reconnectRetries = 10
       self.__extraArgs = {}
@@ -58,7 +59,9 @@ class ExecutorReactor( object ):
 
     def addModule( self, name, exeClass ):
       self.__modules[ name ] = exeClass
-      self.__maxTasks = max( self.__maxTasks, exeClass.ex_getOption( "MaxTasks" ) )
+      self.__batchSize = max( self.__batchSize, exeClass.ex_getOption( "BatchSize" ) )
+      #Room for a whole batch
+      self.__maxTasks = max( self.__maxTasks, exeClass.ex_getOption( "MaxTasks" ), self.__batchSize )
       self.__reconnectSleep = max( self.__reconnectSleep, exeClass.ex_getOption( "ReconnectSleep" ) )
       self.__reconnectRetries = max( self.__reconnectRetries, exeClass.ex_getOption( "ReconnectRetries" ) )
       self.__extraArgs[ name ] = exeClass.ex_getExtraArguments()
@@ -66,9 +69,11 @@ class ExecutorReactor( object ):
     def connect( self ):
       self.__msgClient = MessageClient( self.__mindName )
       self.__msgClient.subscribeToMessage( 'ProcessTask', self.__processTask )
+      self.__msgClient.subscribeToMessage( 'ProcessTasks', self.__processTasks )
       self.__msgClient.subscribeToDisconnect( self.__disconnected )
       result = self.__msgClient.connect( executorTypes = list( self.__modules.keys() ),
                                          maxTasks = self.__maxTasks,
+                                         batchSize = self.__batchSize,
                                          extraArgs = self.__extraArgs )
       if result[ 'OK' ]:
         self.__aliveLock.alive()
@@ -81,6 +86,7 @@ class ExecutorReactor( object ):
         gLogger.notice( "Trying to reconnect to %s" % self.__mindName )
         result = self.__msgClient.connect( executorTypes = list( self.__modules.keys() ),
                                            maxTasks = self.__maxTasks,
+                                           batchSize = self.__batchSize,
                                            extraArgs = self.__extraArgs )
 
         if result[ 'OK' ]:
@@ -154,6 +160,67 @@ class ExecutorReactor( object ):
         msgObj.freezeTime = extra
       return self.__msgClient.sendMessage( msgObj )
 
+    def __processTasks( self, msgObj ):
+      eType = msgObj.eType
+      taskIds = msgObj.taskIds
+
+      result = self.__moduleProcessTasks( eType, taskIds, msgObj.taskStubs )
+      if not result[ 'OK' ]:
+        return self.__sendExecutorError( eType, taskIds[0], result[ 'Message' ] )
+      taskResults = result[ 'Value' ]
+
+      result = self.__msgClient.createMessage( "TasksDone" )
+      if not result[ 'OK' ]:
+        return self.__sendExecutorError( eType, taskIds[0], "Can't generate TasksDone message: %s" % result[ 'Message' ] )
+      gLogger.verbose( "Tasks %s: Sending TasksDone" % ", ".join( [ str( taskId ) for taskId in taskIds ] ) )
+      msgObj = result[ 'Value' ]
+      msgObj.results = taskResults
+      return self.__msgClient.sendMessage( msgObj )
+
+    def __moduleProcessTasks( self, eType, taskIds, taskStubs, fastTrackLevel = 0 ):
+      """ Process a batch with one module instance, returns the list of
+          ( taskId, msgName, taskStub, extra ) to send back to the mind.
+          The tasks fast tracked to the same executor go on together
+      """
+      result = self.__getInstance( eType )
+      if not result[ 'OK' ]:
+        return result
+      modInstance = result[ 'Value' ]
+      try:
+        result = modInstance._ex_processTasks( taskIds, taskStubs )
+      except Exception, excp:
+        gLogger.exception( "Error while processing tasks %s" % ", ".join( [ str( taskId ) for taskId in taskIds ] ) )
+        return S_ERROR( "Error processing tasks: %s" % excp )
+
+      self.__storeInstance( eType, modInstance )
+
+      if not result[ 'OK' ]:
+        return result
+      taskResults = {}
+      fastTracks = {}
+      for ( taskId, taskResult ), taskStub in zip( result[ 'Value' ], taskStubs ):
+        if not taskResult[ 'OK' ]:
+          taskResults[ taskId ] = ( taskId, 'TaskError', taskStub, "Error: %s" % taskResult[ 'Message' ] )
+          continue
+        taskStub, freezeTime, fastTrackType = taskResult[ 'Value' ]
+        if freezeTime:
+          taskResults[ taskId ] = ( taskId, "TaskFreeze", taskStub, freezeTime )
+          continue
+        if fastTrackType:
+          if fastTrackLevel < 10 and fastTrackType in self.__modules:
+            fastTracks.setdefault( fastTrackType, [] ).append( ( taskId, taskStub ) )
+            continue
+          gLogger.notice( "Stopping %s fast track. Sending back to the mind" % ( taskId ) )
+        taskResults[ taskId ] = ( taskId, "TaskDone", taskStub, True )
+      for fastTrackType, tasks in fastTracks.items():
+        gLogger.notice( "Fast tracking %s tasks to %s" % ( len( tasks ), fastTrackType ) )
+        result = self.__moduleProcessTasks( fastTrackType, [ task[0] for task in tasks ], [ task[1] for task in tasks ],
+                                            fastTrackLevel + 1 )
+        if not result[ 'OK' ]:
+          return result
+        for taskResult in result[ 'Value' ]:
+          taskResults[ taskResult[0] ] = taskResult
+      return S_OK( [ taskResults[ taskId ] for taskId in taskIds ] )
 
     def __moduleProcess( self, eType, taskId, taskStub, fastTrackLevel = 0 ):
       result = self.__getInstance( eType )
@@ -0,0 +1,78 @@
+""" Test cases for the batch processing of the ExecutorReactor
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Base.ExecutorReactor import ExecutorReactor
+
+class FakeExecutor( object ):
+  """ Executor module processing tasks as told by the RESULTS of its class,
+      a dict taskId -> ( freezeTime, fastTrackType ) or an error message
+  """
+
+  RESULTS = {}
+  PROCESSED = []
+
+  @classmethod
+  def ex_getOption( cls, optName ):
+    return { 'BatchSize' : 10, 'MaxTasks' : 10 }.get( optName, 1 )
+
+  @classmethod
+  def ex_getExtraArguments( cls ):
+    return {}
+
+  def _ex_processTasks( self, taskIds, taskStubs ):
+    self.PROCESSED.append( ( self.__class__.__name__, list( taskIds ) ) )
+    results = []
+    for taskId, taskStub in zip( taskIds, taskStubs ):
+      result = self.RESULTS.get( taskId, ( 0, False ) )
+      if type( result ) == type( "" ):
+        results.append( ( taskId, S_ERROR( result ) ) )
+        continue
+      freezeTime, fastTrackType = result
+      results.append( ( taskId, S_OK( ( "%s+%s" % ( taskStub, self.__class__.__name__ ), freezeTime, fastTrackType ) ) ) )
+    return S_OK( results )
+
+class ExecA( FakeExecutor ):
+  RESULTS = {}
+
+class ExecB( FakeExecutor ):
+  RESULTS = {}
+
+class ExecutorReactorBatchCase( unittest.TestCase ):
+
+  def setUp( self ):
+    del FakeExecutor.PROCESSED[:]
+    ExecA.RESULTS = { 2 : ( 0, 'ExecB' ), 3 : ( 30, False ), 4 : "Broken", 5 : ( 0, 'ExecB' ), 6 : ( 0, 'Unknown' ) }
+    ExecB.RESULTS = { 5 : ( 60, False ) }
+    self.cluster = ExecutorReactor.MindCluster( "Framework/FakeMind", ExecutorReactor.AliveLock() )
+    self.cluster.addModule( 'ExecA', ExecA )
+    self.cluster.addModule( 'ExecB', ExecB )
+
+  def test01fastTrackInBatch( self ):
+    """ results keep the order of the batch and fast tracked tasks go on together """
+    taskIds = [ 1, 2, 3, 4, 5, 6 ]
+    result = self.cluster._MindCluster__moduleProcessTasks( 'ExecA', taskIds, [ "t%s" % i for i in taskIds ] )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( result[ 'Value' ], [ ( 1, "TaskDone", "t1+ExecA", True ),
+                                           ( 2, "TaskDone", "t2+ExecA+ExecB", True ),
+                                           ( 3, "TaskFreeze", "t3+ExecA", 30 ),
+                                           ( 4, "TaskError", "t4", "Error: Broken" ),
+                                           ( 5, "TaskFreeze", "t5+ExecA+ExecB", 60 ),
+                                           ( 6, "TaskDone", "t6+ExecA", True ) ] )
+    self.assertEqual( FakeExecutor.PROCESSED, [ ( 'ExecA', taskIds ), ( 'ExecB', [ 2, 5 ] ) ] )
+
+  def test02fastTrackLoop( self ):
+    """ a fast track back and forth stops after 10 hops and goes back to the mind """
+    ExecB.RESULTS = { 7 : ( 0, 'ExecA' ) }
+    ExecA.RESULTS = { 7 : ( 0, 'ExecB' ) }
+    result = self.cluster._MindCluster__moduleProcessTasks( 'ExecA', [ 7 ], [ "t7" ] )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( len( FakeExecutor.PROCESSED ), 11 )
+    self.assertEqual( [ taskResult[:2] for taskResult in result[ 'Value' ] ], [ ( 7, "TaskDone" ) ] )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( ExecutorReactorBatchCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -10,6 +10,8 @@ from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.Core.DISET.private.MessageBroker import getGlobalMessageBroker
 from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.ActionProfiler import getCallProfile
+from DIRAC.Core.Security import Properties
 import DIRAC
 
 def getServiceOption( serviceInfo, optionName, defaultValue ):
@@ -56,7 +58,7 @@ class RequestHandler( object ):
     pass
 
   @classmethod
-  def _rh__initializeClass( cls, serviceInfoDict, lockManager, msgBroker, monitor ):
+  def _rh__initializeClass( cls, serviceInfoDict, lockManager, msgBroker, monitor, profiler = None ):
     """
     Class initialization (not to be called by hand or overwritten!!)
 
@@ -66,6 +68,8 @@ class RequestHandler( object ):
     @param msgBroker: Message delivery
     @type lockManager: object
     @param lockManager: Lock manager to use
+    @type profiler: object
+    @param profiler: ActionProfiler of the service or None if it's not profiled
     """
     cls.__srvInfoDict = serviceInfoDict
     cls.__svcName = cls.__srvInfoDict[ 'serviceName' ]
@@ -73,6 +77,7 @@ class RequestHandler( object ):
     cls.__msgBroker = msgBroker
     cls.__trPool = msgBroker.getTransportPool()
     cls.__monitor = monitor
+    cls.__profiler = profiler
     cls.log = gLogger
 
   def getRemoteAddress( self ):
@@ -130,7 +135,14 @@ class RequestHandler( object ):
       gLogger.error( message )
       retVal = S_ERROR( message )
     self.__logRemoteQueryResponse( retVal, time.time() - startTime )
-    return self.__trPool.send( self.__trid, retVal )
+    callProfile = getCallProfile()
+    if not callProfile:
+      return self.__trPool.send( self.__trid, retVal )
+    callProfile.ok = retVal[ 'OK' ]
+    encodeStart = time.time()
+    result = self.__trPool.send( self.__trid, retVal )
+    callProfile.addPhaseTime( 'encode', time.time() - encodeStart )
+    return result
 
 #####
 #
@@ -221,10 +233,14 @@ class RequestHandler( object ):
     @param method: Method to execute
     @return: S_OK/S_ERROR
     """
+    decodeStart = time.time()
     retVal = self.__trPool.receive( self.__trid )
     if not retVal[ 'OK' ]:
       raise RequestHandler.ConnectionError( "Error while receiving arguments %s %s" % ( self.srv_getFormattedRemoteCredentials(),
                                                                          retVal[ 'Message' ] ) )
+    callProfile = getCallProfile()
+    if callProfile:
+      callProfile.addPhaseTime( 'decode', time.time() - decodeStart )
     args = retVal[ 'Value' ]
     self.__logRemoteQuery( "RPC/%s" % method, args )
     return self.__RPCCallFunction( method, args )
@@ -245,8 +261,14 @@ class RequestHandler( object ):
                                      idleRead = True )
     try:
       try:
-        uReturnValue = oMethod( *args )
-        return uReturnValue
+        callProfile = getCallProfile()
+        if not callProfile:
+          return oMethod( *args )
+        executeStart = time.time()
+        try:
+          return callProfile.runProfiled( oMethod, *args )
+        finally:
+          callProfile.addPhaseTime( 'execute', time.time() - executeStart )
       finally:
         self.__lockManager.unlock( "RPC/%s" % method )
         self.__msgBroker.removeTransport( self.__trid, closeTransport = False )
@@ -471,6 +493,41 @@ class RequestHandler( object ):
 
     return S_OK( dInfo )
 
+####
+#
+#  Profiling methods
+#
+####
+
+  types_getProfilingData = []
+  auth_getProfilingData = [ Properties.SERVICE_ADMINISTRATOR ]
+  def export_getProfilingData( self, reset = False ):
+    """
+    Get the latency, time per phase and SQL time of each action and the profiles
+    of the slowest sampled calls, optionally starting a new profiling period
+    """
+    if not self.__profiler:
+      return S_ERROR( "Profiling is not enabled in %s" % self.__svcName )
+    data = self.__profiler.getData()
+    if reset:
+      self.__profiler.reset()
+    return S_OK( data )
+
+  types_dumpProfilingData = []
+  auth_dumpProfilingData = [ Properties.SERVICE_ADMINISTRATOR ]
+  def export_dumpProfilingData( self ):
+    """
+    Write the profiling data in the ProfilingDumpFile of the service for offline analysis
+    """
+    if not self.__profiler:
+      return S_ERROR( "Profiling is not enabled in %s" % self.__svcName )
+    fileName = self.srv_getCSOption( "ProfilingDumpFile", "%s.profile" % self.__svcName.replace( "/", "_" ) )
+    try:
+      self.__profiler.dump( fileName )
+    except IOError, excp:
+      return S_ERROR( "Cannot write %s: %s" % ( fileName, excp ) )
+    return S_OK( os.path.abspath( fileName ) )
+
 ####
 #
 #  Utilities methods
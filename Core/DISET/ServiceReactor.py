@@ -16,6 +16,7 @@ from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC.Core.Utilities import Network, Time
 from DIRAC.Core.Base.private.ModuleLoader import ModuleLoader
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
+from DIRAC.Core.DISET.private.EventLoop import EventLoop
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client import PathFinder
 
@@ -35,6 +36,8 @@ class ServiceReactor:
     self.__maxFD = 0
     self.__listeningConnections = {}
     self.__stats = ReactorStats()
+    self.__eventLoop = None
+    self.__pendingConnections = {}
 
   def initialize( self, servicesList ):
     try:
@@ -52,6 +55,16 @@ class ServiceReactor:
     for serviceName in self.__serviceModules:
       self.__services[ serviceName ] = Service( self.__serviceModules[ serviceName ] )
 
+    #Use the event driven reactor if any service requests it
+    for serviceName in self.__services:
+      if self.__services[ serviceName ].getConfig().useEventDrivenReactor():
+        gLogger.info( "Using event driven reactor" )
+        self.__eventLoop = EventLoop( "Reactor" )
+        break
+    if self.__eventLoop:
+      for serviceName in self.__services:
+        self.__services[ serviceName ].setEventLoop( self.__eventLoop )
+
     #Loop again to include the GW in case there is one (included in the __init__)
     for serviceName in self.__services:
       gLogger.info( "Initializing %s" % serviceName )
@@ -116,9 +129,85 @@ class ServiceReactor:
           p = multiprocessing.Process( target = self.__startCloneProcess, args = ( svcName, i ) )
           p.start()
           gLogger.always( "Started clone process %s for %s" % ( i, svcName ) )
+    if self.__eventLoop:
+      return self.__serveEventDriven()
     while self.__alive:
       self.__acceptIncomingConnection()
 
+  #Event driven reactor: the same loop accepts connections, waits for the clients
+  #to start talking and listens to the persistent (message) connections
+  def __serveEventDriven( self ):
+    gLogger.info( "Event driven reactor using %s" % self.__eventLoop.getBackend() )
+    for svcName in self.__listeningConnections:
+      self.__eventLoop.register( self.__listeningConnections[ svcName ][ 'socket' ],
+                                 lambda sock, svcName = svcName : self.__acceptEventDriven( svcName ) )
+    self.__eventLoop.addPeriodicCallback( 1, self.__purgePendingConnections )
+    self.__eventLoop.addPeriodicCallback( 60, self.__renewServerContexts )
+    while self.__alive:
+      self.__eventLoop.runOnce( 1 )
+    return S_OK()
+
+  def __acceptEventDriven( self, svcName ):
+    try:
+      retVal = self.__listeningConnections[ svcName ][ 'transport' ].acceptConnection()
+    except socket.error, e:
+      gLogger.warn( "Error while accepting a connection: ", str( e ) )
+      return
+    if not retVal[ 'OK' ]:
+      gLogger.warn( "Error while accepting a connection: ", retVal[ 'Message' ] )
+      return
+    clientTransport = retVal[ 'Value' ]
+    self.__maxFD = max( self.__maxFD, clientTransport.oSocket.fileno() )
+    #Is it banned?
+    clientIP = clientTransport.getRemoteAddress()[0]
+    if clientIP in Registry.getBannedIPs():
+      gLogger.warn( "Client connected from banned ip %s" % clientIP )
+      clientTransport.close()
+      return
+    self.__stats.connectionStablished()
+    #Do not waste a thread on the connection until the client starts talking
+    clientSocket = clientTransport.getSocket()
+    self.__pendingConnections[ clientSocket ] = ( svcName, clientTransport, time.time() )
+    self.__eventLoop.register( clientSocket, self.__pendingConnectionReady )
+
+  def __pendingConnectionReady( self, clientSocket ):
+    self.__eventLoop.unregister( clientSocket )
+    try:
+      svcName, clientTransport, _connTime = self.__pendingConnections.pop( clientSocket )
+    except KeyError:
+      return
+    self.__services[ svcName ].handleConnection( clientTransport )
+
+  def __purgePendingConnections( self ):
+    now = time.time()
+    for clientSocket in list( self.__pendingConnections ):
+      svcName, clientTransport, connTime = self.__pendingConnections[ clientSocket ]
+      if now - connTime < self.__services[ svcName ].getConfig().getPendingConnectionTimeout():
+        continue
+      gLogger.verbose( "Closing idle connection", "from %s" % str( clientTransport.getRemoteAddress() ) )
+      self.__eventLoop.unregister( clientSocket )
+      self.__pendingConnections.pop( clientSocket )
+      try:
+        clientTransport.close()
+      except:
+        pass
+
+  def __renewServerContexts( self ):
+    now = time.time()
+    for svcName in self.__listeningConnections:
+      lc = self.__listeningConnections[ svcName ]
+      tr = lc[ 'transport' ]
+      if now - tr.latestServerRenewTime() <= self.__services[ svcName ].getConfig().getContextLifeTime():
+        continue
+      result = tr.renewServerContext()
+      if not result[ 'OK' ] or tr.getSocket() is lc[ 'socket' ]:
+        continue
+      #The listening socket has changed with the new context
+      self.__eventLoop.unregister( lc[ 'socket' ] )
+      lc[ 'socket' ] = tr.getSocket()
+      self.__eventLoop.register( lc[ 'socket' ],
+                                 lambda sock, svcName = svcName : self.__acceptEventDriven( svcName ) )
+
   #This function runs in a different process
   def __startCloneProcess( self, svcName, i ):
     self.__services[ svcName ].setCloneProcessId( i )
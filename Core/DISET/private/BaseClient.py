@@ -2,6 +2,7 @@
 __RCSID__ = "$Id$"
 
 import types
+import time
 import thread
 import DIRAC
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
@@ -12,6 +13,7 @@ from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL
 from DIRAC.Core.Security import CS
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ClientConnectionPool import getGlobalClientConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 class BaseClient:
@@ -31,6 +33,7 @@ class BaseClient:
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_PERSISTENT_CONNECTION = "persistentConnection"
 
   __threadConfig = ThreadConfig()
 
@@ -48,7 +51,7 @@ class BaseClient:
     for initFunc in ( self.__discoverSetup, self.__discoverVO, self.__discoverTimeout,
                       self.__discoverURL, self.__discoverCredentialsToUse,
                       self.__checkTransportSanity,
-                      self.__setKeepAliveLapse ):
+                      self.__setKeepAliveLapse, self.__discoverPersistence ):
       result = initFunc()
       if not result[ 'OK' ] and self.__initStatus[ 'OK' ]:
         self.__initStatus = result
@@ -112,6 +115,14 @@ class BaseClient:
     self.kwargs[ self.KW_TIMEOUT ] = self.timeout
     return S_OK()
 
+  def __discoverPersistence( self ):
+    #Reuse connections between actions?
+    if self.KW_PERSISTENT_CONNECTION in self.kwargs:
+      self.persistentConnection = self.kwargs[ self.KW_PERSISTENT_CONNECTION ]
+    else:
+      self.persistentConnection = gConfig.getValue( "/DIRAC/Connections/Persistent", False )
+    return S_OK()
+
   def __discoverCredentialsToUse( self ):
     #Use certificates?
     if self.KW_USE_CERTIFICATES in self.kwargs:
@@ -225,6 +236,13 @@ and this is thread %s
       return self.__initStatus
     if self.__enableThreadCheck:
       self.__checkThreadID()
+    if self.persistentConnection:
+      retVal = getGlobalClientConnectionPool().get( self.__getConnectionKey() )
+      if retVal[ 'OK' ] and retVal[ 'Value' ]:
+        gLogger.debug( "Reusing connection to: %s" % self.serviceURL )
+        retVal[ 'reused' ] = True
+        return retVal
+    connectStart = time.time()
     gLogger.debug( "Connecting to: %s" % self.serviceURL )
     try:
       transport = gProtocolDict[ self.__URLTuple[0] ][ 'transport' ]( self.__URLTuple[1:3], **self.kwargs )
@@ -234,9 +252,29 @@ and this is thread %s
     except Exception, e:
       return S_ERROR( "Can't connect to %s: %s" % ( self.serviceURL, e ) )
     trid = getGlobalTransportPool().add( transport )
+    if self.persistentConnection:
+      getGlobalClientConnectionPool().addMiss( self.serviceURL, time.time() - connectStart )
     return S_OK( ( trid, transport ) )
 
-  def _disconnect( self, trid ):
+  def __getConnectionKey( self ):
+    """
+    Connections can only be shared between clients using the same credentials
+    """
+    return ( self.serviceURL, self.__extraCredentials,
+             self.kwargs[ self.KW_USE_CERTIFICATES ], self.kwargs[ self.KW_SKIP_CA_CHECK ],
+             self.kwargs.get( self.KW_PROXY_LOCATION, False ),
+             hash( self.kwargs.get( self.KW_PROXY_STRING, False ) ) )
+
+  def _disconnect( self, trid, keepConnection = 0 ):
+    """
+    Close the connection or give it back to the pool if the server keeps it
+    open for keepConnection seconds
+    """
+    if keepConnection and self.persistentConnection:
+      transport = getGlobalTransportPool().get( trid )
+      if transport:
+        getGlobalClientConnectionPool().release( self.__getConnectionKey(), trid, transport, keepConnection )
+        return
     getGlobalTransportPool().close( trid )
 
   def _proposeAction( self, transport, action ):
@@ -245,6 +283,9 @@ and this is thread %s
     stConnectionInfo = ( ( self.__URLTuple[3], self.setup, self.vo ),
                          action,
                          self.__extraCredentials )
+    if self.persistentConnection and action[0] == "RPC":
+      #Servers that don't know about persistent connections just ignore it
+      stConnectionInfo += ( { 'keepConnection' : True }, )
     retVal = transport.sendData( S_OK( stConnectionInfo ) )
     if not retVal[ 'OK' ]:
       return retVal
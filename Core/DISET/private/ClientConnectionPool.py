@@ -0,0 +1,173 @@
+"""
+Pool of authenticated client connections
+
+Clients with persistent connections enabled give back their transport to this
+pool after an action instead of closing it, and take it again for the next
+action to the same service with the same credentials. That saves one TCP
+connection, SSL handshake and credentials check per call.
+
+Idle transports stay registered in the global TransportPool, so its periodic
+keep alives keep checking them. Before a transport is handed out again any
+pending keep alive traffic is processed and transports closed by the server
+are discarded.
+"""
+__RCSID__ = "$Id$"
+
+import time
+import select
+import threading
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+
+class ClientConnectionPool:
+
+  def __init__( self, maxIdlePerKey = 5, maxIdleTime = 60 ):
+    self.log = gLogger.getSubLogger( "ClientConnectionPool" )
+    self.__maxIdlePerKey = maxIdlePerKey
+    self.__maxIdleTime = maxIdleTime
+    self.__lock = threading.Lock()
+    #key -> list of ( trid, transport, expirationTime )
+    self.__idle = {}
+    #URL -> counters
+    self.__stats = {}
+    result = gThreadScheduler.addPeriodicTask( 5, self.purgeExpired )
+    if not result[ 'OK' ]:
+      self.log.fatal( "Cannot add task to thread scheduler", result[ 'Message' ] )
+
+  def __getStats( self, url ):
+    if url not in self.__stats:
+      self.__stats[ url ] = { 'hits' : 0, 'misses' : 0, 'stale' : 0, 'released' : 0, 'closed' : 0,
+                              'hitTime' : 0.0, 'missTime' : 0.0 }
+    return self.__stats[ url ]
+
+  def __isHealthy( self, trid, transport ):
+    """
+    Check that a transport can be used again. Pending keep alive pings and pongs
+    are processed, and a readable socket without them means the peer closed it
+    """
+    if not getGlobalTransportPool().exists( trid ):
+      return False
+    try:
+      while transport.byteStream or select.select( [ transport.getSocket() ], [], [], 0 )[0]:
+        result = transport.receiveData( 1024, blockAfterKeepAlive = False )
+        if not result[ 'OK' ] or 'keepAlive' not in result:
+          return False
+    except Exception, e:
+      self.log.debug( "Discarding broken connection %s: %s" % ( trid, str( e ) ) )
+      return False
+    return True
+
+  def get( self, key ):
+    """
+    Get an idle transport for a ( URL, credentials ) key
+
+    :return: S_OK( ( trid, transport ) ) or S_OK( None ) if there's no usable one
+    """
+    start = time.time()
+    url = key[0]
+    while True:
+      self.__lock.acquire()
+      try:
+        try:
+          trid, transport, expirationTime = self.__idle[ key ].pop()
+        except ( KeyError, IndexError ):
+          return S_OK( None )
+      finally:
+        self.__lock.release()
+      healthy = expirationTime > time.time() and self.__isHealthy( trid, transport )
+      self.__lock.acquire()
+      try:
+        stats = self.__getStats( url )
+        if healthy:
+          stats[ 'hits' ] += 1
+          stats[ 'hitTime' ] += time.time() - start
+        else:
+          stats[ 'stale' ] += 1
+      finally:
+        self.__lock.release()
+      if healthy:
+        return S_OK( ( trid, transport ) )
+      self.__close( url, trid )
+
+  def release( self, key, trid, transport, lifeTime ):
+    """
+    Give back a transport. The server keeps it open for lifeTime seconds
+    """
+    lifeTime = min( lifeTime, self.__maxIdleTime )
+    self.__lock.acquire()
+    try:
+      idleList = self.__idle.setdefault( key, [] )
+      if len( idleList ) < self.__maxIdlePerKey:
+        #Leave some margin so the server does not close it while it's being reused
+        idleList.append( ( trid, transport, time.time() + lifeTime - 1 ) )
+        self.__getStats( key[0] )[ 'released' ] += 1
+        return
+    finally:
+      self.__lock.release()
+    self.__close( key[0], trid )
+
+  def addMiss( self, url, connectTime ):
+    """
+    Account a connection that had to be established
+    """
+    self.__lock.acquire()
+    try:
+      stats = self.__getStats( url )
+      stats[ 'misses' ] += 1
+      stats[ 'missTime' ] += connectTime
+    finally:
+      self.__lock.release()
+
+  def __close( self, url, trid ):
+    self.__lock.acquire()
+    try:
+      self.__getStats( url )[ 'closed' ] += 1
+    finally:
+      self.__lock.release()
+    getGlobalTransportPool().close( trid )
+
+  def purgeExpired( self ):
+    now = time.time()
+    toClose = []
+    self.__lock.acquire()
+    try:
+      for key in self.__idle:
+        idleList = self.__idle[ key ]
+        for entry in [ entry for entry in idleList if entry[2] <= now ]:
+          idleList.remove( entry )
+          toClose.append( ( key[0], entry[0] ) )
+    finally:
+      self.__lock.release()
+    for url, trid in toClose:
+      self.__close( url, trid )
+
+  def getNumIdle( self ):
+    return sum( [ len( idleList ) for idleList in self.__idle.values() ] )
+
+  def getStats( self ):
+    """
+    Get hit, miss and latency counters per URL. Latencies are averages in seconds
+    """
+    stats = {}
+    self.__lock.acquire()
+    try:
+      for url in self.__stats:
+        urlStats = dict( self.__stats[ url ] )
+        urlStats[ 'hitLatency' ] = urlStats.pop( 'hitTime' ) / max( 1, urlStats[ 'hits' ] )
+        urlStats[ 'missLatency' ] = urlStats.pop( 'missTime' ) / max( 1, urlStats[ 'misses' ] )
+        requests = urlStats[ 'hits' ] + urlStats[ 'misses' ]
+        urlStats[ 'hitRatio' ] = float( urlStats[ 'hits' ] ) / max( 1, requests )
+        urlStats[ 'idle' ] = sum( [ len( self.__idle[ key ] ) for key in self.__idle if key[0] == url ] )
+        stats[ url ] = urlStats
+    finally:
+      self.__lock.release()
+    return S_OK( stats )
+
+gClientConnectionPool = None
+
+def getGlobalClientConnectionPool():
+  global gClientConnectionPool
+  if not gClientConnectionPool:
+    gClientConnectionPool = ClientConnectionPool()
+  return gClientConnectionPool
@@ -0,0 +1,193 @@
+"""
+Readiness notification for DISET sockets
+
+The Poller uses the best mechanism available in the platform (epoll, poll or
+select as last resort) and keeps the registered sockets between calls so
+there is no need to rebuild the list of sockets on every iteration.
+The EventLoop dispatches readable sockets to callbacks and runs periodic tasks.
+"""
+__RCSID__ = "$Id$"
+
+import time
+import select
+import threading
+
+from DIRAC import gLogger
+
+class Poller:
+
+  def __init__( self ):
+    self.__fdMap = {}
+    self.__lock = threading.Lock()
+    if hasattr( select, "epoll" ):
+      self.__backend = "epoll"
+      self.__poller = select.epoll()
+      self.__readMask = select.EPOLLIN | select.EPOLLPRI | select.EPOLLERR | select.EPOLLHUP
+    elif hasattr( select, "poll" ):
+      self.__backend = "poll"
+      self.__poller = select.poll()
+      self.__readMask = select.POLLIN | select.POLLPRI | select.POLLERR | select.POLLHUP
+    else:
+      self.__backend = "select"
+      self.__poller = None
+
+  def getBackend( self ):
+    return self.__backend
+
+  def __len__( self ):
+    return len( self.__fdMap )
+
+  def register( self, fileObj, data = None ):
+    """
+    Watch a file object for reading. Data will be returned by poll when it's readable
+    """
+    fd = fileObj.fileno()
+    self.__lock.acquire()
+    try:
+      if fd in self.__fdMap:
+        sameObj = self.__fdMap[ fd ][0] is fileObj
+        self.__fdMap[ fd ] = ( fileObj, data )
+        if sameObj or not self.__poller:
+          return
+        #The fd has been reused by a new socket without unregistering the old one
+        try:
+          self.__poller.unregister( fd )
+        except ( IOError, OSError, KeyError ):
+          pass
+      self.__fdMap[ fd ] = ( fileObj, data )
+      if self.__poller:
+        self.__poller.register( fd, self.__readMask )
+    finally:
+      self.__lock.release()
+
+  def __findFD( self, fileObj ):
+    try:
+      fd = fileObj.fileno()
+      if fd in self.__fdMap and self.__fdMap[ fd ][0] is fileObj:
+        return fd
+    except Exception:
+      pass
+    #Closed sockets do not have a valid fileno any more
+    for fd in self.__fdMap:
+      if self.__fdMap[ fd ][0] is fileObj:
+        return fd
+    return None
+
+  def unregister( self, fileObj ):
+    self.__lock.acquire()
+    try:
+      fd = self.__findFD( fileObj )
+      if fd is None:
+        return False
+      del( self.__fdMap[ fd ] )
+      if self.__poller:
+        try:
+          self.__poller.unregister( fd )
+        except ( IOError, OSError, KeyError ):
+          pass
+      return True
+    finally:
+      self.__lock.release()
+
+  def poll( self, timeout ):
+    """
+    Wait up to timeout seconds
+
+    :return: list of ( fileObj, data ) for the readable file objects
+    """
+    if self.__backend == "epoll":
+      events = self.__poller.poll( timeout )
+    elif self.__backend == "poll":
+      events = self.__poller.poll( int( timeout * 1000 ) )
+    else:
+      if not self.__fdMap:
+        time.sleep( timeout )
+        return []
+      inList = select.select( self.__fdMap.keys(), [], [], timeout )[0]
+      events = [ ( fd, 0 ) for fd in inList ]
+    ready = []
+    for fd, _event in events:
+      try:
+        ready.append( self.__fdMap[ fd ] )
+      except KeyError:
+        #Unregistered while waiting
+        pass
+    return ready
+
+  def close( self ):
+    if self.__poller and self.__backend == "epoll":
+      self.__poller.close()
+    self.__fdMap = {}
+
+class EventLoop:
+
+  def __init__( self, name = "EventLoop", timeout = 1 ):
+    self.__name = name
+    self.__timeout = timeout
+    self.__poller = Poller()
+    self.__periodicCallbacks = []
+    self.__running = False
+    self.__log = gLogger.getSubLogger( name )
+    self.__stats = { 'iterations' : 0, 'events' : 0 }
+
+  def getBackend( self ):
+    return self.__poller.getBackend()
+
+  def getNumRegistered( self ):
+    return len( self.__poller )
+
+  def getStats( self ):
+    stats = dict( self.__stats )
+    stats[ 'registered' ] = len( self.__poller )
+    return stats
+
+  def register( self, fileObj, callback ):
+    """
+    Execute callback( fileObj ) from the loop each time fileObj is readable
+    """
+    self.__poller.register( fileObj, callback )
+
+  def unregister( self, fileObj ):
+    return self.__poller.unregister( fileObj )
+
+  def addPeriodicCallback( self, period, callback ):
+    self.__periodicCallbacks.append( [ period, time.time(), callback ] )
+
+  def runOnce( self, timeout = None ):
+    if timeout is None:
+      timeout = self.__timeout
+    try:
+      ready = self.__poller.poll( timeout )
+    except ( select.error, IOError, OSError ), e:
+      #EINTR and sockets closed while polling
+      self.__log.debug( "Error while polling: %s" % str( e ) )
+      time.sleep( 0.001 )
+      ready = []
+    self.__stats[ 'iterations' ] += 1
+    self.__stats[ 'events' ] += len( ready )
+    for fileObj, callback in ready:
+      try:
+        callback( fileObj )
+      except Exception:
+        self.__log.exception( "Exception while processing socket event" )
+    if self.__periodicCallbacks:
+      now = time.time()
+      for periodicCB in self.__periodicCallbacks:
+        if now - periodicCB[1] >= periodicCB[0]:
+          periodicCB[1] = now
+          try:
+            periodicCB[2]()
+          except Exception:
+            self.__log.exception( "Exception while executing periodic callback" )
+    return len( ready )
+
+  def run( self ):
+    self.__running = True
+    while self.__running:
+      self.runOnce()
+
+  def isRunning( self ):
+    return self.__running
+
+  def stop( self ):
+    self.__running = False
@@ -15,18 +15,32 @@ class InnerRPCClient( BaseClient ):
       retVal[ 'rpcStub' ] = stub
       return retVal
     trid, transport = retVal[ 'Value' ]
+    reused = retVal.get( 'reused', False )
+    keepConnection = 0
     try:
       retVal = self._proposeAction( transport, ( "RPC", functionName ) )
+      if not retVal[ 'OK' ] and reused:
+        #The server may have closed the pooled connection. Nothing has been executed yet so try a new one
+        self._disconnect( trid )
+        retVal = self._connect()
+        if not retVal[ 'OK' ]:
+          retVal[ 'rpcStub' ] = stub
+          return retVal
+        trid, transport = retVal[ 'Value' ]
+        retVal = self._proposeAction( transport, ( "RPC", functionName ) )
       if not retVal[ 'OK' ]:
         retVal[ 'rpcStub' ] = stub
         return retVal
+      serverKeepConnection = retVal.get( 'keepConnection', 0 )
       retVal = transport.sendData( S_OK( args ) )
       if not retVal[ 'OK' ]:
         return retVal
       receivedData = transport.receiveData()
       if type( receivedData ) == types.DictType:
         receivedData[ 'rpcStub' ] = stub
+        #Errors may come from the transport itself, only reuse it after a good answer
+        if receivedData.get( 'OK' ):
+          keepConnection = serverKeepConnection
       return receivedData
     finally:
-      self._disconnect( trid )
-
+      self._disconnect( trid, keepConnection )
@@ -1,15 +1,14 @@
 
 import threading
-import select
 import time
 import types
-import socket
 
 from DIRAC import gConfig, gMonitor, gLogger, S_OK, S_ERROR
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
 from DIRAC.Core.Utilities.ThreadPool import getGlobalThreadPool
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
 from DIRAC.Core.DISET.private.MessageFactory import MessageFactory, DummyMessage
+from DIRAC.Core.DISET.private.EventLoop import EventLoop
 
 
 class MessageBroker:
@@ -35,6 +34,21 @@ class MessageBroker:
       threadPool = getGlobalThreadPool()
     self.__threadPool = threadPool
     self.__listeningForMessages = False
+    self.__eventLoop = None
+    self.__sharedEventLoop = False
+
+  def setEventLoop( self, eventLoop ):
+    """
+    Listen to the connections from an external event loop instead of an own thread.
+    The owner of the loop is the one running it. Has to be set before adding transports
+    """
+    self.__eventLoop = eventLoop
+    self.__sharedEventLoop = True
+
+  def __getEventLoop( self ):
+    if not self.__eventLoop:
+      self.__eventLoop = EventLoop( "%sLoop" % self.__name )
+    return self.__eventLoop
 
   def getNumConnections( self ):
     return len( self.__messageTransports )
@@ -89,6 +103,8 @@ class MessageBroker:
                                            'cbDisconnect' : disconnectCallback,
                                            'listen' : listenToConnection,
                                            'idleRead' : idleRead }
+      if listenToConnection:
+        self.__listenToSocket( trid, tr )
       self.__startListeningThread()
       return S_OK()
     finally:
@@ -98,7 +114,12 @@ class MessageBroker:
     self.__trInOutLock.acquire()
     try:
       if trid in self.__messageTransports:
-        self.__messageTransports[ trid ][ 'listen' ] = listen
+        mt = self.__messageTransports[ trid ]
+        mt[ 'listen' ] = listen
+        if listen:
+          self.__listenToSocket( trid, mt[ 'transport' ] )
+        else:
+          self.__getEventLoop().unregister( mt[ 'transport' ].getSocket() )
       self.__startListeningThread()
     finally:
       self.__trInOutLock.release()
@@ -106,7 +127,19 @@ class MessageBroker:
 
   # Listen to connections
 
+  def __listenToSocket( self, trid, transport ):
+    self.__getEventLoop().register( transport.getSocket(),
+                                    lambda sock, trid = trid : self.__dataAvailable( trid ) )
+
+  def __dataAvailable( self, trid ):
+    if trid in self.__messageTransports:
+      result = self.__receiveMsgDataAndQueue( trid )
+      if not result[ 'OK' ]:
+        self.removeTransport( trid )
+
   def __startListeningThread( self ):
+    if self.__sharedEventLoop:
+      return
     if self.__listenThread is None or not self.__listenThread.isAlive() or not self.__listeningForMessages:
       self.__listeningForMessages = True
       self.__listenThread = threading.Thread( target = self.__listenAutoReceiveConnections )
@@ -114,44 +147,16 @@ class MessageBroker:
       self.__listenThread.start()
 
   def __listenAutoReceiveConnections( self ):
+    eventLoop = self.__getEventLoop()
     while self.__listeningForMessages:
       self.__trInOutLock.acquire()
       try:
-        sIdList = []
-        for trid in self.__messageTransports:
-          mt = self.__messageTransports[ trid ]
-          if not mt[ 'listen' ]:
-            continue
-          sIdList.append( ( trid, mt[ 'transport' ].getSocket() ) )
-        if not sIdList:
+        if not eventLoop.getNumRegistered():
           self.__listeningForMessages = False
           return
       finally:
         self.__trInOutLock.release()
-      try:
-        try:
-          inList, outList, exList = select.select( [ pos[1] for pos in sIdList ] , [], [], 1 )
-          if len( inList ) == 0:
-            continue
-        except socket.error:
-          time.sleep( 0.001 )
-          continue
-        except select.error:
-          time.sleep( 0.001 )
-          continue
-      except:
-        from DIRAC import gLogger
-        gLogger.exception( "Exception while selecting persistent connections" )
-        continue
-      for sock in inList:
-        for iPos in range( len( sIdList ) ):
-          if sock == sIdList[ iPos ][1]:
-            trid = sIdList[ iPos ][0]
-            if trid in self.__messageTransports:
-              result = self.__receiveMsgDataAndQueue( trid )
-              if not result[ 'OK' ]:
-                self.removeTransport( trid )
-            break
+      eventLoop.runOnce( 1 )
 
   #Process received data functions
 
@@ -380,7 +385,9 @@ class MessageBroker:
       else:
         cbDisconnect = False
 
-      self.__messageTransports.pop( trid )
+      mt = self.__messageTransports.pop( trid )
+      if self.__eventLoop:
+        self.__eventLoop.unregister( mt[ 'transport' ].getSocket() )
       if closeTransport:
         self.__trPool.close( trid )
     finally:
@@ -1,6 +1,7 @@
 
 import os
 import time
+import select
 import DIRAC
 import threading
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR, gMonitor
@@ -14,6 +15,7 @@ from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
+from DIRAC.Core.Utilities.ActionProfiler import ActionProfiler
 from DIRAC.Core.Security import CS
 from DIRAC.Core.DISET.AuthManager import AuthManager
 from DIRAC.FrameworkSystem.Client.SecurityLogClient import SecurityLogClient
@@ -45,11 +47,19 @@ class Service:
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    self.__eventLoop = None
+    self._profiler = None
 
   def setCloneProcessId( self, cloneId ):
     self.__cloneId = cloneId
     self._monitor.setComponentName( "%s-Clone:%s" % ( self._name, cloneId ) )
 
+  def setEventLoop( self, eventLoop ):
+    """
+    Listen to the persistent connections from the given event loop. Has to be set before initializing
+    """
+    self.__eventLoop = eventLoop
+
   def _isMetaAction( self, action ):
     referedAction = Service.SVC_VALID_ACTIONS[ action ]
     if referedAction in Service.SVC_VALID_ACTIONS:
@@ -70,11 +80,16 @@ class Service:
     #Initialize lock manager
     self._lockManager = LockManager( self._cfg.getMaxWaitingPetitions() )
     self._initMonitoring()
+    if self._cfg.useProfiling():
+      gLogger.info( "Profiling the actions of %s" % self._name )
+      self._profiler = ActionProfiler( self._cfg.getProfilingSampleRate(), self._cfg.getProfilingSlowestCalls() )
     self._threadPool = ThreadPool( max( 1, self._cfg.getMinThreads() ),
                                    max( 0, self._cfg.getMaxThreads() ),
                                    self._cfg.getMaxWaitingPetitions() )
     self._threadPool.daemonize()
     self._msgBroker = MessageBroker( "%sMSB" % self._name, threadPool = self._threadPool )
+    if self.__eventLoop:
+      self._msgBroker.setEventLoop( self.__eventLoop )
     #Create static dict
     self._serviceInfoDict = { 'serviceName' : self._name,
                               'serviceSectionPath' : PathFinder.getServiceSection( self._name ),
@@ -88,7 +103,8 @@ class Service:
       self._handler[ 'class' ]._rh__initializeClass( dict( self._serviceInfoDict ),
                                                      self._lockManager,
                                                      self._msgBroker,
-                                                     self._monitor )
+                                                     self._monitor,
+                                                     self._profiler )
       if self._handler[ 'init' ]:
         for initFunc in self._handler[ 'init' ]:
           gLogger.verbose( "Executing initialization function" )
@@ -289,6 +305,7 @@ class Service:
       monReport = False
     try:
       #Handshake
+      handshakeTime = time.time()
       try:
         result = clientTransport.handshake()
         if not result[ 'OK' ]:
@@ -296,36 +313,101 @@ class Service:
           return
       except:
         return
+      handshakeTime = time.time() - handshakeTime
       #Add to the transport pool
       trid = self._transportPool.add( clientTransport )
       if not trid:
         return
-      #Receive and check proposal
-      result = self._receiveAndCheckProposal( trid )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      proposalTuple = result[ 'Value' ]
-      #Instantiate handler
-      result = self._instantiateHandler( trid, proposalTuple )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      handlerObj = result[ 'Value' ]
-      #Execute the action
-      result = self._processProposal( trid, proposalTuple, handlerObj )
-      #Close the connection if required
-      if result[ 'closeTransport' ] or not result[ 'OK' ]:
+      actionsDone = 0
+      while True:
+        #Receive and check proposal
+        result = self._receiveAndCheckProposal( trid )
         if not result[ 'OK' ]:
-          gLogger.error( "Error processing proposal", result[ 'Message' ] )
-        self._transportPool.close( trid )
-      return result
+          self._transportPool.sendAndClose( trid, result )
+          return
+        proposalTuple = result[ 'Value' ]
+        #Instantiate handler
+        result = self._instantiateHandler( trid, proposalTuple )
+        if not result[ 'OK' ]:
+          self._transportPool.sendAndClose( trid, result )
+          return
+        handlerObj = result[ 'Value' ]
+        #Execute the action
+        actionsDone += 1
+        keepConnection = self.__getKeepConnectionTime( proposalTuple, actionsDone )
+        if self._profiler:
+          #The handshake is accounted to the first action of the connection
+          callProfile = self._profiler.startCall( "/".join( proposalTuple[1] ), handshakeTime )
+          handshakeTime = 0
+          try:
+            result = self._processProposal( trid, proposalTuple, handlerObj, keepConnection )
+          finally:
+            self._profiler.endCall( callProfile )
+        else:
+          result = self._processProposal( trid, proposalTuple, handlerObj, keepConnection )
+        #Close the connection if required
+        if result[ 'closeTransport' ] or not result[ 'OK' ]:
+          if not result[ 'OK' ]:
+            gLogger.error( "Error processing proposal", result[ 'Message' ] )
+          self._transportPool.close( trid )
+          return result
+        if not keepConnection:
+          return result
+        #Persistent connection, wait for the next action
+        if not self.__waitForNextProposal( trid, keepConnection ):
+          self._transportPool.close( trid )
+          return result
+        self._stats[ 'connections' ] += 1
+        self._monitor.setComponentExtraParam( 'queries', self._stats[ 'connections' ] )
     finally:
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring( *monReport )
 
 
+  def __getKeepConnectionTime( self, proposalTuple, actionsDone ):
+    """
+    Seconds the connection will be kept open after this action. Only RPC
+    connections from clients asking for it are kept
+    """
+    if len( proposalTuple ) < 4 or proposalTuple[1][0] != "RPC":
+      return 0
+    try:
+      if not proposalTuple[3].get( 'keepConnection', False ):
+        return 0
+    except AttributeError:
+      return 0
+    if actionsDone >= self._cfg.getMaxActionsPerConnection():
+      return 0
+    return max( 0, self._cfg.getPersistentConnectionIdleTime() )
+
+  def __waitForNextProposal( self, trid, idleTime ):
+    """
+    Wait for the next proposal of a persistent connection. Keep alives are
+    answered while waiting. Give up if the service has queued connections
+    waiting for a thread
+    """
+    clientTransport = self._transportPool.get( trid )
+    if not clientTransport:
+      return False
+    endTime = time.time() + idleTime
+    while not clientTransport.byteStream:
+      waitTime = endTime - time.time()
+      if waitTime <= 0 or self._threadPool.pendingJobs():
+        return False
+      try:
+        if not select.select( [ clientTransport.getSocket() ], [], [], min( 1, waitTime ) )[0]:
+          continue
+      except Exception:
+        return False
+      #Receive and keep the proposal for _receiveAndCheckProposal
+      result = clientTransport.receiveData( 1024, blockAfterKeepAlive = False, idleReceive = True )
+      if not result[ 'OK' ]:
+        return False
+      if 'keepAlive' not in result:
+        return True
+    return True
+
   def _createIdentityString( self, credDict, clientTransport = None ):
     if 'username' in credDict:
       if 'group' in credDict:
@@ -446,9 +528,13 @@ class Service:
       return S_ERROR( "Server error while loading handler" )
     return S_OK( handlerInstance )
 
-  def _processProposal( self, trid, proposalTuple, handlerObj ):
+  def _processProposal( self, trid, proposalTuple, handlerObj, keepConnection = 0 ):
     #Notify the client we're ready to execute the action
-    retVal = self._transportPool.send( trid, S_OK() )
+    readyMsg = S_OK()
+    if keepConnection:
+      #Tell the client for how long the connection will be kept after the action
+      readyMsg[ 'keepConnection' ] = keepConnection
+    retVal = self._transportPool.send( trid, readyMsg )
     if not retVal[ 'OK' ]:
       return retVal
 
@@ -476,7 +562,7 @@ class Service:
       if not result[ 'OK' ]:
         self._msgBroker.removeTransport( trid )
 
-    result[ 'closeTransport' ] = not messageConnection or not result[ 'OK' ]
+    result[ 'closeTransport' ] = ( not messageConnection and not keepConnection ) or not result[ 'OK' ]
     return result
 
   def _mbConnect( self, trid, handlerObj = None ):
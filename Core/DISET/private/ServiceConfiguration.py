@@ -137,3 +137,49 @@ class ServiceConfiguration:
     except:
       return 21600
 
+  def useEventDrivenReactor( self ):
+    optionValue = self.getOption( "EventDrivenReactor" )
+    if optionValue and optionValue.lower() in ( "y", "yes", "true" ):
+      return True
+    return False
+
+  def getPendingConnectionTimeout( self ):
+    optionValue = self.getOption( "PendingConnectionTimeout" )
+    try:
+      return int( optionValue )
+    except:
+      return 30
+
+  def getPersistentConnectionIdleTime( self ):
+    optionValue = self.getOption( "PersistentConnectionIdleTime" )
+    try:
+      return int( optionValue )
+    except:
+      return 10
+
+  def getMaxActionsPerConnection( self ):
+    optionValue = self.getOption( "MaxActionsPerConnection" )
+    try:
+      return int( optionValue )
+    except:
+      return 100
+
+  def useProfiling( self ):
+    optionValue = self.getOption( "Profiling" )
+    if optionValue and optionValue.lower() in ( "y", "yes", "true" ):
+      return True
+    return False
+
+  def getProfilingSampleRate( self ):
+    optionValue = self.getOption( "ProfilingSampleRate" )
+    try:
+      return float( optionValue )
+    except:
+      return 0.01
+
+  def getProfilingSlowestCalls( self ):
+    optionValue = self.getOption( "ProfilingSlowestCalls" )
+    try:
+      return int( optionValue )
+    except:
+      return 10
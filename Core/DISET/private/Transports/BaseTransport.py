@@ -10,7 +10,7 @@ except:
   from md5 import md5
 
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
-from DIRAC.Core.Utilities import DEncode
+from DIRAC.Core.Utilities import StreamDEncode
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 class BaseTransport:
@@ -116,7 +116,7 @@ class BaseTransport:
 
   def sendData( self, uData, prefix = False ):
     self.__updateLastActionTimestamp()
-    sCodedData = DEncode.encode( uData )
+    sCodedData = StreamDEncode.encode( uData )
     if prefix:
       dataToSend = "%s%s:%s" % ( prefix, len( sCodedData ), sCodedData )
     else:
@@ -175,16 +175,17 @@ class BaseTransport:
       #From here it must be a real message!
       #Process the size and remove the msg length from the bytestream
       pkgSize = int( self.byteStream[ :iSeparatorPosition ] )
-      pkgData = self.byteStream[ iSeparatorPosition + 1: ]
-      readSize = len( pkgData )
+      pkgStart = iSeparatorPosition + 1
+      readSize = len( self.byteStream ) - pkgStart
       if readSize >= pkgSize:
-        #If we already have all the data we need
-        data = pkgData[ :pkgSize ]
-        self.byteStream = pkgData[ pkgSize: ]
+        #If we already have all the data we need, decode it in place
+        data = self.byteStream
+        self.byteStream = data[ pkgStart + pkgSize: ]
       else:
         #If we still need to read stuff
         pkgMem = cStringIO.StringIO()
-        pkgMem.write( pkgData )
+        pkgMem.write( buffer( self.byteStream, pkgStart ) )
+        pkgStart = 0
         #Receive while there's still data to be received
         while readSize < pkgSize:
           retVal = self._read( pkgSize - readSize, skipReadyCheck = True )
@@ -206,9 +207,11 @@ class BaseTransport:
           data = pkgMem.read( pkgSize )
           self.byteStream = pkgMem.read()
       try:
-        data = DEncode.decode( data )[0]
+        data, pkgEnd = StreamDEncode.decode( data, pkgStart )
       except Exception, e:
         return S_ERROR( "Could not decode received data: %s" % str( e ) )
+      if pkgEnd != pkgStart + pkgSize:
+        return S_ERROR( "Could not decode received data: message length mismatch" )
       if idleReceive:
         self.receivedMessages.append( data )
         return S_OK()
@@ -0,0 +1,192 @@
+""" Per action profiling of the calls served by a service
+
+    The ActionProfiler keeps for each action ( ie RPC/getJobs ) the number of calls,
+    a histogram of their latency, the time spent in each phase of the calls and the
+    time spent in SQL statements. The profile of the call being served is attached
+    to the thread serving it, getCallProfile gives it to the lower layers ( MySQL
+    adds the time of its statements ) and is None when nothing is profiled, so the
+    cost without profiling is one lookup. A sample of the calls is executed under
+    cProfile and the profiles of the slowest ones are kept.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import bisect
+import random
+import threading
+import cProfile
+import pstats
+import cStringIO
+
+#Upper limit in seconds of the latency histogram bins, the last bin has no limit
+HISTOGRAM_BINS = ( 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60 )
+PHASES = ( 'handshake', 'decode', 'execute', 'encode' )
+
+gCallProfiles = threading.local()
+
+def getCallProfile():
+  """ Profile of the call served by the current thread, None if it is not profiled
+  """
+  return getattr( gCallProfiles, 'current', None )
+
+class CallProfile( object ):
+
+  def __init__( self, action, sampled = False ):
+    self.action = action
+    self.startTime = time.time()
+    self.phases = {}
+    self.sqlTime = 0.
+    self.sqlStatements = 0
+    self.slowestSQL = ( 0., '' )
+    self.sampled = sampled
+    self.profile = None
+    self.ok = True
+
+  def addPhaseTime( self, phase, seconds ):
+    self.phases[ phase ] = self.phases.get( phase, 0. ) + seconds
+
+  def addSQLTime( self, seconds, statement ):
+    self.sqlTime += seconds
+    self.sqlStatements += 1
+    if seconds > self.slowestSQL[0]:
+      self.slowestSQL = ( seconds, statement[:512] )
+
+  def runProfiled( self, function, *args ):
+    """ Execute function, under cProfile if the call is in the sample
+    """
+    if not self.sampled:
+      return function( *args )
+    self.profile = cProfile.Profile()
+    return self.profile.runcall( function, *args )
+
+class ActionProfiler( object ):
+
+  def __init__( self, sampleRate = 0.01, slowestCalls = 10 ):
+    self.__sampleRate = sampleRate
+    self.__slowestCalls = slowestCalls
+    self.__lock = threading.Lock()
+    self.reset()
+
+  def reset( self ):
+    """ Forget the calls profiled up to now
+    """
+    self.__lock.acquire()
+    try:
+      self.__startTime = time.time()
+      self.__actions = {}
+      self.__slowest = []
+    finally:
+      self.__lock.release()
+
+  def startCall( self, action, handshakeTime = 0 ):
+    """ Start profiling a call in the current thread
+    """
+    callProfile = CallProfile( action, self.__sampleRate > 0 and random.random() < self.__sampleRate )
+    if handshakeTime:
+      callProfile.addPhaseTime( 'handshake', handshakeTime )
+    gCallProfiles.current = callProfile
+    return callProfile
+
+  def endCall( self, callProfile ):
+    """ Stop profiling a call and add it to the statistics of its action
+    """
+    gCallProfiles.current = None
+    elapsed = time.time() - callProfile.startTime + callProfile.phases.get( 'handshake', 0. )
+    self.__lock.acquire()
+    try:
+      if callProfile.action not in self.__actions:
+        self.__actions[ callProfile.action ] = { 'Calls' : 0, 'Errors' : 0, 'TotalTime' : 0., 'MaxTime' : 0.,
+                                                 'Histogram' : [ 0 ] * ( len( HISTOGRAM_BINS ) + 1 ),
+                                                 'Phases' : dict( [ ( phase, 0. ) for phase in PHASES ] ),
+                                                 'SQLTime' : 0., 'SQLStatements' : 0 }
+      actionStats = self.__actions[ callProfile.action ]
+      actionStats[ 'Calls' ] += 1
+      if not callProfile.ok:
+        actionStats[ 'Errors' ] += 1
+      actionStats[ 'TotalTime' ] += elapsed
+      actionStats[ 'MaxTime' ] = max( actionStats[ 'MaxTime' ], elapsed )
+      actionStats[ 'Histogram' ][ bisect.bisect_left( HISTOGRAM_BINS, elapsed ) ] += 1
+      for phase in callProfile.phases:
+        actionStats[ 'Phases' ][ phase ] = actionStats[ 'Phases' ].get( phase, 0. ) + callProfile.phases[ phase ]
+      actionStats[ 'SQLTime' ] += callProfile.sqlTime
+      actionStats[ 'SQLStatements' ] += callProfile.sqlStatements
+      if callProfile.profile:
+        self.__slowest.append( ( elapsed, callProfile ) )
+        self.__slowest.sort( reverse = True )
+        del self.__slowest[ self.__slowestCalls: ]
+    finally:
+      self.__lock.release()
+
+  def __profileText( self, profile, lines = 30 ):
+    output = cStringIO.StringIO()
+    stats = pstats.Stats( profile, stream = output )
+    stats.sort_stats( 'cumulative' ).print_stats( lines )
+    return output.getvalue()
+
+  def getData( self ):
+    """ Statistics of the actions and the slowest of the sampled calls
+    """
+    return self.__getData()[0]
+
+  def __getData( self ):
+    self.__lock.acquire()
+    try:
+      actions = {}
+      for action, actionStats in self.__actions.items():
+        actions[ action ] = dict( actionStats )
+        actions[ action ][ 'Histogram' ] = list( actionStats[ 'Histogram' ] )
+        actions[ action ][ 'Phases' ] = dict( actionStats[ 'Phases' ] )
+      slowest = list( self.__slowest )
+      startTime = self.__startTime
+    finally:
+      self.__lock.release()
+    slowestCalls = []
+    for elapsed, callProfile in slowest:
+      slowestCalls.append( { 'Action' : callProfile.action,
+                             'StartTime' : callProfile.startTime,
+                             'Elapsed' : elapsed,
+                             'Phases' : dict( callProfile.phases ),
+                             'SQLTime' : callProfile.sqlTime,
+                             'SQLStatements' : callProfile.sqlStatements,
+                             'SlowestSQL' : list( callProfile.slowestSQL ),
+                             'Profile' : self.__profileText( callProfile.profile ) } )
+    data = { 'StartTime' : startTime,
+             'EndTime' : time.time(),
+             'HistogramBins' : list( HISTOGRAM_BINS ),
+             'Actions' : actions,
+             'SlowestCalls' : slowestCalls }
+    return data, [ callProfile.profile for _elapsed, callProfile in slowest ]
+
+  def dump( self, fileName ):
+    """ Write the statistics as text in fileName and the cProfile data of the slowest
+        calls in fileName.<n>.prof, to be loaded with pstats
+    """
+    data, profiles = self.__getData()
+    lines = [ "Profiling from %s to %s" % ( time.ctime( data[ 'StartTime' ] ), time.ctime( data[ 'EndTime' ] ) ), "" ]
+    binNames = [ "<%ss" % limit for limit in HISTOGRAM_BINS ] + [ ">%ss" % HISTOGRAM_BINS[-1] ]
+    for action in sorted( data[ 'Actions' ] ):
+      actionStats = data[ 'Actions' ][ action ]
+      lines.append( "%s: %d calls, %d errors, %.3f s total, %.3f s mean, %.3f s max" %
+                    ( action, actionStats[ 'Calls' ], actionStats[ 'Errors' ], actionStats[ 'TotalTime' ],
+                      actionStats[ 'TotalTime' ] / actionStats[ 'Calls' ], actionStats[ 'MaxTime' ] ) )
+      lines.append( "  phases: %s" % ", ".join( [ "%s %.3f s" % ( phase, actionStats[ 'Phases' ][ phase ] )
+                                                  for phase in sorted( actionStats[ 'Phases' ] ) ] ) )
+      lines.append( "  SQL: %d statements, %.3f s" % ( actionStats[ 'SQLStatements' ], actionStats[ 'SQLTime' ] ) )
+      lines.append( "  latency: %s" % ", ".join( [ "%s %d" % ( binNames[ i ], count )
+                                                   for i, count in enumerate( actionStats[ 'Histogram' ] ) if count ] ) )
+    for i in range( len( data[ 'SlowestCalls' ] ) ):
+      callData = data[ 'SlowestCalls' ][ i ]
+      profileFile = "%s.%d.prof" % ( fileName, i )
+      profiles[i].dump_stats( profileFile )
+      lines.extend( [ "", "%s at %s: %.3f s, SQL %.3f s in %d statements, profile in %s" %
+                      ( callData[ 'Action' ], time.ctime( callData[ 'StartTime' ] ), callData[ 'Elapsed' ],
+                        callData[ 'SQLTime' ], callData[ 'SQLStatements' ], profileFile ) ] )
+      if callData[ 'SlowestSQL' ][1]:
+        lines.append( "  slowest SQL ( %.3f s ): %s" % tuple( callData[ 'SlowestSQL' ] ) )
+      lines.append( callData[ 'Profile' ] )
+    dumpFile = open( fileName, "w" )
+    try:
+      dumpFile.write( "\n".join( lines ) + "\n" )
+    finally:
+      dumpFile.close()
@@ -14,20 +14,25 @@ class ExecutorState:
     self.__lock = threading.Lock()
     self.__typeToId = {}
     self.__maxTasks = {}
+    self.__batchSize = {}
+    self.__held = {}
     self.__execTasks = {}
     self.__taskInExec = {}
 
   def _internals( self ):
     return { 'type2id' : dict( self.__typeToId ),
              'maxTasks' : dict( self.__maxTasks ),
+             'batchSize' : dict( self.__batchSize ),
+             'held' : dict( self.__held ),
              'execTasks' : dict( self.__execTasks ),
              'tasksInExec' : dict( self.__taskInExec ),
              'locked' : self.__lock.locked() }
 
-  def addExecutor( self, eId, eTypes, maxTasks = 1 ):
+  def addExecutor( self, eId, eTypes, maxTasks = 1, batchSize = 1 ):
     self.__lock.acquire()
     try:
       self.__maxTasks[ eId ] = max( 1, maxTasks )
+      self.__batchSize[ eId ] = max( 1, batchSize )
       if eId not in self.__execTasks:
         self.__execTasks[ eId ] = set()
       if type( eTypes ) not in ( types.ListType, types.TupleType ):
@@ -51,6 +56,8 @@ class ExecutorState:
         tasks.append( taskId )
       self.__execTasks.pop( eId )
       self.__maxTasks.pop( eId )
+      self.__batchSize.pop( eId )
+      self.__held.pop( eId, None )
       return tasks
     finally:
       self.__lock.release()
@@ -68,11 +75,42 @@ class ExecutorState:
       return True
 
   def freeSlots( self, eId ):
+    if eId in self.__held:
+      return 0
     try:
       return self.__maxTasks[ eId ] - len( self.__execTasks[ eId ] )
     except KeyError:
       return 0
 
+  def batchSize( self, eId ):
+    try:
+      return self.__batchSize[ eId ]
+    except KeyError:
+      return 1
+
+  def hold( self, eId ):
+    """ No task is sent to the executor until it is released, used while
+        the results of a batch are processed
+    """
+    self.__lock.acquire()
+    try:
+      self.__held[ eId ] = self.__held.get( eId, 0 ) + 1
+    finally:
+      self.__lock.release()
+
+  def release( self, eId ):
+    self.__lock.acquire()
+    try:
+      if eId in self.__held:
+        self.__held[ eId ] -= 1
+        if self.__held[ eId ] < 1:
+          del self.__held[ eId ]
+    finally:
+      self.__lock.release()
+
+  def isHeld( self, eId ):
+    return eId in self.__held
+
   def getFreeExecutors( self, eType ):
     execs = {}
     try:
@@ -199,6 +237,29 @@ class ExecutorQueues:
     #Not found. release and return None
     return None
 
+  def popTasks( self, eTypes, maxTasks ):
+    """ Pop up to maxTasks tasks of the first of eTypes with waiting tasks,
+        returns ( [ taskId, ... ], eType ) or None
+    """
+    if type( eTypes ) not in ( types.ListType, types.TupleType ):
+      eTypes = [ eTypes ]
+    self.__lock.acquire()
+    try:
+      for eType in eTypes:
+        queue = self.__queues.get( eType )
+        if not queue:
+          continue
+        taskIds = queue[ :maxTasks ]
+        del queue[ :maxTasks ]
+        for taskId in taskIds:
+          del( self.__taskInQueue[ taskId ] )
+        self.__lastUse[ eType ] = time.time()
+        self.__log.verbose( "Popped tasks %s from executor %s waiting queue" % ( taskIds, eType ) )
+        return ( taskIds, eType )
+    finally:
+      self.__lock.release()
+    return None
+
   def getState( self ):
     self.__lock.acquire()
     try:
@@ -246,6 +307,11 @@ class ExecutorDispatcherCallbacks:
   def cbSendTask( self, taskId, taskObj, eId, eType ):
     return S_ERROR( "No send task callback defined" )
 
+  def cbSendTasks( self, tasks, eId, eType ):
+    """ Send a batch of [ ( taskId, taskObj ), ... ] in one message
+    """
+    return S_ERROR( "No send tasks callback defined" )
+
   def cbDisconectExecutor( self, eId ):
     return S_ERROR( "No disconnect callback defined" )
 
@@ -354,7 +420,7 @@ class ExecutorDispatcher:
         pass
     self.__monitor.addMark( "executors", len( self.__idMap ) )
 
-  def addExecutor( self, eId, eTypes, maxTasks = 1 ):
+  def addExecutor( self, eId, eTypes, maxTasks = 1, batchSize = 1 ):
     self.__log.verbose( "Adding new %s executor to the pool %s" % ( eId, ", ".join ( eTypes ) ) )
     self.__executorsLock.acquire()
     try:
@@ -363,7 +429,7 @@ class ExecutorDispatcher:
       if type( eTypes ) not in ( types.ListType, types.TupleType ):
         eTypes = [ eTypes ]
       self.__idMap[ eId ] = list( eTypes )
-      self.__states.addExecutor( eId, eTypes, maxTasks )
+      self.__states.addExecutor( eId, eTypes, maxTasks, batchSize )
       for eType in eTypes:
         if eType not in self.__execTypes:
           self.__execTypes[ eType ] = 0
@@ -738,6 +804,19 @@ class ExecutorDispatcher:
       return S_OK()
     return self.__dispatchTask( taskId )
 
+  def holdExecutor( self, eId ):
+    """ Stop sending tasks to an executor until releaseExecutor, so that the tasks
+        freed by the results of a batch are refilled with one batch
+    """
+    self.__states.hold( eId )
+
+  def releaseExecutor( self, eId ):
+    self.__states.release( eId )
+    while self.__states.freeSlots( eId ) > 0:
+      result = self.__sendTaskToExecutor( eId )
+      if not result[ 'OK' ] or not result[ 'Value' ]:
+        break
+
   def __fillExecutors( self, eType, defrozeIfNeeded = True ):
     if defrozeIfNeeded:
       self.__log.verbose( "Unfreezing tasks for %s" % eType )
@@ -758,6 +837,8 @@ class ExecutorDispatcher:
     self.__log.verbose( "No more idle executors for %s" % eType )
 
   def __sendTaskToExecutor( self, eId, eTypes = False, checkIdle = False ):
+    if self.__states.isHeld( eId ):
+      return S_OK()
     if checkIdle and self.__states.freeSlots( eId ) == 0:
       return S_OK()
     try:
@@ -774,6 +855,14 @@ class ExecutorDispatcher:
         except ValueError:
           pass
         searchTypes.append( eType )
+    batchSize = self.__states.batchSize( eId )
+    if batchSize > 1:
+      numTasks = min( batchSize, self.__states.freeSlots( eId ) )
+      #While busy the executor waits for room for a whole batch, so that tasks gather
+      if numTasks < 1 or ( numTasks < batchSize and self.__states.getTasksForExecutor( eId ) ):
+        return S_OK()
+      if numTasks > 1:
+        return self.__sendTasksToExecutor( eId, searchTypes, numTasks )
     pData = self.__queues.popTask( searchTypes )
     if pData == None:
       self.__log.verbose( "No more tasks for %s" % eTypes )
@@ -788,6 +877,43 @@ class ExecutorDispatcher:
       return result
     return S_OK( taskId )
 
+  def __sendTasksToExecutor( self, eId, searchTypes, numTasks ):
+    pData = self.__queues.popTasks( searchTypes, numTasks )
+    if pData == None:
+      self.__log.verbose( "No more tasks for %s" % searchTypes )
+      return S_OK()
+    taskIds, eType = pData
+    self.__log.verbose( "Sending %s tasks to %s=%s" % ( len( taskIds ), eType, eId ) )
+    tasks = []
+    now = time.time()
+    for taskId in taskIds:
+      self.__states.addTask( eId, taskId )
+      try:
+        eTask = self.__tasks[ taskId ]
+      except KeyError:
+        #Task deleted meanwhile
+        self.__states.removeTask( taskId )
+        continue
+      eTask.sendTime = now
+      tasks.append( ( taskId, eTask.taskObj ) )
+    if not tasks:
+      return S_OK( taskIds )
+    try:
+      result = self.__cbHolder.cbSendTasks( tasks, eId, eType )
+    except:
+      self.__log.exception( "Exception while sending tasks to executor" )
+      result = S_ERROR( "Exception while sending tasks to executor" )
+    if not isReturnStructure( result ):
+      errMsg = "Send tasks callback did not send back an S_OK/S_ERROR structure"
+      self.__log.fatal( errMsg )
+      result = S_ERROR( errMsg )
+    if not result[ 'OK' ]:
+      for taskId, _taskObj in reversed( tasks ):
+        self.__queues.pushTask( eType, taskId, ahead = True )
+        self.__states.removeTask( taskId )
+      return result
+    return S_OK( taskIds )
+
   def __msgTaskToExecutor( self, taskId, eId, eType ):
     try:
       self.__tasks[ taskId ].sendTime = time.time()
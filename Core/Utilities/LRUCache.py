@@ -0,0 +1,174 @@
+""" Bounded, thread safe, least recently used cache with hit counters
+
+    Entries can optionally expire after lifeTime seconds, to limit how long
+    a value changed by another process can be served from the cache, and
+    the cache can be bounded by the sum of the weights of the entries, such
+    as their size in bytes, on top of their number.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import threading
+
+# Positions in the linked list nodes
+PREV, NEXT, KEY, VALUE, EXPIRES, WEIGHT = range( 6 )
+
+class LRUCache( object ):
+
+  def __init__( self, maxSize = 10000, lifeTime = 0, maxWeight = 0 ):
+    """ maxSize is the maximum number of entries, lifeTime the validity of an
+        entry in seconds ( 0 for no expiration ) and maxWeight the maximum sum
+        of the weights of the entries ( 0 for no bound )
+    """
+    self.__maxSize = max( 1, maxSize )
+    self.__lifeTime = lifeTime
+    self.__maxWeight = maxWeight
+    self.__weight = 0
+    self.__lock = threading.Lock()
+    self.__cache = {}
+    # Circular doubly linked list, the root next is the most recently used entry
+    self.__root = []
+    self.__root[:] = [ self.__root, self.__root, None, None, 0, 0 ]
+    self.__hits = 0
+    self.__misses = 0
+
+  def __len__( self ):
+    return len( self.__cache )
+
+  def __contains__( self, key ):
+    return key in self.__cache
+
+  def __unlink( self, node ):
+    node[ PREV ][ NEXT ] = node[ NEXT ]
+    node[ NEXT ][ PREV ] = node[ PREV ]
+
+  def __remove( self, node ):
+    self.__unlink( node )
+    del( self.__cache[ node[ KEY ] ] )
+    self.__weight -= node[ WEIGHT ]
+
+  def __linkFirst( self, node ):
+    root = self.__root
+    node[ PREV ] = root
+    node[ NEXT ] = root[ NEXT ]
+    root[ NEXT ][ PREV ] = node
+    root[ NEXT ] = node
+
+  def get( self, key, default = None ):
+    """ Get the cached value for key, or default if not cached or expired
+    """
+    self.__lock.acquire()
+    try:
+      node = self.__cache.get( key )
+      if node is None:
+        self.__misses += 1
+        return default
+      if node[ EXPIRES ] and node[ EXPIRES ] < time.time():
+        self.__remove( node )
+        self.__misses += 1
+        return default
+      self.__unlink( node )
+      self.__linkFirst( node )
+      self.__hits += 1
+      return node[ VALUE ]
+    finally:
+      self.__lock.release()
+
+  def getMany( self, keys ):
+    """ Get a dict with the cached values of the given keys found in the cache
+    """
+    found = {}
+    for key in keys:
+      value = self.get( key )
+      if value is not None:
+        found[ key ] = value
+    return found
+
+  def put( self, key, value, weight = 1 ):
+    """ Cache value for key. Returns False if the weight of the value alone is
+        over the maximum weight, the value is not cached then
+    """
+    expires = 0
+    if self.__lifeTime:
+      expires = time.time() + self.__lifeTime
+    self.__lock.acquire()
+    try:
+      node = self.__cache.get( key )
+      if node is not None:
+        self.__remove( node )
+      if self.__maxWeight and weight > self.__maxWeight:
+        return False
+      while self.__cache and ( len( self.__cache ) >= self.__maxSize or
+                               ( self.__maxWeight and self.__weight + weight > self.__maxWeight ) ):
+        self.__remove( self.__root[ PREV ] )
+      node = [ None, None, key, value, expires, weight ]
+      self.__cache[ key ] = node
+      self.__weight += weight
+      self.__linkFirst( node )
+      return True
+    finally:
+      self.__lock.release()
+
+  def delete( self, key ):
+    self.__lock.acquire()
+    try:
+      node = self.__cache.get( key )
+      if node is None:
+        return False
+      self.__remove( node )
+      return True
+    finally:
+      self.__lock.release()
+
+  def deleteIf( self, condition ):
+    """ Delete the entries for which condition( key, value ) is True.
+        It goes through the whole cache, use it for rare invalidations
+    """
+    self.__lock.acquire()
+    try:
+      toDelete = [ node for node in self.__cache.values() if condition( node[ KEY ], node[ VALUE ] ) ]
+      for node in toDelete:
+        self.__remove( node )
+      return len( toDelete )
+    finally:
+      self.__lock.release()
+
+  def purgeExpired( self ):
+    """ Delete the expired entries, they are otherwise only deleted when looked up or evicted
+    """
+    if not self.__lifeTime:
+      return 0
+    now = time.time()
+    self.__lock.acquire()
+    try:
+      toDelete = [ node for node in self.__cache.values() if node[ EXPIRES ] < now ]
+      for node in toDelete:
+        self.__remove( node )
+      return len( toDelete )
+    finally:
+      self.__lock.release()
+
+  def clear( self ):
+    self.__lock.acquire()
+    try:
+      self.__cache = {}
+      self.__weight = 0
+      self.__root[:] = [ self.__root, self.__root, None, None, 0, 0 ]
+    finally:
+      self.__lock.release()
+
+  def getStats( self ):
+    """ Get the size, weight and hit counters of the cache
+    """
+    lookups = self.__hits + self.__misses
+    hitRate = 0.
+    if lookups:
+      hitRate = 100. * self.__hits / lookups
+    return { 'Size' : len( self.__cache ),
+             'MaxSize' : self.__maxSize,
+             'Weight' : self.__weight,
+             'MaxWeight' : self.__maxWeight,
+             'Hits' : self.__hits,
+             'Misses' : self.__misses,
+             'HitRate' : hitRate }
@@ -16,6 +16,9 @@
     that are kept for reuse. It also defined the maximum number of open
     connections available from the object.
     maxConnsInQueue = 0 means unlimited and it is not supported.
+    "maxConnections" is a hard limit of connections to the server shared by
+    all the instances with the same server and credentials, threads wait for
+    a free connection when it is reached. 0, the default, means no limit.
 
 
     _except( methodName, exception, errorMessage )
@@ -155,8 +158,11 @@ __RCSID__ = "$Id$"
 
 from DIRAC                                  import gLogger
 from DIRAC                                  import S_OK, S_ERROR
+from DIRAC                                  import gMonitor
+from DIRAC.Core.Utilities.ThreadScheduler   import gThreadScheduler
 from DIRAC.Core.Utilities.DataStructures    import MutableStruct
 from DIRAC.Core.Utilities                   import Time
+from DIRAC.Core.Utilities.ActionProfiler    import getCallProfile
 
 # Get rid of the annoying Deprecation warning of the current MySQLdb
 # FIXME: compile a newer MySQLdb version
@@ -180,9 +186,18 @@ gDebugFile = None
 import collections
 import time
 import threading
-from types import StringTypes, DictType, ListType, TupleType
+from types import StringTypes, DictType, ListType, TupleType, StringType, UnicodeType, IntType, LongType, \
+                  FloatType, BooleanType
 
 MAXCONNECTRETRY = 10
+#Functions that are not escaped as strings
+_SPECIALVALUES = ( 'UTC_TIMESTAMP', 'TIMESTAMPADD', 'TIMESTAMPDIFF' )
+#Settings of the connection pool when the number of connections is limited
+POOLPINGINTERVAL = 30
+POOLRECLAIMTIME = 2
+POOLWAITTIMEOUT = 30
+POOLREAPPERIOD = 5
+POOLMAXRETRYSLEEP = 5
 
 def _checkQueueSize( maxQueueSize ):
   """
@@ -240,10 +255,25 @@ class MySQL:
   class ConnectionPool( object ):
     """
     Management of connections per thread
-    """
-    __connData = MutableStruct( 'ConnData', [ 'conn', 'dbName', 'last', 'intrans' ] )
 
-    def __init__( self, host, user, passwd, port = 3306, graceTime = 600 ):
+    By default each thread gets its own connection and the number of connections
+    is not limited. With maxConnections the pool never opens more than that
+    number: threads without connection wait in order of arrival, connections not
+    used for reclaimTime seconds can be taken from their threads, pings are only
+    done every pingInterval seconds and unused connections are reaped by a
+    periodic task instead of on every get. Connections in a transaction or
+    holding table locks stay with their thread, any other session state
+    (temporary tables, user and session variables, named locks) can be lost
+    when the connection is reclaimed
+    """
+    __connData = MutableStruct( 'ConnData', [ 'conn', 'dbName', 'last', 'intrans', 'busy', 'pinged', 'locked' ] )
+    __latencyBuckets = ( ( 0.001, 'MySQLQueriesUnder1ms', "less than 1 ms" ),
+                         ( 0.01, 'MySQLQueriesUnder10ms', "1 to 10 ms" ),
+                         ( 0.1, 'MySQLQueriesUnder100ms', "10 to 100 ms" ),
+                         ( 1, 'MySQLQueriesUnder1s', "100 ms to 1 s" ),
+                         ( None, 'MySQLQueriesOver1s', "more than 1 s" ) )
+
+    def __init__( self, host, user, passwd, port = 3306, graceTime = 600, maxConnections = 0 ):
       self.__host = host
       self.__user = user
       self.__passwd = passwd
@@ -253,6 +283,27 @@ class MySQL:
       self.__maxSpares = 10
       self.__lastClean = 0
       self.__assigned = {}
+      self.__lock = threading.Lock()
+      self.__waitCondition = threading.Condition( self.__lock )
+      self.__waiters = collections.deque()
+      self.__numConns = 0
+      self.__maxConns = 0
+      self.__pingInterval = 0
+      self.__stats = {}
+      self.__resetStats()
+      self.setMaxConnections( maxConnections )
+      result = gThreadScheduler.addPeriodicTask( POOLREAPPERIOD, self.__periodicTask )
+      if not result[ 'OK' ]:
+        gLogger.error( "Cannot add MySQL connection pool task to thread scheduler", result[ 'Message' ] )
+
+    def setMaxConnections( self, maxConnections ):
+      """
+      Limit the number of connections. The pool keeps the highest limit requested
+      """
+      if maxConnections > self.__maxConns:
+        self.__maxConns = maxConnections
+        self.__maxSpares = maxConnections
+        self.__pingInterval = POOLPINGINTERVAL
 
     @property
     def __thid( self ):
@@ -275,28 +326,56 @@ class MySQL:
 
     def get( self, dbName, retries = 10 ):
       retries = max( 0, min( MAXCONNECTRETRY, retries ) )
-      self.clean()
+      if not self.__maxConns:
+        self.clean()
       result = self.__getWithRetry( dbName, retries, retries )
       if not result[ 'OK' ]:
         return result
       return S_OK( result[ 'Value' ].conn )
 
+    def done( self, queryTime = None, cmd = None ):
+      """
+      The thread has finished using its connection for now. It stays assigned to
+      the thread, but it can be reclaimed if the pool is full unless cmd has left
+      tables locked
+      """
+      try:
+        connData = self.__assigned[ self.__thid ]
+      except KeyError:
+        return
+      connData.busy = False
+      connData.last = time.time()
+      if cmd:
+        statement = cmd.lstrip()[:12].upper()
+        if statement.startswith( "UNLOCK TABLE" ):
+          connData.locked = False
+        elif statement.startswith( "LOCK TABLE" ) and queryTime is not None:
+          connData.locked = True
+      if queryTime is not None:
+        for limit, name, _description in self.__latencyBuckets:
+          if limit is None or queryTime < limit:
+            self.__stats[ name ] += 1
+            break
+
     def __getWithRetry( self, dbName, totalRetries = 10, retriesLeft = 10 ):
-      sleepTime = 5 * ( totalRetries - retriesLeft )
-      if sleepTime > 0:
-        time.sleep( sleepTime )
+      attempt = totalRetries - retriesLeft
+      if attempt > 0:
+        if self.__maxConns:
+          time.sleep( min( POOLMAXRETRYSLEEP, 0.1 * 2 ** attempt ) )
+        else:
+          time.sleep( 5 * attempt )
       try:
         connData, thid = self.__innerGet()
       except MySQLdb.MySQLError, excp:
         if retriesLeft >= 0:
           return self.__getWithRetry( dbName, totalRetries, retriesLeft - 1 )
         return S_ERROR( "Could not connect: %s" % excp )
+      if not connData:
+        return S_ERROR( "Timeout waiting for a MySQL connection" )
 
-      if not connData.intrans and not self.__ping( connData.conn ):
-        try:
-          self.__assigned.pop( thid )
-        except KeyError:
-          pass
+      #A ping may reconnect, losing the transaction or the table locks
+      if not ( connData.intrans or connData.locked ) and not self.__ping( connData ):
+        self.__discard( thid )
         if retriesLeft >= 0:
           return self.__getWithRetry( dbName, totalRetries, retriesLeft )
         return S_ERROR( "Could not connect" )
@@ -306,18 +385,19 @@ class MySQL:
           connData.conn.select_db( dbName )
           connData.dbName = dbName
         except MySQLdb.MySQLError, excp:
-          try:
-            self.__assigned.pop( thid ).conn.close()
-          except Exception:
-            pass
+          self.__discard( thid )
           if retriesLeft >= 0:
             return self.__getWithRetry( dbName, totalRetries, retriesLeft - 1 )
           return S_ERROR( "Could not select db %s: %s" % ( dbName, excp ) )
       return S_OK( connData )
 
-    def __ping( self, conn ):
+    def __ping( self, connData ):
+      now = time.time()
+      if self.__pingInterval and now - connData.pinged < self.__pingInterval:
+        return True
       try:
-        conn.ping( True )
+        connData.conn.ping( True )
+        connData.pinged = now
         return True
       except:
         return False
@@ -325,30 +405,162 @@ class MySQL:
     def __innerGet( self ):
       thid = self.__thid
       now = time.time()
+      #Lock so the connection can't be reclaimed while it's being taken
+      self.__lock.acquire()
       try:
-        data = self.__assigned[ thid ]
-        data.last = now
-        return data, thid
-      except KeyError:
+        try:
+          data = self.__assigned[ thid ]
+          data.last = now
+          data.busy = True
+          return data, thid
+        except KeyError:
+          pass
+        #Not cached
+        connData = self.__takeConn( now )
+        if connData is None:
+          connData = self.__waitForConn( now )
+          if connData is None:
+            return None, thid
+      finally:
+        self.__lock.release()
+      if connData is True:
+        #There's room for a new connection
+        try:
+          connData = self.__connData( self.__newConn(), "", now, False, True, now, False )
+        except:
+          self.__lock.acquire()
+          try:
+            self.__numConns -= 1
+            self.__wakeUpWaiter()
+          finally:
+            self.__lock.release()
+          raise
+      connData.last = time.time()
+      connData.busy = True
+      self.__assigned[ thid ] = connData
+      return connData, thid
+
+    def __takeConn( self, now ):
+      """
+      Get a spare connection, True if a new one can be opened or None if the pool is full.
+      Called with the lock held
+      """
+      if self.__waiters:
+        return None
+      if self.__spares:
+        return self.__spares.pop()
+      if not self.__maxConns or self.__numConns < self.__maxConns:
+        self.__numConns += 1
+        return True
+      return self.__reclaim( now )
+
+    def __reclaim( self, now ):
+      """
+      Take the connection that has been unused for longer from its thread.
+      Called with the lock held
+      """
+      candidate = None
+      for thid in list( self.__assigned ):
+        try:
+          data = self.__assigned[ thid ]
+        except KeyError:
+          continue
+        if data.intrans or data.locked or ( data.busy and thid.isAlive() ):
+          continue
+        if thid.isAlive() and now - data.last < POOLRECLAIMTIME:
+          continue
+        if not candidate or data.last < candidate[1].last:
+          candidate = ( thid, data )
+      if not candidate:
+        return None
+      self.__stats[ 'reclaimed' ] += 1
+      #It may have just been cleaned
+      return self.__assigned.pop( candidate[0], None )
+
+    def __waitForConn( self, start ):
+      """
+      Wait in order of arrival for a connection. Called with the lock held
+      """
+      waiter = [ None ]
+      self.__waiters.append( waiter )
+      try:
+        while waiter[0] is None:
+          now = time.time()
+          if self.__waiters[0] is waiter:
+            #First in the queue, look for connections that can be reclaimed
+            waiter[0] = self.__reclaim( now )
+            if waiter[0] is not None:
+              break
+          timeLeft = start + POOLWAITTIMEOUT - now
+          if timeLeft <= 0:
+            self.__stats[ 'timeouts' ] += 1
+            return None
+          self.__waitCondition.wait( min( timeLeft, 0.1 ) )
+      finally:
+        self.__waiters.remove( waiter )
+        self.__stats[ 'waits' ] += 1
+        self.__stats[ 'waitTime' ] += time.time() - start
+      return waiter[0]
+
+    def __wakeUpWaiter( self ):
+      """
+      Give a free slot to the first waiting thread. Called with the lock held
+      """
+      for waiter in self.__waiters:
+        if waiter[0] is None:
+          self.__numConns += 1
+          waiter[0] = True
+          self.__waitCondition.notifyAll()
+          return True
+      return False
+
+    def __giveBack( self, connData ):
+      """
+      Hand a connection to the first waiting thread or keep it as spare
+      """
+      self.__lock.acquire()
+      try:
+        for waiter in self.__waiters:
+          if waiter[0] is None:
+            waiter[0] = connData
+            self.__waitCondition.notifyAll()
+            return
+        if len( self.__spares ) < self.__maxSpares:
+          self.__spares.append( connData )
+          return
+        self.__numConns -= 1
+      finally:
+        self.__lock.release()
+      connData.conn.close()
+
+    def __close( self, connData ):
+      try:
+        connData.conn.close()
+      except Exception:
         pass
-      #Not cached
+      self.__lock.acquire()
       try:
-        connData = self.__spares.pop()
-      except IndexError:
-        connData = self.__connData( self.__newConn(), "", now, False )
+        self.__numConns -= 1
+        self.__wakeUpWaiter()
+      finally:
+        self.__lock.release()
 
-      self.__assigned[ thid ] = connData
-      return self.__assigned[ thid ], thid
+    def __discard( self, thid ):
+      try:
+        connData = self.__assigned.pop( thid )
+      except KeyError:
+        return
+      self.__close( connData )
 
     def __pop( self, thid ):
       try:
         connData = self.__assigned.pop( thid )
       except KeyError:
         return
-      if not connData.intrans and len( self.__spares ) < self.__maxSpares:
-        self.__spares.append( connData )
+      if connData.intrans or connData.locked:
+        self.__close( connData )
       else:
-        connData.conn.close()
+        self.__giveBack( connData )
 
     def clean( self, now = False ):
       if not now:
@@ -365,6 +577,69 @@ class MySQL:
         if now - data.last > self.__graceTime:
           self.__pop( thid )
 
+    def __reapSpares( self, now ):
+      toClose = []
+      self.__lock.acquire()
+      try:
+        for connData in list( self.__spares ):
+          if now - connData.last > self.__graceTime:
+            self.__spares.remove( connData )
+            toClose.append( connData )
+      finally:
+        self.__lock.release()
+      for connData in toClose:
+        self.__close( connData )
+
+    def __resetStats( self ):
+      self.__stats = { 'waits' : 0, 'waitTime' : 0.0, 'timeouts' : 0, 'reclaimed' : 0 }
+      for _limit, name, _description in self.__latencyBuckets:
+        self.__stats[ name ] = 0
+
+    def getStats( self ):
+      """
+      Occupancy of the pool and counters since the last report to the monitoring
+      """
+      stats = dict( self.__stats )
+      stats[ 'open' ] = self.__numConns
+      stats[ 'inUse' ] = len( [ data for data in self.__assigned.values() if data.busy ] )
+      stats[ 'assigned' ] = len( self.__assigned )
+      stats[ 'spare' ] = len( self.__spares )
+      stats[ 'waiting' ] = len( self.__waiters )
+      stats[ 'max' ] = self.__maxConns
+      return stats
+
+    def __periodicTask( self ):
+      if self.__maxConns:
+        now = time.time()
+        self.clean( now )
+        self.__reapSpares( now )
+      self.__report()
+
+    def __report( self ):
+      """
+      Send occupancy, wait times and the query latency histogram to the monitoring
+      """
+      stats = self.getStats()
+      self.__resetStats()
+      marks = [ ( 'MySQLConnectionsOpen', "MySQL open connections", 'connections', gMonitor.OP_MEAN,
+                  stats[ 'open' ] ),
+                ( 'MySQLConnectionsInUse', "MySQL connections in use", 'connections', gMonitor.OP_MEAN,
+                  stats[ 'inUse' ] ),
+                ( 'MySQLConnectionWaits', "Waits for a MySQL connection", 'waits', gMonitor.OP_SUM,
+                  stats[ 'waits' ] ),
+                ( 'MySQLConnectionWaitTime', "Mean wait for a MySQL connection", 'ms', gMonitor.OP_MEAN,
+                  1000.0 * stats[ 'waitTime' ] / max( 1, stats[ 'waits' ] ) ) ]
+      for _limit, name, description in self.__latencyBuckets:
+        marks.append( ( name, "MySQL queries taking %s" % description, 'queries', gMonitor.OP_SUM,
+                        stats[ name ] ) )
+      for name, description, unit, operation, value in marks:
+        if name not in gMonitor.activitiesDefinitions:
+          gMonitor.registerActivity( name, description, 'MySQL', unit, operation )
+          #The monitoring client may still not be initialized
+          if name not in gMonitor.activitiesDefinitions:
+            continue
+        gMonitor.addMark( name, value )
+
     def transactionStart( self, dbName ):
       print "TRANS START"
       result = self.__getWithRetry( dbName )
@@ -410,9 +685,12 @@ class MySQL:
 
   __connectionPools = {}
 
-  def __init__( self, hostName, userName, passwd, dbName, port = 3306, maxQueueSize = 3, debug = False ):
+  def __init__( self, hostName, userName, passwd, dbName, port = 3306, maxQueueSize = 3, debug = False,
+                maxConnections = 0 ):
     """
     set MySQL connection parameters and try to connect
+    maxConnections limits the number of connections of the pool shared by all the
+    instances using the same server and credentials, 0 means no limit
     """
     global gInstancesCount, gDebugFile
     gInstancesCount += 1
@@ -434,10 +712,12 @@ class MySQL:
     self.__passwd = str( passwd )
     self.__dbName = str( dbName )
     self.__port = port
+    self.__maxAllowedPacket = 0
     cKey = ( self.__hostName, self.__userName, self.__passwd, self.__port )
     if cKey not in MySQL.__connectionPools:
       MySQL.__connectionPools[ cKey ] = MySQL.ConnectionPool( *cKey )
     self.__connectionPool = MySQL.__connectionPools[ cKey ]
+    self.__connectionPool.setMaxConnections( maxConnections )
 
     self.__initialized = True
     result = self._connect()
@@ -487,15 +767,13 @@ class MySQL:
       return retDict
     connection = retDict['Value']
 
-    specialValues = ( 'UTC_TIMESTAMP', 'TIMESTAMPADD', 'TIMESTAMPDIFF' )
-
     try:
       myString = str( myString )
     except ValueError:
       return S_ERROR( "Cannot escape value!" )
 
     try:
-      for sV in specialValues:
+      for sV in _SPECIALVALUES:
         if myString.find( sV ) == 0:
           return S_OK( myString )
       escape_string = connection.escape_string( str( myString ) )
@@ -504,6 +782,8 @@ class MySQL:
     except Exception, x:
       self.log.debug( '__escape_string: Could not escape string', '"%s"' % myString )
       return self._except( '__escape_string', x, 'Could not escape string' )
+    finally:
+      self.__connectionPool.done()
 
   def __checkTable( self, tableName, force = False ):
 
@@ -621,10 +901,12 @@ class MySQL:
 
     try:
       cursor = connection.cursor()
+      queryStart = time.time()
       if cursor.execute( cmd ):
         res = cursor.fetchall()
       else:
         res = ()
+      queryTime = time.time() - queryStart
 
       # Log the result limiting it to just 10 records
       if len( res ) <= 10:
@@ -644,11 +926,16 @@ class MySQL:
     except Exception , x:
       self.log.warn( '_query:', cmd )
       retDict = self._except( '_query', x, 'Execution failed.' )
+      queryTime = None
 
     try:
       cursor.close()
     except Exception:
       pass
+    self.__connectionPool.done( queryTime, cmd )
+    callProfile = getCallProfile()
+    if callProfile and queryTime is not None:
+      callProfile.addSQLTime( queryTime, cmd )
 
     if gDebugFile:
       print >> gDebugFile, time.time() - start, cmd.replace( '\n', '' )
@@ -680,7 +967,9 @@ class MySQL:
 
     try:
       cursor = connection.cursor()
+      queryStart = time.time()
       res = cursor.execute( cmd )
+      queryTime = time.time() - queryStart
       # connection.commit()
       if debug:
         self.log.debug( '_update:', res )
@@ -692,11 +981,16 @@ class MySQL:
     except Exception, x:
       self.log.warn( '_update: %s: %s' % ( cmd, str( x ) ) )
       retDict = self._except( '_update', x, 'Execution failed.' )
+      queryTime = None
 
     try:
       cursor.close()
     except Exception:
       pass
+    self.__connectionPool.done( queryTime, cmd )
+    callProfile = getCallProfile()
+    if callProfile and queryTime is not None:
+      callProfile.addSQLTime( queryTime, cmd )
 
     if gDebugFile:
       print >> gDebugFile, time.time() - start, cmd.replace( '\n', '' )
@@ -735,9 +1029,11 @@ class MySQL:
       self.logger.execption( error )
       # # rollback, put back connection to the pool
       connection.rollback()
+      self.__connectionPool.done()
       return S_ERROR( error )
     # # close cursor, put back connection to the pool
     cursor.close()
+    self.__connectionPool.done()
     return S_OK( cmdRet )
 
   def _createViews( self, viewsDict, force = False ):
@@ -1524,6 +1820,139 @@ class MySQL:
     return self._update( 'INSERT INTO %s %s VALUES %s' %
                          ( table, inFieldString, inValueString ), conn, debug = True )
 
+  def insertMany( self, tableName, fields, rows, conn = None, ignore = False ):
+    """
+      Insert many rows in "tableName" with as few statements as possible.
+      Each row is a list or tuple with the values of "fields" in the same order.
+      String type values are escaped and None values are inserted as NULL.
+      Statements are split to fit in the max_allowed_packet of the server, if
+      one of them fails the rows of the previous ones stay inserted.
+      With "ignore" rows with duplicated keys are skipped.
+
+      Returns S_OK with the number of affected rows
+    """
+    command = 'INSERT'
+    if ignore:
+      command = 'INSERT IGNORE'
+    return self.__insertMany( command, tableName, fields, rows, '', conn )
+
+  def upsertMany( self, tableName, fields, rows, updateFields = None, conn = None, accumulate = False, append = False ):
+    """
+      Same as insertMany but rows that already exist, by primary or unique key,
+      get the "updateFields" (all the "fields" by default) updated with the new values.
+      With "accumulate" the new values are added to the existing ones instead,
+      with "append" they are concatenated to them.
+
+      Returns S_OK with the number of affected rows, as given by MySQL
+      (1 for each inserted row and 2 for each updated one)
+    """
+    if updateFields is None:
+      updateFields = fields
+    if not updateFields:
+      return S_ERROR( 'Nothing to update' )
+    for field in updateFields:
+      if field not in fields:
+        return S_ERROR( 'Field %s to update is not inserted' % field )
+    if accumulate:
+      updateFormat = '`%(field)s` = `%(field)s` + VALUES( `%(field)s` )'
+    elif append:
+      updateFormat = '`%(field)s` = CONCAT( `%(field)s`, VALUES( `%(field)s` ) )'
+    else:
+      updateFormat = '`%(field)s` = VALUES( `%(field)s` )'
+    update = ' ON DUPLICATE KEY UPDATE %s' % ', '.join( [ updateFormat % { 'field' : field }
+                                                          for field in updateFields ] )
+    return self.__insertMany( 'INSERT', tableName, fields, rows, update, conn )
+
+  def __insertMany( self, command, tableName, fields, rows, suffix, conn ):
+    table = _quotedList( [tableName] )
+    if not table:
+      return S_ERROR( 'Invalid tableName argument' )
+    fieldString = _quotedList( fields )
+    if not fieldString:
+      return S_ERROR( 'Invalid fields argument' )
+
+    retDict = self.__escapeRows( rows, len( fields ) )
+    if not retDict['OK']:
+      self.log.warn( 'insertMany:', retDict['Message'] )
+      return retDict
+    escapedRows = retDict['Value']
+    if not escapedRows:
+      return S_OK( 0 )
+
+    header = '%s INTO %s ( %s ) VALUES ' % ( command, table, fieldString )
+    maxSize = self.__getMaxStatementSize() - len( header ) - len( suffix )
+    self.log.verbose( 'insertMany:', 'inserting %s rows into table %s' % ( len( escapedRows ), table ) )
+    affected = 0
+    start = 0
+    while start < len( escapedRows ):
+      #Add rows to the statement while it fits, always at least one
+      end = start + 1
+      size = len( escapedRows[ start ] )
+      while end < len( escapedRows ) and size + len( escapedRows[ end ] ) + 1 <= maxSize:
+        size += len( escapedRows[ end ] ) + 1
+        end += 1
+      retDict = self._update( '%s%s%s' % ( header, ','.join( escapedRows[ start:end ] ), suffix ), conn )
+      if not retDict['OK']:
+        return retDict
+      affected += retDict['Value']
+      start = end
+    return S_OK( affected )
+
+  def __escapeRows( self, rows, numFields ):
+    """
+      Escape all the values of the rows using one connection and return
+      a list of "( value, ... )" strings
+    """
+    retDict = self.__getConnection()
+    if not retDict['OK']:
+      return retDict
+    escape = retDict['Value'].escape_string
+    quoted = []
+    try:
+      try:
+        for row in rows:
+          if len( row ) != numFields:
+            return S_ERROR( 'Row %s does not have %s values' % ( str( row ), numFields ) )
+          values = []
+          for value in row:
+            valueType = type( value )
+            if valueType == StringType:
+              if value.startswith( _SPECIALVALUES ):
+                values.append( value )
+              else:
+                values.append( '"%s"' % escape( value ) )
+            elif valueType in ( IntType, LongType ):
+              values.append( str( value ) )
+            elif value is None:
+              values.append( 'NULL' )
+            elif valueType == FloatType:
+              values.append( repr( value ) )
+            elif valueType == BooleanType:
+              values.append( str( int( value ) ) )
+            elif valueType == UnicodeType:
+              values.append( '"%s"' % escape( value.encode( 'utf-8' ) ) )
+            else:
+              values.append( '"%s"' % escape( str( value ) ) )
+          quoted.append( '(%s)' % ','.join( values ) )
+      except Exception, x:
+        return self._except( 'insertMany', x, 'Could not escape values' )
+    finally:
+      self.__connectionPool.done()
+    return S_OK( quoted )
+
+  def __getMaxStatementSize( self ):
+    """
+      Size of the statements sent to the server, with some margin below its max_allowed_packet
+    """
+    if not self.__maxAllowedPacket:
+      retDict = self._query( "SHOW VARIABLES LIKE 'max_allowed_packet'" )
+      if retDict['OK'] and retDict['Value']:
+        self.__maxAllowedPacket = int( retDict['Value'][0][1] )
+      else:
+        #Default of the MySQL servers
+        return 1048576 * 9 / 10
+    return self.__maxAllowedPacket * 9 / 10
+
 #####################################################################################
 #
 #   This is a test code for this class, it requires access to a MySQL DB
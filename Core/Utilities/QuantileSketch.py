@@ -0,0 +1,125 @@
+""" Compact sketch of a distribution of numbers to estimate its quantiles
+
+    Values are counted in buckets whose width grows geometrically, so any
+    quantile is estimated with a relative error of at most relativeAccuracy,
+    whatever the number of values added. The sketch keeps at most maxBuckets
+    buckets for the positive values and as many for the negative ones: when
+    there are more, the ones closest to zero are merged, which only loses
+    accuracy on the values of smallest magnitude. Sketches with the same
+    accuracy can be merged, for example to join the sketches of several threads.
+"""
+
+__RCSID__ = "$Id$"
+
+import math
+
+class QuantileSketch( object ):
+
+  def __init__( self, relativeAccuracy = 0.01, maxBuckets = 1024 ):
+    self.__relativeAccuracy = relativeAccuracy
+    self.__gamma = ( 1 + relativeAccuracy ) / ( 1 - relativeAccuracy )
+    self.__logGamma = math.log( self.__gamma )
+    self.__maxBuckets = max( 1, maxBuckets )
+    self.__positive = {}
+    self.__negative = {}
+    self.__zeros = 0
+    self.count = 0
+    self.minValue = None
+    self.maxValue = None
+
+  def __len__( self ):
+    return self.count
+
+  def add( self, value ):
+    """ Add a value to the sketch
+    """
+    if value > 0:
+      self.__addToBuckets( self.__positive, value )
+    elif value < 0:
+      self.__addToBuckets( self.__negative, -value )
+    else:
+      self.__zeros += 1
+    self.count += 1
+    if self.minValue is None or value < self.minValue:
+      self.minValue = value
+    if self.maxValue is None or value > self.maxValue:
+      self.maxValue = value
+
+  def __addToBuckets( self, buckets, value ):
+    key = int( math.ceil( math.log( value ) / self.__logGamma ) )
+    if key in buckets:
+      buckets[ key ] += 1
+    else:
+      buckets[ key ] = 1
+      if len( buckets ) > self.__maxBuckets:
+        self.__collapse( buckets )
+
+  def __collapse( self, buckets ):
+    """ Merge the buckets closest to zero until there are maxBuckets
+    """
+    keys = sorted( buckets )
+    extra = len( keys ) - self.__maxBuckets
+    for key in keys[ :extra ]:
+      buckets[ keys[ extra ] ] += buckets.pop( key )
+
+  def merge( self, sketch ):
+    """ Add the values of another sketch with the same accuracy to this one
+    """
+    if sketch.__relativeAccuracy != self.__relativeAccuracy:
+      raise ValueError( "Cannot merge sketches of different accuracy" )
+    for buckets, otherBuckets in ( ( self.__positive, sketch.__positive ), ( self.__negative, sketch.__negative ) ):
+      for key, count in otherBuckets.items():
+        buckets[ key ] = buckets.get( key, 0 ) + count
+      if len( buckets ) > self.__maxBuckets:
+        self.__collapse( buckets )
+    self.__zeros += sketch.__zeros
+    self.count += sketch.count
+    for value in ( sketch.minValue, sketch.maxValue ):
+      if value is None:
+        continue
+      if self.minValue is None or value < self.minValue:
+        self.minValue = value
+      if self.maxValue is None or value > self.maxValue:
+        self.maxValue = value
+
+  def __bucketValue( self, key ):
+    """ Value in the middle of a bucket, in relative terms
+    """
+    return 2 * self.__gamma ** key / ( self.__gamma + 1 )
+
+  def quantile( self, fraction ):
+    """ Estimate the value below which fraction ( 0 to 1 ) of the values are,
+        None if the sketch is empty
+    """
+    if not self.count:
+      return None
+    rank = max( 0.0, min( 1.0, fraction ) ) * ( self.count - 1 )
+    if rank <= 0:
+      return self.minValue
+    if rank >= self.count - 1:
+      return self.maxValue
+    seen = 0
+    value = None
+    for key in sorted( self.__negative, reverse = True ):
+      seen += self.__negative[ key ]
+      if seen > rank:
+        value = -self.__bucketValue( key )
+        break
+    if value is None:
+      seen += self.__zeros
+      if seen > rank:
+        value = 0
+    if value is None:
+      for key in sorted( self.__positive ):
+        seen += self.__positive[ key ]
+        if seen > rank:
+          value = self.__bucketValue( key )
+          break
+    if value is None:
+      value = self.maxValue
+    return max( self.minValue, min( self.maxValue, value ) )
+
+  def quantiles( self, fractions ):
+    """ Estimate several quantiles at once
+    """
+    return [ self.quantile( fraction ) for fraction in fractions ]
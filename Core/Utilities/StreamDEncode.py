@@ -0,0 +1,223 @@
+# $HeadURL$
+"""
+Streaming engine for the DEncode wire format
+
+The encoder walks the object graph iteratively and writes every token into a
+single output buffer instead of recursing through one function per type. The
+decoder works in place on the received buffer: it starts at any offset of the
+data and only slices out the bytes of the final values, so the transport does
+not need to cut the message out of its byte stream before decoding it.
+
+The produced stream is byte for byte the same as the one produced by
+DEncode, and any stream produced by DEncode can be decoded by this engine:
+ i -> int
+ I -> long
+ f -> float
+ b -> bool
+ s -> string
+ u -> unicode
+ z -> datetime
+ n -> none
+ l -> list
+ t -> tuple
+ d -> dictionary
+"""
+__RCSID__ = "$Id$"
+
+import types
+import datetime
+from itertools import chain, izip
+
+_dateTimeType = datetime.datetime
+_dateType = datetime.date
+_timeType = datetime.time
+
+_IntType = types.IntType
+_LongType = types.LongType
+_FloatType = types.FloatType
+_BooleanType = types.BooleanType
+_StringType = types.StringType
+_UnicodeType = types.UnicodeType
+_NoneType = types.NoneType
+_ListType = types.ListType
+_TupleType = types.TupleType
+_DictType = types.DictType
+
+_chainItems = chain.from_iterable
+
+def encode( uObject ):
+  """ Encode an object into a DEncode string
+
+    :param uObject: object to encode
+    :return: encoded string
+  """
+  eList = []
+  write = eList.append
+  extend = eList.extend
+  stack = []
+  pending = iter( ( uObject, ) )
+  while True:
+    for obj in pending:
+      objType = type( obj )
+      if objType is _StringType:
+        extend( ( "s", str( len( obj ) ), ":", obj ) )
+      elif objType is _IntType:
+        extend( ( "i", str( obj ), "e" ) )
+      elif objType is _DictType:
+        write( "d" )
+        stack.append( pending )
+        #Keys are unique so sorting the items sorts by key, as DEncode does
+        pending = _chainItems( sorted( obj.iteritems() ) )
+        break
+      elif objType is _ListType:
+        write( "l" )
+        stack.append( pending )
+        pending = iter( obj )
+        break
+      elif objType is _TupleType:
+        write( "t" )
+        stack.append( pending )
+        pending = iter( obj )
+        break
+      elif objType is _FloatType:
+        extend( ( "f", str( obj ), "e" ) )
+      elif objType is _NoneType:
+        write( "n" )
+      elif objType is _BooleanType:
+        if obj:
+          write( "b1" )
+        else:
+          write( "b0" )
+      elif objType is _LongType:
+        extend( ( "I", str( obj ), "e" ) )
+      elif objType is _UnicodeType:
+        valueStr = obj.encode( 'utf-8' )
+        extend( ( "u", str( len( valueStr ) ), ":", valueStr ) )
+      elif objType is _dateTimeType and obj.tzinfo is None:
+        write( "zati%sei%sei%sei%sei%sei%sei%sene" % ( obj.year, obj.month, obj.day,
+                                                       obj.hour, obj.minute, obj.second,
+                                                       obj.microsecond ) )
+      elif objType is _dateTimeType:
+        write( "zat" )
+        stack.append( pending )
+        pending = iter( ( obj.year, obj.month, obj.day,
+                          obj.hour, obj.minute, obj.second,
+                          obj.microsecond, obj.tzinfo ) )
+        break
+      elif objType is _dateType:
+        write( "zdt" )
+        stack.append( pending )
+        pending = iter( ( obj.year, obj.month, obj.day ) )
+        break
+      elif objType is _timeType:
+        write( "ztt" )
+        stack.append( pending )
+        pending = iter( ( obj.hour, obj.minute, obj.second, obj.microsecond, obj.tzinfo ) )
+        break
+      else:
+        #Same behaviour as DEncode for types it does not know
+        raise KeyError( objType )
+    else:
+      if not stack:
+        break
+      write( "e" )
+      pending = stack.pop()
+  return "".join( eList )
+
+def decode( data, offset = 0 ):
+  """ Decode a DEncode stream starting at a given position of the data
+
+    :param data: string containing the encoded object
+    :param offset: position of the data where the object starts
+    :return: tuple ( decoded object, position right after the object )
+  """
+  if not data:
+    return data
+  dataLen = len( data )
+  index = data.index
+  i = offset
+  #Every container is accumulated as a flat list of values (keys and values
+  #alternate for dictionaries) and converted when its end mark is found
+  stack = []
+  container = None
+  cType = None
+  append = None
+  while True:
+    c = data[ i ]
+    if c == "s":
+      colon = index( ":", i + 1 )
+      i = colon + 1 + int( data[ i + 1 : colon ] )
+      value = data[ colon + 1 : i ]
+    elif c == "i":
+      end = index( "e", i + 1 )
+      value = int( data[ i + 1 : end ] )
+      i = end + 1
+    elif c == "e":
+      #End of the current container
+      if cType is None:
+        raise ValueError( "Unexpected end of container at position %s" % i )
+      i += 1
+      if cType == "d":
+        items = iter( container )
+        value = dict( izip( items, items ) )
+      elif cType == "l":
+        value = container
+      elif cType == "t":
+        value = tuple( container )
+      elif cType == "za":
+        value = datetime.datetime( *container )
+      elif cType == "zd":
+        value = datetime.date( *container )
+      else:
+        value = datetime.time( *container )
+      container, cType = stack.pop()
+      if cType is not None:
+        append = container.append
+    elif c == "d" or c == "l" or c == "t":
+      stack.append( ( container, cType ) )
+      container = []
+      append = container.append
+      cType = c
+      i += 1
+      continue
+    elif c == "z":
+      dtType = data[ i + 1 ]
+      if dtType not in ( "a", "d", "t" ):
+        raise Exception( "Unexpected type %s while decoding a datetime object" % dtType )
+      if data[ i + 2 ] not in ( "t", "l" ):
+        raise Exception( "Unexpected type %s while decoding a datetime object" % data[ i + 2 ] )
+      #The datetime components come as a sequence, decode them as the container contents
+      stack.append( ( container, cType ) )
+      container = []
+      append = container.append
+      cType = "z" + dtType
+      i += 3
+      continue
+    elif c == "n":
+      value = None
+      i += 1
+    elif c == "f":
+      end = index( "e", i + 1 )
+      if end + 1 < dataLen and data[ end + 1 ] in ( "+", "-" ):
+        eI = end
+        end = index( "e", end + 1 )
+        value = float( data[ i + 1 : eI ] ) * 10 ** int( data[ eI + 1 : end ] )
+      else:
+        value = float( data[ i + 1 : end ] )
+      i = end + 1
+    elif c == "b":
+      value = data[ i + 1 ] != "0"
+      i += 2
+    elif c == "u":
+      colon = index( ":", i + 1 )
+      i = colon + 1 + int( data[ i + 1 : colon ] )
+      value = unicode( data[ colon + 1 : i ], 'utf-8' )
+    elif c == "I":
+      end = index( "e", i + 1 )
+      value = long( data[ i + 1 : end ] )
+      i = end + 1
+    else:
+      raise KeyError( c )
+    if cType is None:
+      return ( value, i )
+    append( value )
@@ -0,0 +1,70 @@
+""" Test cases for ActionProfiler
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+import pstats
+import tempfile
+import unittest
+from DIRAC.Core.Utilities.ActionProfiler import ActionProfiler, getCallProfile, HISTOGRAM_BINS
+
+class ActionProfilerTestCase( unittest.TestCase ):
+
+  def serve( self, profiler, action, sleepTime, ok = True ):
+    callProfile = profiler.startCall( action, handshakeTime = 0.001 )
+    try:
+      self.assert_( getCallProfile() is callProfile )
+      getCallProfile().addSQLTime( sleepTime / 2, "SELECT %s" % sleepTime )
+      callProfile.runProfiled( time.sleep, sleepTime )
+      callProfile.addPhaseTime( 'execute', sleepTime )
+      callProfile.ok = ok
+    finally:
+      profiler.endCall( callProfile )
+
+  def test01statistics( self ):
+    """ calls are counted per action with their latency, phases and SQL time """
+    profiler = ActionProfiler( sampleRate = 0 )
+    for sleepTime in ( 0.01, 0.02, 0.03 ):
+      self.serve( profiler, 'RPC/a', sleepTime )
+    self.serve( profiler, 'RPC/b', 0.01, ok = False )
+    self.assert_( getCallProfile() is None )
+    data = profiler.getData()
+    self.assertEqual( sorted( data[ 'Actions' ] ), [ 'RPC/a', 'RPC/b' ] )
+    actionStats = data[ 'Actions' ][ 'RPC/a' ]
+    self.assertEqual( actionStats[ 'Calls' ], 3 )
+    self.assertEqual( actionStats[ 'Errors' ], 0 )
+    self.assertEqual( data[ 'Actions' ][ 'RPC/b' ][ 'Errors' ], 1 )
+    self.assertEqual( sum( actionStats[ 'Histogram' ] ), 3 )
+    self.assertEqual( len( actionStats[ 'Histogram' ] ), len( HISTOGRAM_BINS ) + 1 )
+    self.assertEqual( actionStats[ 'SQLStatements' ], 3 )
+    self.assertAlmostEqual( actionStats[ 'SQLTime' ], 0.03 )
+    self.assertAlmostEqual( actionStats[ 'Phases' ][ 'handshake' ], 0.003 )
+    self.assert_( actionStats[ 'MaxTime' ] >= 0.031 )
+    self.assertEqual( data[ 'SlowestCalls' ], [] )
+    profiler.reset()
+    self.assertEqual( profiler.getData()[ 'Actions' ], {} )
+
+  def test02slowestCalls( self ):
+    """ the profiles of the slowest sampled calls are kept and dumped """
+    profiler = ActionProfiler( sampleRate = 1, slowestCalls = 2 )
+    for sleepTime in ( 0.03, 0.01, 0.02 ):
+      self.serve( profiler, 'RPC/a', sleepTime )
+    slowestCalls = profiler.getData()[ 'SlowestCalls' ]
+    self.assertEqual( len( slowestCalls ), 2 )
+    self.assert_( slowestCalls[0][ 'Elapsed' ] > slowestCalls[1][ 'Elapsed' ] >= 0.02 )
+    self.assertEqual( slowestCalls[0][ 'SlowestSQL' ], [ 0.015, "SELECT 0.03" ] )
+    self.assert_( "sleep" in slowestCalls[0][ 'Profile' ] )
+    dumpDir = tempfile.mkdtemp()
+    fileName = os.path.join( dumpDir, "test.profile" )
+    profiler.dump( fileName )
+    self.assert_( "RPC/a: 3 calls" in open( fileName ).read() )
+    pstats.Stats( "%s.0.prof" % fileName )
+    for dumpFile in os.listdir( dumpDir ):
+      os.unlink( os.path.join( dumpDir, dumpFile ) )
+    os.rmdir( dumpDir )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( ActionProfilerTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+""" Benchmark of the DEncode engines
+
+    Compares DEncode and StreamDEncode on payloads that look like the
+    replies of the busiest DISET services. Run it with:
+
+      python DEncodeBenchmark.py [ nLFNs ] [ nJobs ] [ nIterations ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import datetime
+
+from DIRAC.Core.Utilities import DEncode, StreamDEncode
+
+def getReplicasPayload( nLFNs ):
+  """ Reply of FileCatalog getReplicas for nLFNs files with three replicas each
+  """
+  successful = {}
+  for i in range( nLFNs ):
+    lfn = "/lhcb/LHCb/Collision12/BHADRON.DST/00020198/0000/00020198_%08d_1.bhadron.dst" % i
+    successful[ lfn ] = { 'CERN-DST' : "srm://srm-lhcb.cern.ch/castor/cern.ch/grid%s" % lfn,
+                          'IN2P3-DST' : "srm://ccsrm.in2p3.fr/pnfs/in2p3.fr/data%s" % lfn,
+                          'CNAF-DST' : "srm://storm-fe-lhcb.cr.cnaf.infn.it/t0d1%s" % lfn }
+  return { 'OK' : True, 'Value' : { 'Successful' : successful, 'Failed' : {} } }
+
+def getJobAttributesPayload( nJobs ):
+  """ Reply of JobMonitoring getJobsSummary style calls for nJobs jobs
+  """
+  now = datetime.datetime.utcnow()
+  jobs = {}
+  for jobID in range( 1, nJobs + 1 ):
+    jobs[ jobID ] = { 'JobID' : str( jobID ),
+                      'JobName' : 'Brunel_%s' % jobID,
+                      'JobGroup' : '00020198',
+                      'JobType' : 'DataReconstruction',
+                      'Owner' : 'lhcbprod',
+                      'OwnerDN' : '/DC=ch/DC=cern/OU=Organic Units/OU=Users/CN=lhcbprod',
+                      'OwnerGroup' : 'lhcb_prod',
+                      'Site' : 'LCG.CERN.ch',
+                      'Status' : 'Running',
+                      'MinorStatus' : 'Application',
+                      'ApplicationStatus' : 'Brunel step 1',
+                      'SubmissionTime' : now,
+                      'LastUpdateTime' : now,
+                      'HeartBeatTime' : now,
+                      'CPUTime' : 1234.5,
+                      'RescheduleCounter' : 0,
+                      'VerifiedFlag' : True,
+                      'UserPriority' : 1 }
+  return { 'OK' : True, 'Value' : jobs }
+
+def timeIt( function, argument, nIterations ):
+  start = time.time()
+  for _i in range( nIterations ):
+    result = function( argument )
+  return ( time.time() - start ) / nIterations, result
+
+def benchmark( name, payload, nIterations ):
+  print "%s" % name
+  encoded = DEncode.encode( payload )
+  if StreamDEncode.encode( payload ) != encoded:
+    print "  ERROR: engines produce different streams"
+    return
+  if StreamDEncode.decode( encoded ) != DEncode.decode( encoded ):
+    print "  ERROR: engines decode different objects"
+    return
+  print "  Encoded size: %.2f MiB" % ( len( encoded ) / 1048576.0 )
+  for engine in ( DEncode, StreamDEncode ):
+    encTime, _dummy = timeIt( engine.encode, payload, nIterations )
+    decTime, _dummy = timeIt( engine.decode, encoded, nIterations )
+    print "  %-14s encode %8.4f s  decode %8.4f s" % ( engine.__name__.split( "." )[-1], encTime, decTime )
+
+if __name__ == "__main__":
+  nLFNs = 100000
+  nJobs = 20000
+  nIterations = 3
+  if len( sys.argv ) > 1:
+    nLFNs = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nJobs = int( sys.argv[2] )
+  if len( sys.argv ) > 3:
+    nIterations = int( sys.argv[3] )
+  benchmark( "getReplicas reply with %s LFNs" % nLFNs, getReplicasPayload( nLFNs ), nIterations )
+  benchmark( "Job attributes reply for %s jobs" % nJobs, getJobAttributesPayload( nJobs ), nIterations )
@@ -0,0 +1,123 @@
+"""
+  Benchmark of the ExecutorDispatcher with single and batched task dispatch
+
+  Sends nTasks tasks through a chain of 4 executor types, like the JobPath,
+  JobSanity, InputData and JobScheduling optimizers, each served by nExecutors
+  executors running in threads. Every message costs msgTime seconds and every
+  task taskTime seconds of processing, so that the time spent in messages can
+  be compared for several batch sizes. Prints the tasks through the whole chain
+  per second and the number of messages exchanged. Run it with:
+
+    python ExecutorDispatcherBenchmark.py [ nTasks ] [ nExecutors ] [ msgTime ] [ taskTime ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import Queue
+import threading
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.ExecutorDispatcher import ExecutorDispatcher, ExecutorDispatcherCallbacks
+
+CHAIN = ( 'JobPath', 'JobSanity', 'InputData', 'JobScheduling' )
+
+class BenchmarkCallbacks( ExecutorDispatcherCallbacks ):
+
+  def __init__( self, nTasks ):
+    self.inboxes = {}
+    self.messages = 0
+    self.pending = nTasks
+    self.done = threading.Event()
+    self.lock = threading.Lock()
+
+  def count( self, messages = 0, pending = 0 ):
+    self.lock.acquire()
+    try:
+      self.messages += messages
+      self.pending -= pending
+      if self.pending <= 0:
+        self.done.set()
+    finally:
+      self.lock.release()
+
+  def cbDispatch( self, taskId, taskObj, pathExecuted ):
+    if len( pathExecuted ) >= len( CHAIN ):
+      self.count( pending = 1 )
+      return S_OK()
+    return S_OK( CHAIN[ len( pathExecuted ) ] )
+
+  def cbSendTask( self, taskId, taskObj, eId, eType ):
+    self.count( messages = 1 )
+    self.inboxes[ eId ].put( [ taskId ] )
+    return S_OK()
+
+  def cbSendTasks( self, tasks, eId, eType ):
+    self.count( messages = 1 )
+    self.inboxes[ eId ].put( [ task[0] for task in tasks ] )
+    return S_OK()
+
+  def cbDisconectExecutor( self, eId ):
+    return S_OK()
+
+def executor( eId, dispatcher, callbacks, msgTime, taskTime ):
+  inbox = callbacks.inboxes[ eId ]
+  while True:
+    taskIds = inbox.get()
+    if taskIds is None:
+      return
+    time.sleep( msgTime + taskTime * len( taskIds ) )
+    callbacks.count( messages = 1 )
+    if len( taskIds ) == 1:
+      dispatcher.taskProcessed( eId, taskIds[0] )
+      continue
+    #As the mind does with the results of a batch
+    dispatcher.holdExecutor( eId )
+    try:
+      for taskId in taskIds:
+        dispatcher.taskProcessed( eId, taskId )
+    finally:
+      dispatcher.releaseExecutor( eId )
+
+def benchmark( nTasks, nExecutors, msgTime, taskTime, batchSize ):
+  dispatcher = ExecutorDispatcher()
+  callbacks = BenchmarkCallbacks( nTasks )
+  dispatcher.setCallbacks( callbacks )
+  threads = []
+  for eType in CHAIN:
+    for i in range( nExecutors ):
+      eId = "%s-%s" % ( eType, i )
+      callbacks.inboxes[ eId ] = Queue.Queue()
+      thread = threading.Thread( target = executor, args = ( eId, dispatcher, callbacks, msgTime, taskTime ) )
+      thread.setDaemon( True )
+      thread.start()
+      threads.append( thread )
+      dispatcher.addExecutor( eId, [ eType ], maxTasks = batchSize, batchSize = batchSize )
+  start = time.time()
+  for taskId in range( nTasks ):
+    dispatcher.addTask( taskId, "task%s" % taskId )
+  callbacks.done.wait( 600 )
+  elapsed = time.time() - start
+  for inbox in callbacks.inboxes.values():
+    inbox.put( None )
+  for thread in threads:
+    thread.join()
+  print "Batch size %3s: %s tasks in %.2f s, %.1f tasks/s, %s messages" % ( batchSize, nTasks - callbacks.pending,
+                                                                            elapsed, nTasks / elapsed,
+                                                                            callbacks.messages )
+
+if __name__ == "__main__":
+  nTasks = 2000
+  nExecutors = 2
+  msgTime = 0.005
+  taskTime = 0.0005
+  if len( sys.argv ) > 1:
+    nTasks = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nExecutors = int( sys.argv[2] )
+  if len( sys.argv ) > 3:
+    msgTime = float( sys.argv[3] )
+  if len( sys.argv ) > 4:
+    taskTime = float( sys.argv[4] )
+  for batchSize in ( 1, 10, 50 ):
+    benchmark( nTasks, nExecutors, msgTime, taskTime, batchSize )
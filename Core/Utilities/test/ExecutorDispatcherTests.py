@@ -0,0 +1,161 @@
+""" Test cases for the batched dispatch of the ExecutorDispatcher
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.ExecutorDispatcher import ExecutorDispatcher, ExecutorDispatcherCallbacks
+
+class FakeCallbacks( ExecutorDispatcherCallbacks ):
+  """ Synchronous callbacks recording what is sent to the executors
+  """
+
+  def __init__( self, chain ):
+    self.chain = chain
+    self.sent = []
+    self.failSend = False
+    self.frozen = []
+    self.finished = []
+
+  def cbDispatch( self, taskId, taskObj, pathExecuted ):
+    if len( pathExecuted ) >= len( self.chain ):
+      self.finished.append( taskId )
+      return S_OK()
+    return S_OK( self.chain[ len( pathExecuted ) ] )
+
+  def cbSendTask( self, taskId, taskObj, eId, eType ):
+    if self.failSend:
+      return S_ERROR( "Send failed" )
+    self.sent.append( ( eId, eType, [ taskId ] ) )
+    return S_OK()
+
+  def cbSendTasks( self, tasks, eId, eType ):
+    if self.failSend:
+      return S_ERROR( "Send failed" )
+    self.sent.append( ( eId, eType, [ task[0] for task in tasks ] ) )
+    return S_OK()
+
+  def cbDisconectExecutor( self, eId ):
+    return S_OK()
+
+  def cbTaskError( self, taskId, taskObj, errorMsg ):
+    return S_OK()
+
+  def cbTaskFreeze( self, taskId, taskObj, eType ):
+    self.frozen.append( taskId )
+    return S_OK()
+
+class ExecutorDispatcherBatchCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.callbacks = FakeCallbacks( ( 'TypeA', 'TypeB' ) )
+    self.dispatcher = ExecutorDispatcher()
+    self.dispatcher.setCallbacks( self.callbacks )
+    self.dispatcher.addExecutor( 'exA', [ 'TypeA' ], maxTasks = 3, batchSize = 3 )
+
+  def addTasks( self, nTasks ):
+    """ queue the tasks while the executor is held so that they leave in batches """
+    self.dispatcher.holdExecutor( 'exA' )
+    for taskId in range( nTasks ):
+      self.dispatcher.addTask( taskId, "task%s" % taskId )
+    self.assertEqual( self.callbacks.sent, [] )
+    self.dispatcher.releaseExecutor( 'exA' )
+
+  def tasksDone( self, eId, results ):
+    """ as the mind does with a TasksDone message """
+    self.dispatcher.holdExecutor( eId )
+    try:
+      for taskId, msgName in results:
+        if msgName == "TaskDone":
+          self.dispatcher.taskProcessed( eId, taskId )
+        elif msgName == "TaskFreeze":
+          self.dispatcher.freezeTask( eId, taskId, 600 )
+        else:
+          self.dispatcher.removeTask( taskId )
+    finally:
+      self.dispatcher.releaseExecutor( eId )
+
+  def queued( self, eType ):
+    return self.dispatcher._internals()[ 'queues' ][ 'queues' ].get( eType, [] )
+
+  def execTasks( self, eId ):
+    return sorted( self.dispatcher._internals()[ 'states' ][ 'execTasks' ].get( eId, [] ) )
+
+  def test01batchAndRefill( self ):
+    """ tasks are sent in whole batches and the executor is refilled once a batch is done """
+    self.addTasks( 7 )
+    self.assertEqual( self.callbacks.sent, [ ( 'exA', 'TypeA', [ 0, 1, 2 ] ) ] )
+    self.assertEqual( self.queued( 'TypeA' ), [ 3, 4, 5, 6 ] )
+    self.tasksDone( 'exA', [ ( 0, "TaskDone" ), ( 1, "TaskDone" ), ( 2, "TaskDone" ) ] )
+    self.assertEqual( self.callbacks.sent[1:], [ ( 'exA', 'TypeA', [ 3, 4, 5 ] ) ] )
+    #No TypeB executor has connected yet
+    self.assertEqual( self.dispatcher._internals()[ 'freezer' ], [ 0, 1, 2 ] )
+    self.tasksDone( 'exA', [ ( 3, "TaskDone" ), ( 4, "TaskDone" ), ( 5, "TaskDone" ) ] )
+    self.assertEqual( self.callbacks.sent[2:], [ ( 'exA', 'TypeA', [ 6 ] ) ] )
+    self.assertEqual( self.queued( 'TypeA' ), [] )
+    self.assertEqual( self.execTasks( 'exA' ), [ 6 ] )
+
+  def test02failedSend( self ):
+    """ a failed batch send puts back every task in the queue in the same order """
+    self.callbacks.failSend = True
+    self.addTasks( 5 )
+    self.assertEqual( self.callbacks.sent, [] )
+    self.assertEqual( self.queued( 'TypeA' ), [ 0, 1, 2, 3, 4 ] )
+    self.assertEqual( self.execTasks( 'exA' ), [] )
+    self.callbacks.failSend = False
+    self.dispatcher.holdExecutor( 'exA' )
+    self.dispatcher.releaseExecutor( 'exA' )
+    self.assertEqual( self.callbacks.sent, [ ( 'exA', 'TypeA', [ 0, 1, 2 ] ) ] )
+    self.assertEqual( self.queued( 'TypeA' ), [ 3, 4 ] )
+
+  def test03deletedTasks( self ):
+    """ tasks removed while queued or while in the executor are skipped """
+    self.addTasks( 8 )
+    #Removed while in the executor: its result is not known any more
+    self.dispatcher.removeTask( 1 )
+    self.assertEqual( self.execTasks( 'exA' ), [ 0, 2 ] )
+    #Removed from the tasks between the pop of the queue and the send
+    self.dispatcher._ExecutorDispatcher__tasks.pop( 4 )
+    self.dispatcher.holdExecutor( 'exA' )
+    self.dispatcher.taskProcessed( 'exA', 0 )
+    self.assertFalse( self.dispatcher.taskProcessed( 'exA', 1 )[ 'OK' ] )
+    self.dispatcher.taskProcessed( 'exA', 2 )
+    self.dispatcher.releaseExecutor( 'exA' )
+    self.assertEqual( self.callbacks.sent[1:], [ ( 'exA', 'TypeA', [ 3, 5 ] ) ] )
+    self.assertEqual( self.execTasks( 'exA' ), [ 3, 5 ] )
+    self.assertEqual( self.queued( 'TypeA' ), [ 6, 7 ] )
+    self.tasksDone( 'exA', [ ( 3, "TaskDone" ), ( 5, "TaskDone" ) ] )
+    self.assertEqual( self.callbacks.sent[2:], [ ( 'exA', 'TypeA', [ 6, 7 ] ) ] )
+
+  def test04mixedResults( self ):
+    """ done, frozen and failed tasks of a batch free their slots for one new batch """
+    self.addTasks( 6 )
+    self.tasksDone( 'exA', [ ( 0, "TaskDone" ), ( 1, "TaskFreeze" ), ( 2, "TaskError" ) ] )
+    self.assertEqual( self.callbacks.sent, [ ( 'exA', 'TypeA', [ 0, 1, 2 ] ),
+                                             ( 'exA', 'TypeA', [ 3, 4, 5 ] ) ] )
+    internals = self.dispatcher._internals()
+    self.assertEqual( self.callbacks.frozen, [ 1 ] )
+    #Task 0 waits for a TypeB executor and task 1 for its freeze time
+    self.assertEqual( internals[ 'freezer' ], [ 0, 1 ] )
+    self.assertEqual( self.dispatcher._ExecutorDispatcher__tasks[ 0 ].eType, 'TypeB' )
+    self.assertEqual( self.dispatcher._ExecutorDispatcher__tasks[ 1 ].eType, 'TypeA' )
+    self.assertFalse( 2 in internals[ 'tasks' ] )
+    self.assertEqual( self.execTasks( 'exA' ), [ 3, 4, 5 ] )
+
+  def test05nextExecutor( self ):
+    """ the tasks done go on to an executor of the next type in batches """
+    self.addTasks( 3 )
+    self.dispatcher.addExecutor( 'exB', [ 'TypeB' ], maxTasks = 3, batchSize = 3 )
+    self.tasksDone( 'exA', [ ( 0, "TaskDone" ), ( 1, "TaskDone" ), ( 2, "TaskDone" ) ] )
+    #The first task reaches the idle executor alone, the rest wait for its batch
+    self.assertEqual( self.callbacks.sent[1:], [ ( 'exB', 'TypeB', [ 0 ] ) ] )
+    self.tasksDone( 'exB', [ ( 0, "TaskDone" ) ] )
+    self.assertEqual( self.callbacks.sent[2:], [ ( 'exB', 'TypeB', [ 1, 2 ] ) ] )
+    self.tasksDone( 'exB', [ ( 1, "TaskDone" ), ( 2, "TaskDone" ) ] )
+    self.assertEqual( self.callbacks.finished, [ 0, 1, 2 ] )
+    self.assertEqual( self.dispatcher.getTaskIds(), [] )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( ExecutorDispatcherBatchCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -0,0 +1,71 @@
+""" Test cases for LRUCache
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import unittest
+from DIRAC.Core.Utilities.LRUCache import LRUCache
+
+class LRUCacheTestCase( unittest.TestCase ):
+
+  def test01eviction( self ):
+    """ least recently used entries are evicted first """
+    cache = LRUCache( maxSize = 3 )
+    for key in ( 'a', 'b', 'c' ):
+      cache.put( key, key.upper() )
+    self.assertEqual( cache.get( 'a' ), 'A' )
+    cache.put( 'd', 'D' )
+    self.assertEqual( len( cache ), 3 )
+    self.assertFalse( 'b' in cache )
+    self.assertEqual( cache.getMany( [ 'a', 'b', 'c', 'd' ] ), { 'a' : 'A', 'c' : 'C', 'd' : 'D' } )
+    cache.put( 'c', 'CC' )
+    cache.put( 'e', 'E' )
+    self.assertFalse( 'a' in cache )
+    self.assertEqual( cache.get( 'c' ), 'CC' )
+
+  def test02invalidation( self ):
+    """ delete, deleteIf and clear """
+    cache = LRUCache( maxSize = 10 )
+    for i in range( 10 ):
+      cache.put( '/dir/%d' % i, i )
+    self.assert_( cache.delete( '/dir/0' ) )
+    self.assertFalse( cache.delete( '/dir/0' ) )
+    self.assertEqual( cache.deleteIf( lambda key, value: value % 2 ), 5 )
+    self.assertEqual( len( cache ), 4 )
+    cache.clear()
+    self.assertEqual( len( cache ), 0 )
+    cache.put( 'a', 1 )
+    self.assertEqual( cache.get( 'a' ), 1 )
+
+  def test03stats( self ):
+    """ hit counters and expiration """
+    cache = LRUCache( maxSize = 10, lifeTime = 1 )
+    cache.put( 'a', 1 )
+    cache.get( 'a' )
+    cache.get( 'b' )
+    stats = cache.getStats()
+    self.assertEqual( ( stats[ 'Hits' ], stats[ 'Misses' ], stats[ 'HitRate' ] ), ( 1, 1, 50. ) )
+    time.sleep( 1.1 )
+    self.assertEqual( cache.get( 'a' ), None )
+    self.assertEqual( len( cache ), 0 )
+
+  def test04weights( self ):
+    """ entries are evicted to keep the sum of the weights under maxWeight """
+    cache = LRUCache( maxSize = 10, maxWeight = 100 )
+    self.assert_( cache.put( 'a', 'A', 40 ) )
+    self.assert_( cache.put( 'b', 'B', 40 ) )
+    cache.get( 'a' )
+    self.assert_( cache.put( 'c', 'C', 30 ) )
+    self.assertEqual( cache.getMany( [ 'a', 'b', 'c' ] ), { 'a' : 'A', 'c' : 'C' } )
+    self.assertEqual( cache.getStats()[ 'Weight' ], 70 )
+    self.assertFalse( cache.put( 'd', 'D', 101 ) )
+    self.assertFalse( 'd' in cache )
+    cache.put( 'a', 'AA', 10 )
+    self.assertEqual( cache.getStats()[ 'Weight' ], 40 )
+    cache.deleteIf( lambda key, value: key == 'c' )
+    self.assertEqual( cache.getStats()[ 'Weight' ], 10 )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( LRUCacheTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
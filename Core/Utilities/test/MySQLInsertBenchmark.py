@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+""" Benchmark of multi-row inserts
+
+    Inserts nRows logging records, like the ones of the JobLoggingDB, in a
+    MySQL/MariaDB table with one statement per row, with insertMany, and updates
+    them with upsertMany. The database must exist and the user must be able to
+    create tables in it. Run it with:
+
+      python MySQLInsertBenchmark.py host user password dbName [ nRows ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+TABLE = "InsertBenchmark"
+FIELDS = [ 'JobID', 'SeqNum', 'Status', 'MinorStatus', 'StatusTime', 'StatusSource' ]
+
+def prepare( db ):
+  db._update( "DROP TABLE IF EXISTS `%s`" % TABLE )
+  return db._update( "CREATE TABLE `%s` ( `JobID` INTEGER NOT NULL, `SeqNum` INTEGER NOT NULL, "
+                     "`Status` VARCHAR(32) NOT NULL, `MinorStatus` VARCHAR(128) NOT NULL, "
+                     "`StatusTime` DATETIME NOT NULL, `StatusSource` VARCHAR(32) NOT NULL, "
+                     "PRIMARY KEY( `JobID`, `SeqNum` ) ) ENGINE = InnoDB" % TABLE )
+
+def getRows( nRows, status ):
+  return [ ( i / 10, i % 10, status, "Job's minor status %d" % i, 'UTC_TIMESTAMP()', 'Benchmark' )
+           for i in range( nRows ) ]
+
+def report( name, nRows, elapsed, result ):
+  if not result[ 'OK' ]:
+    print "%s failed: %s" % ( name, result[ 'Message' ] )
+    return
+  print "%s: %s rows in %.2f s (%.0f rows/s)" % ( name, nRows, elapsed, nRows / max( elapsed, 0.000001 ) )
+
+def rowPerStatement( db, rows ):
+  for row in rows:
+    result = db.insertFields( TABLE, FIELDS, list( row ) )
+    if not result[ 'OK' ]:
+      return result
+  return result
+
+if __name__ == "__main__":
+  if len( sys.argv ) < 5:
+    print __doc__
+    sys.exit( 1 )
+  host, user, passwd, dbName = sys.argv[1:5]
+  nRows = 10000
+  if len( sys.argv ) > 5:
+    nRows = int( sys.argv[5] )
+
+  db = MySQL( host, user, passwd, dbName )
+  result = prepare( db )
+  if not result[ 'OK' ]:
+    print "Cannot prepare the benchmark table: %s" % result[ 'Message' ]
+    sys.exit( 1 )
+
+  start = time.time()
+  result = rowPerStatement( db, getRows( nRows, 'Received' ) )
+  report( "One statement per row", nRows, time.time() - start, result )
+
+  db._update( "DELETE FROM `%s`" % TABLE )
+  start = time.time()
+  result = db.insertMany( TABLE, FIELDS, getRows( nRows, 'Received' ) )
+  report( "insertMany", nRows, time.time() - start, result )
+
+  start = time.time()
+  result = db.upsertMany( TABLE, FIELDS, getRows( nRows, 'Running' ), updateFields = [ 'Status', 'StatusTime' ] )
+  report( "upsertMany updating all the rows", nRows, time.time() - start, result )
+
+  db._update( "DROP TABLE `%s`" % TABLE )
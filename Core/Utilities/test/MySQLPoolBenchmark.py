@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+""" Benchmark of the MySQL connection pool
+
+    Runs nThreads threads doing nQueries short queries each against a MySQL/MariaDB
+    server, with an unlimited pool (one connection per thread) and with a pool
+    limited to maxConnections. The database must exist and the user must be able
+    to create tables in it. Run it with:
+
+      python MySQLPoolBenchmark.py host user password dbName [ nThreads ] [ nQueries ] [ maxConnections ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import threading
+
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+TABLE = "PoolBenchmark"
+
+def worker( db, nQueries, latencies, errors ):
+  for i in range( nQueries ):
+    start = time.time()
+    if i % 4:
+      result = db._query( "SELECT `Value` FROM `%s` WHERE `ID` = %d" % ( TABLE, i % 100 ) )
+    else:
+      result = db._update( "UPDATE `%s` SET `Value` = `Value` + 1 WHERE `ID` = %d" % ( TABLE, i % 100 ) )
+    if result[ 'OK' ]:
+      latencies.append( time.time() - start )
+    else:
+      errors.append( result[ 'Message' ] )
+
+def prepare( db ):
+  result = db._update( "CREATE TABLE IF NOT EXISTS `%s` ( `ID` INTEGER NOT NULL, `Value` INTEGER NOT NULL, "
+                       "PRIMARY KEY( `ID` ) ) ENGINE = InnoDB" % TABLE )
+  if not result[ 'OK' ]:
+    return result
+  values = ", ".join( [ "( %d, 0 )" % i for i in range( 100 ) ] )
+  return db._update( "REPLACE INTO `%s` ( `ID`, `Value` ) VALUES %s" % ( TABLE, values ) )
+
+def serverConnections( db ):
+  result = db._query( "SHOW STATUS LIKE 'Threads_connected'" )
+  if not result[ 'OK' ] or not result[ 'Value' ]:
+    return "unknown"
+  return result[ 'Value' ][0][1]
+
+def benchmark( name, db, nThreads, nQueries ):
+  latencies = []
+  errors = []
+  threads = [ threading.Thread( target = worker, args = ( db, nQueries, latencies, errors ) )
+              for _i in range( nThreads ) ]
+  start = time.time()
+  for thd in threads:
+    thd.start()
+  maxServerConns = 0
+  while [ thd for thd in threads if thd.isAlive() ]:
+    conns = serverConnections( db )
+    if conns != "unknown":
+      maxServerConns = max( maxServerConns, int( conns ) )
+    time.sleep( 0.2 )
+  elapsed = time.time() - start
+  print name
+  print "  Queries OK: %s (%.1f/s)  Errors: %s" % ( len( latencies ), len( latencies ) / elapsed, len( errors ) )
+  if latencies:
+    latencies.sort()
+    for percentile in ( 50, 90, 99 ):
+      pos = min( len( latencies ) - 1, int( len( latencies ) * percentile / 100. ) )
+      print "  p%s latency: %.2f ms" % ( percentile, latencies[ pos ] * 1000 )
+  print "  Max connections seen by the server: %s" % maxServerConns
+  print "  Pool: %s" % db._MySQL__connectionPool.getStats()
+
+if __name__ == "__main__":
+  if len( sys.argv ) < 5:
+    print __doc__
+    sys.exit( 1 )
+  host, user, passwd, dbName = sys.argv[1:5]
+  nThreads = 100
+  nQueries = 200
+  maxConnections = 10
+  if len( sys.argv ) > 5:
+    nThreads = int( sys.argv[5] )
+  if len( sys.argv ) > 6:
+    nQueries = int( sys.argv[6] )
+  if len( sys.argv ) > 7:
+    maxConnections = int( sys.argv[7] )
+
+  unlimitedDB = MySQL( host, user, passwd, dbName )
+  result = prepare( unlimitedDB )
+  if not result[ 'OK' ]:
+    print "Cannot prepare the benchmark table: %s" % result[ 'Message' ]
+    sys.exit( 1 )
+  benchmark( "Unlimited pool, %s threads x %s queries" % ( nThreads, nQueries ), unlimitedDB, nThreads, nQueries )
+  #Pools are shared per server and credentials, so this limits the same pool.
+  #Give back the connections of the finished threads before starting
+  limitedDB = MySQL( host, user, passwd, dbName, maxConnections = maxConnections )
+  limitedDB._MySQL__connectionPool.clean()
+  benchmark( "Pool limited to %s connections, %s threads x %s queries" % ( maxConnections, nThreads, nQueries ),
+             limitedDB, nThreads, nQueries )
+  unlimitedDB._update( "DROP TABLE `%s`" % TABLE )
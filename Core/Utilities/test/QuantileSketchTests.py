@@ -0,0 +1,56 @@
+""" Test cases for QuantileSketch
+"""
+
+__RCSID__ = "$Id$"
+
+import random
+import unittest
+from DIRAC.Core.Utilities.QuantileSketch import QuantileSketch
+
+class QuantileSketchTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    random.seed( 3 )
+    self.values = [ random.lognormvariate( 0, 2 ) for _i in range( 10000 ) ] + [ 0 ] * 100 + \
+                  [ -random.random() for _i in range( 500 ) ]
+
+  def assertQuantiles( self, sketch, values ):
+    values = sorted( values )
+    for fraction in ( 0, 0.01, 0.25, 0.5, 0.9, 0.99, 1 ):
+      expected = values[ int( fraction * ( len( values ) - 1 ) ) ]
+      self.assert_( abs( sketch.quantile( fraction ) - expected ) <= 0.01 * abs( expected ) + 1e-12,
+                    "quantile %s: %s instead of %s" % ( fraction, sketch.quantile( fraction ), expected ) )
+
+  def test01accuracy( self ):
+    """ quantiles are within the relative accuracy of the exact ones """
+    sketch = QuantileSketch( relativeAccuracy = 0.01 )
+    for value in self.values:
+      sketch.add( value )
+    self.assertEqual( len( sketch ), len( self.values ) )
+    self.assertEqual( sketch.minValue, min( self.values ) )
+    self.assertEqual( sketch.maxValue, max( self.values ) )
+    self.assertQuantiles( sketch, self.values )
+
+  def test02merge( self ):
+    """ merged sketches give the quantiles of all the values """
+    sketches = [ QuantileSketch() for _i in range( 4 ) ]
+    for i, value in enumerate( self.values ):
+      sketches[ i % 4 ].add( value )
+    for sketch in sketches[1:]:
+      sketches[0].merge( sketch )
+    self.assertEqual( len( sketches[0] ), len( self.values ) )
+    self.assertQuantiles( sketches[0], self.values )
+    self.assertRaises( ValueError, sketches[0].merge, QuantileSketch( relativeAccuracy = 0.05 ) )
+
+  def test03limits( self ):
+    """ empty sketch and bounded number of buckets """
+    self.assertEqual( QuantileSketch().quantile( 0.5 ), None )
+    sketch = QuantileSketch( maxBuckets = 10 )
+    for value in range( 1, 100001 ):
+      sketch.add( value )
+    self.assertEqual( sketch.quantiles( [ 0, 1 ] ), [ 1, 100000 ] )
+    self.assert_( abs( sketch.quantile( 0.99 ) - 99000 ) < 0.01 * 99000 )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( QuantileSketchTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
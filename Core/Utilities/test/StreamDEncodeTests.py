@@ -0,0 +1,68 @@
+""" :mod: StreamDEncodeTests
+    =======================
+
+    .. module: StreamDEncodeTests
+    :synopsis: test cases for StreamDEncode
+
+    Checks that StreamDEncode is wire compatible with DEncode
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+import datetime
+## SUT
+from DIRAC.Core.Utilities import DEncode, StreamDEncode
+
+########################################################################
+class StreamDEncodeTestCase( unittest.TestCase ):
+  """
+  .. class:: StreamDEncodeTestCase
+
+  """
+  def setUp( self ):
+    """ test setup """
+    self.objects = [ 1, -5, 10L ** 30, 2.5, 2.0 * 10 ** 20, 2.0 * 10 ** -10, True, False, None,
+                     "", "a:string:with:colons e", u"h\xe9llo", [], (), {},
+                     [ 1, [ 2, ( 3, {} ) ] ],
+                     { 2 : "3", True : ( 3, None ), 2.0 * 10 ** 20 : 2.0 * 10 ** -10 },
+                     datetime.datetime.utcnow(), datetime.date.today(), datetime.time( 3, 4, 5, 6 ),
+                     { 'OK' : True,
+                       'Value' : { 'Successful' : { '/lhcb/f1' : { 'CERN-DST' : 'srm://a/f1' },
+                                                    '/lhcb/f2' : { 'CERN-DST' : 'srm://a/f2',
+                                                                   'IN2P3-DST' : 'srm://b/f2' } },
+                                   'Failed' : { '/lhcb/f3' : 'No such file' } } },
+                     [ datetime.datetime( 2012, 1, 1 ), { 'a' : ( datetime.date( 2000, 1, 1 ), ) } ] ]
+
+  def test01encode( self ):
+    """ same stream as DEncode """
+    for obj in self.objects:
+      self.assertEqual( StreamDEncode.encode( obj ), DEncode.encode( obj ) )
+
+  def test02decode( self ):
+    """ same objects as DEncode """
+    for obj in self.objects:
+      data = DEncode.encode( obj )
+      result = StreamDEncode.decode( data )
+      self.assertEqual( result, DEncode.decode( data ) )
+      self.assertEqual( type( result[0] ), type( obj ) )
+
+  def test03offset( self ):
+    """ decode in place inside a bigger buffer """
+    for obj in self.objects:
+      data = DEncode.encode( obj )
+      self.assertEqual( StreamDEncode.decode( "12:%syy" % data, 3 ), ( obj, len( data ) + 3 ) )
+
+  def test04errors( self ):
+    """ unknown types and corrupted data """
+    self.assertRaises( KeyError, StreamDEncode.encode, set() )
+    self.assertRaises( KeyError, StreamDEncode.decode, "x" )
+    self.assertRaises( ValueError, StreamDEncode.decode, "e" )
+    self.assertRaises( IndexError, StreamDEncode.decode, "l" )
+
+## test execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( StreamDEncodeTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
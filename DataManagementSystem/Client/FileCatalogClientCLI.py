@@ -15,6 +15,7 @@ from DIRAC.Core.Security import CS
 from DIRAC.Core.Security.ProxyInfo import getProxyInfo
 from DIRAC.Core.Utilities.List import uniqueElements
 from DIRAC.Interfaces.API.Dirac import Dirac
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
 from DIRAC.Core.Utilities.PrettyPrint import int_with_commas, printTable
 
 from DIRAC.DataManagementSystem.Client.CmdDirCompletion.AbstractFileSystem import DFCFileSystem, UnixLikeFileSystem
@@ -265,6 +266,18 @@ File Catalog Client $Revision: 1.17 $Date:
       path = path.replace('//','/')
 
     return os.path.normpath(path)
+
+  def __getStreamCatalog( self ):
+    """ The FileCatalogClient able to stream the directory listings, either the client
+        itself or the first such read catalog of a FileCatalog, None if there is none
+    """
+    if isinstance( self.fc, FileCatalogClient ):
+      return self.fc
+    if hasattr( self.fc, 'getReadCatalogs' ):
+      for _catalogName, oCatalog, _master in self.fc.getReadCatalogs():
+        if isinstance( oCatalog, FileCatalogClient ):
+          return oCatalog
+    return None
   
   def do_register(self,args):
     """ Register a record to the File Catalog
@@ -1313,54 +1326,56 @@ File Catalog Client $Revision: 1.17 $Date:
     
     # Get directory contents now
     try:
-      result =  self.fc.listDirectory(path,_long)                   
       dList = DirectoryListing()
+      streamCatalog = self.__getStreamCatalog()
+      if streamCatalog is not None:
+        # Stream the listing by chunks instead of getting it in one response
+        result = streamCatalog.listDirectoryStream( path,
+                                                   lambda chunk: self.__addListingEntries( dList, chunk, _long, numericid ),
+                                                   _long )
+      else:
+        result = self.fc.listDirectory(path,_long)
+        if result['OK'] and path in result['Value']['Successful']:
+          self.__addListingEntries( dList, result['Value']['Successful'][path], _long, numericid )
       if result['OK']:
-        if result['Value']['Successful']:
-          for entry in result['Value']['Successful'][path]['Files']:
-            fname = entry.split('/')[-1]
-            # print entry, fname
-            # fname = entry.replace(self.cwd,'').replace('/','')
-            if _long:
-              fileDict = result['Value']['Successful'][path]['Files'][entry]['MetaData']
-              repDict = result['Value']['Successful'][path]['Files'][entry].get( "Replicas", {} )
-              if fileDict:
-                dList.addFile(fname,fileDict,repDict,numericid)
-            else:  
-              dList.addSimpleFile(fname)
-          for entry in result['Value']['Successful'][path]['SubDirs']:
-            dname = entry.split('/')[-1]
-            # print entry, dname
-            # dname = entry.replace(self.cwd,'').replace('/','')  
-            if _long:
-              dirDict = result['Value']['Successful'][path]['SubDirs'][entry]
-              if dirDict:
-                dList.addDirectory(dname,dirDict,numericid)
-            else:    
-              dList.addSimpleFile(dname)
-          
-          for entry in result['Value']['Successful'][path]['Links']:
-            pass
-          
-          if 'Datasets' in result['Value']['Successful'][path]:
-            for entry in result['Value']['Successful'][path]['Datasets']:
-              dname = os.path.basename( entry )    
-              if _long:
-                dsDict = result['Value']['Successful'][path]['Datasets'][entry]['Metadata']  
-                if dsDict:
-                  dList.addDataset(dname,dsDict,numericid)
-              else:    
-                dList.addSimpleFile(dname)
-              
-          if _long:
-            dList.printListing(reverse,timeorder)      
-          else:
-            dList.printOrdered()
+        if _long:
+          dList.printListing(reverse,timeorder)
+        else:
+          dList.printOrdered()
       else:
         print "Error:",result['Message']
     except Exception, x:
       print "Error:", str(x)
 
+  def __addListingEntries( self, dList, pathDict, _long, numericid ):
+    """ Add the Files, SubDirs and Datasets of a directory listing to dList
+    """
+    for entry in pathDict.get( 'Files', {} ):
+      fname = entry.split('/')[-1]
+      if _long:
+        fileDict = pathDict['Files'][entry]['MetaData']
+        repDict = pathDict['Files'][entry].get( "Replicas", {} )
+        if fileDict:
+          dList.addFile(fname,fileDict,repDict,numericid)
+      else:
+        dList.addSimpleFile(fname)
+    for entry in pathDict.get( 'SubDirs', {} ):
+      dname = entry.split('/')[-1]
+      if _long:
+        dirDict = pathDict['SubDirs'][entry]
+        if dirDict:
+          dList.addDirectory(dname,dirDict,numericid)
+      else:
+        dList.addSimpleFile(dname)
+    for entry in pathDict.get( 'Datasets', {} ):
+      dname = os.path.basename( entry )
+      if _long:
+        dsDict = pathDict['Datasets'][entry]['Metadata']
+        if dsDict:
+          dList.addDataset(dname,dsDict,numericid)
+      else:
+        dList.addSimpleFile(dname)
+
   def complete_ls(self, text, line, begidx, endidx):
     result = []
     args = line.split()
@@ -2082,7 +2097,20 @@ File Catalog Client $Revision: 1.17 $Date:
     else:
       metaDict = {}    
     print "Query:",metaDict
-          
+
+    streamCatalog = self.__getStreamCatalog()
+    if not metaDict and streamCatalog is not None:
+      # Without conditions walk the tree printing the files as they are streamed
+      startTime = time.time()
+      nFiles = self.__streamFindFiles( streamCatalog, path )
+      if nFiles is None:
+        return
+      if not nFiles:
+        print "No matching data found"
+      if verbose:
+        print "QueryTime %.2f sec" % ( time.time() - startTime )
+      return
+
     result = self.fc.findFilesByMetadata(metaDict,path)
     if not result['OK']:
       print ("Error: %s" % result['Message']) 
@@ -2095,6 +2123,25 @@ File Catalog Client $Revision: 1.17 $Date:
     if verbose and "QueryTime" in result:
       print "QueryTime %.2f sec" % result['QueryTime']  
 
+  def __streamFindFiles( self, streamCatalog, path ):
+    """ Print all the files below path, returns the number of files or None in case of error
+    """
+    counter = { 'Files' : 0 }
+    directories = [ path ]
+
+    def printChunk( chunk ):
+      for lfn in chunk.get( 'Files', {} ):
+        print lfn
+      counter['Files'] += len( chunk.get( 'Files', {} ) )
+      directories.extend( chunk.get( 'SubDirs', {} ).keys() )
+
+    while directories:
+      result = streamCatalog.listDirectoryStream( directories.pop( 0 ), printChunk )
+      if not result['OK']:
+        print "Error: %s" % result['Message']
+        return None
+    return counter['Files']
+
   def complete_find(self, text, line, begidx, endidx):
     result = []
     args = line.split()
@@ -2502,7 +2549,6 @@ if __name__ == "__main__":
       print "Starting LFC Proxy FileCatalog client"
       cli.cmdloop() 
     elif catype == "DiracFC":
-      from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
       cli = FileCatalogClientCLI(FileCatalogClient())
       print "Starting ProcDB FileCatalog client"
       cli.cmdloop()  
@@ -649,15 +649,31 @@ class DirectoryTreeBase:
     if not result['OK']:
       return result
     directoryID = result['Value']
-    directories = {}
     links = {}
-    result = self.getChildren( path )
+    result = self.__getSubdirectories( path, details )
+    if not result['OK']:
+      return result
+    directories = result['Value']
+    result = self.db.fileManager.getFilesInDirectory( directoryID, verbose = details )
     if not result['OK']:
       return result
+    files = result['Value']
+    result = self.db.datasetManager.getDatasetsInDirectory( directoryID, verbose = details )
+    if not result['OK']:
+      return result
+    datasets = result['Value']
+    pathDict = {'Files': files, 'SubDirs':directories, 'Links':links, 'Datasets':datasets }
 
-    # Get subdirectories
-    dirIDList = result['Value']
-    for dirID in dirIDList:
+    return S_OK( pathDict )
+
+  def __getSubdirectories( self, path, details = False ):
+    """ Get the subdirectories of a given directory, with their parameters if details
+    """
+    directories = {}
+    result = self.getChildren( path )
+    if not result['OK']:
+      return result
+    for dirID in result['Value']:
       result = self.getDirectoryPath( dirID )
       if not result['OK']:
         return result
@@ -670,16 +686,33 @@ class DirectoryTreeBase:
           directories[dirName] = result['Value']
       else:
         directories[dirName] = True
-    result = self.db.fileManager.getFilesInDirectory( directoryID, verbose = details )
+    return S_OK( directories )
+
+  def listDirectoryChunk( self, path, cursor = 0, maxFiles = 1000, verbose = False ):
+    """ Get a part of the listing of a directory: at most maxFiles files after the
+        cursor, in FileID order. The subdirectories and datasets come with the first chunk
+        ( cursor 0 ). The returned 'Cursor' gets the next chunk, it is 0 after the last one
+    """
+    result = self.findDir( path )
     if not result['OK']:
       return result
-    files = result['Value']
-    result = self.db.datasetManager.getDatasetsInDirectory( directoryID, verbose = details )
+    directoryID = result['Value']
+    if not directoryID:
+      return S_ERROR( 'Directory does not exist' )
+    pathDict = {'Files': {}, 'SubDirs': {}, 'Links': {}, 'Datasets': {} }
+    if not cursor:
+      result = self.__getSubdirectories( path, verbose )
+      if not result['OK']:
+        return result
+      pathDict['SubDirs'] = result['Value']
+      result = self.db.datasetManager.getDatasetsInDirectory( directoryID, verbose = verbose )
+      if not result['OK']:
+        return result
+      pathDict['Datasets'] = result['Value']
+    result = self.db.fileManager.getFilesInDirectoryChunk( directoryID, cursor, maxFiles, verbose = verbose )
     if not result['OK']:
       return result
-    datasets = result['Value']
-    pathDict = {'Files': files, 'SubDirs':directories, 'Links':links, 'Datasets':datasets }
-
+    pathDict['Files'], pathDict['Cursor'] = result['Value']
     return S_OK( pathDict )
 
   def listDirectory( self, lfns, verbose = False ):
@@ -729,6 +762,28 @@ class DirectoryTreeBase:
       
     return result
 
+  def getDirectoryReplicasChunk( self, path, cursor = 0, maxFiles = 1000, allStatus = False ):
+    """ Get the replicas of at most maxFiles files of a directory after the cursor, in
+        FileID order. Returns S_OK( { 'Replicas', 'Cursor', 'SEPrefixes' } ), the cursor
+        being 0 after the last chunk
+    """
+    result = self.findDir( path )
+    if not result['OK']:
+      return result
+    directoryID = result['Value']
+    if not directoryID:
+      return S_ERROR( 'Directory does not exist' )
+    result = self.db.fileManager.getDirectoryReplicasChunk( directoryID, cursor, maxFiles, allStatus )
+    if not result['OK']:
+      return result
+    replicas, cursor = result['Value']
+    resultDict = { 'Replicas': replicas, 'Cursor': cursor, 'SEPrefixes': {} }
+    if self.db.lfnPfnConvention:
+      resSE = self.db.seManager.getSEPrefixes()
+      if resSE['OK']:
+        resultDict['SEPrefixes'] = resSE['Value']
+    return S_OK( resultDict )
+
   def getDirectorySize( self, lfns, longOutput = False, rawFileTables = False ):
     """ Get the total size of the requested directories. If long flag
         is True, get also physical size per Storage Element
@@ -76,6 +76,24 @@ class FileManager(FileManagerBase):
                                 "PrimaryKey": "RepID"
                               } 
 
+  def __init__( self, database = None ):
+    self.__visibleStatusIDs = []
+    FileManagerBase.__init__( self, database )
+
+  def __getVisibleStatusIDs( self, connection = False ):
+    """ Get the IDs of the visible file statuses, they do not change once defined
+    """
+    if self.__visibleStatusIDs:
+      return self.__visibleStatusIDs
+    statusIDs = []
+    for status in self.db.visibleFileStatus:
+      res = self._getStatusInt( status, connection=connection )
+      if res['OK']:
+        statusIDs.append( res['Value'] )
+    if len( statusIDs ) == len( self.db.visibleFileStatus ):
+      self.__visibleStatusIDs = statusIDs
+    return statusIDs
+
   ######################################################
   #
   # The all important _findFiles and _getDirectoryFiles methods
@@ -87,7 +105,7 @@ class FileManager(FileManagerBase):
     connection = self._getConnection(connection)
     dirDict = self._getFileDirectories(lfns)
     failed = {}
-    result = self.db.dtree.findDirs( dirDict.keys() )
+    result = self.db._findDirIDs( dirDict.keys(), connection )
     if not result['OK']:
       return result
     directoryIDs = result['Value']
@@ -102,7 +120,20 @@ class FileManager(FileManagerBase):
     successful = {}
     for dirPath in directoryIDs:
       fileNames = dirDict[dirPath]
-      res = self._getDirectoryFiles(directoryIDs[dirPath],fileNames,metadata,connection=connection)
+      cachedFiles = {}
+      if metadata == ['FileID']:
+        # Only the FileIDs are needed, take the visible files we know about from the cache
+        statusIDs = self.__getVisibleStatusIDs( connection )
+        for fileName, ( fileID, status ) in self.db._getCachedFileIDs( directoryIDs[dirPath], fileNames ).items():
+          if status in statusIDs:
+            cachedFiles[fileName] = {'FileID':fileID}
+      if len( cachedFiles ) == len( fileNames ):
+        res = S_OK( cachedFiles )
+      else:
+        toFind = [ fileName for fileName in fileNames if not fileName in cachedFiles ]
+        res = self._getDirectoryFiles(directoryIDs[dirPath],toFind,metadata,connection=connection)
+        if res['OK']:
+          res['Value'].update( cachedFiles )
       if (not res['OK']) or (not res['Value']):
         error = res.get('Message','No such file or directory')
         for fileName in fileNames:
@@ -128,7 +159,7 @@ class FileManager(FileManagerBase):
     dirDict = self._getFileDirectories(lfns)
     failed = {}
     successful = {}
-    result = self.db.dtree.findDirs( dirDict.keys() )
+    result = self.db._findDirIDs( dirDict.keys(), connection )
     if not result['OK']:
       return result
     directoryIDs = result['Value']
@@ -142,23 +173,35 @@ class FileManager(FileManagerBase):
           failed[fname] = 'No such directory'
       else:
         directoryPaths[directoryIDs[dirPath]] = dirPath
-    directoryIDList = directoryIDs.keys()
+    toFind = {}
+    for dirPath in directoryIDs:
+      dirID = directoryIDs[dirPath]
+      cachedFiles = self.db._getCachedFileIDs( dirID, dirDict[dirPath] )
+      for fileName, ( fileID, _status ) in cachedFiles.items():
+        fname = '%s/%s' % (dirPath,fileName)
+        fname = fname.replace('//','/')
+        successful[fname] = fileID
+      fileNames = [ fileName for fileName in dirDict[dirPath] if not fileName in cachedFiles ]
+      if fileNames:
+        toFind[dirPath] = fileNames
+    directoryIDList = toFind.keys()
     for dirIDs in breakListIntoChunks( directoryIDList, 1000 ):
 
       wheres = []
       for dirPath in dirIDs:
-        fileNames = dirDict[dirPath]
+        fileNames = toFind[dirPath]
         dirID = directoryIDs[dirPath]
         wheres.append( "( DirID=%d AND FileName IN (%s) )" % (dirID, stringListToString(fileNames) ) )
 
-      req = "SELECT FileName,DirID,FileID FROM FC_Files WHERE %s" % " OR ".join( wheres )
+      req = "SELECT FileName,DirID,FileID,Status FROM FC_Files WHERE %s" % " OR ".join( wheres )
       result = self.db._query(req,connection)
       if not result['OK']:
         return result
-      for fileName, dirID, fileID in result['Value']:
+      for fileName, dirID, fileID, _status in result['Value']:
         fname = '%s/%s' % (directoryPaths[dirID],fileName)
         fname = fname.replace('//','/')
         successful[fname] = fileID
+      self.db._cacheFileIDs( [ ( dirID, fileName, fileID, status ) for fileName, dirID, fileID, status in result['Value'] ] )
 
     for lfn in lfns:
       if not lfn in successful:
@@ -176,11 +219,7 @@ class FileManager(FileManagerBase):
     # 'Type','CreationDate','ModificationDate','Mode']
     req = "SELECT FileName,DirID,FileID,Size,UID,GID,Status FROM FC_Files WHERE DirID=%d" % (dirID)
     if not allStatus:
-      statusIDs = []
-      for status in self.db.visibleFileStatus:
-        res = self._getStatusInt( status, connection=connection )
-        if res['OK']:
-          statusIDs.append( res['Value'] )
+      statusIDs = self.__getVisibleStatusIDs( connection )
       if statusIDs:
         req = "%s AND Status IN (%s)" % (req,intListToString(statusIDs))
     if fileNames:
@@ -191,6 +230,8 @@ class FileManager(FileManagerBase):
     fileNameIDs = res['Value']
     if not fileNameIDs:
       return S_OK({})
+    if fileNames:
+      self.db._cacheFileIDs( [ ( row[1], row[0], row[2], row[6] ) for row in fileNameIDs ] )
     filesDict = {}
     # If we only requested the FileIDs then there is no need to do anything else
     if metadata == ['FileID']:
@@ -297,14 +338,13 @@ class FileManager(FileManagerBase):
         result = self.db.ugManager.getUserAndGroupID( ownerDict )
         if result['OK']:
           s_uid, s_gid = result['Value']
-      insertTuples.append("(%d,%d,%d,%d,%d,'%s')" % (dirID,size,s_uid,s_gid,statusID,fileName))
+      insertTuples.append((dirID,size,s_uid,s_gid,statusID,fileName))
       directorySESizeDict.setdefault( dirID, {} )
       directorySESizeDict[dirID].setdefault( 0, {'Files':0,'Size':0} )
       directorySESizeDict[dirID][0]['Size'] += lfns[lfn]['Size']
       directorySESizeDict[dirID][0]['Files'] += 1
 
-    req = "INSERT INTO FC_Files (DirID,Size,UID,GID,Status,FileName) VALUES %s" % (','.join(insertTuples))
-    res = self.db._update(req,connection)
+    res = self.db.insertMany('FC_Files',['DirID','Size','UID','GID','Status','FileName'],insertTuples,connection)
     if not res['OK']:
       return res
     # Get the fileIDs for the inserted files
@@ -330,10 +370,10 @@ class FileManager(FileManagerBase):
       guid = fileInfo.get('GUID','')
       mode = fileInfo.get('Mode',self.db.umask)
       toDelete.append(fileID)
-      insertTuples.append("(%d,'%s','%s','%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),%d)" % (fileID,guid,checksum,checksumtype,mode))
+      insertTuples.append((fileID,guid,checksum,checksumtype,'UTC_TIMESTAMP()','UTC_TIMESTAMP()',mode))
     if insertTuples:
-      req = "INSERT INTO FC_FileInfo (FileID,GUID,Checksum,CheckSumType,CreationDate,ModificationDate,Mode) VALUES %s" % ','.join(insertTuples)
-      res = self.db._update(req)
+      res = self.db.insertMany('FC_FileInfo',['FileID','GUID','Checksum','CheckSumType','CreationDate','ModificationDate','Mode'],
+                               insertTuples,connection)
       if not res['OK']:
         self._deleteFiles(toDelete,connection=connection)
         for lfn in lfns.keys():
@@ -449,9 +489,8 @@ class FileManager(FileManagerBase):
     if not insertTuples:
       return S_OK({'Successful':successful,'Failed':failed})
 
-    req = "INSERT INTO FC_Replicas (FileID,SEID,Status) VALUES %s" % \
-          (','.join(["(%d,%d,%d)" % (tuple_[0],tuple_[1],statusID) for tuple_ in insertTuples]))
-    res = self.db._update(req,connection)
+    res = self.db.insertMany('FC_Replicas',['FileID','SEID','Status'],
+                             [(fileID,seID,statusID) for fileID,seID in insertTuples],connection)
     if not res['OK']:
       return res
     res = self._getRepIDsForReplica(insertTuples, connection=connection)
@@ -480,10 +519,10 @@ class FileManager(FileManagerBase):
       if repID:
         pfn = fileDict['PFN']
         toDelete.append(repID)
-        insertReplicas.append("(%d,'%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),'%s')" % (repID,replicaType,pfn))    
+        insertReplicas.append((repID,replicaType,'UTC_TIMESTAMP()','UTC_TIMESTAMP()',pfn))
     if insertReplicas:
-      req = "INSERT INTO FC_ReplicaInfo (RepID,RepType,CreationDate,ModificationDate,PFN) VALUES %s" % (','.join(insertReplicas))
-      res = self.db._update(req,connection)
+      res = self.db.insertMany('FC_ReplicaInfo',['RepID','RepType','CreationDate','ModificationDate','PFN'],
+                               insertReplicas,connection)
       if not res['OK']:
         for lfn in lfns.keys():
           failed[lfn] = res['Message']
@@ -686,8 +686,12 @@ class FileManagerBase:
       for fid, reason in res['Value']['Failed'].items():
         failed[fileIDLfns[fid]] = reason
         
-    # Now do removal  
+    # Now do removal, uncaching again once the rows are gone as a concurrent lookup
+    # may have cached the files meanwhile
+    fileKeys = [ ( lfnDict['DirID'], os.path.basename( lfn ) ) for lfn, lfnDict in lfns.items() ]
+    self.db._uncacheFiles( fileKeys )
     res = self._deleteFiles( fileIDLfns.keys(), connection = connection )
+    self.db._uncacheFiles( fileKeys )
     if not res['OK']:
       for lfn in fileIDLfns.values():
         failed[lfn] = res['Message']
@@ -735,12 +739,15 @@ class FileManagerBase:
     successful = {}
     failed = {}
     for lfn,status in lfns.items():
-      result = self._findFiles( [lfn], ['FileID'], connection = connection )
+      result = self._findFiles( [lfn], ['FileID', 'DirID'], connection = connection )
       if not result['Value']['Successful'].has_key( lfn ):
         failed[lfn] = result['Value']['Failed'][lfn]
         continue
       fileID = result['Value']['Successful'][lfn]['FileID']
+      fileKeys = [ ( result['Value']['Successful'][lfn]['DirID'], os.path.basename( lfn ) ) ]
+      self.db._uncacheFiles( fileKeys )
       result = self._setFileStatus( fileID, status, connection )
+      self.db._uncacheFiles( fileKeys )
       if not result['OK']:
         failed[lfn] = result['Message']
       else:
@@ -1100,8 +1107,46 @@ class FileManagerBase:
 
   def getFilesInDirectory( self, dirID, verbose = False, connection = False ):
     connection = self._getConnection( connection )
+    return self.__getFilesInDirectory( dirID, [], verbose, connection )
+
+  def getFilesInDirectoryChunk( self, dirID, fromFileID = 0, maxFiles = 1000, verbose = False, connection = False ):
+    """ Get the files of a directory with FileID above fromFileID, at most maxFiles
+        of them in FileID order. Returns S_OK( ( files, lastFileID ) ) where lastFileID
+        is the cursor for the next chunk, 0 when the end of the directory is reached
+    """
+    connection = self._getConnection( connection )
+    res = self._getDirectoryFileChunk( dirID, fromFileID, maxFiles, connection = connection )
+    if not res['OK']:
+      return res
+    fileNames, lastFileID = res['Value']
+    if not fileNames:
+      return S_OK( ( {}, lastFileID ) )
+    res = self.__getFilesInDirectory( dirID, fileNames, verbose, connection )
+    if not res['OK']:
+      return res
+    return S_OK( ( res['Value'], lastFileID ) )
+
+  def _getDirectoryFileChunk( self, dirID, fromFileID, maxFiles, connection = False ):
+    """ Get the names of at most maxFiles files of a directory with FileID above fromFileID,
+        in FileID order, and the cursor to get the next ones ( 0 at the end of the directory )
+    """
+    connection = self._getConnection( connection )
+    req = "SELECT FileID,FileName FROM FC_Files WHERE DirID=%d AND FileID>%d ORDER BY FileID LIMIT %d" % \
+          ( dirID, fromFileID, maxFiles )
+    res = self.db._query( req, connection )
+    if not res['OK']:
+      return res
+    lastFileID = 0
+    if len( res['Value'] ) == maxFiles:
+      lastFileID = res['Value'][-1][0]
+    return S_OK( ( [ row[1] for row in res['Value'] ], lastFileID ) )
+
+  def __getFilesInDirectory( self, dirID, fileNames, verbose, connection ):
+    """ Get the metadata, and replicas if verbose, of the given files of a directory,
+        or of all of them if fileNames is empty
+    """
     files = {}
-    res = self._getDirectoryFiles( dirID, [], ['FileID', 'Size',
+    res = self._getDirectoryFiles( dirID, fileNames, ['FileID', 'Size',
                                                'Checksum', 'ChecksumType',
                                                'Type', 'UID',
                                                'GID', 'CreationDate',
@@ -1149,6 +1194,41 @@ class FileManagerBase:
 
     return S_OK( resultDict )
 
+  def getDirectoryReplicasChunk( self, dirID, fromFileID = 0, maxFiles = 1000, allStatus = False, connection = False ):
+    """ Get the replicas of the files of a directory with FileID above fromFileID, at most
+        maxFiles of them in FileID order. Returns S_OK( ( replicas, lastFileID ) ) as
+        getFilesInDirectoryChunk
+    """
+    connection = self._getConnection( connection )
+    res = self._getDirectoryFileChunk( dirID, fromFileID, maxFiles, connection = connection )
+    if not res['OK']:
+      return res
+    fileNames, lastFileID = res['Value']
+    if not fileNames:
+      return S_OK( ( {}, lastFileID ) )
+    res = self._getDirectoryFiles( dirID, fileNames, ['FileID'], allStatus = allStatus, connection = connection )
+    if not res['OK']:
+      return res
+    fileIDNames = {}
+    for fileName, fileDict in res['Value'].items():
+      fileIDNames[fileDict['FileID']] = fileName
+    if not fileIDNames:
+      return S_OK( ( {}, lastFileID ) )
+    res = self._getFileReplicas( fileIDNames.keys(), ['PFN'], connection = connection )
+    if not res['OK']:
+      return res
+    # With the strong LFN-PFN convention the PFNs are built by the client from the SE prefixes
+    strongConvention = self.db.lfnPfnConvention and self.db.lfnPfnConvention != "Weak"
+    resultDict = {}
+    for fileID, seDict in res['Value'].items():
+      resultDict[fileIDNames[fileID]] = {}
+      for se, repDict in seDict.items():
+        pfn = repDict.get( 'PFN', '' )
+        if strongConvention:
+          pfn = ''
+        resultDict[fileIDNames[fileID]][se] = pfn
+    return S_OK( ( resultDict, lastFileID ) )
+
   def _getFileDirectories( self, lfns ):
     dirDict = {}
     for lfn in lfns:
@@ -145,9 +145,9 @@ class FileManagerFlat(FileManagerBase):
       if not directoryFiles.has_key(dirName):
         directoryFiles[dirName] = []
       directoryFiles[dirName].append(fileName)  
-      insertTuples.append("(%d,%d,%d,%d,%d,'%s','%s','%s','%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),%d)" % (dirID,size,uid,gid,statusID,fileName,guid,checksum,checksumtype,self.db.umask))
-    req = "INSERT INTO FC_Files (DirID,Size,UID,GID,Status,FileName,GUID,Checksum,ChecksumType,CreationDate,ModificationDate,Mode) VALUES %s" % (','.join(insertTuples))
-    res = self.db._update(req,connection)
+      insertTuples.append((dirID,size,uid,gid,statusID,fileName,guid,checksum,checksumtype,'UTC_TIMESTAMP()','UTC_TIMESTAMP()',self.db.umask))
+    res = self.db.insertMany('FC_Files',['DirID','Size','UID','GID','Status','FileName','GUID','Checksum','ChecksumType',
+                                         'CreationDate','ModificationDate','Mode'],insertTuples,connection)
     if not res['OK']:
       return res
     # Get the fileIDs for the inserted files
@@ -249,11 +249,11 @@ class FileManagerFlat(FileManagerBase):
         directorySESizeDict[dirID][seID] = {'Files':0,'Size':0}
       directorySESizeDict[dirID][seID]['Size'] += lfns[lfn]['Size']
       directorySESizeDict[dirID][seID]['Files'] += 1
-      insertTuples[lfn] = ("(%d,%d,%d,'%s',UTC_TIMESTAMP(),UTC_TIMESTAMP(),'%s')" % (fileID,seID,statusID,replicaType,pfn))
+      insertTuples[lfn] = (fileID,seID,statusID,replicaType,'UTC_TIMESTAMP()','UTC_TIMESTAMP()',pfn)
       deleteTuples.append((fileID,seID))
     if insertTuples:
-      req = "INSERT INTO FC_Replicas (FileID,SEID,Status,RepType,CreationDate,ModificationDate,PFN) VALUES %s" % ','.join(insertTuples.values())
-      res = self.db._update(req,connection)
+      res = self.db.insertMany('FC_Replicas',['FileID','SEID','Status','RepType','CreationDate','ModificationDate','PFN'],
+                               insertTuples.values(),connection)
       if not res['OK']:
         self.__deleteReplicas(deleteTuples,connection=connection)
         for lfn in insertTuples.keys():
@@ -7,8 +7,11 @@ __RCSID__ = "$Id$"
 
 from DIRAC                                                            import gLogger, S_OK, S_ERROR
 from DIRAC.Core.Base.DB                                               import DB
-from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities    import checkArgumentDict
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities    import checkArgumentFormat
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
+from DIRAC.Core.Utilities.LRUCache import LRUCache
+
+import os
 
 #############################################################################
 class FileCatalogDB(DB):
@@ -48,6 +51,9 @@ class FileCatalogDB(DB):
     self.dmeta = None
     self.fmeta = None
     self.statusDict = {}
+    # Caches of directory path -> DirID and ( DirID, FileName ) -> ( FileID, Status )
+    self.dirIDCache = LRUCache( 100000, 60 )
+    self.fileIDCache = LRUCache( 100000, 60 )
 
   def setConfig(self,databaseConfig):
 
@@ -73,6 +79,10 @@ class FileCatalogDB(DB):
     self.validReplicaStatus = databaseConfig['ValidReplicaStatus']
     self.visibleFileStatus = databaseConfig['VisibleFileStatus']
     self.visibleReplicaStatus = databaseConfig['VisibleReplicaStatus']
+    cacheSize = int( databaseConfig.get( 'LFNCacheSize', 100000 ) )
+    cacheLifeTime = int( databaseConfig.get( 'LFNCacheLifeTime', 60 ) )
+    self.dirIDCache = LRUCache( cacheSize, cacheLifeTime )
+    self.fileIDCache = LRUCache( cacheSize, cacheLifeTime )
 
     # Obtain the plugins to be used for DB interaction
     self. objectLoader = ObjectLoader()
@@ -178,6 +188,76 @@ class FileCatalogDB(DB):
       return S_OK(self.statusDict[statusID])
     return S_OK('Unknown')
 
+  ########################################################################
+  #
+  #  LFN resolution caches
+  #
+  #  They only hold entries found in the DB, the methods removing directories
+  #  and files drop their entries. Entries expire after LFNCacheLifeTime seconds
+  #  to limit the effect of changes done through other service instances
+
+  def _findDirIDs( self, paths, connection = False ):
+    """ Get the DirIDs of the given directory paths, only the existing ones are returned
+    """
+    dirPaths = [ os.path.normpath( path ) for path in paths ]
+    dirIDs = self.dirIDCache.getMany( dirPaths )
+    toFind = [ path for path in dirPaths if path not in dirIDs ]
+    if toFind:
+      result = self.dtree.findDirs( toFind, connection )
+      if not result['OK']:
+        return result
+      for path, dirID in result['Value'].items():
+        self.dirIDCache.put( path, dirID )
+        dirIDs[path] = dirID
+    return S_OK( dirIDs )
+
+  def _getCachedFileIDs( self, dirID, fileNames ):
+    """ Get the cached ( FileID, Status ) of the given files of a directory
+    """
+    cached = {}
+    for fileName in fileNames:
+      fileTuple = self.fileIDCache.get( ( dirID, fileName ) )
+      if fileTuple is not None:
+        cached[fileName] = fileTuple
+    return cached
+
+  def _cacheFileIDs( self, fileTuples ):
+    """ Add ( DirID, FileName, FileID, Status ) tuples to the file cache
+    """
+    for dirID, fileName, fileID, status in fileTuples:
+      self.fileIDCache.put( ( dirID, fileName ), ( fileID, status ) )
+
+  def _uncacheFiles( self, fileKeys ):
+    """ Remove ( DirID, FileName ) entries from the file cache
+    """
+    for fileKey in fileKeys:
+      self.fileIDCache.delete( fileKey )
+
+  def _uncacheDirectories( self, paths ):
+    """ Remove the given directories, their subdirectories and their files from the caches
+    """
+    dirPaths = set( [ os.path.normpath( path ) for path in paths ] )
+    prefixes = tuple( [ "%s/" % path.rstrip( '/' ) for path in dirPaths ] )
+    dirIDs = set()
+    def isRemoved( path, dirID ):
+      if path in dirPaths or path.startswith( prefixes ):
+        dirIDs.add( dirID )
+        return True
+      return False
+    self.dirIDCache.deleteIf( isRemoved )
+    if dirIDs:
+      self.fileIDCache.deleteIf( lambda fileKey, _fileTuple: fileKey[0] in dirIDs )
+
+  def clearCaches( self ):
+    self.dirIDCache.clear()
+    self.fileIDCache.clear()
+
+  def getCacheCounters( self ):
+    """ Get the size and hit rate of the LFN resolution caches
+    """
+    return S_OK( { 'DirIDCache' : self.dirIDCache.getStats(),
+                   'FileIDCache' : self.fileIDCache.getStats() } )
+
   ########################################################################
   #
   #  SE based write methods
@@ -626,6 +706,7 @@ class FileCatalogDB(DB):
       res = self.dtree.removeDirectory(res['Value']['Successful'],credDict)
       if not res['OK']:
         return res
+      self._uncacheDirectories( res['Value']['Successful'].keys() )
       failed.update(res['Value']['Failed'])
       successful = res['Value']['Successful']
       if not successful:
@@ -659,6 +740,22 @@ class FileCatalogDB(DB):
     successful = res['Value']['Successful']
     return S_OK( {'Successful':successful,'Failed':failed} )
   
+  def listDirectoryChunk( self, path, credDict, cursor = 0, maxFiles = 1000, verbose = False ):
+    """ Get a part of a directory listing, see DirectoryTreeBase.listDirectoryChunk
+    """
+    res = self.__checkSinglePathPermission( 'Read', path, credDict )
+    if not res['OK']:
+      return res
+    return self.dtree.listDirectoryChunk( res['Value'], cursor, maxFiles, verbose )
+
+  def getDirectoryReplicasChunk( self, path, credDict, cursor = 0, maxFiles = 1000, allStatus = False ):
+    """ Get the replicas of a part of a directory, see DirectoryTreeBase.getDirectoryReplicasChunk
+    """
+    res = self.__checkSinglePathPermission( 'Read', path, credDict )
+    if not res['OK']:
+      return res
+    return self.dtree.getDirectoryReplicasChunk( res['Value'], cursor, maxFiles, allStatus )
+
   def isDirectory(self,lfns,credDict):
     res = self._checkPathPermissions('Read', lfns, credDict)
     if not res['OK']:
@@ -709,6 +806,8 @@ class FileCatalogDB(DB):
     result = S_OK()
     if directoryFlag:
       result = self.dtree.recoverOrphanDirectories( credDict )
+      # Directory IDs may have changed
+      self.clearCaches()
       
     return result 
     
@@ -805,6 +904,10 @@ class FileCatalogDB(DB):
     if not res['OK']:
       return res
     counterDict.update(res['Value'])
+    for cacheName, cache in [ ( 'DirID', self.dirIDCache ), ( 'FileID', self.fileIDCache ) ]:
+      stats = cache.getStats()
+      counterDict['%s cache size' % cacheName] = stats['Size']
+      counterDict['%s cache hit rate (%%)' % cacheName] = round( stats['HitRate'], 1 )
     return S_OK(counterDict)
 
   ########################################################################
@@ -815,6 +918,21 @@ class FileCatalogDB(DB):
   def _checkAdminPermission(self,credDict):
     return self.securityManager.hasAdminAccess(credDict)
 
+  def __checkSinglePathPermission( self, operation, path, credDict ):
+    """ Check the permission on one path, returns the path in the normalized form
+        used by _checkPathPermissions
+    """
+    res = checkArgumentFormat( path )
+    if not res['OK']:
+      return res
+    path = res['Value'].keys()[0]
+    res = self._checkPathPermissions( operation, path, credDict )
+    if not res['OK']:
+      return res
+    if path not in res['Value']['Successful']:
+      return S_ERROR( res['Value']['Failed'].get( path, 'Permission denied' ) )
+    return S_OK( path )
+
   def _checkPathPermissions(self,operation,lfns,credDict):
     res = checkArgumentFormat(lfns)
     if not res['OK']:
@@ -865,9 +865,8 @@ class TransferDB( DB ):
       if not query["OK"]:
         gLogger.error( "TransferDB.getFSTReqLFNs: unable to select PFNs for missing Files: %s" % query["Message"] )
         return query
-      # # guess LFN from StorageElement, prepare query for inserting records, save lfn in files dict
-      insertTemplate = "INSERT INTO Files (SubRequestID, FileID, LFN, Status) VALUES (0, %s, %s, 'Scheduled');"
-      insertQuery = []
+      # # guess LFN from StorageElement, prepare rows for inserting records, save lfn in files dict
+      insertRows = []
       for fileID, pfn in query["Value"]:
         lfn = sourceSE.getPfnPath( pfn )
         if not lfn["OK"]:
@@ -875,10 +874,10 @@ class TransferDB( DB ):
           return lfn
         lfn = lfn["Value"]
         files[lfn] = fileID
-        insertQuery.append( insertTemplate % ( fileID, lfn ) )
+        insertRows.append( ( 0, fileID, lfn, 'Scheduled' ) )
       # # insert missing 'fake' records
-      if insertQuery:
-        ins = self._update( "\n".join( insertQuery ) )
+      if insertRows:
+        ins = self.insertMany( "Files", [ "SubRequestID", "FileID", "LFN", "Status" ], insertRows )
         if not ins["OK"]:
           gLogger.error( "TransferDB.getFTSReqLFNs: unable to insert fake Files for missing LFNs: %s" % ins["Message"] )
           return ins
@@ -894,13 +893,11 @@ class TransferDB( DB ):
     :param int channelID: Channel.ChannelID
     :param list fileAttributes: [ (fileID, fileSize), ... ]
     """
-    for fileID, fileSize in fileAttributes:
-      req = "INSERT INTO FileToFTS (FTSReqID,FileID,ChannelID,SubmissionTime,FileSize)" \
-          " VALUES (%s,%s,%s,UTC_TIMESTAMP(),%s);" % ( ftsReqID, fileID, channelID, fileSize )
-      res = self._update( req )
-      if not res['OK']:
-        err = "TransferDB._setFTSReqFiles: Failed to set File %s for FTSReq %s." % ( fileID, ftsReqID )
-        return S_ERROR( '%s\n%s' % ( err, res['Message'] ) )
+    rows = [ ( ftsReqID, fileID, channelID, "UTC_TIMESTAMP()", fileSize ) for fileID, fileSize in fileAttributes ]
+    res = self.insertMany( "FileToFTS", [ "FTSReqID", "FileID", "ChannelID", "SubmissionTime", "FileSize" ], rows )
+    if not res['OK']:
+      err = "TransferDB._setFTSReqFiles: Failed to set Files for FTSReq %s." % ftsReqID
+      return S_ERROR( '%s\n%s' % ( err, res['Message'] ) )
     return S_OK()
 
   def getFTSReqFileIDs( self, ftsReqID ):
@@ -1173,15 +1170,15 @@ class TransferDB( DB ):
     :param int fileID: Files.FileID
     :param dict tree: replicationTree produced by StrategyHandler
     """
+    rows = []
     for channelID, repDict in tree.items():
       ancestor = repDict["Ancestor"] if repDict["Ancestor"] else "-"
-      strategy = repDict['Strategy']
-      req = "INSERT INTO ReplicationTree (FileID, ChannelID, AncestorChannel, Strategy, CreationTime) " \
-          " VALUES (%s,%s,'%s','%s',UTC_TIMESTAMP());" % ( fileID, channelID, ancestor, strategy )
-      res = self._update( req )
-      if not res['OK']:
-        err = "TransferDB._addReplicationTree: Failed to add ReplicationTree for file %s" % fileID
-        return S_ERROR( err )
+      rows.append( ( fileID, channelID, ancestor, repDict['Strategy'], "UTC_TIMESTAMP()" ) )
+    res = self.insertMany( "ReplicationTree", [ "FileID", "ChannelID", "AncestorChannel", "Strategy", "CreationTime" ],
+                           rows )
+    if not res['OK']:
+      err = "TransferDB._addReplicationTree: Failed to add ReplicationTree for file %s" % fileID
+      return S_ERROR( err )
     return S_OK()
 
   #################################################################################
@@ -9,6 +9,7 @@ testUser  = 'atsareg'
 testGroup = 'dirac_user'
 testDir = '/vo.formation.idgrilles.fr/user/a/atsareg/testdir'
 testFile  = '/vo.formation.idgrilles.fr/user/a/atsareg/testdir/testfile'
+chunkDir = '/vo.formation.idgrilles.fr/user/a/atsareg/testdir/chunks'
 
 class FileCatalogDBTestCase(unittest.TestCase):
   """ Base class for the FileCatalogDB test cases
@@ -86,11 +87,84 @@ class FileCase(FileCatalogDBTestCase):
       self.assert_( testFile in result['Value']['Successful'] )
       
 
+class ChunkCase(FileCatalogDBTestCase):
+
+  def setUp(self):
+    FileCatalogDBTestCase.setUp(self)
+    from DIRAC.Core.Utilities.File import makeGuid
+    self.files = {}
+    for i in range(5):
+      lfn = '%s/chunkfile%d' % ( chunkDir, i )
+      self.files[lfn] = { 'PFN': 'chunkfile%d' % i,
+                          'SE': 'testSE',
+                          'Size': 0,
+                          'GUID': makeGuid(),
+                          'Checksum': '0' }
+    result = self.fc.createDirectory( chunkDir )
+    self.assert_( result['OK'] )
+    result = self.fc.addFile( self.files )
+    self.assert_( result['OK'] )
+    self.assertEqual( result['Value']['Failed'], {} )
+
+  def tearDown(self):
+    self.fc.removeFile( self.files.keys() )
+    self.fc.removeDirectory( chunkDir )
+
+  def test_listDirectoryChunk(self):
+    """ the chunks of a directory hold all its files once """
+    listed = []
+    cursor = 0
+    chunks = 0
+    while True:
+      result = self.fc.listDirectoryChunk( chunkDir, cursor, 2 )
+      self.assert_( result['OK'] )
+      self.assert_( len( result['Value']['Files'] ) <= 2 )
+      listed.extend( result['Value']['Files'].keys() )
+      chunks += 1
+      cursor = result['Value']['Cursor']
+      if not cursor:
+        break
+    self.assertEqual( sorted( listed ), sorted( self.files ) )
+    self.assert_( chunks >= 3 )
+    # The path is normalized as for the other methods
+    result = self.fc.listDirectoryChunk( 'lfn:%s/' % chunkDir, 0, 10 )
+    self.assert_( result['OK'] )
+    self.assertEqual( len( result['Value']['Files'] ), 5 )
+    result = self.fc.getDirectoryReplicasChunk( chunkDir, 0, 10 )
+    self.assert_( result['OK'] )
+    self.assertEqual( len( result['Value']['Replicas'] ), 5 )
+
+  def test_streams(self):
+    """ the streams deliver all the files and resume from a cursor """
+    streamed = []
+    result = self.fc.listDirectoryStream( chunkDir, lambda chunk: streamed.extend( chunk['Files'].keys() ),
+                                          chunkSize = 2 )
+    self.assert_( result['OK'] )
+    self.assertEqual( result['Value'], 0 )
+    self.assertEqual( sorted( streamed ), sorted( self.files ) )
+    replicas = {}
+    result = self.fc.getDirectoryReplicasStream( chunkDir, replicas.update, chunkSize = 2 )
+    self.assert_( result['OK'] )
+    self.assertEqual( sorted( replicas ), sorted( self.files ) )
+    self.assert_( 'testSE' in replicas.values()[0] )
+    result = self.fc.listDirectoryChunk( chunkDir, 0, 2 )
+    self.assert_( result['OK'] )
+    firstFiles = result['Value']['Files'].keys()
+    rest = []
+    result = self.fc.listDirectoryStream( chunkDir, lambda chunk: rest.extend( chunk['Files'].keys() ),
+                                          cursor = result['Value']['Cursor'], chunkSize = 2 )
+    self.assert_( result['OK'] )
+    self.assertEqual( sorted( firstFiles + rest ), sorted( self.files ) )
+    result = self.fc.listDirectoryStream( '%s/missing' % chunkDir, lambda chunk: None )
+    self.assertFalse( result['OK'] )
+    self.assertEqual( result['Cursor'], 0 )
+
 if __name__ == '__main__':
 
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(UserGroupCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DirectoryCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(FileCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ChunkCase))
 
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
 
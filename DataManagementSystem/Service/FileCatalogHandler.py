@@ -20,9 +20,12 @@ from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
 from DIRAC.Core.Utilities.List import sortList
+from DIRAC.Core.Utilities import DEncode
 
 # This is a global instance of the FileCatalogDB class
 gFileCatalogDB = None
+# Maximum number of files in a chunk of directory listing or replicas
+MAX_CHUNK_SIZE = 10000
 
 def initializeFileCatalogHandler( serviceInfo ):
   """ handler initialisation """
@@ -59,7 +62,9 @@ def initializeFileCatalogHandler( serviceInfo ):
                     'ValidFileStatus'     : ['AprioriGood','Trash','Removing','Probing'],
                     'ValidReplicaStatus'  : ['AprioriGood','Trash','Removing','Probing'],
                     'VisibleFileStatus'   : ['AprioriGood'],
-                    'VisibleReplicaStatus': ['AprioriGood']}
+                    'VisibleReplicaStatus': ['AprioriGood'],
+                    'LFNCacheSize'        : 100000,
+                    'LFNCacheLifeTime'    : 60 }
   for configKey in sortList( defaultConfig.keys() ):
     defaultValue = defaultConfig[configKey]
     configValue = getServiceOption( serviceInfo, configKey, defaultValue )
@@ -302,6 +307,52 @@ class FileCatalogHandler( RequestHandler ):
     """ Get replicas for files in the supplied directory """
     return gFileCatalogDB.getDirectoryReplicas( lfns, allStatus, self.getRemoteCredentials() )
 
+  types_listDirectoryChunk = [ StringTypes, [ IntType, LongType ], [ IntType, LongType ], BooleanType ]
+  def export_listDirectoryChunk( self, path, cursor, maxFiles, verbose ):
+    """ List at most maxFiles files of a directory after the cursor, the returned
+        Cursor gets the next chunk and is 0 after the last one
+    """
+    maxFiles = max( 1, min( maxFiles, MAX_CHUNK_SIZE ) )
+    return gFileCatalogDB.listDirectoryChunk( path, self.getRemoteCredentials(), cursor, maxFiles, verbose )
+
+  types_getDirectoryReplicasChunk = [ StringTypes, [ IntType, LongType ], [ IntType, LongType ], BooleanType ]
+  def export_getDirectoryReplicasChunk( self, path, cursor, maxFiles, allStatus ):
+    """ Get the replicas of at most maxFiles files of a directory after the cursor
+    """
+    maxFiles = max( 1, min( maxFiles, MAX_CHUNK_SIZE ) )
+    return gFileCatalogDB.getDirectoryReplicasChunk( path, self.getRemoteCredentials(), cursor, maxFiles, allStatus )
+
+  def transfer_toClient( self, fileID, token, fileHelper ):
+    """ Stream a directory listing or the replicas of a directory, chunk by chunk, as
+        DEncoded results of listDirectoryChunk or getDirectoryReplicasChunk. The stream
+        stops after the last chunk or after the first error, whose cursor allows to resume.
+        fileID is ( 'listDirectory' | 'getDirectoryReplicas', path, optionsDict )
+    """
+    try:
+      operation, path, options = fileID
+    except ( TypeError, ValueError ):
+      return S_ERROR( "Invalid stream request %s" % str( fileID ) )
+    if operation not in ( 'listDirectory', 'getDirectoryReplicas' ):
+      return S_ERROR( "Unknown stream operation %s" % operation )
+    credDict = self.getRemoteCredentials()
+    cursor = options.get( 'Cursor', 0 )
+    maxFiles = max( 1, min( options.get( 'ChunkSize', 1000 ), MAX_CHUNK_SIZE ) )
+    while True:
+      if operation == 'listDirectory':
+        result = gFileCatalogDB.listDirectoryChunk( path, credDict, cursor, maxFiles, options.get( 'Verbose', False ) )
+      else:
+        result = gFileCatalogDB.getDirectoryReplicasChunk( path, credDict, cursor, maxFiles,
+                                                           options.get( 'AllStatus', False ) )
+      retVal = fileHelper.sendData( DEncode.encode( result ) )
+      if not retVal['OK']:
+        return retVal
+      if 'AbortTransfer' in retVal and retVal['AbortTransfer']:
+        return S_OK()
+      if not result['OK'] or not result['Value']['Cursor']:
+        break
+      cursor = result['Value']['Cursor']
+    return fileHelper.sendEOF()
+
   ########################################################################
   #
   # Administrative database operations
@@ -46,6 +46,7 @@ from DIRAC                                                   import gLogger
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry       import getVOForGroup
 from DIRAC.Core.Security.ProxyInfo                           import getProxyInfo
 from DIRAC.Resources.Catalog.FileCatalog import FileCatalog
+from DIRAC.Resources.Catalog.FileCatalogClient               import FileCatalogClient
 from DIRAC.Core.Utilities.List                               import sortList
 from datetime import datetime, timedelta
 import sys, os, time, fnmatch
@@ -89,32 +90,46 @@ activeDirs = [baseDir]
 
 allFiles = []
 emptyDirs = []
+
+# Stream the directory listings from the DIRAC File Catalog if it is used, to get
+# large directories by chunks instead of in a single response
+streamCatalog = None
+for catalogName, oCatalog, master in fc.getReadCatalogs():
+  if isinstance( oCatalog, FileCatalogClient ):
+    streamCatalog = oCatalog
+    break
+
+def addDirContents( dirContents, counters ):
+  for subdir, metadata in dirContents.get( 'SubDirs', {} ).items():
+    if ( not verbose ) or isOlderThan( metadata['CreationDate'], totalDays ):
+      activeDirs.append( subdir )
+    counters['SubDirs'] += 1
+  for filename, fileInfo in dirContents.get( 'Files', {} ).items():
+    metadata = fileInfo['MetaData']
+    if ( not verbose ) or isOlderThan( metadata['CreationDate'], totalDays ):
+      if fnmatch.fnmatch( filename, wildcard ):
+        allFiles.append( filename )
+    counters['Files'] += 1
+
 while len( activeDirs ) > 0:
   currentDir = activeDirs[0]
-  res = fc.listDirectory( currentDir, verbose )
   activeDirs.remove( currentDir )
+  counters = { 'Files' : 0, 'SubDirs' : 0 }
+  if streamCatalog:
+    res = streamCatalog.listDirectoryStream( currentDir, lambda chunk: addDirContents( chunk, counters ), verbose )
+  else:
+    res = fc.listDirectory( currentDir, verbose )
+    if res['OK']:
+      if res['Value']['Failed'].has_key( currentDir ):
+        res = DIRAC.S_ERROR( res['Value']['Failed'][currentDir] )
+      else:
+        addDirContents( res['Value']['Successful'][currentDir], counters )
   if not res['OK']:
     gLogger.error( "Error retrieving directory contents", "%s %s" % ( currentDir, res['Message'] ) )
-  elif res['Value']['Failed'].has_key( currentDir ):
-    gLogger.error( "Error retrieving directory contents", "%s %s" % ( currentDir, res['Value']['Failed'][currentDir] ) )
-  else:
-    dirContents = res['Value']['Successful'][currentDir]
-    subdirs = dirContents['SubDirs']
-    empty = True
-    for subdir, metadata in subdirs.items():
-      if ( not verbose ) or isOlderThan( metadata['CreationDate'], totalDays ):
-        activeDirs.append( subdir )
-      empty = False
-    for filename, fileInfo in dirContents['Files'].items():
-      metadata = fileInfo['MetaData']
-      if ( not verbose ) or isOlderThan( metadata['CreationDate'], totalDays ):
-        if fnmatch.fnmatch( filename, wildcard ):
-          allFiles.append( filename )
-      empty = False
-    files = dirContents['Files'].keys()
-    gLogger.notice( "%s: %d files, %d sub-directories" % ( currentDir, len( files ), len( subdirs ) ) )
-    if empty:
-      emptyDirs.append( currentDir )
+    continue
+  gLogger.notice( "%s: %d files, %d sub-directories" % ( currentDir, counters['Files'], counters['SubDirs'] ) )
+  if not counters['Files'] and not counters['SubDirs']:
+    emptyDirs.append( currentDir )
 
 outputFileName = '%s.lfns' % baseDir.replace( '/%s' % vo, '%s' % vo ).replace( '/', '-' )
 outputFile = open( outputFileName, 'w' )
@@ -1,7 +1,7 @@
 # $HeadURL$
 __RCSID__ = "b7db10b (2013-03-06 01:10:41 +0100) Andrei Tsaregorodtsev <atsareg@in2p3.fr>"
 
-#import threading
+import threading
 import time
 import types
 import DIRAC
@@ -9,6 +9,7 @@ from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.Core.Utilities import Time, Network, ThreadScheduler
+from DIRAC.Core.Utilities.QuantileSketch import QuantileSketch
 from DIRAC.Core.DISET.RPCClient import RPCClient
 
 class MonitoringClientActivityNotDefined( Exception ):
@@ -49,6 +50,18 @@ class MonitoringFlusher:
 
 gMonitoringFlusher = MonitoringFlusher()
 
+#Positions in the aggregates of the marks of an activity bucket
+COUNT, TOTAL, MIN, MAX, SKETCH = range( 5 )
+
+class MarksShard:
+  """
+  Aggregates of the marks added by one thread, by activity and bucket
+  """
+  def __init__( self ):
+    self.lock = threading.Lock()
+    self.marks = {}
+    self.thread = threading.currentThread()
+
 class MonitoringClient(object):
 
   #Different types of operations
@@ -72,7 +85,9 @@ class MonitoringClient(object):
     self.sourceDict[ 'componentName' ] = "unknown"
     self.sourceDict[ 'componentLocation' ] = "unknown"
     self.activitiesDefinitions = {}
-    self.activitiesMarks = {}
+    self.activitiesPercentiles = {}
+    self.__marksShards = []
+    self.__threadData = threading.local()
     self.definitionsToSend = {}
     self.marksToSend = {}
     self.__compRegistrationExtraDict = {}
@@ -163,10 +178,11 @@ class MonitoringClient(object):
     """
     self.sourceDict[ 'componentType' ] = componentType
 
-  def registerActivity( self, name, description, category, unit, operation, bucketLength = 60 ):
+  def registerActivity( self, name, description, category, unit, operation, bucketLength = 60, percentiles = () ):
     """
     Register new activity. Before reporting information to the server, the activity
-    must be registered.
+    must be registered. For each percentile an activity named <name>_p<percentile>
+    is also registered to report the percentile of the marks of each bucket.
 
     @type  name: string
     @param name: Id of the activity to report
@@ -181,6 +197,8 @@ class MonitoringClient(object):
                         are defined in the Constants.py file
     @type  bucketLength: int
     @param bucketLength: Bucket length in seconds
+    @type  percentiles: list
+    @param percentiles: Percentiles ( 0 to 100 ) of the marks to report
     """
     if not self.__initialized:
       return
@@ -194,8 +212,18 @@ class MonitoringClient(object):
                                                "type" : operation,
                                                "bucketLength" : bucketLength
                                               }
-        self.activitiesMarks[ name ] = {}
         self.definitionsToSend[ name ] = dict( self.activitiesDefinitions[ name ] )
+        if percentiles:
+          self.activitiesPercentiles[ name ] = tuple( percentiles )
+        for percentile in percentiles:
+          pName = "%s_p%s" % ( name, percentile )
+          self.activitiesDefinitions[ pName ] = { "category" : category,
+                                                  "description" : "%s (percentile %s)" % ( description, percentile ),
+                                                  "unit" : unit,
+                                                  "type" : self.OP_MEAN,
+                                                  "bucketLength" : bucketLength
+                                                 }
+          self.definitionsToSend[ pName ] = dict( self.activitiesDefinitions[ pName ] )
     finally:
       self.activitiesLock.release()
 
@@ -223,47 +251,95 @@ class MonitoringClient(object):
     if type( value ) not in self.__validMonitoringValues:
       raise MonitoringClientActivityValueTypeError( "Activity '%s' value's type (%s) is not valid" % ( name, type(value) ) )
       #raise Exception( "Value's type %s is not valid" % value )
-    self.activitiesLock.acquire()
+    self.logger.debug( "Adding mark to", name )
+    markKey = ( name, self.__UTCStepTime( name ) )
+    shard = self.__getMarksShard()
+    shard.lock.acquire()
     try:
-      self.logger.debug( "Adding mark to %s" % name )
-      markTime = self.__UTCStepTime( name )
-      if markTime in self.activitiesMarks[ name ]:
-        self.activitiesMarks[ name ][ markTime ].append( value )
+      aggregate = shard.marks.get( markKey )
+      if aggregate is None:
+        sketch = None
+        if name in self.activitiesPercentiles:
+          sketch = QuantileSketch()
+          sketch.add( value )
+        shard.marks[ markKey ] = [ 1, value, value, value, sketch ]
       else:
-        self.activitiesMarks[ name ][ markTime ] = [ value ]
+        aggregate[ COUNT ] += 1
+        aggregate[ TOTAL ] += value
+        if value < aggregate[ MIN ]:
+          aggregate[ MIN ] = value
+        if value > aggregate[ MAX ]:
+          aggregate[ MAX ] = value
+        if aggregate[ SKETCH ]:
+          aggregate[ SKETCH ].add( value )
     finally:
-      self.activitiesLock.release()
+      shard.lock.release()
+
+  def __getMarksShard( self ):
+    """
+      Get the marks shard of the current thread, only its lock is taken to add a mark
+    """
+    try:
+      return self.__threadData.shard
+    except AttributeError:
+      shard = MarksShard()
+      self.activitiesLock.acquire()
+      try:
+        self.__marksShards.append( shard )
+      finally:
+        self.activitiesLock.release()
+      self.__threadData.shard = shard
+      return shard
+
+  def __mergeShards( self, allData ):
+    """
+      Takes out of the shards and merges the aggregates of all buckets except last step ones
+    """
+    mergedMarks = {}
+    liveShards = []
+    for shard in self.__marksShards:
+      shard.lock.acquire()
+      try:
+        shardMarks = shard.marks
+        shard.marks = {}
+        for markKey in shardMarks.keys():
+          if not allData and markKey[1] >= self.__UTCStepTime( markKey[0] ):
+            shard.marks[ markKey ] = shardMarks.pop( markKey )
+      finally:
+        shard.lock.release()
+      if shard.marks or shard.thread.isAlive():
+        liveShards.append( shard )
+      for markKey, aggregate in shardMarks.items():
+        merged = mergedMarks.get( markKey )
+        if merged is None:
+          mergedMarks[ markKey ] = aggregate
+          continue
+        merged[ COUNT ] += aggregate[ COUNT ]
+        merged[ TOTAL ] += aggregate[ TOTAL ]
+        merged[ MIN ] = min( merged[ MIN ], aggregate[ MIN ] )
+        merged[ MAX ] = max( merged[ MAX ], aggregate[ MAX ] )
+        if merged[ SKETCH ] and aggregate[ SKETCH ]:
+          merged[ SKETCH ].merge( aggregate[ SKETCH ] )
+    #Drop the empty shards of finished threads
+    self.__marksShards = liveShards
+    return mergedMarks
 
   def __consolidateMarks( self, allData ):
     """
-      Copies all marks except last step ones
+      Merges the marks of all threads except last step ones
       and consolidates them
     """
     consolidatedMarks = {}
-    remainderMarks = {}
-    for key in self.activitiesMarks:
-      if allData:
-        lastStepToSend = int( Time.toEpoch() )
-      else:
-        lastStepToSend = self.__UTCStepTime( key )
-      consolidatedMarks[ key ] = {}
-      remainderMarks [ key ] = {}
-      for markTime in self.activitiesMarks[ key ]:
-        markValue = self.activitiesMarks[ key ][ markTime ]
-        if markTime >= lastStepToSend:
-          remainderMarks[ key ][ markTime ] = markValue
-        else:
-          consolidatedMarks[ key ][ markTime ] = markValue
-          #Consolidate the copied ones
-          totalValue = 0
-          for mark in consolidatedMarks[ key ][ markTime ]:
-            totalValue += mark
-          if self.activitiesDefinitions[ key ][ 'type' ] == self.OP_MEAN:
-            totalValue /= len( consolidatedMarks[ key ][ markTime ] )
-          consolidatedMarks[ key ][ markTime ] = totalValue
-      if len( consolidatedMarks[ key ] ) == 0:
-        del( consolidatedMarks[ key ] )
-    self.activitiesMarks = remainderMarks
+    for markKey, aggregate in self.__mergeShards( allData ).items():
+      name, markTime = markKey
+      totalValue = aggregate[ TOTAL ]
+      if self.activitiesDefinitions[ name ][ 'type' ] == self.OP_MEAN:
+        totalValue /= aggregate[ COUNT ]
+      consolidatedMarks.setdefault( name, {} )[ markTime ] = totalValue
+      if aggregate[ SKETCH ]:
+        for percentile in self.activitiesPercentiles[ name ]:
+          pName = "%s_p%s" % ( name, percentile )
+          consolidatedMarks.setdefault( pName, {} )[ markTime ] = aggregate[ SKETCH ].quantile( percentile / 100.0 )
     return consolidatedMarks
 
   def flush( self, allData = False ):
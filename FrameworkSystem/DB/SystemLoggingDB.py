@@ -4,6 +4,7 @@
     The following methods are provided
 
     insertMessage()
+    insertMessages()
     getMessagesByDate()
     getMessagesByFixedText()
     getMessages()
@@ -19,6 +20,7 @@ from types import ListType, StringTypes
 from DIRAC                                     import gLogger, gConfig, S_OK, S_ERROR
 from DIRAC.Core.Base.DB                        import DB
 from DIRAC.Core.Utilities                      import Time, List
+from DIRAC.Core.Utilities.LRUCache             import LRUCache
 
 DEBUG = 0
 
@@ -178,6 +180,8 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
     """
     DB.__init__( self, 'SystemLoggingDB', 'Framework/SystemLoggingDB',
                  maxQueueSize, debug = DEBUG )
+    # IDs of the rows of the auxiliary tables, by table and values
+    self.__idCache = LRUCache( maxSize = self.getCSOption( 'IDCacheSize', 10000 ) )
     result = self._checkTable()
     if not result['OK']:
       gLogger.error( 'Failed to check/create the database tables', result['Message'] )
@@ -373,6 +377,11 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
     #              'ClientIPs':'ClientFQDN', 
     #              'Sites':'SiteName'}
 
+    cacheKey = ( tableName, tuple( inValues ) )
+    rowID = self.__idCache.get( cacheKey )
+    if rowID is not None:
+      return S_OK( rowID )
+
     # Check if the record is already there and get the rowID
     condDict = {}
     condDict.update( [ ( inFields[k], inValues[k] ) for k in range( len( inFields ) )] )
@@ -381,6 +390,7 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
       self.log.error( '__insertIntoAuxiliaryTable failed to query DB', result['Message'] )
       return S_ERROR()
     if len( result['Value'] ) > 0:
+      self.__idCache.put( cacheKey, int( result['Value'][0][0] ) )
       return S_OK( int( result['Value'][0][0] ) )
 
     result = self.insertFields( tableName, inFields, inValues )
@@ -422,8 +432,66 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
       self.log.error( error )
       return S_ERROR( 'Failed while check of inserted Values' )
 
+    self.__idCache.put( cacheKey, int( outValues[0] ) )
     return S_OK( int( outValues[0] ) )
 
+  def __getAuxiliaryIDs( self, tableName, outField, inFields, inValuesList ):
+    """  Set based version of __insertIntoAuxiliaryTable: returns a dictionary with
+         the unique KEY of each tuple of values in inValuesList. The KEYs not cached
+         are selected, and the missing rows inserted, with one query for all of them
+    """
+    rowIDs = self.__idCache.getMany( [ ( tableName, inValues ) for inValues in inValuesList ] )
+    rowIDs = dict( [ ( cacheKey[1], rowID ) for cacheKey, rowID in rowIDs.items() ] )
+    missing = [ inValues for inValues in set( inValuesList ) if inValues not in rowIDs ]
+    if not missing:
+      return S_OK( rowIDs )
+
+    result = self.__selectAuxiliaryIDs( tableName, outField, inFields, missing, rowIDs )
+    if not result['OK']:
+      return result
+    notFound = result['Value']
+    if notFound:
+      result = self.insertMany( tableName, inFields, notFound, ignore = True )
+      if not result['OK']:
+        self.log.error( '__getAuxiliaryIDs failed to insert data into DB', result['Message'] )
+        return S_ERROR( 'Could not insert the data into %s table' % tableName )
+      # check the inserted values
+      result = self.__selectAuxiliaryIDs( tableName, outField, inFields, notFound, rowIDs )
+      if not result['OK']:
+        return result
+      if result['Value']:
+        error = 'Could not retrieve inserted values'
+        self.log.error( error, 'in %s: %s' % ( tableName, result['Value'] ) )
+        return S_ERROR( error )
+
+    for inValues in missing:
+      self.__idCache.put( ( tableName, inValues ), rowIDs[inValues] )
+    return S_OK( rowIDs )
+
+  def __selectAuxiliaryIDs( self, tableName, outField, inFields, inValuesList, rowIDs ):
+    """  Add to rowIDs the KEYs of the tuples of values found in the table,
+         returns the list of tuples not found
+    """
+    condDict = {}
+    for k in range( len( inFields ) ):
+      condDict[ inFields[k] ] = list( set( [ inValues[k] for inValues in inValuesList ] ) )
+    result = self.getFields( tableName, [ outField ] + inFields, condDict = condDict )
+    if not result['OK']:
+      self.log.error( '__selectAuxiliaryIDs failed to query DB', result['Message'] )
+      return S_ERROR( 'Could not query %s table' % tableName )
+    # The selection can give more rows than asked, and values matching with other case or trailing spaces
+    foundIDs = {}
+    for row in result['Value']:
+      foundIDs[ _comparableValues( row[1:] ) ] = int( row[0] )
+    notFound = []
+    for inValues in inValuesList:
+      rowID = foundIDs.get( _comparableValues( inValues ) )
+      if rowID is None:
+        notFound.append( inValues )
+      else:
+        rowIDs[ inValues ] = rowID
+    return S_OK( notFound )
+
 
   def insertMessage( self, message, site, nodeFQDN, userDN, userGroup, remoteAddress ):
     """ This function inserts the Log message into the DB
@@ -501,6 +569,66 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
 
     return self.insertFields( 'MessageRepository', fieldsList, messageList )
 
+  def insertMessages( self, messagesList, site, nodeFQDN, userDN, userGroup, remoteAddress ):
+    """ This function inserts a list of Log messages coming from the same client into the DB.
+        The IDs of the auxiliary tables are resolved for all the messages at once
+        and the messages are written with a multi-row insert
+    """
+    if not messagesList:
+      return S_OK( 0 )
+    if not site:
+      site = 'Unknown'
+
+    result = self.__getAuxiliaryIDs( 'UserDNs', 'UserDNID', [ 'OwnerDN', 'OwnerGroup' ], [ ( userDN, userGroup ) ] )
+    if not result['OK']:
+      return result
+    userDNID = result['Value'][ ( userDN, userGroup ) ]
+
+    result = self.__getAuxiliaryIDs( 'Sites', 'SiteID', [ 'SiteName' ], [ ( site, ) ] )
+    if not result['OK']:
+      return result
+    clientKey = ( remoteAddress, nodeFQDN, result['Value'][ ( site, ) ] )
+    result = self.__getAuxiliaryIDs( 'ClientIPs', 'ClientIPNumberID',
+                                     [ 'ClientIPNumberString' , 'ClientFQDN', 'SiteID' ], [ clientKey ] )
+    if not result['OK']:
+      return result
+    clientIPID = result['Value'][ clientKey ]
+
+    systemNames = []
+    for message in messagesList:
+      systemNames.append( ( message.getName() or 'Unknown', message.getSubSystemName() or 'Unknown' ) )
+
+    result = self.__getAuxiliaryIDs( 'Systems', 'SystemID', [ 'SystemName' ],
+                                     [ ( systemName, ) for systemName, _subSystemName in systemNames ] )
+    if not result['OK']:
+      return result
+    systemIDs = result['Value']
+
+    subSystemKeys = [ ( subSystemName, systemIDs[ ( systemName, ) ] ) for systemName, subSystemName in systemNames ]
+    result = self.__getAuxiliaryIDs( 'SubSystems', 'SubSystemID', [ 'SubSystemName', 'SystemID' ], subSystemKeys )
+    if not result['OK']:
+      return result
+    subSystemIDs = result['Value']
+
+    fixedTextKeys = []
+    for k in range( len( messagesList ) ):
+      fixedTextKeys.append( ( messagesList[k].getFixedMessage(), subSystemIDs[ subSystemKeys[k] ] ) )
+    result = self.__getAuxiliaryIDs( 'FixedTextMessages', 'FixedTextID', [ 'FixedTextString' , 'SubSystemID' ],
+                                     fixedTextKeys )
+    if not result['OK']:
+      return result
+    fixedTextIDs = result['Value']
+
+    fieldsList = [ 'MessageTime', 'VariableText', 'UserDNID', 'ClientIPNumberID', 'LogLevel', 'FixedTextID' ]
+    rows = []
+    for k in range( len( messagesList ) ):
+      message = messagesList[k]
+      messageDate = Time.toString( message.getTime() )
+      messageDate = messageDate[:messageDate.find( '.' )]
+      rows.append( ( messageDate, message.getVariableMessage(), userDNID, clientIPID,
+                     message.getLevel(), fixedTextIDs[ fixedTextKeys[k] ] ) )
+    return self.insertMany( 'MessageRepository', fieldsList, rows )
+
   def _insertDataIntoAgentTable( self, agentName, data ):
     """Insert the persistent data needed by the agents running on top of
        the SystemLoggingDB.
@@ -536,6 +664,17 @@ CREATE  TABLE IF NOT EXISTS `AgentPersistentData` (
 
     return self.getFields( 'AgentPersistentData', outFields, condDict )
 
+def _comparableValues( values ):
+  """ Values as compared by MySQL: case insensitive and without trailing spaces
+  """
+  comparable = []
+  for value in values:
+    if type( value ) in StringTypes:
+      comparable.append( value.lower().rstrip() )
+    else:
+      comparable.append( int( value ) )
+  return tuple( comparable )
+
 def testSystemLoggingDB():
   """ Some test cases
   """
@@ -599,6 +738,12 @@ def testSystemLoggingDB():
       assert result['lastRowId'] == k + 1
       assert result['Value'] == 1
 
+    gLogger.info( '\n Inserting a bundle of records\n' )
+    result = db.insertMessages( [ message ] * records, site, nodeFQDN,
+                                userDN, userGroup, remoteAddress )
+    assert result['OK']
+    assert result['Value'] == records
+
     result = db.insertMessage( message, longSite, nodeFQDN,
                                   userDN, userGroup, remoteAddress )
     assert not result['OK']
@@ -626,7 +771,7 @@ def testSystemLoggingDB():
     result = db._queryDB( showFieldList = [ 'VariableText', 'SiteName' ], count = True, groupColumn = 'VariableText' )
     assert result['OK']
     assert result['Value'][0][1] == site
-    assert result['Value'][0][2] == records
+    assert result['Value'][0][2] == 2 * records
 
 
     gLogger.info( '\n Removing Table\n' )
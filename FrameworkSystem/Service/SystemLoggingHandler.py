@@ -38,8 +38,8 @@ class SystemLoggingHandler( RequestHandler ):
   """ This is server
   """
 
-  def __addMessage( self, messageObject, site, nodeFQDN ):
-    """  This is the function that actually adds the Message to 
+  def __addMessages( self, messagesList, site, nodeFQDN ):
+    """  This is the function that actually adds the Messages to 
          the log Database
     """
     credentials = self.getRemoteCredentials()
@@ -53,7 +53,7 @@ class SystemLoggingHandler( RequestHandler ):
       userGroup = 'unknown'
 
     remoteAddress = self.getRemoteAddress()[0]
-    return gLogDB.insertMessage( messageObject, site, nodeFQDN, userDN, userGroup, remoteAddress )
+    return gLogDB.insertMessages( messagesList, site, nodeFQDN, userDN, userGroup, remoteAddress )
 
 
   types_addMessages = [ ListType, StringTypes, StringTypes ]
@@ -68,12 +68,11 @@ class SystemLoggingHandler( RequestHandler ):
            S_ERROR if an exception was raised
            
     """
-    for messageTuple in messagesList:
-      messageObject = tupleToMessage( messageTuple )
-      result = self.__addMessage( messageObject, site, nodeFQDN )
-      if not result['OK']:
-        gLogger.error( 'The Log Message could not be inserted into the DB',
-                       'because: "%s"' % result['Message'] )
-        return S_ERROR( result['Message'] )
+    messageObjects = [ tupleToMessage( messageTuple ) for messageTuple in messagesList ]
+    result = self.__addMessages( messageObjects, site, nodeFQDN )
+    if not result['OK']:
+      gLogger.error( 'The Log Messages could not be inserted into the DB',
+                     'because: "%s"' % result['Message'] )
+      return S_ERROR( result['Message'] )
     return S_OK()
 
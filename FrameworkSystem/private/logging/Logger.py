@@ -16,6 +16,18 @@ import DIRAC
 
 DEBUG = 1
 
+#Absolute values of the levels, to discard messages before building them
+_logLevels = LogLevels()
+_ALWAYS = abs( _logLevels.getLevelValue( _logLevels.always ) )
+_NOTICE = abs( _logLevels.getLevelValue( _logLevels.notice ) )
+_INFO = abs( _logLevels.getLevelValue( _logLevels.info ) )
+_VERBOSE = abs( _logLevels.getLevelValue( _logLevels.verbose ) )
+_DEBUG = abs( _logLevels.getLevelValue( _logLevels.debug ) )
+_WARN = abs( _logLevels.getLevelValue( _logLevels.warn ) )
+_ERROR = abs( _logLevels.getLevelValue( _logLevels.error ) )
+_EXCEPTION = abs( _logLevels.getLevelValue( _logLevels.exception ) )
+_FATAL = abs( _logLevels.getLevelValue( _logLevels.fatal ) )
+
 class Logger:
 
   defaultLogLevel = 'NOTICE'
@@ -134,106 +146,91 @@ class Logger:
   def shown( self, levelName ):
     levelName = levelName.upper()
     if levelName in self._logLevels.getLevels():
-      return self._logLevels.getLevelValue( levelName ) <= levelName
+      return self._shownValue( abs( self._logLevels.getLevelValue( levelName ) ) )
     return False
 
+  def _shownValue( self, levelValue ):
+    """ Check the absolute value of a level against the minimum level
+    """
+    return levelValue >= self._minLevel
+
   def getName( self ):
     return self._systemName
 
-  def always( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.always,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def always( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _ALWAYS ):
+      return True
+    return self.__sendMessage( self._logLevels.always, sMsg, sVarMsg, args )
 
-  def notice( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.notice,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def notice( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _NOTICE ):
+      return True
+    return self.__sendMessage( self._logLevels.notice, sMsg, sVarMsg, args )
 
-  def info( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.info,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def info( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _INFO ):
+      return True
+    return self.__sendMessage( self._logLevels.info, sMsg, sVarMsg, args )
 
-  def verbose( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.verbose,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def verbose( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _VERBOSE ):
+      return True
+    return self.__sendMessage( self._logLevels.verbose, sMsg, sVarMsg, args )
 
-  def debug( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.debug,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def debug( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _DEBUG ):
+      return True
+    return self.__sendMessage( self._logLevels.debug, sMsg, sVarMsg, args )
 
-  def warn( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.warn,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def warn( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _WARN ):
+      return True
+    return self.__sendMessage( self._logLevels.warn, sMsg, sVarMsg, args )
 
-  def error( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.error,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def error( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _ERROR ):
+      return True
+    return self.__sendMessage( self._logLevels.error, sMsg, sVarMsg, args )
 
   def exception( self, sMsg = "", sVarMsg = '', lException = False, lExcInfo = False ):
+    if not self._shownValue( _EXCEPTION ):
+      return True
+    if callable( sVarMsg ):
+      sVarMsg = sVarMsg()
     if sVarMsg:
       sVarMsg += "\n%s" % self.__getExceptionString( lException, lExcInfo )
     else:
       sVarMsg = "\n%s" % self.__getExceptionString( lException, lExcInfo )
-    messageObject = Message( self._systemName,
-                             self._logLevels.exception,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+    return self.__sendMessage( self._logLevels.exception, sMsg, sVarMsg, () )
+
+  def fatal( self, sMsg, sVarMsg = '', *args ):
+    if not self._shownValue( _FATAL ):
+      return True
+    return self.__sendMessage( self._logLevels.fatal, sMsg, sVarMsg, args )
 
-  def fatal( self, sMsg, sVarMsg = '' ):
+  def showStack( self ):
+    if not self._shownValue( _DEBUG ):
+      return
+    self.__sendMessage( self._logLevels.debug, "", self.__getStackString(), () )
+
+  def __sendMessage( self, level, sMsg, sVarMsg, args ):
+    """ Build and process a message that passed the level check. The messages can
+        be callables returning the text, and args are formatted into the variable message
+    """
+    if callable( sMsg ):
+      sMsg = sMsg()
+    if callable( sVarMsg ):
+      sVarMsg = sVarMsg()
+    if args:
+      sVarMsg = sVarMsg % args
     messageObject = Message( self._systemName,
-                             self._logLevels.fatal,
+                             level,
                              Time.dateTime(),
                              sMsg,
                              sVarMsg,
                              self.__discoverCallingFrame() )
     return self.processMessage( messageObject )
 
-  def showStack( self ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.debug,
-                             Time.dateTime(),
-                             "",
-                             self.__getStackString(),
-                             self.__discoverCallingFrame() )
-    self.processMessage( messageObject )
-
   def processMessage( self, messageObject ):
     if self.__testLevel( messageObject.getLevel() ):
       if not messageObject.getName():
@@ -286,7 +283,7 @@ class Logger:
     if self.__testLevel( self._logLevels.debug ) and self._showCallingFrame:
       oActualFrame = inspect.currentframe()
       lOuterFrames = inspect.getouterframes( oActualFrame )
-      lCallingFrame = lOuterFrames[2]
+      lCallingFrame = lOuterFrames[3]
       return "%s:%s" % ( lCallingFrame[1].replace( sys.path[0], "" )[1:], lCallingFrame[2] )
     else:
       return ""
@@ -8,6 +8,8 @@ from DIRAC.FrameworkSystem.Client.Logger import Logger
 class SubSystemLogger( Logger ):
 
   def __init__( self, subName, masterLogger, child = True ):
+    #The master logger checks the levels, also of the messages sent while initializing
+    self.__masterLogger = masterLogger
     Logger.__init__( self )
     self.__child = child
     for attrName in dir( masterLogger ):
@@ -17,6 +19,9 @@ class SubSystemLogger( Logger ):
     self.__masterLogger = masterLogger
     self._subName = subName
 
+  def _shownValue( self, levelValue ):
+    return self.__masterLogger._shownValue( levelValue )
+
   def processMessage( self, messageObject ):
     if self.__child:
       messageObject.setSubSystemName( self._subName )
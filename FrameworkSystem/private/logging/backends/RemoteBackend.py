@@ -3,79 +3,286 @@ __RCSID__ = "$Id$"
 """This Backend sends the Log Messages to a Log Server
 It will only report to the server ERROR, EXCEPTION, FATAL
 and ALWAYS messages.
+
+Messages are queued in a bounded queue and sent by a thread in bundles of
+at most BundleSize messages, at the latest SleepTime seconds after the first
+message of the bundle, through one persistent connection. When the queue is
+full the logging thread waits up to QueueWaitTime seconds before dropping the
+message. Bundles that can't be sent are appended to the SpillFile, up to
+MaxSpillSize MB, and sent again once the server is reachable. The default
+SpillFile is per process, like the log file of the FileBackend, a SpillFile
+set in the options must not be shared by several processes. With the default
+SpillFile, the spill files left in the same directory by processes that are
+no longer running are taken over at startup and sent with the own ones.
 """
+import os
+import re
+import errno
+import time
+import types
+import base64
 import threading
 import Queue
-from DIRAC.Core.Utilities import Time, Network
+from DIRAC.Core.Utilities import Time, Network, DEncode
 from DIRAC.FrameworkSystem.private.logging.backends.BaseBackend import BaseBackend
 from DIRAC.FrameworkSystem.private.logging.LogLevels import LogLevels
 
+SPILLFILEPATTERN = 'Dirac-log-remote_%s.spill'
+
 class RemoteBackend( BaseBackend, threading.Thread ):
 
+  __staleSpillRE = re.compile( r'^Dirac-log-remote_(\d+)\.spill(\.adopted|\.replay)?$' )
+
   def __init__( self, optionsDictionary ):
     threading.Thread.__init__( self )
     self.__interactive = optionsDictionary[ 'Interactive' ]
     self.__sleep = optionsDictionary[ 'SleepTime' ]
-    self._messageQueue = Queue.Queue()
-    self._Transactions = []
+    self._maxBundledMessages = self.__getIntOption( optionsDictionary, 'BundleSize', 100 )
+    self._messageQueue = Queue.Queue( self.__getIntOption( optionsDictionary, 'QueueSize', 10000 ) )
+    self._queueWaitTime = self.__getIntOption( optionsDictionary, 'QueueWaitTime', 1 )
+    self._spillFile = optionsDictionary.get( 'SpillFile', SPILLFILEPATTERN % os.getpid() )
+    self._maxSpillSize = self.__getIntOption( optionsDictionary, 'MaxSpillSize', 100 ) * 1024 * 1024
     self._alive = True
     self._site = optionsDictionary[ 'Site' ]
     self._hostname = Network.getFQDN()
     self._logLevels = LogLevels()
     self._negativeLevel = self._logLevels.getLevelValue( 'ERROR' )
     self._positiveLevel = self._logLevels.getLevelValue( 'ALWAYS' )
-    self._maxBundledMessages = 20
+    self._rpcClient = None
+    self._retryTime = 0
+    self._sendLock = threading.Lock()
+    self._statsLock = threading.Lock()
+    self._stats = { 'Sent' : 0, 'Dropped' : 0, 'Spilled' : 0, 'Replayed' : 0 }
+    self._reportedDrops = 0
+    if 'SpillFile' not in optionsDictionary:
+      self._adoptStaleSpills()
     self.setDaemon(1)
     self.start()
 
+  def __getIntOption( self, optionsDictionary, optionName, defaultValue ):
+    try:
+      return int( optionsDictionary.get( optionName, defaultValue ) )
+    except ValueError:
+      return defaultValue
+
   def doMessage( self, messageObject ):
-    self._messageQueue.put( messageObject )
+    if not self._testLevel( messageObject.getLevel() ):
+      return
+    try:
+      self._messageQueue.put( messageObject.toTuple(), True, self._queueWaitTime )
+    except Queue.Full:
+      self.__count( 'Dropped', 1 )
+
+  def __count( self, counterName, increment ):
+    self._statsLock.acquire()
+    try:
+      self._stats[ counterName ] += increment
+    finally:
+      self._statsLock.release()
+
+  def getStatistics( self ):
+    """ Number of messages sent, dropped, spilled to disk and sent from the spill file,
+        and number of messages waiting in the queue
+    """
+    self._statsLock.acquire()
+    try:
+      stats = dict( self._stats )
+    finally:
+      self._statsLock.release()
+    stats[ 'Queued' ] = self._messageQueue.qsize()
+    return stats
 
   def run( self ):
-    import time
     while self._alive:
-      self._bundleMessages()
-      time.sleep( self.__sleep )
-
-  def _bundleMessages( self ):
-    while not self._messageQueue.empty():
-      bundle = []
-      while ( len( bundle ) < self._maxBundledMessages ) and \
-                ( not self._messageQueue.empty() ):
-        message = self._messageQueue.get()
-        if self._testLevel( message.getLevel() ):
-          bundle.append( message.toTuple() )
-
-      if len( bundle ):
-        self._sendMessageToServer( bundle )
-
-    if len( self._Transactions ):
-      self._sendMessageToServer()
-
-  def _sendMessageToServer( self, messageBundle=None ):
-    from DIRAC.Core.DISET.RPCClient import RPCClient
-    if messageBundle:
-      self._Transactions.append( messageBundle )
-    TransactionsLength = len( self._Transactions )
-    if TransactionsLength > 100:
-      del self._Transactions[:TransactionsLength-100]
-      TransactionsLength = 100
+      bundle = self._getBundle( self.__sleep )
+      if bundle:
+        self._sendBundle( bundle )
+      self._replaySpilled()
+
+  def _getBundle( self, maxWait ):
+    """ Get the next bundle of messages, waiting at most maxWait seconds
+        for the first one and as long again to fill the bundle
+    """
+    bundle = []
+    try:
+      if maxWait:
+        bundle.append( self._messageQueue.get( True, maxWait ) )
+      else:
+        bundle.append( self._messageQueue.get_nowait() )
+    except Queue.Empty:
+      return bundle
+    endTime = time.time() + maxWait
+    while len( bundle ) < self._maxBundledMessages:
+      waitTime = endTime - time.time()
+      try:
+        if waitTime > 0:
+          bundle.append( self._messageQueue.get( True, waitTime ) )
+        else:
+          bundle.append( self._messageQueue.get_nowait() )
+      except Queue.Empty:
+        break
+    return bundle
 
+  def _sendBundle( self, bundle ):
+    self._sendLock.acquire()
     try:
-      oSock = RPCClient( "Framework/SystemLogging" )
-    except Exception,v:
+      if not self._sendToServer( bundle ):
+        self._spill( bundle )
+    finally:
+      self._sendLock.release()
+
+  def _sendToServer( self, bundle ):
+    """ Send a bundle through the persistent connection, after a failure
+        nothing is sent before SleepTime seconds
+    """
+    if time.time() < self._retryTime:
+      return False
+    dropped = self._stats[ 'Dropped' ] - self._reportedDrops
+    messagesList = list( bundle )
+    if dropped:
+      messagesList.append( ( 'Framework', 'ERROR', Time.toString(), "Remote logging dropped messages",
+                             "%s messages could not be queued or spilled, %s sent" % ( dropped, self._stats[ 'Sent' ] ),
+                             '', 'RemoteBackend' ) )
+    try:
+      if not self._rpcClient:
+        from DIRAC.Core.DISET.RPCClient import RPCClient
+        self._rpcClient = RPCClient( "Framework/SystemLogging", persistentConnection = True )
+      result = self._rpcClient.addMessages( messagesList, self._site, self._hostname )
+      sent = result[ 'OK' ]
+    except Exception:
+      sent = False
+    if not sent:
+      self._retryTime = time.time() + self.__sleep
       return False
+    self._retryTime = 0
+    self._reportedDrops += dropped
+    self.__count( 'Sent', len( bundle ) )
+    return True
 
-    while TransactionsLength:
-      result = oSock.addMessages( self._Transactions[0],
-                                  self._site, self._hostname )
-      if result['OK']:
-        TransactionsLength = TransactionsLength - 1
-        self._Transactions.pop(0) 
-      else:
-        return False
+  def _spill( self, bundle ):
+    """ Append a bundle to the spill file, one encoded bundle per line
+    """
+    if not self._spillFile:
+      self.__count( 'Dropped', len( bundle ) )
+      return
+    record = "%s\n" % base64.b64encode( DEncode.encode( bundle ) )
+    try:
+      spillSize = 0
+      if os.path.exists( self._spillFile ):
+        spillSize = os.path.getsize( self._spillFile )
+      if spillSize + len( record ) > self._maxSpillSize:
+        self.__count( 'Dropped', len( bundle ) )
+        return
+      spillFile = open( self._spillFile, 'a' )
+      try:
+        spillFile.write( record )
+      finally:
+        spillFile.close()
+    except ( IOError, OSError ):
+      self.__count( 'Dropped', len( bundle ) )
+      return
+    self.__count( 'Spilled', len( bundle ) )
+
+  def __isAlive( self, pid ):
+    try:
+      os.kill( pid, 0 )
+    except OSError, excp:
+      return excp.errno != errno.ESRCH
     return True
 
+  def _adoptStaleSpills( self ):
+    """ Append the bundles spilled by processes that are no longer running to the
+        own replay file. Each stale file is renamed before being read, so that it is
+        taken over by only one of the processes starting at the same time
+    """
+    spillDir = os.path.dirname( self._spillFile ) or '.'
+    try:
+      fileNames = os.listdir( spillDir )
+    except OSError:
+      return
+    staleFiles = []
+    for fileName in fileNames:
+      match = self.__staleSpillRE.match( fileName )
+      if not match:
+        continue
+      pid = int( match.group( 1 ) )
+      if pid == os.getpid() or self.__isAlive( pid ):
+        continue
+      #Older bundles first: adopted, being replayed, then spilled
+      staleFiles.append( ( pid, [ '.adopted', '.replay', None ].index( match.group( 2 ) ), fileName ) )
+    staleFiles.sort()
+    adoptedFile = "%s.adopted" % self._spillFile
+    for _pid, _rank, fileName in staleFiles:
+      try:
+        os.rename( os.path.join( spillDir, fileName ), adoptedFile )
+      except OSError:
+        #Taken by another process
+        continue
+      try:
+        stale = open( adoptedFile )
+        try:
+          #A record cut by a crash must not run into the next one
+          records = [ "%s\n" % record.rstrip( "\n" ) for record in stale.readlines() ]
+        finally:
+          stale.close()
+        replay = open( "%s.replay" % self._spillFile, 'a' )
+        try:
+          replay.writelines( records )
+        finally:
+          replay.close()
+        os.unlink( adoptedFile )
+      except ( IOError, OSError ):
+        pass
+
+  def _replaySpilled( self ):
+    """ Send the spilled bundles once the server is reachable. The spill file is moved
+        aside first so that new failures go to a new one, and what can't be sent now
+        is kept for the next time. It stops when the queue fills up, live messages first.
+    """
+    if not self._spillFile or time.time() < self._retryTime:
+      return
+    replayFile = "%s.replay" % self._spillFile
+    self._sendLock.acquire()
+    try:
+      try:
+        if not os.path.exists( replayFile ):
+          if not os.path.exists( self._spillFile ):
+            return
+          os.rename( self._spillFile, replayFile )
+        replay = open( replayFile )
+        try:
+          records = replay.readlines()
+        finally:
+          replay.close()
+        while records:
+          if self._messageQueue.qsize() > self._messageQueue.maxsize / 2:
+            break
+          try:
+            bundle, _length = DEncode.decode( base64.b64decode( records[0].strip() ) )
+          except Exception:
+            bundle = None
+          if type( bundle ) != types.ListType:
+            #Truncated or corrupted record
+            records.pop( 0 )
+            continue
+          if not self._sendToServer( bundle ):
+            break
+          self.__count( 'Replayed', len( bundle ) )
+          records.pop( 0 )
+        if not records:
+          os.unlink( replayFile )
+          return
+        replay = open( "%s.tmp" % replayFile, 'w' )
+        try:
+          replay.writelines( records )
+        finally:
+          replay.close()
+        os.rename( "%s.tmp" % replayFile, replayFile )
+      except ( IOError, OSError ):
+        pass
+    finally:
+      self._sendLock.release()
+
   def _testLevel( self, sLevel ):
     messageLevel = self._logLevels.getLevelValue( sLevel )
     return messageLevel <= self._negativeLevel or \
@@ -83,7 +290,9 @@ class RemoteBackend( BaseBackend, threading.Thread ):
 
   def flush( self ):
     self._alive = False
-    if not self.__interactive and self._sendMessageToServer()['OK']:
-      while not self._messageQueue.empty():
-        self._bundleMessages()
-
+    if self.__interactive:
+      return
+    bundle = self._getBundle( 0 )
+    while bundle:
+      self._sendBundle( bundle )
+      bundle = self._getBundle( 0 )
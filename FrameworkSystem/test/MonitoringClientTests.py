@@ -0,0 +1,85 @@
+""" Test cases for the merge of the marks added by several threads to the MonitoringClient
+"""
+
+__RCSID__ = "$Id$"
+
+import threading
+import unittest
+from DIRAC import gLogger
+import DIRAC.FrameworkSystem.Client.MonitoringClient as MonitoringClientModule
+from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
+
+class FakeTime:
+  """ Clock of the marks, moved by the tests
+  """
+  epoch = 1000
+
+  @classmethod
+  def toEpoch( cls ):
+    return cls.epoch
+
+class MonitoringClientShardsCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.realTime = MonitoringClientModule.Time
+    MonitoringClientModule.Time = FakeTime
+    FakeTime.epoch = 1000
+    self.client = MonitoringClient()
+    self.client.logger = gLogger
+    self.client._MonitoringClient__initialized = True
+    self.client.registerActivity( "time", "Time", "Test", "seconds", MonitoringClient.OP_MEAN, 60, ( 50, 90 ) )
+    self.client.registerActivity( "calls", "Calls", "Test", "calls", MonitoringClient.OP_SUM, 60 )
+
+  def tearDown( self ):
+    MonitoringClientModule.Time = self.realTime
+
+  def addMarks( self, nThreads, values ):
+    """ each of the nThreads threads adds all the values, then exits """
+    def addThreadMarks():
+      for value in values:
+        self.client.addMark( "time", value )
+        self.client.addMark( "calls", 1 )
+    threads = [ threading.Thread( target = addThreadMarks ) for _i in range( nThreads ) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  def consolidate( self, allData = False ):
+    return self.client._MonitoringClient__consolidateMarks( allData )
+
+  def shards( self ):
+    return self.client._MonitoringClient__marksShards
+
+  def test01merge( self ):
+    """ the aggregates of all the threads are merged once their bucket is over """
+    self.addMarks( 4, range( 1, 101 ) )
+    self.client.addMark( "time", 50.5 )
+    self.assertEqual( len( self.shards() ), 5 )
+    #Bucket still open: nothing is taken, not even from the shards of exited threads
+    self.assertEqual( self.consolidate(), {} )
+    self.assertEqual( len( self.shards() ), 5 )
+    FakeTime.epoch = 1100
+    marks = self.consolidate()
+    self.assertEqual( sorted( marks ), [ "calls", "time", "time_p50", "time_p90" ] )
+    self.assertEqual( marks[ "calls" ], { 960 : 400 } )
+    self.assertAlmostEqual( marks[ "time" ][ 960 ], ( 4 * 5050 + 50.5 ) / 401.0 )
+    self.assertAlmostEqual( marks[ "time_p50" ][ 960 ], 50, delta = 1 )
+    self.assertAlmostEqual( marks[ "time_p90" ][ 960 ], 90, delta = 1 )
+    #The empty shards of the exited threads are dropped
+    self.assertEqual( len( self.shards() ), 1 )
+    self.assertEqual( self.consolidate(), {} )
+
+  def test02allData( self ):
+    """ with allData the open buckets are merged too, the older ones are kept apart """
+    self.addMarks( 2, [ 1, 3 ] )
+    FakeTime.epoch = 1100
+    self.addMarks( 3, [ 10, 20 ] )
+    marks = self.consolidate( allData = True )
+    self.assertEqual( marks[ "calls" ], { 960 : 4, 1080 : 6 } )
+    self.assertEqual( marks[ "time" ], { 960 : 2, 1080 : 15 } )
+    self.assertEqual( self.shards(), [] )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( MonitoringClientShardsCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
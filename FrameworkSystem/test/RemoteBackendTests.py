@@ -0,0 +1,196 @@
+""" Test cases for the spill file and the counters of the RemoteBackend
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import shutil
+import tempfile
+import unittest
+from DIRAC import S_OK, S_ERROR
+from DIRAC.FrameworkSystem.private.logging.backends.RemoteBackend import RemoteBackend
+
+class FakeRPCClient:
+  """ Accepts the first 'accept' calls, then fails
+  """
+
+  def __init__( self, accept = 1000 ):
+    self.accept = accept
+    self.received = []
+
+  def addMessages( self, messagesList, site, hostname ):
+    if self.accept < 1:
+      return S_ERROR( "Server down" )
+    self.accept -= 1
+    self.received.append( list( messagesList ) )
+    return S_OK()
+
+class FakeMessage:
+
+  def __init__( self, text ):
+    self.text = text
+
+  def getLevel( self ):
+    return 'ERROR'
+
+  def toTuple( self ):
+    return ( 'Framework', 'ERROR', '2013-01-01 00:00:00', self.text, '', '', 'Test' )
+
+class QuietRemoteBackend( RemoteBackend ):
+  """ Without the sending thread, the tests drive it
+  """
+
+  def start( self ):
+    pass
+
+class RemoteBackendTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.workDir = tempfile.mkdtemp()
+    self.spillFile = os.path.join( self.workDir, 'remote.spill' )
+
+  def tearDown( self ):
+    shutil.rmtree( self.workDir )
+
+  def getBackend( self, **options ):
+    optionsDictionary = { 'Interactive' : True, 'SleepTime' : 150, 'Site' : 'DIRAC.Test.org',
+                          'SpillFile' : self.spillFile }
+    optionsDictionary.update( options )
+    return QuietRemoteBackend( optionsDictionary )
+
+  def bundle( self, name, length ):
+    return [ FakeMessage( "%s%s" % ( name, i ) ).toTuple() for i in range( length ) ]
+
+  def getDefaultBackend( self ):
+    """ with the default spill file, in the working directory """
+    cwd = os.getcwd()
+    os.chdir( self.workDir )
+    try:
+      return QuietRemoteBackend( { 'Interactive' : True, 'SleepTime' : 150, 'Site' : 'DIRAC.Test.org' } )
+    finally:
+      os.chdir( cwd )
+
+  def deadPid( self ):
+    pid = os.fork()
+    if not pid:
+      os._exit( 0 )
+    os.waitpid( pid, 0 )
+    return pid
+
+  def test01defaultSpillFile( self ):
+    """ the default spill file is not shared by processes """
+    backend = self.getDefaultBackend()
+    self.assertEqual( backend._spillFile, 'Dirac-log-remote_%s.spill' % os.getpid() )
+
+  def test02spillAndReplay( self ):
+    """ bundles not sent are spilled and sent in order once the server is back """
+    backend = self.getBackend()
+    backend._rpcClient = FakeRPCClient( accept = 0 )
+    backend._sendBundle( self.bundle( 'a', 3 ) )
+    #No retry before SleepTime
+    backend._rpcClient.accept = 1000
+    backend._sendBundle( self.bundle( 'b', 2 ) )
+    self.assertEqual( backend._rpcClient.received, [] )
+    self.assert_( os.path.exists( self.spillFile ) )
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received, [] )
+    backend._retryTime = 0
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received, [ self.bundle( 'a', 3 ), self.bundle( 'b', 2 ) ] )
+    self.assertEqual( os.listdir( self.workDir ), [] )
+    stats = backend.getStatistics()
+    self.assertEqual( ( stats[ 'Spilled' ], stats[ 'Replayed' ], stats[ 'Sent' ], stats[ 'Dropped' ] ), ( 5, 5, 5, 0 ) )
+
+  def test03partialReplay( self ):
+    """ what can't be replayed is kept for the next time, after new spills go to a new file """
+    backend = self.getBackend()
+    backend._rpcClient = FakeRPCClient( accept = 0 )
+    for name in ( 'a', 'b', 'c' ):
+      backend._retryTime = 0
+      backend._sendBundle( self.bundle( name, 2 ) )
+    backend._rpcClient.accept = 1
+    backend._retryTime = 0
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received, [ self.bundle( 'a', 2 ) ] )
+    self.assertEqual( open( "%s.replay" % self.spillFile ).read().count( "\n" ), 2 )
+    backend._retryTime = 0
+    backend._sendBundle( self.bundle( 'd', 1 ) )
+    self.assertEqual( open( self.spillFile ).read().count( "\n" ), 1 )
+    backend._rpcClient.accept = 1000
+    backend._retryTime = 0
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received[1:], [ self.bundle( 'b', 2 ), self.bundle( 'c', 2 ) ] )
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received[3:], [ self.bundle( 'd', 1 ) ] )
+    self.assertEqual( os.listdir( self.workDir ), [] )
+    self.assertEqual( backend.getStatistics()[ 'Replayed' ], 7 )
+
+  def test04corruptedRecords( self ):
+    """ truncated or corrupted records of the spill file are skipped """
+    backend = self.getBackend()
+    backend._rpcClient = FakeRPCClient( accept = 0 )
+    backend._sendBundle( self.bundle( 'a', 2 ) )
+    record = open( self.spillFile ).read()
+    spillFile = open( self.spillFile, 'a' )
+    #A record cut by a crash, and one decoding to something else than a bundle
+    spillFile.write( record[ : len( record ) / 2 ] + "\n" )
+    spillFile.write( "bm9uc2Vuc2U=\n" )
+    spillFile.close()
+    backend._retryTime = 0
+    backend._sendBundle( self.bundle( 'b', 2 ) )
+    backend._rpcClient.accept = 1000
+    backend._retryTime = 0
+    backend._replaySpilled()
+    self.assertEqual( backend._rpcClient.received, [ self.bundle( 'a', 2 ), self.bundle( 'b', 2 ) ] )
+
+  def test05drops( self ):
+    """ messages not queued or spilled are counted and reported with the next bundle sent """
+    backend = self.getBackend( QueueSize = 2, QueueWaitTime = 0, MaxSpillSize = 0 )
+    for i in range( 5 ):
+      backend.doMessage( FakeMessage( "m%s" % i ) )
+    self.assertEqual( backend.getStatistics()[ 'Dropped' ], 3 )
+    self.assertEqual( backend.getStatistics()[ 'Queued' ], 2 )
+    backend._rpcClient = FakeRPCClient( accept = 0 )
+    backend._sendBundle( backend._getBundle( 0 ) )
+    self.assertFalse( os.path.exists( self.spillFile ) )
+    self.assertEqual( backend.getStatistics()[ 'Dropped' ], 5 )
+    backend._rpcClient.accept = 1000
+    backend._retryTime = 0
+    backend._sendBundle( self.bundle( 'a', 1 ) )
+    received = backend._rpcClient.received[0]
+    self.assertEqual( received[:1], self.bundle( 'a', 1 ) )
+    self.assertEqual( received[1][4], "5 messages could not be queued or spilled, 0 sent" )
+    backend._sendBundle( self.bundle( 'b', 1 ) )
+    self.assertEqual( backend._rpcClient.received[1], self.bundle( 'b', 1 ) )
+    self.assertEqual( backend.getStatistics()[ 'Sent' ], 2 )
+
+  def test06staleSpills( self ):
+    """ the spill files of processes no longer running are taken over at startup """
+    deadPid = self.deadPid()
+    staleFile = os.path.join( self.workDir, 'Dirac-log-remote_%s.spill' % deadPid )
+    backend = self.getBackend( SpillFile = staleFile )
+    backend._rpcClient = FakeRPCClient( accept = 0 )
+    for name in ( 'a', 'b' ):
+      backend._retryTime = 0
+      backend._sendBundle( self.bundle( name, 2 ) )
+    backend._rpcClient.accept = 1
+    backend._retryTime = 0
+    backend._replaySpilled()
+    backend._retryTime = 0
+    backend._sendBundle( self.bundle( 'c', 2 ) )
+    #Left being replayed and spilled, the last record cut by the crash
+    open( staleFile, 'a' ).write( open( staleFile ).read()[:10] )
+    liveFile = os.path.join( self.workDir, 'Dirac-log-remote_%s.spill' % os.getppid() )
+    open( liveFile, 'w' ).write( open( staleFile ).read() )
+    newBackend = self.getDefaultBackend()
+    newBackend._spillFile = os.path.join( self.workDir, newBackend._spillFile )
+    self.assertEqual( sorted( os.listdir( self.workDir ) ),
+                      sorted( [ os.path.basename( liveFile ), 'Dirac-log-remote_%s.spill.replay' % os.getpid() ] ) )
+    newBackend._rpcClient = FakeRPCClient()
+    newBackend._replaySpilled()
+    self.assertEqual( newBackend._rpcClient.received, [ self.bundle( 'b', 2 ), self.bundle( 'c', 2 ) ] )
+    self.assertEqual( os.listdir( self.workDir ), [ os.path.basename( liveFile ) ] )
+
+if __name__ == "__main__":
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( RemoteBackendTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -0,0 +1,45 @@
+"""
+  Micro-benchmark of the logger overhead per call
+
+  Times the calls to each level method of a Logger and of one of its sub loggers,
+  with the minimum level set to NOTICE, VERBOSE and DEBUG. The messages are built but
+  not written anywhere, so the times are the logger own overhead. Messages below the
+  minimum level should cost only the level check, also when they pass arguments or a
+  callable to be formatted only if shown. Run it with:
+
+    python benchmarkLogger.py [ nCalls ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+
+from DIRAC.FrameworkSystem.private.logging.Logger import Logger
+
+def timeCalls( method, args, nCalls ):
+  start = time.time()
+  for _i in xrange( nCalls ):
+    method( *args )
+  return ( time.time() - start ) / nCalls
+
+if __name__ == "__main__":
+  nCalls = 100000
+  if len( sys.argv ) > 1:
+    nCalls = int( sys.argv[1] )
+  logger = Logger()
+  #No backend, only the logger is timed
+  logger.registerBackends( [] )
+  subLogger = logger.getSubLogger( "Benchmark" )
+  callsArgs = [ ( "plain", ( "Fixed message", "variable message" ) ),
+                ( "args", ( "Fixed message", "for %s: %s", "item", 42 ) ),
+                ( "callable", ( "Fixed message", lambda: "variable message" ) ) ]
+  for minLevel in ( "NOTICE", "VERBOSE", "DEBUG" ):
+    logger.setLevel( minLevel )
+    print "Minimum level %s" % minLevel
+    for methodName in ( "notice", "info", "verbose", "debug" ):
+      shown = logger.shown( methodName )
+      for loggerName, oLogger in ( ( "logger", logger ), ( "sublogger", subLogger ) ):
+        results = []
+        for callName, args in callsArgs:
+          results.append( "%s %7.2f us" % ( callName, timeCalls( getattr( oLogger, methodName ), args, nCalls ) * 1000000 ) )
+        print "  %-8s %-10s %-6s %s" % ( methodName, loggerName, shown and "shown" or "hidden", "  ".join( results ) )
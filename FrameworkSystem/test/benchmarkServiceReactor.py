@@ -0,0 +1,91 @@
+"""
+  Load test for the DISET service reactor
+
+  Opens nIdle persistent MessageClient connections to Framework/PingPong that
+  stay idle during the test, and floods the same service with ping RPCs from
+  nThreads threads for a given number of seconds. Run it against the service
+  started with and without EventDrivenReactor = yes in its section:
+
+    python benchmarkServiceReactor.py [ nIdle ] [ nThreads ] [ seconds ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import threading
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine( ignoreErrors = True )
+
+from DIRAC.Core.DISET.RPCClient import RPCClient
+from DIRAC.Core.DISET.MessageClient import MessageClient
+
+SERVICE = "Framework/PingPong"
+
+def openIdleConnections( nIdle ):
+  clients = []
+  failed = 0
+  start = time.time()
+  for _i in range( nIdle ):
+    msgClient = MessageClient( SERVICE )
+    result = msgClient.connect()
+    if result[ 'OK' ]:
+      clients.append( msgClient )
+    else:
+      failed += 1
+  print "Opened %s idle connections in %.2f s (%s failed)" % ( len( clients ), time.time() - start, failed )
+  return clients
+
+def rpcFlood( stopTime, latencies, errors ):
+  rpcClient = RPCClient( SERVICE )
+  while time.time() < stopTime:
+    start = time.time()
+    result = rpcClient.ping()
+    if result[ 'OK' ]:
+      latencies.append( time.time() - start )
+    else:
+      errors.append( result[ 'Message' ] )
+
+def checkIdleConnections( clients ):
+  """ Send a Ping through every idle connection and count the ones still alive """
+  alive = 0
+  for msgClient in clients:
+    result = msgClient.createMessage( "Ping" )
+    if not result[ 'OK' ]:
+      continue
+    msgObj = result[ 'Value' ]
+    msgObj.id = 1
+    if msgClient.sendMessage( msgObj )[ 'OK' ]:
+      alive += 1
+  return alive
+
+if __name__ == "__main__":
+  nIdle = 2000
+  nThreads = 20
+  seconds = 60
+  if len( sys.argv ) > 1:
+    nIdle = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nThreads = int( sys.argv[2] )
+  if len( sys.argv ) > 3:
+    seconds = int( sys.argv[3] )
+
+  idleClients = openIdleConnections( nIdle )
+
+  latencies = []
+  errors = []
+  stopTime = time.time() + seconds
+  threads = [ threading.Thread( target = rpcFlood, args = ( stopTime, latencies, errors ) ) for _i in range( nThreads ) ]
+  for thd in threads:
+    thd.start()
+  for thd in threads:
+    thd.join()
+
+  print "RPC flood with %s threads during %s s" % ( nThreads, seconds )
+  print "  Calls OK: %s (%.1f/s)  Errors: %s" % ( len( latencies ), len( latencies ) / float( seconds ), len( errors ) )
+  if latencies:
+    latencies.sort()
+    for percentile in ( 50, 90, 99 ):
+      pos = min( len( latencies ) - 1, int( len( latencies ) * percentile / 100. ) )
+      print "  p%s latency: %.1f ms" % ( percentile, latencies[ pos ] * 1000 )
+  print "Idle connections still alive: %s/%s" % ( checkIdleConnections( idleClients ), len( idleClients ) )
@@ -9,6 +9,34 @@ from types import ListType, DictType
 import os
 from DIRAC                              import S_OK, S_ERROR
 from DIRAC.Core.Base.Client             import Client
+from DIRAC.Core.DISET.TransferClient    import TransferClient
+from DIRAC.Core.Utilities               import DEncode
+
+class ChunkStreamSink( object ):
+  """ Data sink for the streamed directory operations of the FileCatalog service:
+      decodes the chunks as they arrive and passes them to a callback
+  """
+
+  def __init__( self, callback ):
+    self.__callback = callback
+    self.__buffer = ''
+    self.cursor = 0
+    self.error = False
+
+  def write( self, data ):
+    self.__buffer += data
+    while self.__buffer:
+      try:
+        result, end = DEncode.decode( self.__buffer )
+      except ( IndexError, KeyError, ValueError ):
+        # Incomplete chunk, wait for the rest
+        return
+      self.__buffer = self.__buffer[end:]
+      if not result['OK']:
+        self.error = result['Message']
+        continue
+      self.cursor = result['Value']['Cursor']
+      self.__callback( result['Value'] )
 
 class FileCatalogClient(Client):
   """ Client code to the DIRAC File Catalogue
@@ -97,6 +125,69 @@ class FileCatalogClient(Client):
         pathDict[lfn] = detailsDict
     return result      
 
+  def listDirectoryChunk(self, path, cursor=0, maxFiles=1000, verbose=False, rpc='', url='', timeout=120):
+    """ List at most maxFiles files of the given directory after the cursor. Entries are
+        LFNs and the returned Cursor gets the next chunk, it is 0 after the last one
+    """
+    rpcClient = self._getRPC(rpc=rpc, url=url, timeout=timeout)
+    result = rpcClient.listDirectoryChunk(path, cursor, maxFiles, verbose)
+    if not result['OK']:
+      return result
+    self.__toLFNs( path, result['Value'] )
+    return result
+
+  def listDirectoryStream(self, path, callback, verbose=False, cursor=0, chunkSize=1000, url='', timeout=600):
+    """ Stream the listing of the given directory through the transfer channel: callback
+        is called with each chunk as returned by listDirectoryChunk. Returns S_OK( cursor ),
+        the cursor is 0 when the whole directory was received. In case of error the
+        message carries the 'Cursor' to resume from
+    """
+    def lfnCallback( chunkDict ):
+      self.__toLFNs( path, chunkDict )
+      callback( chunkDict )
+    options = { 'Verbose' : verbose, 'Cursor' : cursor, 'ChunkSize' : chunkSize }
+    return self.__receiveStream( ( 'listDirectory', path, options ), lfnCallback, cursor, url, timeout )
+
+  def getDirectoryReplicasStream(self, path, callback, allStatus=False, cursor=0, chunkSize=1000, url='', timeout=600):
+    """ Stream the replicas of the files of the given directory: callback is called with
+        dictionaries { lfn : { se : pfn } } for each chunk. Returns as listDirectoryStream
+    """
+    def replicaCallback( chunkDict ):
+      seDict = chunkDict.get( 'SEPrefixes', {} )
+      replicas = {}
+      for fname, detailsDict in chunkDict['Replicas'].items():
+        lfn = '%s/%s' % ( path, os.path.basename( fname ) )
+        for se in detailsDict:
+          if not detailsDict[se] and se in seDict:
+            detailsDict[se] = seDict[se] + lfn
+        replicas[lfn] = detailsDict
+      callback( replicas )
+    options = { 'AllStatus' : allStatus, 'Cursor' : cursor, 'ChunkSize' : chunkSize }
+    return self.__receiveStream( ( 'getDirectoryReplicas', path, options ), replicaCallback, cursor, url, timeout )
+
+  def __receiveStream( self, streamID, callback, cursor, url, timeout ):
+    if not url:
+      url = self.serverURL
+    sink = ChunkStreamSink( callback )
+    sink.cursor = cursor
+    transferClient = TransferClient( url, timeout = timeout )
+    result = transferClient.receiveFile( sink, streamID )
+    if result['OK'] and sink.error:
+      result = S_ERROR( sink.error )
+    if not result['OK']:
+      result['Cursor'] = sink.cursor
+      return result
+    return S_OK( sink.cursor )
+
+  def __toLFNs( self, path, pathDict ):
+    """ Force the directory entries to be LFNs """
+    for entryType in ['Files', 'SubDirs', 'Links', 'Datasets']:
+      entryDict = pathDict.get( entryType, {} )
+      for fname in entryDict.keys():
+        detailsDict = entryDict.pop( fname )
+        lfn = '%s/%s' % ( path, os.path.basename( fname ) )
+        entryDict[lfn] = detailsDict
+
   def findFilesByMetadata(self, metaDict, path='/', rpc='', url='', timeout=120):
     """ Find files given the meta data query and the path
     """
@@ -0,0 +1,113 @@
+""" Test cases for the decoding of the streamed directory operations of the FileCatalogClient
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities import DEncode
+import DIRAC.Resources.Catalog.FileCatalogClient as FileCatalogClientModule
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient, ChunkStreamSink
+
+testDir = '/vo/user/t/test/dir'
+
+def listChunk( names, cursor ):
+  """ encoded as the FileCatalog service streams it """
+  files = dict( [ ( name, { 'MetaData': {} } ) for name in names ] )
+  return DEncode.encode( S_OK( { 'Files': files, 'SubDirs': {}, 'Links': {}, 'Datasets': {}, 'Cursor': cursor } ) )
+
+class FakeTransferClient:
+  """ Writes the stream to the sink in pieces of pieceSize bytes, then returns result
+  """
+  stream = ''
+  pieceSize = 7
+  result = S_OK()
+  requests = []
+
+  def __init__( self, url, timeout = 600 ):
+    self.url = url
+
+  def receiveFile( self, sink, fileID ):
+    FakeTransferClient.requests.append( fileID )
+    stream = FakeTransferClient.stream
+    for iPos in range( 0, len( stream ), self.pieceSize ):
+      sink.write( stream[ iPos : iPos + self.pieceSize ] )
+    return FakeTransferClient.result
+
+class ChunkStreamSinkCase( unittest.TestCase ):
+
+  def test01pieces( self ):
+    """ chunks split at any byte are decoded once complete, in order """
+    stream = listChunk( [ 'a', 'b' ], 12 ) + listChunk( [ 'c' ], 13 ) + listChunk( [ 'd' ], 0 )
+    for pieceSize in ( 1, 5, len( stream ) ):
+      chunks = []
+      sink = ChunkStreamSink( chunks.append )
+      for iPos in range( 0, len( stream ), pieceSize ):
+        sink.write( stream[ iPos : iPos + pieceSize ] )
+      self.assertEqual( [ sorted( chunk['Files'] ) for chunk in chunks ], [ [ 'a', 'b' ], [ 'c' ], [ 'd' ] ] )
+      self.assertEqual( sink.cursor, 0 )
+      self.assertFalse( sink.error )
+
+  def test02error( self ):
+    """ an error chunk is kept with the cursor of the last good chunk """
+    chunks = []
+    sink = ChunkStreamSink( chunks.append )
+    sink.write( listChunk( [ 'a' ], 12 ) + DEncode.encode( S_ERROR( 'Permission denied' ) ) )
+    self.assertEqual( len( chunks ), 1 )
+    self.assertEqual( sink.cursor, 12 )
+    self.assertEqual( sink.error, 'Permission denied' )
+
+class FileCatalogClientStreamCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.realTransferClient = FileCatalogClientModule.TransferClient
+    FileCatalogClientModule.TransferClient = FakeTransferClient
+    FakeTransferClient.result = S_OK()
+    FakeTransferClient.requests = []
+    self.fc = FileCatalogClient( url = 'dips://localhost:9197/DataManagement/FileCatalog' )
+
+  def tearDown( self ):
+    FileCatalogClientModule.TransferClient = self.realTransferClient
+
+  def test01listDirectoryStream( self ):
+    """ the files of each chunk are given as LFNs """
+    FakeTransferClient.stream = listChunk( [ 'f1', 'f2' ], 2 ) + listChunk( [ 'f3' ], 0 )
+    lfns = []
+    result = self.fc.listDirectoryStream( testDir, lambda chunk: lfns.append( sorted( chunk['Files'] ) ), chunkSize = 2 )
+    self.assert_( result['OK'] )
+    self.assertEqual( result['Value'], 0 )
+    self.assertEqual( lfns, [ [ '%s/f1' % testDir, '%s/f2' % testDir ], [ '%s/f3' % testDir ] ] )
+    self.assertEqual( FakeTransferClient.requests, [ ( 'listDirectory', testDir,
+                                                       { 'Verbose': False, 'Cursor': 0, 'ChunkSize': 2 } ) ] )
+
+  def test02resume( self ):
+    """ after a broken transfer the cursor of the last chunk received allows to resume """
+    FakeTransferClient.stream = listChunk( [ 'f1', 'f2' ], 2 ) + listChunk( [ 'f3' ], 3 )[:10]
+    FakeTransferClient.result = S_ERROR( 'Connection closed' )
+    result = self.fc.listDirectoryStream( testDir, lambda chunk: None )
+    self.assertFalse( result['OK'] )
+    self.assertEqual( result['Cursor'], 2 )
+    FakeTransferClient.stream = listChunk( [ 'f3' ], 0 )
+    FakeTransferClient.result = S_OK()
+    result = self.fc.listDirectoryStream( testDir, lambda chunk: None, cursor = result['Cursor'] )
+    self.assert_( result['OK'] )
+    self.assertEqual( FakeTransferClient.requests[-1][2]['Cursor'], 2 )
+    FakeTransferClient.stream = DEncode.encode( S_ERROR( 'Directory does not exist' ) )
+    result = self.fc.listDirectoryStream( testDir, lambda chunk: None, cursor = 7 )
+    self.assertEqual( ( result['OK'], result['Message'], result['Cursor'] ), ( False, 'Directory does not exist', 7 ) )
+
+  def test03replicasStream( self ):
+    """ the replicas are given by LFN with the PFNs built from the SE prefixes """
+    FakeTransferClient.stream = DEncode.encode( S_OK( { 'Replicas': { 'f1': { 'SE1': '', 'SE2': 'srm://se2/f1' } },
+                                                        'SEPrefixes': { 'SE1': 'srm://se1' },
+                                                        'Cursor': 0 } ) )
+    replicas = {}
+    result = self.fc.getDirectoryReplicasStream( testDir, replicas.update )
+    self.assert_( result['OK'] )
+    self.assertEqual( replicas, { '%s/f1' % testDir: { 'SE1': 'srm://se1%s/f1' % testDir, 'SE2': 'srm://se2/f1' } } )
+    self.assertEqual( FakeTransferClient.requests[0][0], 'getDirectoryReplicas' )
+
+if __name__ == '__main__':
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( ChunkStreamSinkCase )
+  SUITE.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( FileCatalogClientStreamCase ) )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -81,6 +81,9 @@ class JobAgent( AgentModule ):
     self.fillingMode = self.am_getOption( 'FillingModeFlag', False )
     self.stopOnApplicationFailure = self.am_getOption( 'StopOnApplicationFailure', True )
     self.stopAfterFailedMatches = self.am_getOption( 'StopAfterFailedMatches', 10 )
+    self.maxJobsPerRequest = self.am_getOption( 'MaxJobsPerRequest', 1 )
+    #Jobs matched by a bulk request still to be submitted: ( matcherInfo, ceDict, matchTime )
+    self.matchedJobs = []
     self.jobCount = 0
     self.matchFailedCount = 0
     #Timeleft
@@ -126,63 +129,80 @@ class JobAgent( AgentModule ):
     if not available['OK'] or not available['Value']:
       self.log.info( 'Resource is not available' )
       self.log.info( available['Message'] )
+      # The jobs already matched, if any, are rescheduled as they can not be submitted
       return self.__finish( 'CE Not Available' )
 
     self.log.info( available['Message'] )
 
-    result = self.computingElement.getDescription()
-    if not result['OK']:
-      return result
-    ceDict = result['Value']
-
-    # Add pilot information
-    gridCE = gConfig.getValue( 'LocalSite/GridCE', 'Unknown' )
-    if gridCE != 'Unknown':
-      ceDict['GridCE'] = gridCE
-    if not 'PilotReference' in ceDict:
-      ceDict['PilotReference'] = str( self.pilotReference )
-    ceDict['PilotBenchmark'] = self.cpuFactor
-    ceDict['PilotInfoReportedFlag'] = self.pilotInfoReportedFlag
-
-    # Add possible job requirements
-    result = gConfig.getOptionsDict( '/AgentJobRequirements' )
-    if result['OK']:
-      requirementsDict = result['Value']
-      ceDict.update( requirementsDict )
-
-    self.log.verbose( ceDict )
-    start = time.time()
-    jobRequest = self.__requestJob( ceDict )
-    matchTime = time.time() - start
-    self.log.info( 'MatcherTime = %.2f (s)' % ( matchTime ) )
-
-    self.stopAfterFailedMatches = self.am_getOption( 'StopAfterFailedMatches', self.stopAfterFailedMatches )
-
-    if not jobRequest['OK']:
-      if re.search( 'No match found', jobRequest['Message'] ):
-        self.log.notice( 'Job request OK: %s' % ( jobRequest['Message'] ) )
-        self.matchFailedCount += 1
-        if self.matchFailedCount > self.stopAfterFailedMatches:
-          return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
-        return S_OK( jobRequest['Message'] )
-      elif jobRequest['Message'].find( "seconds timeout" ) != -1:
-        self.log.error( jobRequest['Message'] )
-        self.matchFailedCount += 1
-        if self.matchFailedCount > self.stopAfterFailedMatches:
-          return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
-        return S_OK( jobRequest['Message'] )
-      elif jobRequest['Message'].find( "Pilot version does not match" ) != -1 :
-        self.log.error( jobRequest['Message'] )
-        return S_ERROR( jobRequest['Message'] )
-      else:
-        self.log.notice( 'Failed to get jobs: %s' % ( jobRequest['Message'] ) )
-        self.matchFailedCount += 1
-        if self.matchFailedCount > self.stopAfterFailedMatches:
-          return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
-        return S_OK( jobRequest['Message'] )
-
-    # Reset the Counter
-    self.matchFailedCount = 0
+    if self.matchedJobs:
+      # Job already matched by a previous bulk request for the free slots
+      self.log.info( 'Submitting a matched job, %s left' % ( len( self.matchedJobs ) - 1 ) )
+      matcherInfo, ceDict, matchTime = self.matchedJobs.pop( 0 )
+      jobRequest = S_OK( matcherInfo )
+    else:
+      result = self.computingElement.getDescription()
+      if not result['OK']:
+        return result
+      ceDict = result['Value']
+
+      # Add pilot information
+      gridCE = gConfig.getValue( 'LocalSite/GridCE', 'Unknown' )
+      if gridCE != 'Unknown':
+        ceDict['GridCE'] = gridCE
+      if not 'PilotReference' in ceDict:
+        ceDict['PilotReference'] = str( self.pilotReference )
+      ceDict['PilotBenchmark'] = self.cpuFactor
+      ceDict['PilotInfoReportedFlag'] = self.pilotInfoReportedFlag
+
+      # Add possible job requirements
+      result = gConfig.getOptionsDict( '/AgentJobRequirements' )
+      if result['OK']:
+        requirementsDict = result['Value']
+        ceDict.update( requirementsDict )
+
+      self.log.verbose( ceDict )
+      start = time.time()
+      numJobs = 1
+      if self.fillingMode and self.maxJobsPerRequest > 1 and available['Value'] > 1:
+        numJobs = min( self.maxJobsPerRequest, int( available['Value'] ) )
+      jobRequest = self.__requestJob( ceDict, numJobs )
+      matchTime = time.time() - start
+      self.log.info( 'MatcherTime = %.2f (s)' % ( matchTime ) )
+
+      self.stopAfterFailedMatches = self.am_getOption( 'StopAfterFailedMatches', self.stopAfterFailedMatches )
+
+      if not jobRequest['OK']:
+        if re.search( 'No match found', jobRequest['Message'] ):
+          self.log.notice( 'Job request OK: %s' % ( jobRequest['Message'] ) )
+          self.matchFailedCount += 1
+          if self.matchFailedCount > self.stopAfterFailedMatches:
+            return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
+          return S_OK( jobRequest['Message'] )
+        elif jobRequest['Message'].find( "seconds timeout" ) != -1:
+          self.log.error( jobRequest['Message'] )
+          self.matchFailedCount += 1
+          if self.matchFailedCount > self.stopAfterFailedMatches:
+            return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
+          return S_OK( jobRequest['Message'] )
+        elif jobRequest['Message'].find( "Pilot version does not match" ) != -1 :
+          self.log.error( jobRequest['Message'] )
+          return S_ERROR( jobRequest['Message'] )
+        else:
+          self.log.notice( 'Failed to get jobs: %s' % ( jobRequest['Message'] ) )
+          self.matchFailedCount += 1
+          if self.matchFailedCount > self.stopAfterFailedMatches:
+            return self.__finish( 'Nothing to do for more than %d cycles' % self.stopAfterFailedMatches )
+          return S_OK( jobRequest['Message'] )
+
+      # Reset the Counter
+      self.matchFailedCount = 0
+
+      if type( jobRequest['Value'] ) == type( [] ):
+        if not jobRequest['Value']:
+          return S_OK( 'No match found' )
+        for matcherInfo in jobRequest['Value'][1:]:
+          self.matchedJobs.append( ( matcherInfo, ceDict, matchTime ) )
+        jobRequest = S_OK( jobRequest['Value'][0] )
 
     matcherInfo = jobRequest['Value']
     jobID = matcherInfo['JobID']
@@ -532,11 +552,13 @@ class JobAgent( AgentModule ):
     return S_OK( data )
 
   #############################################################################
-  def __requestJob( self, ceDict ):
-    """Request a single job from the matcher service.
+  def __requestJob( self, ceDict, numJobs = 1 ):
+    """Request a single job from the matcher service, or a list of up to numJobs jobs
     """
     try:
       matcher = RPCClient( 'WorkloadManagement/Matcher', timeout = 600 )
+      if numJobs > 1:
+        return matcher.requestJobs( ceDict, numJobs )
       result = matcher.requestJob( ceDict )
       return result
     except Exception, x:
@@ -638,11 +660,23 @@ class JobAgent( AgentModule ):
     """
     self.log.info( 'JobAgent will stop with message "%s", execution complete.' % message )
     if stop:
+      self.__rescheduleMatchedJobs( message )
       self.am_stopExecution()
       return S_ERROR( message )
     else:
       return S_OK( message )
 
+  #############################################################################
+  def __rescheduleMatchedJobs( self, message ):
+    """Give back the jobs matched by a bulk request that will not be submitted
+    """
+    while self.matchedJobs:
+      matcherInfo = self.matchedJobs.pop( 0 )[0]
+      jobID = matcherInfo['JobID']
+      self.log.info( 'Rescheduling matched job %s not submitted by the agent' % jobID )
+      jobReport = JobReport( int( jobID ), 'JobAgent@%s' % self.siteName )
+      rescheduleFailedJob( jobID, 'JobAgent stopped: %s' % message, jobReport )
+
   #############################################################################
   def __rescheduleFailedJob( self, jobID, message, jobParams, stop = True ):
     """
@@ -702,6 +736,8 @@ class JobAgent( AgentModule ):
     """ Job Agent finalization method
     """
 
+    self.__rescheduleMatchedJobs( 'JobAgent finalized' )
+
     gridCE = gConfig.getValue( '/LocalSite/GridCE', '' )
     queue = gConfig.getValue( '/LocalSite/CEQueue', '' )
     wmsAdmin = RPCClient( 'WorkloadManagement/WMSAdministrator' )
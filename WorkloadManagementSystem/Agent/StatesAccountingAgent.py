@@ -9,6 +9,7 @@
 """
 __RCSID__ = "$Id$"
 
+import time
 
 from DIRAC  import gLogger, gConfig, S_OK
 from DIRAC.Core.Base.AgentModule import AgentModule
@@ -50,6 +51,7 @@ class StatesAccountingAgent( AgentModule ):
 
     self.reportPeriod = 850
     self.am_setOption( "PollingTime", self.reportPeriod )
+    self.__lastReconcile = 0
     self.__jobDBFields = []
     for field in self.__summaryKeyFieldsMapping:
       if field == 'User':
@@ -67,6 +69,14 @@ class StatesAccountingAgent( AgentModule ):
       return result
     validSetups = result[ 'Value' ]
     gLogger.info( "Valid setups for this cycle are %s" % ", ".join( validSetups ) )
+    if self.jobDB.jobsSummary and \
+       time.time() - self.__lastReconcile > self.am_getOption( "JobsSummaryReconcilePeriod", 3600 ):
+      result = self.jobDB.reconcileJobsSummary()
+      if not result[ 'OK' ]:
+        gLogger.error( "Can't reconcile the jobs summary", result[ 'Message' ] )
+      else:
+        self.__lastReconcile = time.time()
+        gLogger.info( "Reconciled %s jobs summary counters" % result[ 'Value' ] )
     #Get the WMS Snapshot!
     result = self.jobDB.getSummarySnapshot( self.__jobDBFields )
     now = Time.dateTime()
@@ -9,6 +9,9 @@ class CachedJobState( object ):
 
   log = gLogger.getSubLogger( "CachedJobState" )
 
+  #Attributes that have to stay the same for the cached state to be valid
+  INIT_STATE_ATTRIBUTES = ( "Status", "MinorStatus", "LastUpdateTime" )
+
   def __init__( self, jid, skipInitState = False ):
     self.dOnlyCache = False
     self.__jid = jid
@@ -27,26 +30,32 @@ class CachedJobState( object ):
     self.__manifest = False
     self.__initState = None
     self.__lastValidState = time.time()
+    self.__savedByBatch = False
     if not skipInitState:
-      result = self.getAttributes( [ "Status", "MinorStatus", "LastUpdateTime" ] )
+      result = self.getAttributes( list( self.INIT_STATE_ATTRIBUTES ) )
       if result[ 'OK' ]:
         self.__initState = result[ 'Value' ]
       else:
         self.__initState = None
 
   def recheckValidity( self, graceTime = 600 ):
-    now = time.time()
-    if graceTime <= 0 or now - self.__lastValidState > graceTime:
-      self.__lastValidState = now
-      result = self.__jobState.getAttributes( [ "Status", "MinorStatus", "LastUpdateTime" ] )
+    if self._validityExpired( graceTime ):
+      self.__lastValidState = time.time()
+      result = self.__jobState.getAttributes( list( self.INIT_STATE_ATTRIBUTES ) )
       if not result[ 'OK' ]:
         return result
-      currentState = result[ 'Value' ]
-      if not currentState == self.__initState:
-        return S_OK( False )
-      return S_OK( True )
+      return S_OK( self._checkState( result[ 'Value' ] ) )
     return S_OK( self.valid )
 
+  def _validityExpired( self, graceTime = 600 ):
+    return graceTime <= 0 or time.time() - self.__lastValidState > graceTime
+
+  def _checkState( self, currentState ):
+    """ Compare the current state of the job with the initial one
+    """
+    self.__lastValidState = time.time()
+    return currentState == self.__initState
+
   @property
   def valid( self ):
     return self.__initState != None
@@ -61,6 +70,11 @@ class CachedJobState( object ):
   def commitChanges( self ):
     if self.__initState == None:
       return S_ERROR( "CachedJobState( %d ) is not valid" % self.__jid )
+    #Already saved by JobStateBatch, with the initial state checked, and nothing changed since
+    if self.__savedByBatch and not self.__hasChanges():
+      self.__savedByBatch = False
+      return S_OK()
+    self.__savedByBatch = False
     #Save manifest
     if self.__manifest and self.__manifest.isDirty():
       result = self.__jobState.setManifest( self.__manifest )
@@ -104,6 +118,52 @@ class CachedJobState( object ):
     self.__lastValidState = time.time()
     return S_OK()
 
+  def __hasChanges( self ):
+    return self.__dirtyKeys or self.__jobLog or self.__insertIntoTQ or \
+           ( self.__manifest and self.__manifest.isDirty() )
+
+  def _loadState( self, initState, attDict = None, optDict = None, manifest = None ):
+    """ Set the initial state and fill the cache with the data loaded by JobStateBatch
+    """
+    self.__initState = initState
+    self.__lastValidState = time.time()
+    for prefix, data in ( ( 'att', attDict ), ( 'optp', optDict ) ):
+      if not data:
+        continue
+      for key in data:
+        cKey = "%s.%s" % ( prefix, key )
+        if cKey not in self.__cache:
+          self.__cache[ cKey ] = data[ key ]
+    if manifest and not self.__manifest:
+      self.__manifest = manifest
+
+  def _getChanges( self ):
+    """ Changes to be saved by JobStateBatch as ( initState, cache changes, job log, dirty manifest or None ).
+        None if there is nothing to save or the job has to be inserted in the TQ
+    """
+    if self.__initState == None or self.__insertIntoTQ or not self.__hasChanges():
+      return None
+    manifest = None
+    if self.__manifest and self.__manifest.isDirty():
+      manifest = self.__manifest
+    changes = dict( [ ( k, self.__cache[ k ] ) for k in self.__dirtyKeys ] )
+    return ( self.__initState, changes, list( self.__jobLog ), manifest )
+
+  def _changesSaved( self, newState ):
+    """ The changes have been saved by JobStateBatch. Without the new state the
+        cached state is reloaded
+    """
+    if self.__manifest:
+      self.__manifest.clearDirty()
+    self.__jobLog = []
+    self.__dirtyKeys.clear()
+    if newState == None:
+      self.cleanState()
+    else:
+      self.__initState = newState
+      self.__lastValidState = time.time()
+    self.__savedByBatch = True
+
   def serialize( self ):
     if self.__manifest:
       manifest = ( self.__manifest.dumpAsCFG(), self.__manifest.isDirty() )
@@ -97,6 +97,15 @@ class JobState( object ):
       return True
     return False
 
+  @classmethod
+  def getLocalDB( cls, dbName = 'job' ):
+    """ The 'job', 'log' or 'tq' DB if they can be accessed locally, None otherwise
+    """
+    cls.checkDBAccess()
+    if JobState._sDisableLocal or not JobState.__db.job:
+      return None
+    return getattr( JobState.__db, dbName )
+
   def __getDB( self ):
     return JobState.__db.job
 
@@ -195,11 +204,13 @@ class JobState( object ):
 
     logDB = JobState.__db.log
     gLogger.verbose( "Adding logging records for %s" % self.__jid )
+    records = []
     for record, updateTime, source in jobLog:
       gLogger.verbose( "Logging records for %s: %s %s %s" % ( self.__jid, record, updateTime, source ) )
-      record[ 'date' ] = updateTime
-      record[ 'source' ] = source
-      result = self.__retryFunction( 5, logDB.addLoggingRecord, ( self.__jid, ), record )
+      records.append( ( self.__jid, record.get( 'status', 'idem' ), record.get( 'minor', 'idem' ),
+                        record.get( 'application', 'idem' ), updateTime, source ) )
+    if records:
+      result = self.__retryFunction( 5, logDB.addLoggingRecords, ( records, ) )
       if not result[ 'OK' ]:
         return result
 
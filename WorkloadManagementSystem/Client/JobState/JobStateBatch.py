@@ -0,0 +1,197 @@
+""" Load and save the CachedJobStates of many jobs at once
+
+    Parametric submissions give the optimization mind thousands of jobs at once.
+    JobStateBatch loads their attributes, manifests and optimizer parameters
+    with one query per table, rechecks that they are still valid with one query
+    and saves the changes of all of them in one JobDB transaction. It needs the
+    JobDB to be accessible locally, otherwise the jobs are loaded one by one and
+    the changes are left to CachedJobState.commitChanges.
+"""
+
+__RCSID__ = "$Id$"
+
+from DIRAC import S_OK, gLogger
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobState import JobState
+from DIRAC.WorkloadManagementSystem.Client.JobState.CachedJobState import CachedJobState
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManifest
+
+#Attributes cached when loading the jobs, the ones used by the optimizers
+BATCH_ATTRIBUTES = ( 'ApplicationStatus', 'JobType', 'Owner', 'OwnerDN', 'OwnerGroup', 'DIRACSetup',
+                     'RescheduleCounter', 'RescheduleTime' )
+#Jobs per query
+CHUNK_SIZE = 1000
+
+class JobStateBatch( object ):
+
+  log = gLogger.getSubLogger( "JobStateBatch" )
+
+  @classmethod
+  def loadJobs( cls, jids, attNames = BATCH_ATTRIBUTES, manifests = True, optParameters = True ):
+    """ CachedJobStates of the jobs with the attNames attributes, the manifest and the
+        optimizer parameters already in their cache.
+        Returns S_OK( { jid : CachedJobState } ) without the jobs that do not exist
+    """
+    jobDB = JobState.getLocalDB()
+    cjsDict = {}
+    if not jobDB:
+      for jid in jids:
+        cjs = CachedJobState( jid )
+        if cjs.valid:
+          cjsDict[ jid ] = cjs
+      return S_OK( cjsDict )
+    initNames = list( CachedJobState.INIT_STATE_ATTRIBUTES )
+    attNames = initNames + [ name for name in attNames if name not in initNames ]
+    for jidChunk in breakListIntoChunks( list( jids ), CHUNK_SIZE ):
+      result = jobDB.getJobsAttributes( jidChunk, attNames )
+      if not result[ 'OK' ]:
+        return result
+      attData = result[ 'Value' ]
+      jdlData = {}
+      if manifests and attData:
+        result = jobDB.getJobsJDL( attData.keys() )
+        if not result[ 'OK' ]:
+          return result
+        jdlData = result[ 'Value' ]
+      optData = {}
+      if optParameters and attData:
+        result = jobDB.getJobsOptParameters( attData.keys() )
+        if not result[ 'OK' ]:
+          return result
+        optData = result[ 'Value' ]
+      for jid in jidChunk:
+        if jid not in attData:
+          continue
+        manifest = None
+        if jdlData.get( jid ):
+          manifest = JobManifest()
+          result = manifest.loadJDL( jdlData[ jid ] )
+          if not result[ 'OK' ]:
+            cls.log.warn( "Cannot load the manifest of job %s: %s" % ( jid, result[ 'Message' ] ) )
+            manifest = None
+        initState = dict( [ ( name, attData[ jid ][ name ] ) for name in initNames ] )
+        cjs = CachedJobState( jid, skipInitState = True )
+        cjs._loadState( initState, attData[ jid ], optData.get( jid ), manifest )
+        cjsDict[ jid ] = cjs
+    return S_OK( cjsDict )
+
+  @classmethod
+  def recheckValidity( cls, cjsList, graceTime = 600 ):
+    """ Same as CachedJobState.recheckValidity for many jobs, rechecking with one query
+        the ones not checked for graceTime seconds.
+        Returns S_OK( { jid : valid } )
+    """
+    jobDB = JobState.getLocalDB()
+    validity = {}
+    toCheck = []
+    for cjs in cjsList:
+      if not jobDB:
+        result = cjs.recheckValidity( graceTime )
+        if not result[ 'OK' ]:
+          return result
+        validity[ cjs.jid ] = result[ 'Value' ]
+      elif cjs._validityExpired( graceTime ):
+        toCheck.append( cjs )
+      else:
+        validity[ cjs.jid ] = cjs.valid
+    for cjsChunk in breakListIntoChunks( toCheck, CHUNK_SIZE ):
+      result = jobDB.getJobsAttributes( [ cjs.jid for cjs in cjsChunk ], list( CachedJobState.INIT_STATE_ATTRIBUTES ) )
+      if not result[ 'OK' ]:
+        return result
+      for cjs in cjsChunk:
+        validity[ cjs.jid ] = cjs._checkState( result[ 'Value' ].get( cjs.jid, {} ) )
+    return S_OK( validity )
+
+  @classmethod
+  def commitChanges( cls, cjsList ):
+    """ Save the changes of many CachedJobStates in one transaction.
+        Returns S_OK( [ jid, ... ] ) with the jobs saved. The others, like the ones whose
+        state has changed since they were loaded or the ones to insert in the TQ, are left
+        untouched, for their own commitChanges to save them or report the error
+    """
+    jobDB = JobState.getLocalDB()
+    if not jobDB:
+      return S_OK( [] )
+    changes = {}
+    for cjs in cjsList:
+      cjsChanges = cjs._getChanges()
+      if cjsChanges:
+        changes[ cjs.jid ] = cjsChanges
+    if not changes:
+      return S_OK( [] )
+    initNames = list( CachedJobState.INIT_STATE_ATTRIBUTES )
+    with jobDB.transaction as commit:
+      result = jobDB.getJobsAttributes( changes.keys(), initNames, forUpdate = True )
+      if not result[ 'OK' ]:
+        return result
+      currentStates = result[ 'Value' ]
+      for jid in changes.keys():
+        if currentStates.get( jid ) != changes[ jid ][0]:
+          cls.log.verbose( "Job %s: state changed since it was loaded" % jid )
+          del changes[ jid ]
+      result = cls.__saveChanges( jobDB, changes )
+      if not result[ 'OK' ]:
+        return result
+      commit()
+    jids = changes.keys()
+    cls.log.info( "Saved the changes of %s jobs" % len( jids ) )
+
+    records = []
+    for jid in jids:
+      for record, updateTime, source in changes[ jid ][2]:
+        records.append( ( jid, record.get( 'status', 'idem' ), record.get( 'minor', 'idem' ),
+                          record.get( 'application', 'idem' ), updateTime, source ) )
+    if records:
+      result = JobState.getLocalDB( 'log' ).addLoggingRecords( records )
+      if not result[ 'OK' ]:
+        cls.log.error( "Cannot add the logging records of %s jobs: %s" % ( len( jids ), result[ 'Message' ] ) )
+
+    result = jobDB.getJobsAttributes( jids, initNames )
+    if not result[ 'OK' ]:
+      cls.log.error( "Cannot get the new state of %s jobs: %s" % ( len( jids ), result[ 'Message' ] ) )
+      newStates = {}
+    else:
+      newStates = result[ 'Value' ]
+    for cjs in cjsList:
+      if cjs.jid in changes:
+        cjs._changesSaved( newStates.get( cjs.jid ) )
+    return S_OK( jids )
+
+  @classmethod
+  def __saveChanges( cls, jobDB, changes ):
+    """ Write the changes of all the jobs, grouping the jobs that get the same attributes
+    """
+    attGroups = {}
+    jobParameters = {}
+    optParameters = {}
+    jdls = {}
+    for jid in changes:
+      _initState, cache, _jobLog, manifest = changes[ jid ]
+      attDict = {}
+      for key in cache:
+        if key.find( "att." ) == 0:
+          attDict[ key[4:] ] = cache[ key ]
+        elif key.find( "jobp." ) == 0:
+          jobParameters.setdefault( jid, [] ).append( ( key[5:], cache[ key ] ) )
+        elif key.find( "optp." ) == 0:
+          optParameters.setdefault( jid, {} )[ key[5:] ] = cache[ key ]
+      if attDict:
+        attGroups.setdefault( tuple( sorted( attDict.items() ) ), [] ).append( jid )
+      if 'inputData' in cache:
+        result = jobDB.setInputData( jid, cache[ 'inputData' ] )
+        if not result[ 'OK' ]:
+          return result
+      if manifest:
+        jdls[ jid ] = manifest.dumpAsJDL()
+    result = jobDB.setJobsJDL( jdls )
+    if not result[ 'OK' ]:
+      return result
+    for attItems, jids in attGroups.items():
+      result = jobDB.setJobsAttributes( jids, [ name for name, _value in attItems ],
+                                        [ value for _name, value in attItems ], update = True )
+      if not result[ 'OK' ]:
+        return result
+    result = jobDB.setJobsParameters( jobParameters )
+    if not result[ 'OK' ]:
+      return result
+    return jobDB.setJobsOptParameters( optParameters )
@@ -0,0 +1,232 @@
+""" Test cases for the bulk load and save of the job states by JobStateBatch and the
+    OptimizationMind hooks using it
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC import S_OK, gLogger
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobState import JobState
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobStateBatch import JobStateBatch
+from DIRAC.WorkloadManagementSystem.Client.JobState.OptimizationTask import OptimizationTask
+from DIRAC.WorkloadManagementSystem.Service.OptimizationMindHandler import OptimizationMindHandler
+
+class FakeJobDB( object ):
+  """ Jobs kept in memory, counting the queries and the transactions
+  """
+
+  def __init__( self ):
+    self.jobs = {}
+    self.jdls = {}
+    self.parameters = {}
+    self.optParameters = {}
+    self.queries = []
+    self.transactions = []
+    self.updates = 0
+
+  def addJob( self, jid ):
+    self.jobs[ jid ] = { 'Status' : 'Checking', 'MinorStatus' : 'JobSanity', 'LastUpdateTime' : 0,
+                         'ApplicationStatus' : 'Unknown', 'JobType' : 'User', 'Owner' : 'user',
+                         'OwnerDN' : '/DN/user', 'OwnerGroup' : 'user', 'DIRACSetup' : 'Test',
+                         'RescheduleCounter' : 0, 'RescheduleTime' : None }
+    self.jdls[ jid ] = '[ Executable = "job%s"; ]' % jid
+    self.optParameters[ jid ] = { 'OptimizerChain' : 'JobPath,JobSanity' }
+
+  def changeState( self, jid, status ):
+    """ as another component changing the job """
+    self.jobs[ jid ][ 'Status' ] = status
+    self.jobs[ jid ][ 'LastUpdateTime' ] += 1
+
+  @property
+  def transaction( self ):
+    jobDB = self
+    class Guard( object ):
+      def __enter__( self ):
+        self.committed = False
+        def commit():
+          self.committed = True
+        return commit
+      def __exit__( self, exType, exValue, traceback ):
+        jobDB.transactions.append( self.committed and not exValue )
+    return Guard()
+
+  def getJobAttributes( self, jid, attNames = None ):
+    self.queries.append( ( 'getJobAttributes', [ jid ] ) )
+    return S_OK( dict( [ ( name, self.jobs[ jid ][ name ] ) for name in attNames ] ) )
+
+  def getJobsAttributes( self, jids, attNames, forUpdate = False ):
+    self.queries.append( ( 'getJobsAttributes', sorted( jids ) ) )
+    return S_OK( dict( [ ( jid, dict( [ ( name, self.jobs[ jid ][ name ] ) for name in attNames ] ) )
+                         for jid in jids if jid in self.jobs ] ) )
+
+  def getJobsJDL( self, jids ):
+    return S_OK( dict( [ ( jid, self.jdls[ jid ] ) for jid in jids if jid in self.jdls ] ) )
+
+  def getJobsOptParameters( self, jids ):
+    return S_OK( dict( [ ( jid, dict( self.optParameters.get( jid, {} ) ) ) for jid in jids ] ) )
+
+  def setJobsAttributes( self, jids, attNames, attValues, update = False ):
+    self.updates += 1
+    for jid in jids:
+      self.jobs[ jid ].update( dict( zip( attNames, attValues ) ) )
+      self.jobs[ jid ][ 'LastUpdateTime' ] += 1
+    return S_OK()
+
+  def setJobAttributes( self, jid, attNames, attValues, update = False ):
+    return self.setJobsAttributes( [ jid ], attNames, attValues, update )
+
+  def setJobsJDL( self, jdls ):
+    self.jdls.update( jdls )
+    return S_OK()
+
+  def setJobsParameters( self, parameters ):
+    for jid in parameters:
+      self.parameters.setdefault( jid, {} ).update( dict( parameters[ jid ] ) )
+    return S_OK()
+
+  def setJobsOptParameters( self, optParameters ):
+    for jid in optParameters:
+      self.optParameters.setdefault( jid, {} ).update( optParameters[ jid ] )
+    return S_OK()
+
+class FakeJobLoggingDB( object ):
+
+  def __init__( self ):
+    self.records = []
+
+  def addLoggingRecords( self, records ):
+    self.records.extend( records )
+    return S_OK()
+
+class JobStateBatchTestCase( unittest.TestCase ):
+  """ Base class with the fake DBs in place of the local ones
+  """
+
+  def setUp( self ):
+    self.jobDB = FakeJobDB()
+    self.logDB = FakeJobLoggingDB()
+    for jid in ( 1, 2, 3 ):
+      self.jobDB.addJob( jid )
+    self.realDB = JobState._JobState__db
+    dbHold = JobState.DBHold()
+    dbHold.checked = True
+    dbHold.job = self.jobDB
+    dbHold.log = self.logDB
+    JobState._JobState__db = dbHold
+
+  def tearDown( self ):
+    JobState._JobState__db = self.realDB
+
+  def loadJobs( self, jids ):
+    result = JobStateBatch.loadJobs( jids )
+    self.assert_( result[ 'OK' ] )
+    del self.jobDB.queries[:]
+    return result[ 'Value' ]
+
+class JobStateBatchCase( JobStateBatchTestCase ):
+
+  def test01loadJobs( self ):
+    """ jobs not found are left out, the others are loaded with one query per table """
+    result = JobStateBatch.loadJobs( [ 1, 2, 4 ] )
+    self.assert_( result[ 'OK' ] )
+    cjsDict = result[ 'Value' ]
+    self.assertEqual( sorted( cjsDict ), [ 1, 2 ] )
+    self.assertEqual( self.jobDB.queries, [ ( 'getJobsAttributes', [ 1, 2, 4 ] ) ] )
+    cjs = cjsDict[ 2 ]
+    self.assert_( cjs.valid )
+    #Served from the cache
+    cjs.dOnlyCache = True
+    self.assertEqual( cjs.getAttribute( 'JobType' )[ 'Value' ], 'User' )
+    self.assertEqual( cjs.getOptParameter( 'OptimizerChain' )[ 'Value' ], 'JobPath,JobSanity' )
+    self.assertEqual( cjs.getManifest()[ 'Value' ].getOption( 'Executable' ), 'job2' )
+    self.assertEqual( len( self.jobDB.queries ), 1 )
+
+  def test02recheckValidity( self ):
+    """ the jobs changed since they were loaded are not valid any more """
+    cjsDict = self.loadJobs( [ 1, 2, 3 ] )
+    self.jobDB.changeState( 2, 'Killed' )
+    result = JobStateBatch.recheckValidity( cjsDict.values() )
+    self.assert_( result[ 'OK' ] )
+    #Checked less than graceTime ago
+    self.assertEqual( result[ 'Value' ], { 1 : True, 2 : True, 3 : True } )
+    self.assertEqual( self.jobDB.queries, [] )
+    result = JobStateBatch.recheckValidity( cjsDict.values(), graceTime = 0 )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( result[ 'Value' ], { 1 : True, 2 : False, 3 : True } )
+    self.assertEqual( self.jobDB.queries, [ ( 'getJobsAttributes', [ 1, 2, 3 ] ) ] )
+
+  def test03commitChanges( self ):
+    """ a job changed since it was loaded is skipped, the others are saved together """
+    cjsDict = self.loadJobs( [ 1, 2, 3 ] )
+    for jid in cjsDict:
+      cjsDict[ jid ].setStatus( 'Waiting', 'Pilot Agent Submission', source = 'Test' )
+      cjsDict[ jid ].setParameter( 'Optimized', 'yes' )
+    self.jobDB.changeState( 2, 'Killed' )
+    result = JobStateBatch.commitChanges( cjsDict.values() )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( sorted( result[ 'Value' ] ), [ 1, 3 ] )
+    self.assertEqual( self.jobDB.transactions, [ True ] )
+    #The jobs with the same attributes are updated with one statement
+    self.assertEqual( self.jobDB.updates, 1 )
+    self.assertEqual( [ self.jobDB.jobs[ jid ][ 'Status' ] for jid in ( 1, 2, 3 ) ], [ 'Waiting', 'Killed', 'Waiting' ] )
+    self.assertEqual( sorted( self.jobDB.parameters ), [ 1, 3 ] )
+    self.assertEqual( sorted( [ record[0] for record in self.logDB.records ] ), [ 1, 3 ] )
+    self.assertEqual( cjsDict[ 1 ].getDirtyKeys(), set() )
+    self.assertNotEqual( cjsDict[ 2 ].getDirtyKeys(), set() )
+    #The saved jobs are not saved again, the skipped one reports the error
+    del self.jobDB.queries[:]
+    self.assert_( cjsDict[ 1 ].commitChanges()[ 'OK' ] )
+    self.assertEqual( self.jobDB.queries, [] )
+    result = cjsDict[ 2 ].commitChanges()
+    self.assertFalse( result[ 'OK' ] )
+    self.assertEqual( result[ 'Message' ], "Initial state was different" )
+
+  def test04checkedAfterBatch( self ):
+    """ once saved by the batch, a later commit without changes still checks the initial state """
+    cjsDict = self.loadJobs( [ 1 ] )
+    cjs = cjsDict[ 1 ]
+    cjs.setAppStatus( 'Optimized' )
+    self.assertEqual( JobStateBatch.commitChanges( [ cjs ] )[ 'Value' ], [ 1 ] )
+    self.assert_( cjs.commitChanges()[ 'OK' ] )
+    self.jobDB.changeState( 1, 'Killed' )
+    result = cjs.commitChanges()
+    self.assertFalse( result[ 'OK' ] )
+    self.assertEqual( result[ 'Message' ], "Initial state was different" )
+
+class OptimizationMindHooksCase( JobStateBatchTestCase ):
+
+  def setUp( self ):
+    JobStateBatchTestCase.setUp( self )
+    if not getattr( OptimizationMindHandler, 'log', None ):
+      OptimizationMindHandler.log = gLogger
+    self.tasks = dict( [ ( jid, OptimizationTask( cjs ) ) for jid, cjs in self.loadJobs( [ 1, 2, 3 ] ).items() ] )
+
+  def test01prepareToSendTasks( self ):
+    """ the validity of the tasks of a batch is rechecked with one query """
+    self.jobDB.changeState( 3, 'Killed' )
+    for task in self.tasks.values():
+      task.jobState._CachedJobState__lastValidState = 0
+    result = OptimizationMindHandler.exec_prepareToSendTasks( sorted( self.tasks.items() ), 'eId' )
+    self.assert_( result[ 'OK' ] )
+    self.assertEqual( result[ 'Value' ], { 1 : True, 2 : True, 3 : False } )
+    self.assertEqual( self.jobDB.queries, [ ( 'getJobsAttributes', [ 1, 2, 3 ] ) ] )
+
+  def test02tasksDone( self ):
+    """ the tasks done are saved in one transaction before being processed one by one """
+    for jid in self.tasks:
+      self.tasks[ jid ].jobState.setStatus( 'Checking', 'InputData', source = 'JobSanity' )
+    self.jobDB.changeState( 2, 'Killed' )
+    self.assert_( OptimizationMindHandler.exec_tasksDone( self.tasks )[ 'OK' ] )
+    self.assertEqual( self.jobDB.transactions, [ True ] )
+    del self.jobDB.queries[:]
+    for jid in ( 1, 3 ):
+      self.assert_( OptimizationMindHandler.exec_taskProcessed( jid, self.tasks[ jid ], 'JobSanity' )[ 'OK' ] )
+    self.assertEqual( self.jobDB.queries, [] )
+    result = OptimizationMindHandler.exec_taskProcessed( 2, self.tasks[ 2 ], 'JobSanity' )
+    self.assertFalse( result[ 'OK' ] )
+    self.assertEqual( self.jobDB.jobs[ 2 ][ 'Status' ], 'Killed' )
+
+if __name__ == '__main__':
+  SUITE = unittest.defaultTestLoader.loadTestsFromTestCase( JobStateBatchCase )
+  SUITE.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( OptimizationMindHooksCase ) )
+  unittest.TextTestRunner( verbosity = 2 ).run( SUITE )
@@ -46,6 +46,7 @@ __RCSID__ = "$Id$"
 
 import sys, types
 import operator
+import hashlib
 
 from DIRAC                                                       import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Config                     import gConfig
@@ -55,6 +56,7 @@ from DIRAC.ConfigurationSystem.Client.Helpers.Resources          import getSites
 from DIRAC.ResourceStatusSystem.Client.SiteStatus                import SiteStatus
 from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest  import JobManifest
 from DIRAC.Core.Utilities                                        import Time
+from DIRAC.WorkloadManagementSystem.private                      import HeartBeatSeries
 
 DEBUG = False
 JOB_STATES = ['Received', 'Checking', 'Staging', 'Waiting', 'Matched',
@@ -74,6 +76,10 @@ JOB_DYNAMIC_ATTRIBUTES = [ 'LastUpdateTime', 'HeartBeatTime',
                            'Status', 'MinorStatus', 'ApplicationStatus', 'ApplicationNumStatus', 'CPUTime'
                           ]
 
+# Job attributes the JobsSummary counters are kept for
+JOBS_SUMMARY_FIELDS = [ 'DIRACSetup', 'Status', 'MinorStatus', 'Site', 'Owner', 'OwnerDN', 'OwnerGroup',
+                        'JobGroup', 'JobType', 'HerdState' ]
+
 #############################################################################
 class JobDB( DB ):
 
@@ -257,6 +263,39 @@ class JobDB( DB ):
                                                      },
                                            'Indexes' : { 'JobID' : [ 'JobID' ] }
                                           }
+  # HeartBeatSeries table, the packed heart beat samples of the compact mode
+  _tablesDict[ 'HeartBeatSeries' ] = {
+                                      'Fields' :
+                                                {
+                                                 'JobID'      : 'INTEGER NOT NULL',
+                                                 'Name'       : 'VARCHAR(100) NOT NULL',
+                                                 'BlockStart' : 'DATETIME NOT NULL',
+                                                 'Resolution' : 'INTEGER NOT NULL DEFAULT 0',
+                                                 'Samples'    : 'MEDIUMBLOB NOT NULL'
+                                                },
+                                      'PrimaryKey' : [ 'JobID', 'Name', 'BlockStart' ],
+                                      'Indexes' : { 'BlockStart' : [ 'BlockStart' ] }
+                                     }
+  # JobsSummary table, number of jobs and reschedulings for each combination of JOBS_SUMMARY_FIELDS
+  _tablesDict[ 'JobsSummary' ] = {
+                                  'Fields' :
+                                            {
+                                             'SummaryKey'  : 'CHAR(32) NOT NULL',
+                                             'DIRACSetup'  : 'VARCHAR(32) NOT NULL',
+                                             'Status'      : 'VARCHAR(32) NOT NULL',
+                                             'MinorStatus' : 'VARCHAR(128) NOT NULL',
+                                             'Site'        : 'VARCHAR(100) NOT NULL',
+                                             'Owner'       : 'VARCHAR(32) NOT NULL',
+                                             'OwnerDN'     : 'VARCHAR(255) NOT NULL',
+                                             'OwnerGroup'  : 'VARCHAR(128) NOT NULL',
+                                             'JobGroup'    : 'VARCHAR(32) NOT NULL',
+                                             'JobType'     : 'VARCHAR(32) NOT NULL',
+                                             'HerdState'   : 'VARCHAR(32) NOT NULL',
+                                             'Jobs'        : 'INTEGER NOT NULL DEFAULT 0',
+                                             'Reschedules' : 'INTEGER NOT NULL DEFAULT 0'
+                                            },
+                                  'PrimaryKey' : [ 'SummaryKey' ]
+                                 }
   # JobCommands table
   _tablesDict[ 'JobCommands' ] = {
                                   'Fields' :
@@ -279,6 +318,15 @@ class JobDB( DB ):
     DB.__init__( self, 'JobDB', 'WorkloadManagement/JobDB', maxQueueSize, debug = DEBUG )
 
     self.maxRescheduling = gConfig.getValue( self.cs_path + '/MaxRescheduling', 3 )
+    # Numeric heart beat data packed in HeartBeatSeries instead of one row per value,
+    # downsampled to one value per HeartBeatResolution seconds after HeartBeatRawDays days
+    self.compactHeartBeats = gConfig.getValue( self.cs_path + '/CompactHeartBeats', False )
+    self.heartBeatRawDays = gConfig.getValue( self.cs_path + '/HeartBeatRawDays', 2 )
+    self.heartBeatResolution = gConfig.getValue( self.cs_path + '/HeartBeatResolution', 3600 )
+    # Keep the JobsSummary counters up to date and serve the job summaries from them
+    # instead of grouping the whole Jobs table. They are reconciled with the Jobs table
+    # by the StatesAccountingAgent
+    self.jobsSummary = gConfig.getValue( self.cs_path + '/JobsSummary', False )
 
     self.jobAttributeNames = []
     self.nJobAttributeNames = 0
@@ -788,6 +836,32 @@ class JobDB( DB ):
       ret[ attrList[iP] ] = jobData[ iP ]
     return S_OK( ret )
 
+#############################################################################
+  def getJobsAttributes( self, jobIDList, attrList = None, forUpdate = False ):
+    """ Get the attributes of the given jobs with one query, with the same values
+        as getJobAttributes. With forUpdate the rows are locked until the end of
+        the current transaction.
+        Returns S_OK( { jobID : { attribute : value } } ) with only the jobs found
+    """
+    if not jobIDList:
+      return S_OK( {} )
+    if not attrList:
+      attrList = self.jobAttributeNames
+    for attrName in attrList:
+      if attrName not in self.jobAttributeNames:
+        return S_ERROR( 'JobDB.getJobsAttributes: unknown attribute %s' % attrName )
+    cmd = "SELECT JobID, %s FROM Jobs WHERE JobID in ( %s )" % ( ', '.join( attrList ),
+                                                                 ','.join( [ str( int( jobID ) ) for jobID in jobIDList ] ) )
+    if forUpdate:
+      cmd += " FOR UPDATE"
+    result = self._query( cmd )
+    if not result['OK']:
+      return result
+    resultDict = {}
+    for row in result['Value']:
+      resultDict[ int( row[0] ) ] = dict( zip( attrList, row[1:] ) )
+    return S_OK( resultDict )
+
 #############################################################################
   def getJobInfo( self, jobID, parameters = None ):
     """ Get parameters for job specified by jobID. Parameters can be
@@ -914,6 +988,26 @@ class JobDB( DB ):
     else:
       return S_ERROR( 'JobDB.getJobOptParameters: failed to retrieve parameters' )
 
+#############################################################################
+  def getJobsOptParameters( self, jobIDList ):
+    """ Get all the optimizer parameters of the given jobs.
+        Returns S_OK( { jobID : { name : value } } )
+    """
+    if not jobIDList:
+      return S_OK( {} )
+    cmd = "SELECT JobID, Name, Value from OptimizerParameters WHERE JobID in ( %s )" % \
+          ','.join( [ str( int( jobID ) ) for jobID in jobIDList ] )
+    result = self._query( cmd )
+    if not result['OK']:
+      return S_ERROR( 'JobDB.getJobsOptParameters: failed to retrieve parameters' )
+    resultDict = dict( [ ( int( jobID ), {} ) for jobID in jobIDList ] )
+    for jobID, name, value in result['Value']:
+      try:
+        resultDict[int( jobID )][name] = value.tostring()
+      except Exception:
+        resultDict[int( jobID )][name] = value
+    return S_OK( resultDict )
+
 #############################################################################
   def getTimings( self, site, period = 3600 ):
     """ Get CPU and wall clock times for the jobs finished in the last hour
@@ -1147,8 +1241,10 @@ class JobDB( DB ):
     if myDate:
       cmd += ' AND LastUpdateTime < %s' % myDate
 
+    summaryKeys = self.__getSummaryKeys( [ jobID ], [ attrName ] )
     res = self._update( cmd )
     if res['OK']:
+      self.__updateSummary( [ jobID ], summaryKeys )
       return res
     else:
       return S_ERROR( 'JobDB.setAttribute: failed to set attribute' )
@@ -1185,12 +1281,45 @@ class JobDB( DB ):
     if myDate:
       cmd += ' AND LastUpdateTime < %s' % myDate
 
+    summaryKeys = self.__getSummaryKeys( [ jobID ], attrNames )
     res = self._update( cmd )
     if res['OK']:
+      self.__updateSummary( [ jobID ], summaryKeys )
       return res
     else:
       return S_ERROR( 'JobDB.setAttributes: failed to set attribute' )
 
+#############################################################################
+  def setJobsAttributes( self, jobIDList, attrNames, attrValues, update = False ):
+    """ Set the same attribute values for all the jobs in jobIDList in one statement.
+        The LastUpdate time stamp is refreshed if explicitely requested
+    """
+    if not jobIDList:
+      return S_OK( 0 )
+    if len( attrNames ) != len( attrValues ):
+      return S_ERROR( 'JobDB.setJobsAttributes: incompatible Argument length' )
+
+    attr = []
+    for i in range( len( attrNames ) ):
+      ret = self._escapeString( attrValues[i] )
+      if not ret['OK']:
+        return ret
+      attr.append( "%s=%s" % ( attrNames[i], ret['Value'] ) )
+    if update:
+      attr.append( "LastUpdateTime=UTC_TIMESTAMP()" )
+    if len( attr ) == 0:
+      return S_ERROR( 'JobDB.setJobsAttributes: Nothing to do' )
+
+    cmd = 'UPDATE Jobs SET %s WHERE JobID in ( %s )' % ( ', '.join( attr ),
+                                                         ','.join( [ str( int( jobID ) ) for jobID in jobIDList ] ) )
+    summaryKeys = self.__getSummaryKeys( jobIDList, attrNames )
+    res = self._update( cmd )
+    if res['OK']:
+      self.__updateSummary( jobIDList, summaryKeys )
+      return res
+    else:
+      return S_ERROR( 'JobDB.setJobsAttributes: failed to set attributes' )
+
 #############################################################################
   def setJobStatus( self, jobID, status = '', minor = '', application = '', appCounter = None ):
     """ Set status of the job specified by its jobID
@@ -1312,6 +1441,21 @@ class JobDB( DB ):
 
     return result
 
+#############################################################################
+  def setJobsParameters( self, parametersDict ):
+    """ Set the parameters of several jobs given as { jobID : [ ( name, value ), ... ] }
+    """
+    rows = []
+    for jobID in parametersDict:
+      for name, value in parametersDict[ jobID ]:
+        rows.append( ( int( jobID ), name, value ) )
+    if not rows:
+      return S_OK( 0 )
+    result = self.upsertMany( 'JobParameters', [ 'JobID', 'Name', 'Value' ], rows, [ 'Value' ] )
+    if not result['OK']:
+      return S_ERROR( 'JobDB.setJobsParameters: operation failed.' )
+    return result
+
 #############################################################################
   def setJobOptParameter( self, jobID, name, value ):
     """ Set an optimzer parameter specified by name,value pair for the job JobID
@@ -1336,6 +1480,21 @@ class JobDB( DB ):
 
     return S_OK()
 
+#############################################################################
+  def setJobsOptParameters( self, optParametersDict ):
+    """ Set the optimizer parameters of several jobs given as { jobID : { name : value } }
+    """
+    rows = []
+    for jobID in optParametersDict:
+      for name, value in optParametersDict[ jobID ].items():
+        rows.append( ( int( jobID ), name, value ) )
+    if not rows:
+      return S_OK( 0 )
+    result = self.upsertMany( 'OptimizerParameters', [ 'JobID', 'Name', 'Value' ], rows, [ 'Value' ] )
+    if not result['OK']:
+      return S_ERROR( 'JobDB.setJobsOptParameters: operation failed.' )
+    return result
+
 #############################################################################
   def removeJobOptParameter( self, jobID, name ):
     """ Remove the specified optimizer parameter for jobID
@@ -1518,6 +1677,30 @@ class JobDB( DB ):
     else:
       return result
 
+  def setJobsJDL( self, jdlDict ):
+    """ Set the current JDL of several jobs given as { jobID : JDL }
+    """
+    rows = [ ( int( jobID ), jdlDict[ jobID ] ) for jobID in jdlDict ]
+    if not rows:
+      return S_OK( 0 )
+    return self.upsertMany( 'JobJDLs', [ 'JobID', 'JDL' ], rows, [ 'JDL' ] )
+
+  def getJobsJDL( self, jobIDList, original = False ):
+    """ Get the current ( or original ) JDL of the given jobs.
+        Returns S_OK( { jobID : JDL } ) with only the jobs found
+    """
+    if not jobIDList:
+      return S_OK( {} )
+    field = 'JDL'
+    if original:
+      field = 'OriginalJDL'
+    cmd = "SELECT JobID, %s FROM JobJDLs WHERE JobID in ( %s )" % ( field,
+                                                                    ','.join( [ str( int( jobID ) ) for jobID in jobIDList ] ) )
+    result = self._query( cmd )
+    if not result['OK']:
+      return result
+    return S_OK( dict( [ ( int( jobID ), jdl ) for jobID, jdl in result['Value'] ] ) )
+
 
   def getJobsInHerd( self, jid ):
     try:
@@ -1567,11 +1750,13 @@ class JobDB( DB ):
           name = 'UserPriority'
         if value:
           upDict[ name ] = value
+      summaryKeys = self.__getSummaryKeys( [ jid ], upDict.keys() )
       result = self.updateFields( 'Jobs',
                                   condDict = { 'JobID' : jid },
                                   updateDict = upDict )
       if not result[ 'OK' ]:
         return result
+      self.__updateSummary( [ jid ], summaryKeys )
 
       #Reduce source job input data
       if sourceInputData:
@@ -1685,6 +1870,7 @@ class JobDB( DB ):
     result = self.insertFields( 'Jobs', inDict = attrs )
     if not result['OK']:
       return result
+    self.__updateSummary( [ jid ], self.__getSummaryKeys( [] ) )
 
     result = S_OK( jid )
     result[ 'JobID' ] = jid
@@ -1748,6 +1934,7 @@ class JobDB( DB ):
 
     failedTablesList = []
     jobIDString = ','.join( [str( int( j ) ) for j in jobIDList] )
+    summaryKeys = self.__getSummaryKeys( jobIDList )
     cmd = "DELETE LFN, Replicas FROM LFN, Replicas WHERE Replicas.LFNID = LFN.LFNID AND LFN.JobID in (%s)" % jobIDString
     result = self._update( cmd )
     if not result[ 'OK' ]:
@@ -1757,6 +1944,7 @@ class JobDB( DB ):
                    'JobParameters',
                    'AtticJobParameters',
                    'HeartBeatLoggingInfo',
+                   'HeartBeatSeries',
                    'OptimizerParameters',
                    'Jobs',
                    'MasterJDLs'
@@ -1766,6 +1954,8 @@ class JobDB( DB ):
       result = self._update( cmd )
       if not result['OK']:
         failedTablesList.append( table )
+      elif table == 'Jobs':
+        self.__updateSummary( jobIDList, summaryKeys )
 
     result = S_OK()
     #if failedSubjobList:
@@ -1914,10 +2104,12 @@ class JobDB( DB ):
       attrs[ 'Site' ] = site[0]
 
 
+    summaryKeys = self.__getSummaryKeys( [ jid ], attrs.keys() )
     result = self.updateFields( 'Jobs', condDict = { 'JobID' : jid },
                                 updateDict = attrs )
     if not result['OK']:
       return self.__failJob( jid, "Error setting attrs", "Can't set attributes: %s" % res[ 'Value' ] )
+    self.__updateSummary( [ jid ], summaryKeys )
 
     retVal = S_OK( jid )
     retVal['JobID'] = jid
@@ -1954,45 +2146,27 @@ class JobDB( DB ):
     """ Get the summary of jobs in a given status on all the sites
     """
 
-    waitingList = ['"Submitted"', '"Assigned"', '"Waiting"', '"Matched"']
-    waitingString = ','.join( waitingList )
+    waitingList = ['Submitted', 'Assigned', 'Waiting', 'Matched']
 
-    result = self.getDistinctJobAttributes( 'Site' )
+    result = self.getJobsSummaryCounters( ['Site', 'Status'] )
     if not result['OK']:
-      return result
+      return S_ERROR( 'Failed to get Site data from the JobDB' )
 
-    siteList = result['Value']
     siteDict = {}
     totalDict = {'Waiting':0, 'Running':0, 'Stalled':0, 'Done':0, 'Failed':0}
 
-    for site in siteList:
+    for attDict, count in result['Value']:
+      site = attDict['Site']
       if site == "ANY":
         continue
-      # Waiting
-      siteDict[site] = {}
-      ret = self._escapeString( site )
-      if not ret['OK']:
-        return ret
-      e_site = ret['Value']
-
-      req = "SELECT COUNT(JobID) FROM Jobs WHERE Status IN (%s) AND Site=%s" % ( waitingString, e_site )
-      result = self._query( req )
-      if result['OK']:
-        count = result['Value'][0][0]
-      else:
-        return S_ERROR( 'Failed to get Site data from the JobDB' )
-      siteDict[site]['Waiting'] = count
-      totalDict['Waiting'] += count
-      # Running,Stalled,Done,Failed
-      for status in ['"Running"', '"Stalled"', '"Done"', '"Failed"']:
-        req = "SELECT COUNT(JobID) FROM Jobs WHERE Status=%s AND Site=%s" % ( status, e_site )
-        result = self._query( req )
-        if result['OK']:
-          count = result['Value'][0][0]
-        else:
-          return S_ERROR( 'Failed to get Site data from the JobDB' )
-        siteDict[site][status.replace( '"', '' )] = count
-        totalDict[status.replace( '"', '' )] += count
+      if site not in siteDict:
+        siteDict[site] = {'Waiting':0, 'Running':0, 'Stalled':0, 'Done':0, 'Failed':0}
+      status = attDict['Status']
+      if status in waitingList:
+        status = 'Waiting'
+      if status in totalDict:
+        siteDict[site][status] += count
+        totalDict[status] += count
 
     siteDict['Total'] = totalDict
     return S_OK( siteDict )
@@ -2020,9 +2194,12 @@ class JobDB( DB ):
       last_update = selectDict['LastUpdateTime']
       del selectDict['LastUpdateTime']
 
-    result = self.getCounters( 'Jobs', ['Site', 'Status'],
-                              {}, newer = last_update,
-                              timeStamp = 'LastUpdateTime' )
+    if last_update:
+      result = self.getCounters( 'Jobs', ['Site', 'Status'],
+                                {}, newer = last_update,
+                                timeStamp = 'LastUpdateTime' )
+    else:
+      result = self.getJobsSummaryCounters( ['Site', 'Status'] )
     last_day = Time.dateTime() - Time.day
     resultDay = self.getCounters( 'Jobs', ['Site', 'Status'],
                                  {}, newer = last_day,
@@ -2181,9 +2358,12 @@ class JobDB( DB ):
       else:
         return S_ERROR( 'Unknown user %s' % username )
 
-    result = self.getCounters( 'Jobs', ['OwnerDN', 'OwnerGroup', 'Status'],
-                              selectDict, newer = last_update,
-                              timeStamp = 'LastUpdateTime' )
+    if last_update:
+      result = self.getCounters( 'Jobs', ['OwnerDN', 'OwnerGroup', 'Status'],
+                                selectDict, newer = last_update,
+                                timeStamp = 'LastUpdateTime' )
+    else:
+      result = self.getJobsSummaryCounters( ['OwnerDN', 'OwnerGroup', 'Status'], selectDict )
     last_day = Time.dateTime() - Time.day
     resultDay = self.getCounters( 'Jobs', ['OwnerDN', 'OwnerGroup', 'Status'],
                                  selectDict, newer = last_day,
@@ -2254,6 +2434,106 @@ class JobDB( DB ):
     finalDict['TotalRecords'] = len( records )
     return S_OK( finalDict )
 
+#####################################################################################
+  def __getSummaryKeys( self, jobIDList, attrNames = None ):
+    """ JobsSummary fields and reschedule counter of the jobs, to be read before
+        changing them. None if the JobsSummary is not kept or if attrNames does not
+        change it
+    """
+    if not self.jobsSummary:
+      return None
+    if attrNames is not None:
+      for attrName in attrNames:
+        if attrName in JOBS_SUMMARY_FIELDS or attrName == 'RescheduleCounter':
+          break
+      else:
+        return None
+    if not jobIDList:
+      return {}
+    cmd = "SELECT JobID, %s, RescheduleCounter FROM Jobs WHERE JobID in ( %s )" % \
+          ( ', '.join( JOBS_SUMMARY_FIELDS ), ','.join( [ str( jobID ) for jobID in jobIDList ] ) )
+    result = self._query( cmd )
+    if not result['OK']:
+      self.log.warn( 'Cannot get the summary fields of %d jobs' % len( jobIDList ), result['Message'] )
+      return None
+    return dict( [ ( row[0], ( tuple( row[1:-1] ), int( row[-1] ) ) ) for row in result['Value'] ] )
+
+  def __updateSummary( self, jobIDList, oldKeys ):
+    """ Move the jobs from the JobsSummary counters of oldKeys to the ones of their
+        current fields. Changes of the same jobs done at the same time by others can
+        make the counters drift until the next reconciliation
+    """
+    if oldKeys is None:
+      return
+    newKeys = self.__getSummaryKeys( jobIDList )
+    if newKeys is None:
+      return
+    deltas = {}
+    for keys, sign in ( ( oldKeys, -1 ), ( newKeys, 1 ) ):
+      for fields, rescheduleCounter in keys.values():
+        delta = deltas.setdefault( fields, [ 0, 0 ] )
+        delta[0] += sign
+        delta[1] += sign * rescheduleCounter
+    rows = [ ( self.__summaryKey( fields ), ) + fields + tuple( counts )
+             for fields, counts in deltas.items() if counts != [ 0, 0 ] ]
+    if not rows:
+      return
+    result = self.upsertMany( 'JobsSummary', [ 'SummaryKey' ] + JOBS_SUMMARY_FIELDS + [ 'Jobs', 'Reschedules' ],
+                              rows, [ 'Jobs', 'Reschedules' ], accumulate = True )
+    if not result['OK']:
+      self.log.warn( 'Cannot update the jobs summary', result['Message'] )
+
+  def __summaryKey( self, fields ):
+    return hashlib.md5( "\0".join( [ str( field ) for field in fields ] ) ).hexdigest()
+
+  def reconcileJobsSummary( self ):
+    """ Rebuild the JobsSummary counters from the Jobs table
+    """
+    fieldString = ', '.join( JOBS_SUMMARY_FIELDS )
+    with self.transaction as commit:
+      result = self._query( "SELECT %s, COUNT(*), SUM(RescheduleCounter) FROM Jobs GROUP BY %s" % ( fieldString,
+                                                                                                  fieldString ) )
+      if not result['OK']:
+        return result
+      rows = []
+      for row in result['Value']:
+        fields = tuple( row[:-2] )
+        rows.append( ( self.__summaryKey( fields ), ) + fields + ( int( row[-2] ), int( row[-1] or 0 ) ) )
+      result = self._update( "DELETE FROM JobsSummary" )
+      if not result['OK']:
+        return result
+      result = self.insertMany( 'JobsSummary', [ 'SummaryKey' ] + JOBS_SUMMARY_FIELDS + [ 'Jobs', 'Reschedules' ],
+                                rows )
+      if not result['OK']:
+        return result
+      commit()
+    return S_OK( len( rows ) )
+
+  def __useJobsSummary( self, attrList, condDict = None ):
+    if not self.jobsSummary:
+      return False
+    for attrName in list( attrList ) + ( condDict or {} ).keys():
+      if attrName not in JOBS_SUMMARY_FIELDS:
+        return False
+    return True
+
+  def getJobsSummaryCounters( self, attrList, condDict = None ):
+    """ Same as getCounters on the Jobs table, from the JobsSummary counters when
+        they are kept for all the attributes of attrList and condDict
+    """
+    if not self.__useJobsSummary( attrList, condDict ):
+      return self.getCounters( 'Jobs', attrList, condDict or {} )
+    try:
+      cond = self.buildCondition( condDict = condDict )
+    except Exception, x:
+      return S_ERROR( x )
+    attrNames = ', '.join( attrList )
+    cmd = "SELECT %s, SUM(Jobs) FROM JobsSummary %s GROUP BY %s HAVING SUM(Jobs) > 0" % ( attrNames, cond, attrNames )
+    result = self._query( cmd )
+    if not result['OK']:
+      return result
+    return S_OK( [ ( dict( zip( attrList, row[:-1] ) ), int( row[-1] ) ) for row in result['Value'] ] )
+
 #####################################################################################
   def setHeartBeatData( self, jobID, staticDataDict, dynamicDataDict ):
     """ Add the job's heart beat data to the database
@@ -2265,10 +2545,12 @@ class JobDB( DB ):
       return ret
     e_jobID = ret['Value']
 
+    summaryKeys = self.__getSummaryKeys( [ int( jobID ) ], [ 'Status' ] )
     req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), Status='Running' WHERE JobID=%s" % e_jobID
     result = self._update( req )
     if not result['OK']:
       return S_ERROR( 'Failed to set the heart beat time: ' + result['Message'] )
+    self.__updateSummary( [ int( jobID ) ], summaryKeys )
 
     ok = True
     # FIXME: It is rather not optimal to use parameters to store the heartbeat info, must find a proper solution
@@ -2278,6 +2560,16 @@ class JobDB( DB ):
       ok = False
       self.log.warn( result['Message'] )
 
+    if self.compactHeartBeats:
+      result = self.__setHeartBeatSeries( [ ( jobID, [ ( Time.dateTime(), dynamicDataDict ) ] ) ] )
+      if not result['OK']:
+        ok = False
+        self.log.warn( result['Message'] )
+      if ok:
+        return S_OK()
+      else:
+        return S_ERROR( 'Failed to store some or all the parameters' )
+
     # Add dynamic data to the job heart beat log
     # start = time.time()
     valueList = []
@@ -2309,9 +2601,101 @@ class JobDB( DB ):
     else:
       return S_ERROR( 'Failed to store some or all the parameters' )
 
+#####################################################################################
+  def setHeartBeatsData( self, heartBeatsList ):
+    """ Add the heart beat data of many jobs with one statement per table.
+        heartBeatsList is a list of ( jobID, staticDataDict, [ ( heartBeatTime, dynamicDataDict ), ... ] )
+    """
+    if not heartBeatsList:
+      return S_OK()
+    jobIDList = [ int( heartBeat[0] ) for heartBeat in heartBeatsList ]
+    # The heart beat time is the time the last heart beat was received, not the time of the flush
+    lastBeats = {}
+    for jobID, _staticDataDict, dynamicBeats in heartBeatsList:
+      if dynamicBeats:
+        lastBeats[ int( jobID ) ] = max( [ heartBeatTime for heartBeatTime, _dynamicDataDict in dynamicBeats ] )
+    # One UPDATE per chunk of jobs, for the statements to stay small. The status of the jobs
+    # that reached another state since their heart beat was received is left untouched
+    for i in range( 0, len( jobIDList ), 1000 ):
+      chunk = jobIDList[ i:i + 1000 ]
+      timeCases = ' '.join( [ "WHEN %d THEN '%s'" % ( jobID, Time.toString( lastBeats[ jobID ] ) )
+                              for jobID in chunk if jobID in lastBeats ] )
+      if timeCases:
+        req = "UPDATE Jobs SET HeartBeatTime=CASE JobID %s ELSE UTC_TIMESTAMP() END, " % timeCases
+      else:
+        req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), "
+      req += "Status=IF( Status IN ( 'Matched', 'Stalled' ), 'Running', Status ) WHERE JobID in ( %s )" % \
+             ','.join( [ str( jobID ) for jobID in chunk ] )
+      summaryKeys = self.__getSummaryKeys( chunk, [ 'Status' ] )
+      result = self._update( req )
+      if not result['OK']:
+        return S_ERROR( 'Failed to set the heart beat time: ' + result['Message'] )
+      self.__updateSummary( chunk, summaryKeys )
+
+    parameterRows = []
+    heartBeatRows = []
+    for jobID, staticDataDict, dynamicBeats in heartBeatsList:
+      for name, value in staticDataDict.items():
+        parameterRows.append( ( int( jobID ), str( name ), str( value ) ) )
+      if self.compactHeartBeats:
+        continue
+      for heartBeatTime, dynamicDataDict in dynamicBeats:
+        for name, value in dynamicDataDict.items():
+          heartBeatRows.append( ( int( jobID ), str( name ), str( value ), Time.toString( heartBeatTime ) ) )
+
+    ok = True
+    result = self.upsertMany( 'JobParameters', [ 'JobID', 'Name', 'Value' ], parameterRows, [ 'Value' ] )
+    if not result['OK']:
+      ok = False
+      self.log.warn( result['Message'] )
+    if self.compactHeartBeats:
+      result = self.__setHeartBeatSeries( [ ( jobID, dynamicBeats ) for jobID, _static, dynamicBeats in heartBeatsList ] )
+    else:
+      result = self.insertMany( 'HeartBeatLoggingInfo', [ 'JobID', 'Name', 'Value', 'HeartBeatTime' ], heartBeatRows )
+    if not result['OK']:
+      ok = False
+      self.log.warn( result['Message'] )
+
+    if ok:
+      return S_OK()
+    else:
+      return S_ERROR( 'Failed to store some or all the parameters' )
+
+#####################################################################################
+  def __setHeartBeatSeries( self, jobBeatsList ):
+    """ Append the numeric heart beat values to the blocks of HeartBeatSeries, the
+        other values go to HeartBeatLoggingInfo.
+        jobBeatsList is a list of ( jobID, [ ( heartBeatTime, dynamicDataDict ), ... ] )
+    """
+    # ( jobID, name, blockStart ) : [ ( epoch, value ), ... ]
+    blocks = {}
+    heartBeatRows = []
+    for jobID, dynamicBeats in jobBeatsList:
+      for heartBeatTime, dynamicDataDict in dynamicBeats:
+        epoch = int( Time.toEpoch( heartBeatTime ) )
+        for name, value in dynamicDataDict.items():
+          try:
+            value = float( str( value ).replace( '"', '' ) )
+          except ValueError:
+            heartBeatRows.append( ( int( jobID ), str( name ), str( value ), Time.toString( heartBeatTime ) ) )
+            continue
+          blockKey = ( int( jobID ), str( name ), HeartBeatSeries.blockStart( epoch ) )
+          blocks.setdefault( blockKey, [] ).append( ( epoch, value ) )
+
+    seriesRows = []
+    for ( jobID, name, blockStart ), samples in blocks.items():
+      seriesRows.append( ( jobID, name, Time.toString( Time.fromEpoch( blockStart ) ),
+                           HeartBeatSeries.packSamples( samples, blockStart ) ) )
+    result = self.upsertMany( 'HeartBeatSeries', [ 'JobID', 'Name', 'BlockStart', 'Samples' ], seriesRows,
+                              [ 'Samples' ], append = True )
+    if not result['OK']:
+      return result
+    return self.insertMany( 'HeartBeatLoggingInfo', [ 'JobID', 'Name', 'Value', 'HeartBeatTime' ], heartBeatRows )
+
 #####################################################################################
   def getHeartBeatData( self, jobID ):
-    """ Retrieve the job's heart beat data
+    """ Retrieve the job's heart beat data, the values kept one by one and the ones
+        decoded from the compact series, as a list of ( name, value, time ) strings
     """
     ret = self._escapeString( jobID )
     if not ret['OK']:
@@ -2323,16 +2707,101 @@ class JobDB( DB ):
     if not res['OK']:
       return res
 
-    if len( res['Value'] ) == 0:
-      return S_OK ( [] )
-
     result = []
     values = res['Value']
     for row in values:
       result.append( ( str( row[0] ), '%.01f' % ( float( row[1].replace( '"', '' ) ) ), str( row[2] ) ) )
 
+    cmd = 'SELECT Name,BlockStart,Samples from HeartBeatSeries WHERE JobID=%s ORDER BY BlockStart' % jobID
+    res = self._query( cmd )
+    if not res['OK']:
+      return res
+    for name, blockStart, samples in res['Value']:
+      for epoch, value in HeartBeatSeries.unpackSamples( samples, int( Time.toEpoch( blockStart ) ) ):
+        result.append( ( str( name ), '%.01f' % value, str( Time.fromEpoch( epoch ) ) ) )
+
     return S_OK( result )
 
+#####################################################################################
+  def downsampleHeartBeatData( self, maxBlocks = 1000 ):
+    """ Downsample the heart beat series older than HeartBeatRawDays days to
+        HeartBeatResolution seconds. Returns S_OK with the number of blocks downsampled
+    """
+    resolution = int( self.heartBeatResolution )
+    cmd = "SELECT JobID,Name,BlockStart,Samples FROM HeartBeatSeries WHERE Resolution < %d " % resolution
+    cmd += "AND BlockStart < DATE_SUB( UTC_TIMESTAMP(), INTERVAL %d DAY ) LIMIT %d" % ( int( self.heartBeatRawDays ),
+                                                                                      maxBlocks )
+    downsampled = 0
+    while True:
+      result = self._query( cmd )
+      if not result['OK']:
+        return result
+      seriesRows = []
+      for jobID, name, blockStart, samples in result['Value']:
+        startEpoch = int( Time.toEpoch( blockStart ) )
+        samples = HeartBeatSeries.downsample( HeartBeatSeries.unpackSamples( samples, startEpoch ), resolution,
+                                              name in HeartBeatSeries.CUMULATIVE_METRICS )
+        seriesRows.append( ( jobID, name, Time.toString( blockStart ), resolution,
+                             HeartBeatSeries.packSamples( samples, startEpoch ) ) )
+      if seriesRows:
+        result = self.upsertMany( 'HeartBeatSeries', [ 'JobID', 'Name', 'BlockStart', 'Resolution', 'Samples' ],
+                                  seriesRows, [ 'Resolution', 'Samples' ] )
+        if not result['OK']:
+          return result
+        downsampled += len( seriesRows )
+      if len( seriesRows ) < maxBlocks:
+        return S_OK( downsampled )
+
+#####################################################################################
+  def migrateHeartBeatData( self, lastJobID = 0, maxJobs = 100 ):
+    """ Move the numeric heart beat values of the next maxJobs jobs after lastJobID
+        from HeartBeatLoggingInfo to HeartBeatSeries. Returns S_OK( ( jobID, nValues ) )
+        with the last job migrated, 0 when there are no more jobs, and the number
+        of values moved. Only the rows read are removed, the ones written meanwhile
+        are left for the next pass. A failure between the writing of the series and
+        the removal of the rows leaves the values in both tables
+    """
+    cmd = "SELECT DISTINCT JobID FROM HeartBeatLoggingInfo WHERE JobID > %d ORDER BY JobID LIMIT %d" % \
+          ( int( lastJobID ), int( maxJobs ) )
+    result = self._query( cmd )
+    if not result['OK']:
+      return result
+    jobIDList = [ int( row[0] ) for row in result['Value'] ]
+    if not jobIDList:
+      return S_OK( ( 0, 0 ) )
+    jobIDString = ','.join( [ str( jobID ) for jobID in jobIDList ] )
+
+    cmd = "SELECT JobID,Name,Value,HeartBeatTime FROM HeartBeatLoggingInfo WHERE JobID in ( %s )" % jobIDString
+    result = self._query( cmd )
+    if not result['OK']:
+      return result
+    jobBeats = {}
+    movedRows = []
+    for jobID, name, value, heartBeatTime in result['Value']:
+      try:
+        float( str( value ).replace( '"', '' ) )
+      except ValueError:
+        continue
+      jobBeats.setdefault( int( jobID ), [] ).append( ( heartBeatTime, { name : value } ) )
+      result = self._escapeString( name )
+      if not result['OK']:
+        return result
+      movedRows.append( "( %d, %s, '%s' )" % ( int( jobID ), result['Value'], Time.toString( heartBeatTime ) ) )
+    if not movedRows:
+      return S_OK( ( jobIDList[-1], 0 ) )
+
+    result = self.__setHeartBeatSeries( jobBeats.items() )
+    if not result['OK']:
+      return result
+    # Remove exactly the rows moved, the ones received meanwhile may be older than them
+    for i in range( 0, len( movedRows ), 1000 ):
+      cmd = "DELETE FROM HeartBeatLoggingInfo WHERE ( JobID, Name, HeartBeatTime ) IN ( %s )" % \
+            ', '.join( movedRows[ i:i + 1000 ] )
+      result = self._update( cmd )
+      if not result['OK']:
+        return result
+    return S_OK( ( jobIDList[-1], len( movedRows ) ) )
+
 #####################################################################################
   def setJobCommand( self, jobID, command, arguments = None ):
     """ Store a command to be passed to the job together with the
@@ -2389,6 +2858,41 @@ class JobDB( DB ):
 
     return S_OK( resultDict )
 
+#####################################################################################
+  def getJobsCommands( self, jobIDList = None, status = 'Received' ):
+    """ Get the commands to be passed to the given jobs, or to all the jobs if jobIDList
+        is None, with one query.
+        Returns S_OK( { jobID : { command : arguments } } ) for the jobs with commands
+    """
+    if jobIDList is not None and not jobIDList:
+      return S_OK( {} )
+
+    ret = self._escapeString( status )
+    if not ret['OK']:
+      return ret
+    status = ret['Value']
+
+    resultDict = {}
+    if jobIDList is None:
+      result = self._query( "SELECT JobID, Command, Arguments FROM JobCommands WHERE Status=%s" % status )
+      if not result['OK']:
+        return result
+      for jobID, command, arguments in result['Value']:
+        resultDict.setdefault( int( jobID ), {} )[ command ] = arguments
+      return S_OK( resultDict )
+
+    jobIDList = list( jobIDList )
+    for i in range( 0, len( jobIDList ), 1000 ):
+      req = "SELECT JobID, Command, Arguments FROM JobCommands WHERE JobID in ( %s ) AND Status=%s" % \
+            ( ','.join( [ str( int( jobID ) ) for jobID in jobIDList[ i:i + 1000 ] ] ), status )
+      result = self._query( req )
+      if not result['OK']:
+        return result
+      for jobID, command, arguments in result['Value']:
+        resultDict.setdefault( int( jobID ), {} )[ command ] = arguments
+
+    return S_OK( resultDict )
+
 #####################################################################################
   def setJobCommandStatus( self, jobID, command, status ):
     """ Set the command status
@@ -2423,6 +2927,14 @@ class JobDB( DB ):
     valueFields = [ 'COUNT(JobID)', 'SUM(RescheduleCounter)' ]
     defString = ", ".join( defFields )
     valueString = ", ".join( valueFields )
+    if self.__useJobsSummary( defFields ):
+      sqlCmd = "SELECT %s, SUM(Jobs), SUM(Reschedules) FROM JobsSummary GROUP BY %s HAVING SUM(Jobs) > 0" % ( defString,
+                                                                                                           defString )
+      result = self._query( sqlCmd )
+      if not result[ 'OK' ]:
+        return result
+      records = tuple( [ row[:-2] + ( long( row[-2] ), long( row[-1] ) ) for row in result[ 'Value' ] ] )
+      return S_OK( ( ( defFields + valueFields ), records ) )
     sqlCmd = "SELECT %s, %s From Jobs GROUP BY %s" % ( defString, valueString, defString )
     result = self._query( sqlCmd )
     if not result[ 'OK' ]:
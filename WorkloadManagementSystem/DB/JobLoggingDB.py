@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     getWMSTimeStamps()
 """
@@ -109,41 +110,50 @@ class JobLoggingDB( DB ):
         UTC time is used.
     """
 
-    event = 'status/minor/app=%s/%s/%s' % ( status, minor, application )
-    self.gLogger.info( "Adding record for job " + str( jobID ) + ": '" + event + "' from " + source )
+    return self.addLoggingRecords( [ ( jobID, status, minor, application, date, source ) ] )
 
+#############################################################################
+  def addLoggingRecords( self, records ):
+    """ Add several entries to the JobLoggingDB table in one go. Each record is a
+        ( jobID, status, minor, application, date, source ) tuple with the same
+        meaning as the addLoggingRecord arguments
+    """
+    rows = []
+    for jobID, status, minor, application, date, source in records:
+      event = 'status/minor/app=%s/%s/%s' % ( status, minor, application )
+      self.gLogger.info( "Adding record for job " + str( jobID ) + ": '" + event + "' from " + source )
+      _date, time_order = self.__getTimeOrder( date )
+      rows.append( ( int( jobID ), status, minor, application, str( _date ), time_order, source ) )
+
+    return self.insertMany( 'LoggingInfo', [ 'JobID', 'Status', 'MinorStatus', 'ApplicationStatus',
+                                             'StatusTime', 'StatusTimeOrder', 'StatusSource' ], rows )
+
+  def __getTimeOrder( self, date ):
+    """ Get the UTC datetime and the float used to order the records from the date
+        given by the caller
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
       epoc = time.mktime( _date.timetuple() ) + _date.microsecond / 1000000. - MAGIC_EPOC_NUMBER
-      time_order = round( epoc, 3 )
     else:
       try:
         if type( date ) in StringTypes:
           # The date is provided as a string in UTC
           _date = Time.fromString( date )
           epoc = time.mktime( _date.timetuple() ) + _date.microsecond / 1000000. - MAGIC_EPOC_NUMBER
-          time_order = round( epoc, 3 )
         elif type( date ) == Time._dateTimeType:
           _date = date
           epoc = time.mktime( _date.timetuple() ) + _date.microsecond / 1000000. - MAGIC_EPOC_NUMBER
-          time_order = round( epoc, 3 )
         else:
           self.gLogger.error( 'Incorrect date for the logging record' )
           _date = Time.dateTime()
           epoc = time.mktime( _date.timetuple() ) - MAGIC_EPOC_NUMBER
-          time_order = round( epoc, 3 )
       except:
         self.gLogger.exception( 'Exception while date evaluation' )
         _date = Time.dateTime()
         epoc = time.mktime( _date.timetuple() ) - MAGIC_EPOC_NUMBER
-        time_order = round( epoc, 3 )
-
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-           ( int( jobID ), status, minor, application, str( _date ), time_order, source )
-
-    return self._update( cmd )
+    return _date, round( epoc, 3 )
 
 #############################################################################
   def getJobLoggingInfo( self, jobID ):
@@ -567,6 +567,21 @@ class PilotAgentsDB( DB ):
     else:
       return S_ERROR( 'PilotJobReference ' + pilotRef + ' not found' )
 
+##########################################################################################
+  def setJobsForPilot( self, jobIDList, pilotRef, currentJobID = None ):
+    """ Store the jobIDs of the jobs matched by the pilot with reference pilotRef
+        and optionally set its current job, with one statement each
+    """
+    pilotID = self.__getPilotID( pilotRef )
+    if not pilotID:
+      return S_ERROR( 'PilotJobReference ' + pilotRef + ' not found' )
+    if currentJobID:
+      result = self._update( "UPDATE PilotAgents SET CurrentJobID=%d WHERE PilotID=%d" % ( int( currentJobID ), pilotID ) )
+      if not result['OK']:
+        return result
+    rows = [ ( pilotID, int( jobID ), 'UTC_TIMESTAMP()' ) for jobID in jobIDList ]
+    return self.insertMany( 'JobToPilotMapping', [ 'PilotID', 'JobID', 'StartTime' ], rows )
+
 ##########################################################################################
   def setCurrentJobID( self, pilotRef, jobID ):
     """ Set the pilot agent current DIRAC job ID
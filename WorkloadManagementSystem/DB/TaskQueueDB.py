@@ -3,10 +3,13 @@
 
 __RCSID__ = "ebed3a8 (2012-07-06 20:33:11 +0200) Adri Casajs <adria@ecm.ub.es>"
 
+import time
 import types
 import random
+import threading
 from DIRAC  import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 from DIRAC.WorkloadManagementSystem.private.Queues import maxCPUSegments
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities import List
@@ -19,7 +22,7 @@ TQ_MIN_SHARE = 0.001
 
 class TaskQueueDB( DB ):
 
-  def __init__( self, maxQueueSize = 10 ):
+  def __init__( self, maxQueueSize = 10, useTQIndex = None ):
     random.seed()
     DB.__init__( self, 'TaskQueueDB', 'WorkloadManagement/TaskQueueDB', maxQueueSize )
     self.__multiValueDefFields = ( 'Sites', 'GridCEs', 'GridMiddlewares', 'BannedSites',
@@ -41,6 +44,14 @@ class TaskQueueDB( DB ):
     self.__opsHelper = Operations()
     self.__ensureInsertionIsSingle = False
     self.__sharesCorrector = SharesCorrector( self.__opsHelper )
+    #In memory matching index, if None the JobScheduling/UseTQIndex option decides
+    self.__useTQIndex = useTQIndex
+    self.__tqIndex = None
+    self.__tqIndexLock = threading.Lock()
+    self.__tqIndexLoadTime = 0
+    self.__tqIndexSyncTime = 0
+    self.__tqIndexLoadedMaxId = 0
+    self.__tqIndexStats = { 'hits' : 0, 'misses' : 0 }
     result = self.__initializeDB()
     if not result[ 'OK' ]:
       raise Exception( "Can't create tables: %s" % result[ 'Message' ] )
@@ -340,6 +351,8 @@ class TaskQueueDB( DB ):
                              conn = connObj )
       if not result[ 'OK' ]:
         return result
+    #Task queues may have been deleted, reload the whole index
+    self.__tqIndexLoadTime = 0
     return S_OK()
 
   def __setTaskQueueEnabled( self, tqId, enabled = True, connObj = False ):
@@ -411,6 +424,9 @@ class TaskQueueDB( DB ):
         self.recalculateTQSharesForEntity( tqDefDict[ 'OwnerDN' ], tqDefDict[ 'OwnerGroup' ], connObj = connObj )
     finally:
       self.__setTaskQueueEnabled( tqId, True )
+    if newTQ:
+      #Add it to the matching index with the next match
+      self.__tqIndexSyncTime = 0
     return S_OK()
 
   def __insertJobInTaskQueue( self, jobId, tqId, jobPriority, checkTQExists = True, connObj = False ):
@@ -568,6 +584,93 @@ class TaskQueueDB( DB ):
     self.log.info( "Could not find a match after %s match retries" % self.__maxMatchRetry )
     return S_ERROR( "Could not find a match after %s match retries" % self.__maxMatchRetry )
 
+  def matchAndGetJobs( self, tqMatchDict, numJobs, numQueuesPerTry = 10, negativeCond = {} ):
+    """
+    Match up to numJobs jobs. The task queues are matched once per try and the jobs
+    taken out of them in one transaction
+      Returns S_OK( { 'matchFound' : bool, 'jobs' : [ ( jobId, tqId ) ], 'tqMatch' : dict } )
+    """
+    if numJobs <= 1 or 'JobID' in tqMatchDict:
+      retVal = self.matchAndGetJob( tqMatchDict, numQueuesPerTry = numQueuesPerTry, negativeCond = negativeCond )
+      if not retVal[ 'OK' ]:
+        return retVal
+      matchData = retVal[ 'Value' ]
+      matchData[ 'jobs' ] = []
+      if matchData[ 'matchFound' ]:
+        matchData[ 'jobs' ].append( ( matchData[ 'jobId' ], matchData[ 'taskQueueId' ] ) )
+      return S_OK( matchData )
+    #Make a copy to avoid modification of original if escaping needs to be done
+    tqMatchDict = dict( tqMatchDict )
+    self.log.info( "Starting match of %s jobs for requirements" % numJobs, self.__strDict( tqMatchDict ) )
+    retVal = self._checkMatchDefinition( tqMatchDict )
+    if not retVal[ 'OK' ]:
+      self.log.error( "TQ match request check failed", retVal[ 'Message' ] )
+      return retVal
+    prioSQL = "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
+    jobSQL = "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s ORDER BY `tq_Jobs`.JobId ASC LIMIT %s"
+    jobs = []
+    for _ in range( self.__maxMatchRetry ):
+      retVal = self.matchAndGetTaskQueue( tqMatchDict, numQueuesToGet = numQueuesPerTry,
+                                          skipMatchDictDef = True, negativeCond = negativeCond )
+      if not retVal[ 'OK' ]:
+        return retVal
+      tqList = retVal[ 'Value' ]
+      if len( tqList ) == 0:
+        self.log.info( "No TQ matches requirements" )
+        break
+      for tqId, tqOwnerDN, tqOwnerGroup in tqList:
+        retVal = self._query( prioSQL % tqId )
+        if not retVal[ 'OK' ]:
+          return S_ERROR( "Can't retrieve winning priority for matching job: %s" % retVal[ 'Message' ] )
+        if len( retVal[ 'Value' ] ) == 0:
+          continue
+        prio = retVal[ 'Value' ][0][0]
+        #Take some more in case other matchers are taking them at the same time
+        retVal = self._query( jobSQL % ( tqId, prio, 2 * ( numJobs - len( jobs ) ) ) )
+        if not retVal[ 'OK' ]:
+          return S_ERROR( "Can't retrieve jobs for matching: %s" % retVal[ 'Message' ] )
+        jobIds = [ row[0] for row in retVal[ 'Value' ] ]
+        if len( jobIds ) == 0:
+          gLogger.info( "Task queue %s seems to be empty, triggering a cleaning" % tqId )
+          self.__deleteTQWithDelay.add( tqId, 300, ( tqId, tqOwnerDN, tqOwnerGroup ) )
+          continue
+        random.shuffle( jobIds )
+        retVal = self.__takeJobs( jobIds, numJobs - len( jobs ) )
+        if not retVal[ 'OK' ]:
+          return retVal
+        if retVal[ 'Value' ]:
+          self.log.info( "Extracted jobs %s with prio %s from TQ %s" % ( retVal[ 'Value' ], prio, tqId ) )
+          jobs.extend( [ ( jobId, tqId ) for jobId in retVal[ 'Value' ] ] )
+          self.__deleteTQWithDelay.add( tqId, 300, ( tqId, tqOwnerDN, tqOwnerGroup ) )
+        if len( jobs ) >= numJobs:
+          break
+      if len( jobs ) >= numJobs:
+        break
+    return S_OK( { 'matchFound' : len( jobs ) > 0, 'jobs' : jobs, 'tqMatch' : tqMatchDict } )
+
+  def __takeJobs( self, jobIds, numJobs ):
+    """
+    Delete up to numJobs of the jobs from the task queues in a transaction. The rows are
+    locked before deleting them so jobs taken by other matchers are skipped
+      Returns S_OK( list of taken jobIds )
+    """
+    try:
+      with self.transaction as commit:
+        retVal = self._query( "SELECT JobId FROM `tq_Jobs` WHERE JobId in ( %s ) FOR UPDATE" %
+                              ", ".join( [ str( jobId ) for jobId in jobIds ] ) )
+        if not retVal[ 'OK' ]:
+          return retVal
+        available = [ row[0] for row in retVal[ 'Value' ] ]
+        taken = [ jobId for jobId in jobIds if jobId in available ][ :numJobs ]
+        if taken:
+          retVal = self._update( "DELETE FROM `tq_Jobs` WHERE JobId in ( %s )" % ", ".join( [ str( jobId ) for jobId in taken ] ) )
+          if not retVal[ 'OK' ]:
+            return S_ERROR( "Could not take jobs out from the TQs: %s" % retVal[ 'Message' ] )
+        commit()
+    except Exception, excp:
+      return S_ERROR( "Could not take jobs out from the TQs: %s" % str( excp ) )
+    return S_OK( taken )
+
   def matchAndGetTaskQueue( self, tqMatchDict, numQueuesToGet = 1, skipMatchDictDef = False,
                                   negativeCond = {}, connObj = False ):
     """
@@ -579,6 +682,16 @@ class TaskQueueDB( DB ):
       retVal = self._checkMatchDefinition( tqMatchDict )
       if not retVal[ 'OK' ]:
         return retVal
+    tqIndex = self.__getTQIndex()
+    if tqIndex:
+      retVal = self.__escapeNegativeCond( negativeCond )
+      if retVal[ 'OK' ]:
+        tqList = tqIndex.match( tqMatchDict, numQueuesToGet = numQueuesToGet, negativeCond = retVal[ 'Value' ] )
+        if tqList:
+          self.__tqIndexStats[ 'hits' ] += 1
+          return S_OK( tqList )
+      #Nothing in the index, the TQs may have been created after the last sync
+      self.__tqIndexStats[ 'misses' ] += 1
     retVal = self.__generateTQMatchSQL( tqMatchDict, numQueuesToGet = numQueuesToGet, negativeCond = negativeCond )
     if not retVal[ 'OK' ]:
       return retVal
@@ -586,8 +699,130 @@ class TaskQueueDB( DB ):
     retVal = self._query( matchSQL, conn = connObj )
     if not retVal[ 'OK' ]:
       return retVal
+    if tqIndex and retVal[ 'Value' ]:
+      self.__tqIndexSyncTime = 0
     return S_OK( [ ( row[0], row[1], row[2] ) for row in retVal[ 'Value' ] ] )
 
+  def isTQIndexEnabled( self ):
+    if self.__useTQIndex is not None:
+      return self.__useTQIndex
+    return self.__getCSOption( "UseTQIndex", False )
+
+  def getTQIndexStats( self ):
+    """
+    Get the number of matches resolved by the in memory index and the ones that needed SQL
+    """
+    stats = dict( self.__tqIndexStats )
+    stats[ 'enabled' ] = self.isTQIndexEnabled()
+    stats[ 'taskQueues' ] = 0
+    if self.__tqIndex:
+      stats[ 'taskQueues' ] = len( self.__tqIndex )
+    return S_OK( stats )
+
+  def __getTQIndex( self ):
+    """
+    Get the matching index, reloading it completely every TQIndexRefreshTime seconds to get
+    the priorities and deletions done by other processes, and adding the new TQs every
+    TQIndexSyncTime seconds
+    """
+    if not self.isTQIndexEnabled():
+      self.__tqIndex = None
+      return None
+    now = time.time()
+    fullLoad = not self.__tqIndex or now - self.__tqIndexLoadTime > self.__getCSOption( "TQIndexRefreshTime", 60 )
+    if not fullLoad and now - self.__tqIndexSyncTime <= self.__getCSOption( "TQIndexSyncTime", 5 ):
+      return self.__tqIndex
+    #If another thread is already updating it, use the current one
+    if not self.__tqIndexLock.acquire( False ):
+      return self.__tqIndex
+    try:
+      if fullLoad:
+        tqIndex = TaskQueueIndex( self.__multiValueDefFields, self.__multiValueMatchFields,
+                                  tagMatchFields = self.__tagMatchFields,
+                                  bannedJobMatchFields = self.__bannedJobMatchFields,
+                                  strictRequireMatchFields = self.__strictRequireMatchFields )
+        result = self.__loadTQIndex( tqIndex )
+        if not result[ 'OK' ]:
+          self.log.error( "Can't load the TQ matching index", result[ 'Message' ] )
+          return self.__tqIndex
+        self.__tqIndex = tqIndex
+        self.__tqIndexLoadedMaxId = tqIndex.getMaxTQId()
+        self.__tqIndexLoadTime = now
+        self.log.verbose( "Loaded %s TQs in the matching index in %.3f secs" % ( result[ 'Value' ], time.time() - now ) )
+      else:
+        result = self.__loadTQIndex( self.__tqIndex, self.__tqIndexLoadedMaxId )
+        if not result[ 'OK' ]:
+          self.log.error( "Can't update the TQ matching index", result[ 'Message' ] )
+      self.__tqIndexSyncTime = now
+    finally:
+      self.__tqIndexLock.release()
+    return self.__tqIndex
+
+  def __loadTQIndex( self, tqIndex, fromTQId = 0 ):
+    """
+    Load in the index the enabled TQs with TQId > fromTQId that are not already there.
+    TQs are enabled once created, so they are not loaded without their multi value fields
+    """
+    sqlCond = "Enabled >= 1"
+    if fromTQId:
+      sqlCond = "%s AND TQId > %d" % ( sqlCond, fromTQId )
+    result = self._query( "SELECT TQId, OwnerDN, OwnerGroup, Setup, CPUTime, Priority FROM `tq_TaskQueues` WHERE %s" % sqlCond )
+    if not result[ 'OK' ]:
+      return result
+    tqDefs = {}
+    for tqId, ownerDN, ownerGroup, setup, cpuTime, priority in result[ 'Value' ]:
+      if tqId in tqIndex:
+        continue
+      result = self._escapeValues( [ ownerDN, ownerGroup, setup ] )
+      if not result[ 'OK' ]:
+        return result
+      escOwnerDN, escOwnerGroup, escSetup = result[ 'Value' ]
+      tqDefs[ tqId ] = { 'OwnerDN' : escOwnerDN, 'OwnerGroup' : escOwnerGroup, 'Setup' : escSetup,
+                         'CPUTime' : cpuTime, 'Priority' : priority, 'Owner' : ( ownerDN, ownerGroup ) }
+    if not tqDefs:
+      return S_OK( 0 )
+    for field in self.__multiValueDefFields:
+      sqlCmd = "SELECT TQId, Value FROM `tq_TQTo%s`" % field
+      if fromTQId:
+        sqlCmd = "%s WHERE TQId > %d" % ( sqlCmd, fromTQId )
+      result = self._query( sqlCmd )
+      if not result[ 'OK' ]:
+        return result
+      rows = [ row for row in result[ 'Value' ] if row[0] in tqDefs ]
+      result = self._escapeValues( [ row[1] for row in rows ] )
+      if not result[ 'OK' ]:
+        return result
+      for iP in range( len( rows ) ):
+        tqDefs[ rows[ iP ][0] ].setdefault( field, [] ).append( result[ 'Value' ][ iP ] )
+    for tqId in tqDefs:
+      tqIndex.add( tqId, tqDefs[ tqId ], tqDefs[ tqId ][ 'Priority' ], tqDefs[ tqId ][ 'Owner' ] )
+    return S_OK( len( tqDefs ) )
+
+  def __escapeNegativeCond( self, negativeCond ):
+    """
+    Escape the values of the negative conditions as the SQL generation does
+    """
+    if not negativeCond:
+      return S_OK( negativeCond )
+    if type( negativeCond ) in ( types.ListType, types.TupleType ):
+      condList = []
+      for condDict in negativeCond:
+        result = self.__escapeNegativeCond( condDict )
+        if not result[ 'OK' ]:
+          return result
+        condList.append( result[ 'Value' ] )
+      return S_OK( condList )
+    condDict = {}
+    for field in negativeCond:
+      values = negativeCond[ field ]
+      if type( values ) not in ( types.ListType, types.TupleType ):
+        values = [ values ]
+      result = self._escapeValues( values )
+      if not result[ 'OK' ]:
+        return result
+      condDict[ field ] = result[ 'Value' ]
+    return S_OK( condDict )
+
   def __generateSQLSubCond( self, sqlString, value, boolOp = 'OR' ):
     if type( value ) not in ( types.ListType, types.TupleType ):
       return sqlString % str( value ).strip()
@@ -870,6 +1105,8 @@ class TaskQueueDB( DB ):
       return S_ERROR( "Could not delete task queue %s: %s" % ( tqId, retVal[ 'Message' ] ) )
     delTQ = retVal[ 'Value' ]
     if delTQ > 0:
+      if self.__tqIndex:
+        self.__tqIndex.remove( tqId )
       for mvField in self.__multiValueDefFields:
         retVal = self._update( "DELETE FROM `tq_TQTo%s` WHERE TQId = %s" % ( mvField, tqId ), conn = connObj )
         if not retVal[ 'OK' ]:
@@ -902,6 +1139,8 @@ class TaskQueueDB( DB ):
     if not retVal[ 'OK' ]:
       return S_ERROR( "Could not delete task queue %s: %s" % ( tqId, retVal[ 'Message' ] ) )
     delTQ = retVal[ 'Value' ]
+    if self.__tqIndex:
+      self.__tqIndex.remove( tqId )
     sqlCmd = "DELETE FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s" % tqId
     retVal = self._update( sqlCmd, conn = connObj )
     if not retVal[ 'OK' ]:
@@ -1153,7 +1392,9 @@ class TaskQueueDB( DB ):
     for prio in prioDict:
       tqList = ", ".join( [ str( tqId ) for tqId in prioDict[ prio ] ] )
       updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % ( prio, tqList )
-      self._update( updateSQL, conn = connObj )
+      result = self._update( updateSQL, conn = connObj )
+      if result[ 'OK' ] and self.__tqIndex:
+        self.__tqIndex.setPriority( prioDict[ prio ], round( prio, 4 ) )
     return S_OK()
 
   def getGroupShares( self ):
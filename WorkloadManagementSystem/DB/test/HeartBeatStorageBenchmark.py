@@ -0,0 +1,94 @@
+""" Benchmark of the heart beat storage, one value per row and compact series
+
+    Writes the heart beats of nJobs jobs running for nDays days, one every
+    10 minutes, in the configured JobDB (use a test database) one value per row,
+    then as compact series, and prints the number of rows, the stored bytes and
+    the time to get the heart beat data of all the jobs. The series are then
+    downsampled and measured again, and the jobs removed. Run it with:
+
+      python HeartBeatStorageBenchmark.py [ nJobs ] [ nDays ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import random
+import datetime
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine( ignoreErrors = True )
+
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+
+FIRST_JOB_ID = 900000000
+HEARTBEAT_PERIOD = 600
+# Bytes of the fixed size columns of each row
+ROW_OVERHEAD = { 'HeartBeatLoggingInfo' : 12, 'HeartBeatSeries' : 16 }
+VALUE_COLUMN = { 'HeartBeatLoggingInfo' : 'Value', 'HeartBeatSeries' : 'Samples' }
+
+def jobHeartBeats( nDays ):
+  now = datetime.datetime.utcnow()
+  beats = []
+  cpu = 0.
+  for i in range( nDays * 86400 / HEARTBEAT_PERIOD ):
+    cpu += HEARTBEAT_PERIOD * random.uniform( 0.5, 1 )
+    beats.append( ( now - datetime.timedelta( seconds = ( nDays * 86400 - i * HEARTBEAT_PERIOD ) ),
+                    { 'LoadAverage' : random.uniform( 0, 16 ), 'MemoryUsed' : random.uniform( 1e5, 4e6 ),
+                      'AvailableDiskSpace' : random.uniform( 1e3, 1e5 ), 'CPUConsumed' : cpu,
+                      'WallClockTime' : float( ( i + 1 ) * HEARTBEAT_PERIOD ) } ) )
+  return beats
+
+def measure( name, jobDB, table, nJobs ):
+  result = jobDB._query( "SELECT COUNT(*), SUM( LENGTH( Name ) + LENGTH( %s ) + %d ) FROM %s WHERE JobID >= %d" %
+                         ( VALUE_COLUMN[ table ], ROW_OVERHEAD[ table ], table, FIRST_JOB_ID ) )
+  if not result[ 'OK' ]:
+    print "%s: %s" % ( name, result[ 'Message' ] )
+    sys.exit( 1 )
+  rows, size = result[ 'Value' ][0]
+  start = time.time()
+  values = 0
+  for jobID in range( FIRST_JOB_ID, FIRST_JOB_ID + nJobs ):
+    values += len( jobDB.getHeartBeatData( jobID )[ 'Value' ] )
+  elapsed = time.time() - start
+  print "%s: %s rows, %.1f MB, %s values read in %.2f s (%.1f ms/job)" % ( name, rows, float( size or 0 ) / 2 ** 20,
+                                                                          values, elapsed, 1000. * elapsed / nJobs )
+
+def removeJobs( jobDB ):
+  for table in ROW_OVERHEAD:
+    jobDB._update( "DELETE FROM %s WHERE JobID >= %d" % ( table, FIRST_JOB_ID ) )
+
+def writeJobs( jobDB, nJobs, nDays ):
+  start = time.time()
+  for jobID in range( FIRST_JOB_ID, FIRST_JOB_ID + nJobs ):
+    result = jobDB.setHeartBeatsData( [ ( jobID, {}, jobHeartBeats( nDays ) ) ] )
+    if not result[ 'OK' ]:
+      print "Cannot write the heart beats of job %s: %s" % ( jobID, result[ 'Message' ] )
+      sys.exit( 1 )
+  return time.time() - start
+
+if __name__ == "__main__":
+  nJobs = 200
+  nDays = 3
+  if len( sys.argv ) > 1:
+    nJobs = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nDays = int( sys.argv[2] )
+  jobDB = JobDB()
+  jobDB._checkTable()
+  removeJobs( jobDB )
+
+  jobDB.compactHeartBeats = False
+  print "Rows written in %.2f s" % writeJobs( jobDB, nJobs, nDays )
+  measure( "Rows", jobDB, 'HeartBeatLoggingInfo', nJobs )
+  removeJobs( jobDB )
+
+  jobDB.compactHeartBeats = True
+  print "Series written in %.2f s" % writeJobs( jobDB, nJobs, nDays )
+  measure( "Series", jobDB, 'HeartBeatSeries', nJobs )
+  jobDB.heartBeatRawDays = 1
+  start = time.time()
+  result = jobDB.downsampleHeartBeatData()
+  print "%s blocks downsampled to %s s in %.2f s" % ( result.get( 'Value' ), jobDB.heartBeatResolution,
+                                                     time.time() - start )
+  measure( "Downsampled series", jobDB, 'HeartBeatSeries', nJobs )
+  removeJobs( jobDB )
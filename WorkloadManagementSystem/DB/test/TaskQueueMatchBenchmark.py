@@ -0,0 +1,82 @@
+""" Benchmark of the task queue matching with and without the in memory index
+
+    Inserts nJobs jobs with random requirements in the configured TaskQueueDB
+    (use a test database), then runs nMatches random resource matches with the
+    SQL query and with the index, and removes the jobs. Run it with:
+
+      python TaskQueueMatchBenchmark.py [ nJobs ] [ nMatches ]
+"""
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import random
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine( ignoreErrors = True )
+
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+
+FIRST_JOB_ID = 900000000
+SITES = [ "Site%d.org" % i for i in range( 50 ) ]
+PLATFORMS = [ "x86_64-slc5", "x86_64-slc6", "x86_64-cc7" ]
+
+def randomTQDef():
+  tqDefDict = { 'OwnerDN' : '/DN=benchmark%d' % random.randint( 0, 20 ), 'OwnerGroup' : 'user',
+                'Setup' : 'Benchmark', 'CPUTime' : random.choice( [ 3600, 86400, 360000 ] ) }
+  if random.random() < 0.5:
+    tqDefDict[ 'Sites' ] = random.sample( SITES, random.randint( 1, 5 ) )
+  if random.random() < 0.2:
+    tqDefDict[ 'BannedSites' ] = random.sample( SITES, random.randint( 1, 3 ) )
+  if random.random() < 0.5:
+    tqDefDict[ 'Platforms' ] = [ random.choice( PLATFORMS ) ]
+  return tqDefDict
+
+def randomResource():
+  return { 'Setup' : 'Benchmark', 'CPUTime' : random.choice( [ 10000, 100000, 1000000 ] ),
+           'Site' : random.choice( SITES ), 'Platform' : random.sample( PLATFORMS, 2 ) }
+
+def benchmark( name, tqDB, resources ):
+  matched = 0
+  start = time.time()
+  for resource in resources:
+    result = tqDB.matchAndGetTaskQueue( resource, numQueuesToGet = 10 )
+    if not result[ 'OK' ]:
+      print "%s: match failed: %s" % ( name, result[ 'Message' ] )
+      return
+    if result[ 'Value' ]:
+      matched += 1
+  elapsed = time.time() - start
+  print "%s: %s matches in %.2f s (%.1f matches/s), %s resources matched" % ( name, len( resources ), elapsed,
+                                                                               len( resources ) / elapsed, matched )
+
+if __name__ == "__main__":
+  nJobs = 5000
+  nMatches = 2000
+  if len( sys.argv ) > 1:
+    nJobs = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    nMatches = int( sys.argv[2] )
+
+  sqlDB = TaskQueueDB( useTQIndex = False )
+  indexDB = TaskQueueDB( useTQIndex = True )
+
+  start = time.time()
+  for jobId in range( FIRST_JOB_ID, FIRST_JOB_ID + nJobs ):
+    result = sqlDB.insertJob( jobId, randomTQDef(), random.randint( 1, 10 ) )
+    if not result[ 'OK' ]:
+      print "Cannot insert job %s: %s" % ( jobId, result[ 'Message' ] )
+      sys.exit( 1 )
+  print "Inserted %s jobs in %.2f s, %s task queues" % ( nJobs, time.time() - start,
+                                                          sqlDB.getNumTaskQueues().get( 'Value' ) )
+
+  resources = [ randomResource() for _i in range( nMatches ) ]
+  benchmark( "SQL", sqlDB, resources )
+  #First call loads the index
+  indexDB.matchAndGetTaskQueue( resources[0] )
+  benchmark( "Index", indexDB, resources )
+  print "Index stats: %s" % indexDB.getTQIndexStats()[ 'Value' ]
+
+  for jobId in range( FIRST_JOB_ID, FIRST_JOB_ID + nJobs ):
+    sqlDB.deleteJob( jobId )
+  sqlDB.cleanOrphanedTaskQueues()
@@ -0,0 +1,34 @@
+""" Test of the compact encoding of the heart beat series
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC.WorkloadManagementSystem.private import HeartBeatSeries
+
+class HeartBeatSeriesTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.start = HeartBeatSeries.blockStart( 1400000123 )
+    self.samples = [ ( self.start + 10, 1.5 ), ( self.start + 4000, 3. ),
+                     ( self.start + 4100, 5. ), ( self.start + 8000, 2. ) ]
+
+  def test_pack( self ):
+    """ samples come back sorted, a truncated sample is ignored """
+    self.assertEqual( self.start % HeartBeatSeries.BLOCK_LENGTH, 0 )
+    data = HeartBeatSeries.packSamples( reversed( self.samples ), self.start )
+    self.assertEqual( len( data ), 4 * HeartBeatSeries.SAMPLE_SIZE )
+    self.assertEqual( HeartBeatSeries.unpackSamples( data, self.start ), self.samples )
+    self.assertEqual( HeartBeatSeries.unpackSamples( data + data[:3], self.start ), self.samples )
+
+  def test_downsample( self ):
+    """ mean per interval, last value for cumulative metrics """
+    self.assertEqual( HeartBeatSeries.downsample( self.samples, 3600 ),
+                      [ ( self.start + 10, 1.5 ), ( self.start + 4050, 4. ), ( self.start + 8000, 2. ) ] )
+    self.assertEqual( HeartBeatSeries.downsample( self.samples, 3600, cumulative = True ),
+                      [ ( self.start + 10, 1.5 ), ( self.start + 4100, 5. ), ( self.start + 8000, 2. ) ] )
+    self.assertEqual( HeartBeatSeries.downsample( self.samples, 0 ), self.samples )
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( HeartBeatSeriesTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( suite )
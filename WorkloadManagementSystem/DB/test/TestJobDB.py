@@ -1,5 +1,6 @@
 import unittest,types
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
 
 class JobDBTestCase(unittest.TestCase):
   """ Base class for the JobDB test cases
@@ -168,6 +169,117 @@ class CountJobsCase(JobDBTestCase):
     result = self.jobDB.getCounters(['Status','MinorStatus'],{},'2007-04-22 00:00:00')
     self.assert_( result['OK'],'Status after getCounters') 
        
+
+class HeartBeatCase(JobDBTestCase):
+
+  def test_bufferedHeartBeat(self):
+
+    jobID = self.createJob()
+    result = self.jobDB.setJobStatus(jobID,'Running','Application')
+    self.assert_( result['OK'],'Status after setJobStatus')
+    heartBeatBuffer = HeartBeatBuffer(self.jobDB)
+    heartBeatBuffer.addHeartBeat(jobID,{},{'CPUConsumed':10})
+    # The job finishes before the heart beat is flushed
+    result = self.jobDB.setJobStatus(jobID,'Done','Execution Complete')
+    self.assert_( result['OK'],'Status after setJobStatus')
+    result = heartBeatBuffer.flush()
+    self.assert_( result['OK'],'Status after flush')
+    result = self.jobDB.getJobAttribute(jobID,'Status')
+    self.assert_( result['OK'],'Status after getJobAttribute')
+    self.assertEqual(result['Value'],'Done','Final status kept')
+
+    result = self.jobDB.setJobStatus(jobID,'Stalled','Watchdog identified this job as stalled')
+    self.assert_( result['OK'],'Status after setJobStatus')
+    heartBeatBuffer.addHeartBeat(jobID,{},{'CPUConsumed':20})
+    heartBeatBuffer.flush()
+    result = self.jobDB.getJobAttribute(jobID,'Status')
+    self.assertEqual(result['Value'],'Running','Stalled job back to Running')
+
+class JobsSummaryCase(JobDBTestCase):
+
+  def checkSummary(self):
+    attrList = ['Status','MinorStatus','Site','Owner','OwnerGroup','JobGroup']
+    result = self.jobDB.getJobsSummaryCounters(attrList)
+    self.assert_( result['OK'],'Status after getJobsSummaryCounters')
+    summary = sorted([ (sorted(attDict.items()),count) for attDict,count in result['Value'] ])
+    result = self.jobDB.getCounters('Jobs',attrList,{})
+    self.assert_( result['OK'],'Status after getCounters')
+    counters = sorted([ (sorted(attDict.items()),int(count)) for attDict,count in result['Value'] ])
+    self.assertEqual(summary,counters,'Summary counters equal to the Jobs counters')
+
+  def test_jobsSummary(self):
+
+    self.jobDB.jobsSummary = True
+    result = self.jobDB.reconcileJobsSummary()
+    self.assert_( result['OK'],'Status after reconcileJobsSummary')
+    jdlfile = open("test.jdl","r")
+    jdl = jdlfile.read()
+    jdlfile.close()
+    jobIDs = []
+    for i in range(6):
+      result = self.jobDB.insertNewJobIntoDB(jdl,'user%d' % (i%2),'/DN/user%d' % (i%2),'group','Test')
+      self.assert_( result['OK'],'Status after insertNewJobIntoDB')
+      jobIDs.append(result['Value'])
+    self.checkSummary()
+    result = self.jobDB.setJobsAttributes(jobIDs[:4],['Status','MinorStatus','Site'],
+                                          ['Running','Application','DIRAC.in2p3.fr'])
+    self.assert_( result['OK'],'Status after setJobsAttributes')
+    self.checkSummary()
+    result = self.jobDB.setJobStatus(jobIDs[0],'Done','Execution Complete')
+    self.assert_( result['OK'],'Status after setJobStatus')
+    self.checkSummary()
+    result = self.jobDB.removeJobFromDB(jobIDs[:3])
+    self.assert_( result['OK'],'Status after removeJobFromDB')
+    self.checkSummary()
+
+class JobsBulkCase(JobDBTestCase):
+
+  def test_getJobsAttributes(self):
+
+    jobIDs = [ self.createJob() for i in range(3) ]
+    result = self.jobDB.setJobsAttributes(jobIDs[:2],['Status','MinorStatus'],['Checking','JobSanity'])
+    self.assert_( result['OK'],'Status after setJobsAttributes')
+    attrList = ['Status','MinorStatus','LastUpdateTime']
+    result = self.jobDB.getJobsAttributes(jobIDs+[max(jobIDs)+1000],attrList)
+    self.assert_( result['OK'],'Status after getJobsAttributes')
+    jobsAttributes = result['Value']
+    self.assertEqual(sorted(jobsAttributes.keys()),sorted(jobIDs),'Jobs not found are left out')
+    self.assertEqual(jobsAttributes[jobIDs[0]]['Status'],'Checking')
+    for jobID in jobIDs:
+      result = self.jobDB.getJobAttributes(jobID,attrList)
+      self.assert_( result['OK'],'Status after getJobAttributes')
+      self.assertEqual(jobsAttributes[jobID],result['Value'],'Same values as getJobAttributes')
+    result = self.jobDB.getJobsAttributes(jobIDs,['NoSuchAttribute'])
+    self.assertFalse( result['OK'],'Unknown attribute refused')
+
+  def test_setJobsJDLAndParameters(self):
+
+    jobIDs = [ self.createJob() for i in range(2) ]
+    jdls = dict([ (jobID,'[ Executable = "job%s"; ]' % jobID) for jobID in jobIDs ])
+    result = self.jobDB.setJobsJDL(jdls)
+    self.assert_( result['OK'],'Status after setJobsJDL')
+    result = self.jobDB.getJobsJDL(jobIDs)
+    self.assert_( result['OK'],'Status after getJobsJDL')
+    self.assertEqual(result['Value'],jdls)
+
+    result = self.jobDB.setJobsParameters({jobIDs[0]:[('CPU','10'),('Host','node1')],jobIDs[1]:[('CPU','20')]})
+    self.assert_( result['OK'],'Status after setJobsParameters')
+    # Existing parameters are updated
+    result = self.jobDB.setJobsParameters({jobIDs[0]:[('CPU','15')]})
+    self.assert_( result['OK'],'Status after setJobsParameters')
+    result = self.jobDB.getJobParameters(jobIDs[0],['CPU','Host'])
+    self.assert_( result['OK'],'Status after getJobParameters')
+    self.assertEqual(result['Value'],{'CPU':'15','Host':'node1'})
+    result = self.jobDB.getJobParameters(jobIDs[1],['CPU'])
+    self.assertEqual(result['Value'],{'CPU':'20'})
+
+    result = self.jobDB.setJobsOptParameters({jobIDs[0]:{'OptimizerChain':'JobPath,JobSanity'}})
+    self.assert_( result['OK'],'Status after setJobsOptParameters')
+    result = self.jobDB.setJobsOptParameters({jobIDs[0]:{'OptimizerChain':'JobSanity'},jobIDs[1]:{'Flag':'1'}})
+    self.assert_( result['OK'],'Status after setJobsOptParameters')
+    result = self.jobDB.getJobsOptParameters(jobIDs)
+    self.assert_( result['OK'],'Status after getJobsOptParameters')
+    self.assertEqual(result['Value'],{jobIDs[0]:{'OptimizerChain':'JobSanity'},jobIDs[1]:{'Flag':'1'}})
       
 if __name__ == '__main__':
 
@@ -178,5 +290,8 @@ if __name__ == '__main__':
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(SiteMaskCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TaskQueueCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CountJobsCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(HeartBeatCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(JobsSummaryCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(JobsBulkCase))
   
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,69 @@
+""" Test of the in memory task queue matching index
+"""
+
+__RCSID__ = "$Id$"
+
+import unittest
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+MULTI_DEF_FIELDS = ( 'Sites', 'GridCEs', 'GridMiddlewares', 'BannedSites',
+                     'Platforms', 'PilotTypes', 'SubmitPools', 'JobTypes', 'Tags' )
+MULTI_MATCH_FIELDS = ( 'GridCE', 'Site', 'GridMiddleware', 'Platform',
+                       'PilotType', 'SubmitPool', 'JobType', 'Tag' )
+
+def tqDef( **kwargs ):
+  tqDefDict = { 'OwnerDN' : '"/DN=user"', 'OwnerGroup' : '"user"', 'Setup' : '"Test"', 'CPUTime' : 86400 }
+  tqDefDict.update( kwargs )
+  return tqDefDict
+
+class TaskQueueIndexTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.index = TaskQueueIndex( MULTI_DEF_FIELDS, MULTI_MATCH_FIELDS,
+                                 strictRequireMatchFields = ( 'SubmitPool', 'Platform', 'PilotType', 'Tag' ) )
+    self.index.add( 1, tqDef(), 1, ( '/DN=user', 'user' ) )
+    self.index.add( 2, tqDef( Sites = [ '"S1"', '"S2"' ], CPUTime = 3600 ), 1, ( '/DN=user', 'user' ) )
+    self.index.add( 3, tqDef( BannedSites = [ '"S1"' ], Platforms = [ '"x86"' ] ), 1, ( '/DN=user', 'user' ) )
+    self.index.add( 4, tqDef( Tags = [ '"MP"', '"GPU"' ], Setup = '"Other"' ), 1, ( '/DN=other', 'other' ) )
+
+  def __match( self, **kwargs ):
+    matchDict = { 'Setup' : '"Test"', 'CPUTime' : 100000 }
+    matchDict.update( kwargs )
+    return sorted( [ tqTuple[0] for tqTuple in self.index.match( matchDict, numQueuesToGet = 0 ) ] )
+
+  def test01sites( self ):
+    """ site requirements and banned sites """
+    self.assertEqual( self.__match(), [ 1, 2 ] )
+    self.assertEqual( self.__match( Site = '"S1"' ), [ 1, 2 ] )
+    self.assertEqual( self.__match( Site = '"S3"', Platform = '"x86"' ), [ 1, 3 ] )
+    self.assertEqual( self.__match( Site = '"S1"', Platform = '"x86"' ), [ 1, 2 ] )
+    self.assertEqual( self.__match( Site = '"S2"', BannedSite = [ '"S2"' ] ), [ 1 ] )
+
+  def test02singleValues( self ):
+    """ CPU time, setup and owner """
+    self.assertEqual( self.__match( CPUTime = 5000 ), [ 2 ] )
+    self.assertEqual( self.__match( Setup = '"Other"', Tag = [ '"MP"', '"GPU"' ] ), [ 4 ] )
+    self.assertEqual( self.__match( Setup = '"Other"', Tag = [ '"MP"' ] ), [] )
+    self.assertEqual( self.__match( OwnerGroup = '"other"' ), [] )
+
+  def test03updates( self ):
+    """ removal, replacement and priorities """
+    self.assert_( self.index.remove( 2 ) )
+    self.assertFalse( self.index.remove( 2 ) )
+    self.assertEqual( self.__match( Site = '"S1"' ), [ 1 ] )
+    self.index.add( 1, tqDef( Sites = [ '"S3"' ] ), 1, ( '/DN=user', 'user' ) )
+    self.assertEqual( self.__match( Site = '"S1"' ), [] )
+    self.assertEqual( self.index.getMaxTQId(), 4 )
+    self.index.setPriority( [ 1 ], 10 ** 6 )
+    matchDict = { 'Setup' : '"Test"', 'CPUTime' : 100000, 'Site' : '"S3"', 'Platform' : '"x86"' }
+    self.assertEqual( self.index.match( matchDict )[0], ( 1, '/DN=user', 'user' ) )
+
+  def test04negativeCond( self ):
+    """ negative conditions """
+    self.assertEqual( self.__match( Site = '"S1"', ), [ 1, 2 ] )
+    self.assertEqual( sorted( [ tq[0] for tq in self.index.match( { 'Setup' : '"Test"', 'Site' : '"S1"' }, 0,
+                                                               { 'Site' : [ '"S1"' ] } ) ] ), [ 1 ] )
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( TaskQueueIndexTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( suite )
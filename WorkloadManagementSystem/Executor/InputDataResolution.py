@@ -24,6 +24,10 @@ class InputDataResolution( OptimizerExecutor ):
       - checkJob() - the main method called for each job
   """
 
+  #Replicas and metadata looked up for all the jobs of a batch
+  __bulkReplicas = {}
+  __bulkMetadata = {}
+
   @classmethod
   def initializeOptimizer( cls ):
     """Initialize specific parameters
@@ -41,6 +45,63 @@ class InputDataResolution( OptimizerExecutor ):
     cls.ex_setOption( "FailedStatus", "Input Data Not Available" )
     return S_OK()
 
+  def processTasks( self, tasks ):
+    """ Look up the replicas and metadata of the input data of all the jobs
+        of the batch at once, then optimize the jobs one by one from them
+    """
+    self.__bulkReplicas = {}
+    self.__bulkMetadata = {}
+    lfns = set()
+    for _jid, taskObj in tasks:
+      result = taskObj.jobState.getManifest()
+      if result[ 'OK' ]:
+        lfns.update( self.__sanitizeLFNs( result[ 'Value' ].getOption( 'InputData', [] ) ) )
+    lfns = list( lfns )
+    if len( tasks ) > 1 and lfns:
+      startTime = time.time()
+      result = self.__replicaMan.getReplicas( lfns )
+      self.log.info( 'Catalog replicas lookup time for %s jobs: %.2f seconds ' % ( len( tasks ),
+                                                                                 time.time() - startTime ) )
+      if result[ 'OK' ]:
+        self.__bulkReplicas = result[ 'Value' ]
+      if result[ 'OK' ] and self.ex_getOption( 'CheckFileMetadata', True ):
+        startTime = time.time()
+        result = self.__replicaMan.getCatalogFileMetadata( lfns )
+        self.log.info( 'Catalog Metadata Lookup Time for %s jobs: %.2f seconds ' % ( len( tasks ),
+                                                                                    time.time() - startTime ) )
+        if result[ 'OK' ]:
+          self.__bulkMetadata = result[ 'Value' ]
+    try:
+      return OptimizerExecutor.processTasks( self, tasks )
+    finally:
+      self.__bulkReplicas = {}
+      self.__bulkMetadata = {}
+
+  def __sanitizeLFNs( self, inputData ):
+    lfns = []
+    for lfn in inputData:
+      if lfn[:4].lower() == "lfn:":
+        lfns.append( lfn[4:] )
+      else:
+        lfns.append( lfn )
+    return lfns
+
+  def __fromBulk( self, bulkResult, lfns ):
+    """ Successful/Failed dictionary of lfns from the lookup of the batch,
+        None if some of them were not looked up
+    """
+    if not bulkResult:
+      return None
+    resultDict = { 'Successful' : {}, 'Failed' : {} }
+    for lfn in lfns:
+      for key in ( 'Successful', 'Failed' ):
+        if lfn in bulkResult.get( key, {} ):
+          resultDict[ key ][ lfn ] = bulkResult[ key ][ lfn ]
+          break
+      else:
+        return None
+    return resultDict
+
   def optimizeJob( self, jid, jobState ):
     result = self.doTheThing( jobState )
     if not result[ 'OK' ]:
@@ -67,22 +128,17 @@ class InputDataResolution( OptimizerExecutor ):
       return self.setNextOptimizer()
 
     #Sanitize
-    lfns = []
-    for lfn in inputData:
-      if lfn[:4].lower() == "lfn:":
-        lfns.append( lfn[4:] )
-      else:
-        lfns.append( lfn )
+    lfns = self.__sanitizeLFNs( inputData )
 
-
-    startTime = time.time()
-    result = self.__replicaMan.getReplicas( lfns )
-    self.jobLog.info( 'Catalog replicas lookup time: %.2f seconds ' % ( time.time() - startTime ) )
-    if not result['OK']:
-      self.log.warn( result['Message'] )
-      return result
-
-    replicaDict = result['Value']
+    replicaDict = self.__fromBulk( self.__bulkReplicas, lfns )
+    if replicaDict is None:
+      startTime = time.time()
+      result = self.__replicaMan.getReplicas( lfns )
+      self.jobLog.info( 'Catalog replicas lookup time: %.2f seconds ' % ( time.time() - startTime ) )
+      if not result['OK']:
+        self.log.warn( result['Message'] )
+        return result
+      replicaDict = result['Value']
     result = self.__checkReplicas( replicaDict )
     if not result['OK']:
       self.jobLog.error( result['Message'] )
@@ -139,9 +195,13 @@ class InputDataResolution( OptimizerExecutor ):
 
 
   def __getMetadata( self, lfnData ):
-      startTime = time.time()
-      result = self.__replicaMan.getCatalogFileMetadata( lfnData.keys() )
-      self.jobLog.info( 'Catalog Metadata Lookup Time: %.2f seconds ' % ( time.time() - startTime ) )
+      metadata = self.__fromBulk( self.__bulkMetadata, lfnData.keys() )
+      if metadata is not None:
+        result = S_OK( metadata )
+      else:
+        startTime = time.time()
+        result = self.__replicaMan.getCatalogFileMetadata( lfnData.keys() )
+        self.jobLog.info( 'Catalog Metadata Lookup Time: %.2f seconds ' % ( time.time() - startTime ) )
 
       if not result['OK']:
         self.jobLog.error( result['Message'] )
@@ -14,14 +14,17 @@
 __RCSID__ = "$Id$"
 
 from types import *
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
 
 # This is a global instance of the JobDB class
 jobDB = False
 logDB = False
+heartBeatBuffer = False
 
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
 
@@ -29,8 +32,16 @@ def initializeJobStateUpdateHandler( serviceInfo ):
 
   global jobDB
   global logDB
+  global heartBeatBuffer
   jobDB = JobDB()
   logDB = JobLoggingDB()
+  # Heart beats are written every HeartBeatBufferTime seconds, 0 to write each one when received
+  bufferTime = getServiceOption( serviceInfo, 'HeartBeatBufferTime', 10 )
+  if bufferTime > 0:
+    heartBeatBuffer = HeartBeatBuffer( jobDB, getServiceOption( serviceInfo, 'MaxBufferedHeartBeats', 5000 ) )
+    gThreadScheduler.addPeriodicTask( bufferTime, heartBeatBuffer.flush )
+  if jobDB.compactHeartBeats:
+    gThreadScheduler.addPeriodicTask( 3600, jobDB.downsampleHeartBeatData )
   return S_OK()
 
 class JobStateUpdateHandler( RequestHandler ):
@@ -181,6 +192,7 @@ class JobStateUpdateHandler( RequestHandler ):
       result = jobDB.setStartExecTime( int( jobID ), startDate )
 
     # Update the JobLoggingDB records
+    records = []
     for date, sDict in statusDict.items():
 
       status = sDict['Status']
@@ -196,9 +208,10 @@ class JobStateUpdateHandler( RequestHandler ):
         status = "Running"
         minor = "Application"
       source = sDict['Source']
-      result = logDB.addLoggingRecord( int( jobID ), status, minor, application, date, source )
-      if not result['OK']:
-        return result
+      records.append( ( int( jobID ), status, minor, application, date, source ) )
+    result = logDB.addLoggingRecords( records )
+    if not result['OK']:
+      return result
 
     return S_OK()
 
@@ -293,6 +306,10 @@ class JobStateUpdateHandler( RequestHandler ):
     """ Send a heart beat sign of life for a job jobID
     """
 
+    if heartBeatBuffer:
+      heartBeatBuffer.addHeartBeat( int( jobID ), staticData, dynamicData )
+      return S_OK( heartBeatBuffer.takeJobCommands( int( jobID ) ) )
+
     result = jobDB.setHeartBeatData( int( jobID ), staticData, dynamicData )
     if not result['OK']:
       gLogger.warn( 'Failed to set the heart beat data for job %d ' % int( jobID ) )
@@ -10,7 +10,7 @@ It also provides an XMLRPC interface to the Matcher
 __RCSID__ = "$Id$"
 
 import time
-from   types import StringType, DictType, StringTypes
+from   types import StringType, DictType, StringTypes, IntType, LongType
 import threading
 
 from DIRAC.ConfigurationSystem.Client.Helpers          import Registry, Operations
@@ -66,7 +66,7 @@ def initializeMatcherHandler( serviceInfo ):
     return res
 
   gMonitor.registerActivity( 'matchTime', "Job matching time",
-                             'Matching', "secs" , gMonitor.OP_MEAN, 300 )
+                             'Matching', "secs" , gMonitor.OP_MEAN, 300, percentiles = ( 50, 90, 99 ) )
   gMonitor.registerActivity( 'matchesDone', "Job Match Request",
                              'Matching', "matches" , gMonitor.OP_RATE, 300 )
   gMonitor.registerActivity( 'matchesOK', "Matched jobs",
@@ -160,13 +160,13 @@ class Limiter:
       result = self.__getRunningCondition( siteName )
       if result['OK']:
         negativeCond = result['Value']
-      gLogger.verbose( 'Negative conditions for site %s after checking limits are: %s' % ( siteName, str( negativeCond ) ) )
+      gLogger.verbose( 'Negative conditions after checking limits', 'for site %s are: %s', siteName, negativeCond )
 
     if self.checkMatchingDelay():
       result = self.__getDelayCondition( siteName )
       if result['OK']:
         delayCond = result['Value']
-        gLogger.verbose( 'Negative conditions for site %s after delay checking are: %s' % ( siteName, str( delayCond ) ) )
+        gLogger.verbose( 'Negative conditions after delay checking', 'for site %s are: %s', siteName, delayCond )
         negativeCond = self.__mergeCond( negativeCond, delayCond )
 
     if negativeCond:
@@ -245,8 +245,8 @@ class Limiter:
         limit = limitsDict[ attName ][ attValue ]
         running = data.get( attValue, 0 )
         if running >= limit:
-          gLogger.verbose( 'Job Limit imposed at %s on %s/%s=%d,'
-                           ' %d jobs already deployed' % ( siteName, attName, attValue, limit, running ) )
+          gLogger.verbose( 'Job Limit imposed', 'at %s on %s/%s=%d, %d jobs already deployed',
+                           siteName, attName, attValue, limit, running )
           if attName not in negCond:
             negCond[ attName ] = []
           negCond[ attName ].append( attValue )
@@ -334,7 +334,7 @@ class MatcherHandler( RequestHandler ):
       classAdAgent = ClassAd( resourceDescription )
       if not classAdAgent.isOK():
         return S_ERROR( 'Illegal Resource JDL' )
-      gLogger.verbose( classAdAgent.asJDL() )
+      gLogger.verbose( classAdAgent.asJDL )
 
       for name in gTaskQueueDB.getSingleValueTQDefFields():
         if classAdAgent.lookupAttribute( name ):
@@ -377,12 +377,11 @@ class MatcherHandler( RequestHandler ):
 
     return resourceDict
 
-  def selectJob( self, resourceDescription ):
-    """ Main job selection function to find the highest priority job
-        matching the resource capacity
+  def __prepareMatch( self, resourceDescription ):
+    """ Build the resource dict to match from the description sent by the pilot,
+        checking its credentials, version and site, and report the pilot information
+        Returns S_OK( ( resourceDict, pilotReference, pilotInfoReported ) )
     """
-
-    startTime = time.time()
     resourceDict = self.__processResourceDescription( resourceDescription )
 
     credDict = self.getRemoteCredentials()
@@ -465,7 +464,7 @@ class MatcherHandler( RequestHandler ):
     usableSites = result['Value']
 
     siteName = resourceDict['Site']
-    if siteName not in maskList:
+    if siteName not in usableSites:
       
       # if 'GridCE' not in resourceDict:
       #  return S_ERROR( 'Site not in mask and GridCE not specified' )
@@ -477,9 +476,24 @@ class MatcherHandler( RequestHandler ):
 
     resourceDict['Setup'] = self.serviceInfoDict['clientSetup']
 
-    gLogger.verbose( "Resource description:" )
-    for key in resourceDict:
-      gLogger.verbose( "%s : %s" % ( key.rjust( 20 ), resourceDict[ key ] ) )
+    if gLogger.shown( "VERBOSE" ):
+      gLogger.verbose( "Resource description:" )
+      for key in resourceDict:
+        gLogger.verbose( "%s : %s" % ( key.rjust( 20 ), resourceDict[ key ] ) )
+
+    return S_OK( ( resourceDict, pilotReference, pilotInfoReported ) )
+
+  def selectJob( self, resourceDescription ):
+    """ Main job selection function to find the highest priority job
+        matching the resource capacity
+    """
+
+    startTime = time.time()
+    result = self.__prepareMatch( resourceDescription )
+    if not result[ 'OK' ]:
+      return result
+    resourceDict, pilotReference, pilotInfoReported = result[ 'Value' ]
+    siteName = resourceDict['Site']
 
     negativeCond = self.__limiter.getNegativeCondForSite( siteName )
     result = gTaskQueueDB.matchAndGetJob( resourceDict, negativeCond = negativeCond )
@@ -551,6 +565,84 @@ class MatcherHandler( RequestHandler ):
     resultDict['PilotInfoReportedFlag'] = pilotInfoReported
     return S_OK( resultDict )
 
+  def selectJobs( self, resourceDescription, numJobs ):
+    """ Select up to numJobs jobs matching the resource capacity, like selectJob
+        but taking them out of the task queues, updating them and getting their
+        JDLs and optimizer parameters in bulk
+    """
+
+    startTime = time.time()
+    result = self.__prepareMatch( resourceDescription )
+    if not result[ 'OK' ]:
+      return result
+    resourceDict, pilotReference, pilotInfoReported = result[ 'Value' ]
+    siteName = resourceDict['Site']
+
+    negativeCond = self.__limiter.getNegativeCondForSite( siteName )
+    result = gTaskQueueDB.matchAndGetJobs( resourceDict, numJobs, negativeCond = negativeCond )
+    if not result['OK']:
+      return result
+    result = result['Value']
+    if not result['matchFound']:
+      return S_ERROR( 'No match found' )
+
+    jobIDs = [ jobID for jobID, _tqID in result['jobs'] ]
+    resAtt = gJobDB.getAttributesForJobList( jobIDs, ['OwnerDN', 'OwnerGroup', 'Status'] )
+    if not resAtt['OK']:
+      return S_ERROR( 'Could not retrieve job attributes' )
+    jobAttrs = resAtt['Value']
+    #The jobs are already out of the task queues
+    for jobID in list( jobIDs ):
+      if jobID not in jobAttrs or jobAttrs[ jobID ]['Status'] != 'Waiting':
+        gLogger.error( 'Job matched by the TQ is not in Waiting state', str( jobID ) )
+        jobIDs.remove( jobID )
+    if not jobIDs:
+      return S_ERROR( 'No match found' )
+
+    attNames = ['Status','MinorStatus','ApplicationStatus','Site']
+    attValues = ['Matched','Assigned','Unknown',siteName]
+    result = gJobDB.setJobsAttributes( jobIDs, attNames, attValues )
+    if not result['OK']:
+      gLogger.error( 'Could not set the jobs as Matched', result['Message'] )
+    result = gJobLoggingDB.addLoggingRecords( [ ( jobID, 'Matched', 'Assigned', 'idem', '', 'Matcher' ) for jobID in jobIDs ] )
+    if not result['OK']:
+      gLogger.error( 'Could not add the logging records of the matched jobs', result['Message'] )
+
+    result = gJobDB.getJobsJDL( jobIDs )
+    if not result['OK']:
+      return S_ERROR( 'Failed to get the job JDL' )
+    jdls = result['Value']
+    resOpt = gJobDB.getJobsOptParameters( jobIDs )
+    optParams = {}
+    if resOpt['OK']:
+      optParams = resOpt['Value']
+
+    matchTime = time.time() - startTime
+    gLogger.info( "Match time for %s jobs: [%s]" % ( len( jobIDs ), str( matchTime ) ) )
+    gMonitor.addMark( "matchTime", matchTime )
+
+    if self.__opsHelper.getValue( "JobScheduling/CheckMatchingDelay", True ):
+      for jobID in jobIDs:
+        self.__limiter.updateDelayCounters( siteName, jobID )
+
+    # Report pilot-job association
+    if pilotReference:
+      result = gPilotAgentsDB.setJobsForPilot( jobIDs, pilotReference, currentJobID = jobIDs[-1] )
+
+    jobList = []
+    for jobID in jobIDs:
+      if jobID not in jdls:
+        gLogger.error( 'Failed to get the JDL of matched job', str( jobID ) )
+        continue
+      resultDict = dict( optParams.get( jobID, {} ) )
+      resultDict['JDL'] = jdls[ jobID ]
+      resultDict['JobID'] = jobID
+      resultDict['DN'] = jobAttrs[ jobID ]['OwnerDN']
+      resultDict['Group'] = jobAttrs[ jobID ]['OwnerGroup']
+      resultDict['PilotInfoReportedFlag'] = pilotInfoReported
+      jobList.append( resultDict )
+    return S_OK( jobList )
+
 ##############################################################################
   types_requestJob = [ [StringType, DictType] ]
   def export_requestJob( self, resourceDescription ):
@@ -564,6 +656,19 @@ class MatcherHandler( RequestHandler ):
       gMonitor.addMark( "matchesOK" )
     return result
 
+##############################################################################
+  types_requestJobs = [ [StringType, DictType], [IntType, LongType] ]
+  def export_requestJobs( self, resourceDescription, numJobs ):
+    """ Serve up to numJobs jobs to an agent with several free slots.
+        Returns the list of job dictionaries, as returned by requestJob
+    """
+    numJobs = max( 1, min( numJobs, self.__opsHelper.getValue( "JobScheduling/MaxJobsPerRequest", 20 ) ) )
+    result = self.selectJobs( resourceDescription, numJobs )
+    gMonitor.addMark( "matchesDone" )
+    if result[ 'OK' ]:
+      gMonitor.addMark( "matchesOK", len( result[ 'Value' ] ) )
+    return result
+
 ##############################################################################
   types_getActiveTaskQueues = []
   def export_getActiveTaskQueues( self ):
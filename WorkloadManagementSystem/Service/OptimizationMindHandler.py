@@ -5,6 +5,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.Core.Base.ExecutorMindHandler import ExecutorMindHandler
 from DIRAC.WorkloadManagementSystem.Client.JobState.JobState import JobState
 from DIRAC.WorkloadManagementSystem.Client.JobState.CachedJobState import CachedJobState
+from DIRAC.WorkloadManagementSystem.Client.JobState.JobStateBatch import JobStateBatch
 from DIRAC.WorkloadManagementSystem.Client.JobState.OptimizationTask import OptimizationTask
 
 class OptimizationMindHandler( ExecutorMindHandler ):
@@ -17,18 +18,26 @@ class OptimizationMindHandler( ExecutorMindHandler ):
 
   auth_msg_OptimizeJobs = [ 'all' ]
   def msg_OptimizeJobs( self, msgObj ):
-    jids = msgObj.jids
-    for jid in jids:
+    jids = []
+    for jid in msgObj.jids:
       try:
-        jid = int( jid )
+        jids.append( int( jid ) )
       except ValueError:
         self.log.error( "Job ID %s has to be an integer" % jid )
-
+    result = JobStateBatch.loadJobs( jids )
+    if not result[ 'OK' ]:
+      self.log.error( "Could not load %s jobs: %s" % ( len( jids ), result[ 'Message' ] ) )
+      return result
+    jobStates = result[ 'Value' ]
+    for jid in jids:
+      if jid not in jobStates:
+        self.log.error( "Could not add job %s to optimization: it does not exist" % jid )
+        continue
       #Forget and add task to ensure state is reset
       self.forgetTask( jid )
-      result = self.executeTask( jid, OptimizationTask( jid ) )
+      result = self.executeTask( jid, OptimizationTask( jobStates[ jid ] ) )
       if not result[ 'OK' ]:
-        self.log.error( "Could not add job %s to optimization: %s" % ( jid, result[ 'Value' ] ) )
+        self.log.error( "Could not add job %s to optimization: %s" % ( jid, result[ 'Message' ] ) )
       else:
         self.log.info( "Received new job %s" % jid )
     return S_OK()
@@ -67,14 +76,15 @@ class OptimizationMindHandler( ExecutorMindHandler ):
         return result
       jidList = result[ 'Value' ]
       knownJids = cls.getTaskIds()
-      added = 0
-      for jid in jidList:
-        jid = long( jid )
-        if jid not in knownJids:
-          #Same as before. Check that the state is ok.
-          cls.executeTask( jid, OptimizationTask( jid ) )
-          added += 1
-      log.info( "Added %s/%s jobs for %s state" % ( added, len( jidList ), opState ) )
+      newJids = [ long( jid ) for jid in jidList if long( jid ) not in knownJids ]
+      result = JobStateBatch.loadJobs( newJids )
+      if not result[ 'OK' ]:
+        return result
+      jobStates = result[ 'Value' ]
+      for jid in newJids:
+        if jid in jobStates:
+          cls.executeTask( jid, OptimizationTask( jobStates[ jid ] ) )
+      log.info( "Added %s/%s jobs for %s state" % ( len( jobStates ), len( jidList ), opState ) )
     return S_OK()
 
   @classmethod
@@ -114,9 +124,14 @@ class OptimizationMindHandler( ExecutorMindHandler ):
       if not result[ 'OK' ]:
         cls.__failJob( jid, "Error while splitting", result[ 'Message' ] )
         return S_ERROR( "Fail splitting" )
-      for jid in result[ 'Value' ]:
-        cls.forgetTask( jid )
-        cls.executeTask( jid, OptimizationTask( jid ) )
+      result = JobStateBatch.loadJobs( result[ 'Value' ] )
+      if not result[ 'OK' ]:
+        cls.log.error( "Could not load the split jobs of %s: %s" % ( jid, result[ 'Message' ] ) )
+        return S_ERROR( "Fail loading split jobs" )
+      jobStates = result[ 'Value' ]
+      for splitJid in jobStates:
+        cls.forgetTask( splitJid )
+        cls.executeTask( splitJid, OptimizationTask( jobStates[ splitJid ] ) )
     except Exception, excp:
       cls.log.exception( "While splitting" )
       cls.__failJob( jid, "Error while splitting", str( excp ) )
@@ -188,6 +203,18 @@ class OptimizationMindHandler( ExecutorMindHandler ):
   def exec_prepareToSend( cls, jid, taskObj, eId ):
     return taskObj.jobState.recheckValidity()
 
+  @classmethod
+  def exec_prepareToSendTasks( cls, tasks, eId ):
+    return JobStateBatch.recheckValidity( [ taskObj.jobState for _jid, taskObj in tasks ] )
+
+  @classmethod
+  def exec_tasksDone( cls, taskObjs ):
+    #Save the jobs of the batch in one go, exec_taskProcessed saves the ones left
+    result = JobStateBatch.commitChanges( [ taskObjs[ jid ].jobState for jid in taskObjs ] )
+    if not result[ 'OK' ]:
+      cls.log.warn( "Could not save the changes of %s jobs at once: %s" % ( len( taskObjs ), result[ 'Message' ] ) )
+    return S_OK()
+
   @classmethod
   def exec_serializeTask( cls, taskObj ):
     return S_OK( taskObj.serialize() )
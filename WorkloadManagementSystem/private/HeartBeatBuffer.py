@@ -0,0 +1,101 @@
+""" Write-behind buffer of the job heart beats
+
+    The heart beats received by the JobStateUpdate service are kept in memory
+    and written by flush, called periodically, with one statement per table for
+    all the jobs. At each flush all the pending commands are loaded with one query
+    and kept until the next heart beat of their job, which gets them without
+    querying the DB. A command set for a job is then passed to the job with its
+    first heart beat following the next flush. Heart beats still in the buffer
+    are lost if the service stops.
+"""
+
+__RCSID__ = "$Id$"
+
+import threading
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities import Time
+
+class HeartBeatBuffer( object ):
+
+  def __init__( self, jobDB, maxHeartBeats = 5000 ):
+    """ Heart beats of at most maxHeartBeats jobs are buffered, more make the
+        thread adding the last one flush the buffer
+    """
+    self.__jobDB = jobDB
+    self.__maxHeartBeats = maxHeartBeats
+    self.__lock = threading.Lock()
+    self.__flushLock = threading.Lock()
+    # jobID : [ staticDataDict, [ ( heartBeatTime, dynamicDataDict ), ... ] ]
+    self.__heartBeats = {}
+    # jobID : { command : arguments }
+    self.__commands = {}
+    self.log = gLogger.getSubLogger( "HeartBeatBuffer" )
+
+  def addHeartBeat( self, jobID, staticDataDict, dynamicDataDict ):
+    """ Buffer the heart beat of a job
+    """
+    heartBeatTime = Time.dateTime()
+    self.__lock.acquire()
+    try:
+      if jobID in self.__heartBeats:
+        self.__heartBeats[ jobID ][0].update( staticDataDict )
+        self.__heartBeats[ jobID ][1].append( ( heartBeatTime, dynamicDataDict ) )
+      else:
+        self.__heartBeats[ jobID ] = [ dict( staticDataDict ), [ ( heartBeatTime, dynamicDataDict ) ] ]
+      full = len( self.__heartBeats ) >= self.__maxHeartBeats
+    finally:
+      self.__lock.release()
+    if full:
+      self.flush()
+
+  def takeJobCommands( self, jobID ):
+    """ Get the commands found for the job and set them as Sent
+    """
+    if jobID not in self.__commands:
+      return {}
+    # Not while a flush looks up the commands, so that they are passed only once
+    self.__flushLock.acquire()
+    try:
+      self.__lock.acquire()
+      try:
+        commands = self.__commands.pop( jobID, {} )
+      finally:
+        self.__lock.release()
+      for command in commands:
+        result = self.__jobDB.setJobCommandStatus( jobID, command, 'Sent' )
+        if not result['OK']:
+          self.log.warn( 'Failed to set the command status for job %d' % jobID, result['Message'] )
+    finally:
+      self.__flushLock.release()
+    return commands
+
+  def flush( self ):
+    """ Write the buffered heart beats and load the pending commands of all the jobs
+    """
+    self.__flushLock.acquire()
+    try:
+      self.__lock.acquire()
+      try:
+        heartBeats = self.__heartBeats
+        self.__heartBeats = {}
+      finally:
+        self.__lock.release()
+      if heartBeats:
+        result = self.__jobDB.setHeartBeatsData( [ ( jobID, heartBeats[ jobID ][0], heartBeats[ jobID ][1] )
+                                                   for jobID in heartBeats ] )
+        if not result['OK']:
+          self.log.warn( 'Failed to set the heart beat data of %d jobs' % len( heartBeats ), result['Message'] )
+        self.log.verbose( 'Heart beats flushed', 'for %d jobs' % len( heartBeats ) )
+      # The commands already passed by another service instance are dropped as well
+      result = self.__jobDB.getJobsCommands()
+      if not result['OK']:
+        self.log.warn( 'Failed to get the job commands', result['Message'] )
+      else:
+        self.__lock.acquire()
+        try:
+          self.__commands = result['Value']
+        finally:
+          self.__lock.release()
+      return S_OK( len( heartBeats ) )
+    finally:
+      self.__flushLock.release()
@@ -0,0 +1,64 @@
+""" Compact encoding of the job heart beat metrics
+
+    In the compact storage mode of the JobDB the samples of a metric of a job
+    are kept in blocks of one day, one row per job, metric and block, each sample
+    being packed as the offset in seconds from the start of the block and the
+    value. New samples are appended to the block of their day. Blocks older than
+    a few days are downsampled to one sample per resolution seconds: the mean of
+    the values for the metrics that vary up and down, the last value for the
+    cumulative ones, so that their maximum stays exact.
+"""
+
+__RCSID__ = "$Id$"
+
+import struct
+
+BLOCK_LENGTH = 86400
+# Offset from the start of the block in seconds, value
+SAMPLE_FORMAT = '<Id'
+SAMPLE_SIZE = struct.calcsize( SAMPLE_FORMAT )
+# Metrics whose values only grow during the job
+CUMULATIVE_METRICS = ( 'CPUConsumed', 'WallClockTime' )
+
+def blockStart( epoch ):
+  """ Start of the block holding the samples taken at epoch
+  """
+  return int( epoch ) - int( epoch ) % BLOCK_LENGTH
+
+def packSamples( samples, startEpoch ):
+  """ Pack a list of ( epoch, value ) of the block starting at startEpoch
+  """
+  return ''.join( [ struct.pack( SAMPLE_FORMAT, int( epoch ) - startEpoch, value ) for epoch, value in samples ] )
+
+def unpackSamples( data, startEpoch ):
+  """ List of ( epoch, value ) of a block, sorted by time. A truncated
+      trailing sample is ignored
+  """
+  samples = []
+  for i in range( 0, len( data ) - SAMPLE_SIZE + 1, SAMPLE_SIZE ):
+    offset, value = struct.unpack( SAMPLE_FORMAT, data[ i:i + SAMPLE_SIZE ] )
+    samples.append( ( startEpoch + offset, value ) )
+  samples.sort()
+  return samples
+
+def downsample( samples, resolution, cumulative = False ):
+  """ Reduce a sorted list of ( epoch, value ) to one sample per resolution seconds:
+      the mean time and value of the samples of each interval, or the last sample
+      of each interval for a cumulative metric
+  """
+  if resolution <= 1:
+    return list( samples )
+  bins = []
+  for epoch, value in samples:
+    if bins and bins[-1][0] == epoch // resolution:
+      bins[-1][1].append( ( epoch, value ) )
+    else:
+      bins.append( ( epoch // resolution, [ ( epoch, value ) ] ) )
+  result = []
+  for _bin, binSamples in bins:
+    if cumulative:
+      result.append( binSamples[-1] )
+    else:
+      result.append( ( sum( [ epoch for epoch, _value in binSamples ] ) // len( binSamples ),
+                       sum( [ value for _epoch, value in binSamples ] ) / len( binSamples ) ) )
+  return result
@@ -0,0 +1,214 @@
+""" In memory index of the task queues used to match resources without querying the TaskQueueDB
+
+    It mirrors tq_TaskQueues and the tq_TQTo* tables. For every multi value field it keeps
+    an inverted index from values to task queues plus the set of task queues that do not
+    define the field, so the candidates for a resource are found with set operations.
+    Values are kept escaped, as they are in the definition and match dictionaries
+    used by the TaskQueueDB.
+"""
+
+__RCSID__ = "$Id$"
+
+import types
+import random
+import threading
+from DIRAC.Core.Security import Properties, CS
+
+class TaskQueueIndex( object ):
+
+  def __init__( self, multiValueDefFields, multiValueMatchFields, tagMatchFields = ( 'Tag', ),
+                bannedJobMatchFields = ( 'Site', ), strictRequireMatchFields = () ):
+    self.__multiValueDefFields = multiValueDefFields
+    self.__multiValueMatchFields = multiValueMatchFields
+    self.__tagMatchFields = tagMatchFields
+    self.__bannedJobMatchFields = bannedJobMatchFields
+    self.__strictRequireMatchFields = strictRequireMatchFields
+    self.__lock = threading.Lock()
+    #tqId -> { 'OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime', 'Priority', 'Owner', <multi value field> : frozenset }
+    self.__tqs = {}
+    self.__setupIndex = {}
+    self.__valueIndex = dict( [ ( field, {} ) for field in multiValueDefFields ] )
+    self.__undefinedIndex = dict( [ ( field, set() ) for field in multiValueDefFields ] )
+
+  def __len__( self ):
+    return len( self.__tqs )
+
+  def __contains__( self, tqId ):
+    return tqId in self.__tqs
+
+  def getMaxTQId( self ):
+    if not self.__tqs:
+      return 0
+    return max( self.__tqs )
+
+  def add( self, tqId, tqDefDict, priority, owner ):
+    """ Add or replace a task queue. tqDefDict holds the escaped definition
+        and owner the raw ( OwnerDN, OwnerGroup ) returned by the matches
+    """
+    tqData = { 'OwnerDN' : tqDefDict[ 'OwnerDN' ],
+               'OwnerGroup' : tqDefDict[ 'OwnerGroup' ],
+               'Setup' : tqDefDict[ 'Setup' ],
+               'CPUTime' : tqDefDict[ 'CPUTime' ],
+               'Priority' : priority,
+               'Owner' : tuple( owner ) }
+    for field in self.__multiValueDefFields:
+      tqData[ field ] = frozenset( tqDefDict.get( field, [] ) )
+    self.__lock.acquire()
+    try:
+      self.__remove( tqId )
+      self.__tqs[ tqId ] = tqData
+      self.__setupIndex.setdefault( tqData[ 'Setup' ], set() ).add( tqId )
+      for field in self.__multiValueDefFields:
+        if not tqData[ field ]:
+          self.__undefinedIndex[ field ].add( tqId )
+        for value in tqData[ field ]:
+          self.__valueIndex[ field ].setdefault( value, set() ).add( tqId )
+    finally:
+      self.__lock.release()
+
+  def remove( self, tqId ):
+    self.__lock.acquire()
+    try:
+      return self.__remove( tqId )
+    finally:
+      self.__lock.release()
+
+  def __remove( self, tqId ):
+    if tqId not in self.__tqs:
+      return False
+    tqData = self.__tqs.pop( tqId )
+    self.__discard( self.__setupIndex, tqData[ 'Setup' ], tqId )
+    for field in self.__multiValueDefFields:
+      self.__undefinedIndex[ field ].discard( tqId )
+      for value in tqData[ field ]:
+        self.__discard( self.__valueIndex[ field ], value, tqId )
+    return True
+
+  def __discard( self, index, key, tqId ):
+    tqIds = index.get( key )
+    if tqIds is None:
+      return
+    tqIds.discard( tqId )
+    if not tqIds:
+      del( index[ key ] )
+
+  def setPriority( self, tqIds, priority ):
+    self.__lock.acquire()
+    try:
+      for tqId in tqIds:
+        if tqId in self.__tqs:
+          self.__tqs[ tqId ][ 'Priority' ] = priority
+    finally:
+      self.__lock.release()
+
+  def match( self, tqMatchDict, numQueuesToGet = 1, negativeCond = None ):
+    """ Get the task queues that match a checked match dict, with the same
+        conditions as the TaskQueueDB SQL match, ordered by RAND() / Priority
+        Returns a list of ( tqId, OwnerDN, OwnerGroup )
+    """
+    self.__lock.acquire()
+    try:
+      candidates = self.__findCandidates( tqMatchDict )
+      matching = []
+      for tqId in candidates:
+        tqData = self.__tqs[ tqId ]
+        if self.__checkTQ( tqData, tqMatchDict ) and ( not negativeCond or
+                                                       self.__checkNegativeCond( tqData, negativeCond ) ):
+          matching.append( ( random.random() / max( tqData[ 'Priority' ], 0.000001 ), tqId ) )
+      matching.sort()
+      if numQueuesToGet:
+        matching = matching[ :numQueuesToGet ]
+      return [ ( tqId, ) + self.__tqs[ tqId ][ 'Owner' ] for _, tqId in matching ]
+    finally:
+      self.__lock.release()
+
+  def __toList( self, value ):
+    if type( value ) not in ( types.ListType, types.TupleType ):
+      return [ value ]
+    return value
+
+  def __findCandidates( self, tqMatchDict ):
+    """ Intersect the sets of task queues allowed by the indexed conditions
+    """
+    sets = []
+    if 'Setup' in tqMatchDict:
+      setupTQs = set()
+      for setup in self.__toList( tqMatchDict[ 'Setup' ] ):
+        setupTQs.update( self.__setupIndex.get( setup, () ) )
+      sets.append( setupTQs )
+    for field in self.__multiValueMatchFields:
+      defField = "%ss" % field
+      if field in tqMatchDict and tqMatchDict[ field ]:
+        if field in self.__tagMatchFields:
+          #TQs with tags are checked one by one, all their tags have to be provided
+          continue
+        allowed = set( self.__undefinedIndex[ defField ] )
+        for value in self.__toList( tqMatchDict[ field ] ):
+          allowed.update( self.__valueIndex[ defField ].get( value, () ) )
+        sets.append( allowed )
+      elif field in self.__strictRequireMatchFields and field not in tqMatchDict:
+        sets.append( self.__undefinedIndex[ defField ] )
+    if not sets:
+      return list( self.__tqs )
+    sets.sort( key = len )
+    candidates = set( sets[0] )
+    for tqSet in sets[1:]:
+      if not candidates:
+        break
+      candidates.intersection_update( tqSet )
+    return candidates
+
+  def __checkTQ( self, tqData, tqMatchDict ):
+    """ Conditions not resolved by the inverted indexes
+    """
+    if 'CPUTime' in tqMatchDict:
+      if tqData[ 'CPUTime' ] > max( self.__toList( tqMatchDict[ 'CPUTime' ] ) ):
+        return False
+    if not self.__checkOwner( tqData, tqMatchDict ):
+      return False
+    for field in self.__multiValueMatchFields:
+      defField = "%ss" % field
+      if field in tqMatchDict and tqMatchDict[ field ]:
+        values = self.__toList( tqMatchDict[ field ] )
+        if field in self.__tagMatchFields and tqMatchDict[ field ] != '"Any"':
+          if not tqData[ defField ].issubset( values ):
+            return False
+        if field in self.__bannedJobMatchFields:
+          if not [ value for value in values if value not in tqData[ "Banned%s" % defField ] ]:
+            return False
+      bannedField = "Banned%s" % field
+      if bannedField in tqMatchDict and tqMatchDict[ bannedField ]:
+        if not [ value for value in self.__toList( tqMatchDict[ bannedField ] ) if value not in tqData[ defField ] ]:
+          return False
+    return True
+
+  def __checkOwner( self, tqData, tqMatchDict ):
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      if tqData[ 'OwnerGroup' ] not in self.__toList( tqMatchDict[ 'OwnerGroup' ] ):
+        return False
+      if Properties.JOB_SHARING in CS.getPropertiesForGroup( tqData[ 'OwnerGroup' ].replace( '"', "" ) ):
+        return True
+      return tqData[ 'OwnerDN' ] in self.__toList( tqMatchDict[ 'OwnerDN' ] )
+    for field in ( 'OwnerGroup', 'OwnerDN' ):
+      if field in tqMatchDict and tqData[ field ] not in self.__toList( tqMatchDict[ field ] ):
+        return False
+    return True
+
+  def __checkNegativeCond( self, tqData, negativeCond ):
+    """ A list of condition dicts is the OR of them. A dict is ( not cond1 or not cond2 ... )
+    """
+    if type( negativeCond ) in ( types.ListType, types.TupleType ):
+      for condDict in negativeCond:
+        if self.__checkNegativeCond( tqData, condDict ):
+          return True
+      return False
+    for field in negativeCond:
+      if field in self.__multiValueMatchFields:
+        defField = "%ss" % field
+        if not [ value for value in self.__toList( negativeCond[ field ] ) if value in tqData[ defField ] ]:
+          return True
+      elif field in ( 'OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime' ):
+        for value in self.__toList( negativeCond[ field ] ):
+          if value != tqData[ field ]:
+            return True
+    return False
@@ -0,0 +1,99 @@
+""" Test of the write-behind buffer of the job heart beats
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import unittest
+from DIRAC import S_OK
+from DIRAC.Core.Utilities import Time
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
+
+class FakeJobDB( object ):
+  """ Keeps the heart beats written and the commands like the JobDB
+  """
+
+  def __init__( self ):
+    self.heartBeats = []
+    self.commands = {}
+    self.commandQueries = 0
+
+  def setHeartBeatsData( self, heartBeatsList ):
+    self.heartBeats.append( heartBeatsList )
+    return S_OK()
+
+  def getJobsCommands( self, jobIDList = None, status = 'Received' ):
+    self.commandQueries += 1
+    result = {}
+    for ( jobID, command ), ( arguments, commandStatus ) in self.commands.items():
+      if commandStatus == status and ( jobIDList is None or jobID in jobIDList ):
+        result.setdefault( jobID, {} )[ command ] = arguments
+    return S_OK( result )
+
+  def setJobCommandStatus( self, jobID, command, status ):
+    self.commands[ ( jobID, command ) ] = ( self.commands[ ( jobID, command ) ][0], status )
+    return S_OK()
+
+class HeartBeatBufferTestCase( unittest.TestCase ):
+
+  def setUp( self ):
+    self.jobDB = FakeJobDB()
+    self.buffer = HeartBeatBuffer( self.jobDB, maxHeartBeats = 3 )
+
+  def test_flush( self ):
+    """ the heart beats of all the jobs are written with one call """
+    self.buffer.addHeartBeat( 1, { 'Node' : 'a' }, { 'CPU' : 1 } )
+    self.buffer.addHeartBeat( 2, {}, { 'CPU' : 2 } )
+    self.buffer.addHeartBeat( 1, { 'Node' : 'b' }, { 'CPU' : 3 } )
+    self.assertEqual( self.jobDB.heartBeats, [] )
+    self.assertEqual( self.buffer.flush()['Value'], 2 )
+    self.assertEqual( len( self.jobDB.heartBeats ), 1 )
+    heartBeats = dict( [ ( jobID, ( static, dynamic ) ) for jobID, static, dynamic in self.jobDB.heartBeats[0] ] )
+    self.assertEqual( heartBeats[1][0], { 'Node' : 'b' } )
+    self.assertEqual( [ beat[1] for beat in heartBeats[1][1] ], [ { 'CPU' : 1 }, { 'CPU' : 3 } ] )
+    self.assertEqual( self.buffer.flush()['Value'], 0 )
+    self.assertEqual( len( self.jobDB.heartBeats ), 1 )
+
+  def test_full( self ):
+    """ the thread adding the heart beat of one job too many flushes the buffer """
+    for jobID in range( 3 ):
+      self.buffer.addHeartBeat( jobID, {}, {} )
+    self.assertEqual( len( self.jobDB.heartBeats ), 1 )
+    self.assertEqual( len( self.jobDB.heartBeats[0] ), 3 )
+
+  def test_receiptTime( self ):
+    """ a status set between the heart beat and the flush is more recent than the heart beat time,
+        for the JobDB not to set the job back to Running """
+    self.buffer.addHeartBeat( 1, {}, { 'CPU' : 1 } )
+    statusTime = Time.dateTime()
+    time.sleep( 0.01 )
+    self.buffer.flush()
+    heartBeatTime = self.jobDB.heartBeats[0][0][2][0][0]
+    self.assert_( heartBeatTime <= statusTime )
+
+  def test_commands( self ):
+    """ a command is passed once, at the first heart beat after the next flush, whatever job was flushed """
+    self.buffer.flush()
+    self.jobDB.commands[ ( 5, 'Kill' ) ] = ( '', 'Received' )
+    self.assertEqual( self.buffer.takeJobCommands( 5 ), {} )
+    self.buffer.addHeartBeat( 1, {}, {} )
+    self.buffer.flush()
+    self.assertEqual( self.buffer.takeJobCommands( 5 ), { 'Kill' : '' } )
+    self.assertEqual( self.jobDB.commands[ ( 5, 'Kill' ) ], ( '', 'Sent' ) )
+    self.assertEqual( self.buffer.takeJobCommands( 5 ), {} )
+    self.buffer.flush()
+    self.assertEqual( self.buffer.takeJobCommands( 5 ), {} )
+    # One query per flush for all the jobs
+    self.assertEqual( self.jobDB.commandQueries, 3 )
+
+  def test_commandsSentElsewhere( self ):
+    """ the commands passed by another service instance are dropped at the next flush """
+    self.jobDB.commands[ ( 5, 'Kill' ) ] = ( '', 'Received' )
+    self.buffer.flush()
+    self.jobDB.commands[ ( 5, 'Kill' ) ] = ( '', 'Sent' )
+    self.buffer.flush()
+    self.assertEqual( self.buffer.takeJobCommands( 5 ), {} )
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase( HeartBeatBufferTestCase )
+  unittest.TextTestRunner( verbosity = 2 ).run( suite )
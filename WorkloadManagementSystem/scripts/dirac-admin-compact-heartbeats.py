@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+########################################################################
+# $HeadURL$
+# File :    dirac-admin-compact-heartbeats
+########################################################################
+"""
+   Move the heart beat data kept one value per row in the JobDB to the compact
+   series, then downsample the old series. Enable the CompactHeartBeats option of
+   the JobDB before, so that new heart beats are not written one value per row.
+"""
+__RCSID__ = "$Id$"
+import DIRAC
+from DIRAC import S_OK
+from DIRAC.Core.Base import Script
+
+maxJobs = 100
+def setMaxJobs( optVal ):
+  global maxJobs
+  maxJobs = int( optVal )
+  return S_OK()
+
+Script.registerSwitch( "n:", "jobs=", "number of jobs migrated at once (default 100)", setMaxJobs )
+Script.setUsageMessage( '\n'.join( [ __doc__.split( '\n' )[1],
+                                     'Usage:',
+                                     '  %s [option|cfgfile]' % Script.scriptName ] ) )
+Script.parseCommandLine( ignoreErrors = True )
+
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+
+jobdb = JobDB()
+result = jobdb._checkTable()
+if not result[ 'OK' ]:
+  print result[ 'Message' ]
+  DIRAC.exit( 1 )
+
+lastJobID = 0
+migratedValues = 0
+while True:
+  result = jobdb.migrateHeartBeatData( lastJobID, maxJobs )
+  if not result[ 'OK' ]:
+    print "Failed after job %s: %s" % ( lastJobID, result[ 'Message' ] )
+    DIRAC.exit( 1 )
+  lastJobID, nValues = result[ 'Value' ]
+  if not lastJobID:
+    break
+  migratedValues += nValues
+  print "Migrated up to job %s, %s values" % ( lastJobID, migratedValues )
+
+result = jobdb.downsampleHeartBeatData()
+if not result[ 'OK' ]:
+  print "Failed to downsample: %s" % result[ 'Message' ]
+  DIRAC.exit( 1 )
+print "%s values migrated, %s blocks downsampled" % ( migratedValues, result[ 'Value' ] )
+DIRAC.exit( 0 )